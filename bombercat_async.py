@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+BomberCat Async Server Support
+Selects the Socket.IO async mode (eventlet, gevent or threading), applies
+the matching monkey patching so subprocess and socket calls cooperate with
+the event loop, and bounds how much blocking work request handlers may run
+at the same time
+"""
+import time
+import threading
+import importlib.util
+
+ASYNC_MODES = ("eventlet", "gevent", "threading")
+
+
+def mode_available(mode):
+    if mode == "threading":
+        return True
+    return importlib.util.find_spec(mode) is not None
+
+
+def is_patched(mode):
+    """Whether the standard library was monkey patched for a green-thread mode"""
+    if mode == "eventlet":
+        from eventlet import patcher
+        return patcher.is_monkey_patched("thread") and patcher.is_monkey_patched("socket")
+    if mode == "gevent":
+        from gevent import monkey
+        return monkey.is_module_patched("threading") and monkey.is_module_patched("socket")
+    return True
+
+
+def resolve_async_mode(requested="", require_patched=False):
+    """Pick the async mode: threading unless eventlet or gevent is requested
+
+    A green-thread mode is only used when it is installed and, with
+    require_patched, when patch_for() already ran; otherwise blocking
+    subprocess and socket calls would stall its event loop, so this falls
+    back to threading.
+    """
+    if not requested:
+        return "threading"
+    if requested not in ASYNC_MODES:
+        raise ValueError(f"Unknown async mode {requested!r}, use one of {', '.join(ASYNC_MODES)}")
+    if not mode_available(requested):
+        print(f"[WARNING] async_mode {requested!r} is not installed, falling back to threading")
+        return "threading"
+    if require_patched and not is_patched(requested):
+        print(f"[WARNING] async_mode {requested!r} was not monkey patched before the app was created, "
+              f"falling back to threading")
+        return "threading"
+    return requested
+
+
+def patch_for(mode):
+    """Monkey patch the standard library for a green-thread async mode
+
+    Must run before the server starts; it makes subprocess, socket, select
+    and time.sleep yield to the event loop instead of blocking it.
+    """
+    if mode == "eventlet":
+        import eventlet
+        eventlet.monkey_patch()
+    elif mode == "gevent":
+        from gevent import monkey
+        monkey.patch_all()
+
+
+class BlockingWork:
+    """Runs blocking calls (scans, short CLI queries) with bounded concurrency
+
+    With eventlet/gevent the call runs in the hub's native thread pool so the
+    event loop keeps serving requests; with threading it runs in the calling
+    request thread. Either way at most max_workers calls run at once and the
+    rest wait their turn.
+    """
+
+    def __init__(self, async_mode="threading", max_workers=4):
+        self.async_mode = async_mode
+        self.max_workers = max_workers
+        self.slots = threading.BoundedSemaphore(max_workers)
+        self.lock = threading.Lock()
+        self.active = 0
+        self.waiting = 0
+        self.completed = 0
+        self.total_wait = 0.0
+
+    def run(self, func, *args, **kwargs):
+        queued = time.monotonic()
+        with self.lock:
+            self.waiting += 1
+        self.slots.acquire()
+        with self.lock:
+            self.waiting -= 1
+            self.active += 1
+            self.total_wait += time.monotonic() - queued
+        try:
+            return self._call(func, args, kwargs)
+        finally:
+            with self.lock:
+                self.active -= 1
+                self.completed += 1
+            self.slots.release()
+
+    def _call(self, func, args, kwargs):
+        if self.async_mode == "eventlet":
+            from eventlet import tpool
+            return tpool.execute(func, *args, **kwargs)
+        if self.async_mode == "gevent":
+            import gevent
+            return gevent.get_hub().threadpool.apply(func, args, kwargs)
+        return func(*args, **kwargs)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "async_mode": self.async_mode,
+                "max_workers": self.max_workers,
+                "active": self.active,
+                "waiting": self.waiting,
+                "completed": self.completed,
+                "avg_wait_ms": round(self.total_wait * 1000 / self.completed, 2) if self.completed else 0.0
+            }
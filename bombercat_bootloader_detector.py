@@ -49,6 +49,66 @@ def find_rpi_rp2_drive():
     
     return None
 
+def volume_present(drive, was_mount):
+    """Check whether a BOOTSEL volume is still attached"""
+    if not os.path.exists(drive):
+        return False
+    if was_mount and not os.path.ismount(drive):
+        return False
+    return True
+
+def copy_uf2_to_drive(uf2_path, drive, progress=None, chunk_size=1024 * 1024, timeout=15):
+    """Copy a UF2 image straight onto the RPI-RP2 volume
+
+    Writes in large sequential chunks, fsyncs the file and then waits for
+    the volume to disappear, which is how the RP2040 bootrom confirms it
+    accepted the image and rebooted. progress(bytes_written, total) is
+    called after every chunk. Returns the number of bytes written.
+    """
+    uf2_path = Path(uf2_path)
+    total = uf2_path.stat().st_size
+    was_mount = os.path.ismount(drive)
+    target = os.path.join(drive, uf2_path.name)
+
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    written = 0
+
+    fd = os.open(target, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0))
+    try:
+        with open(uf2_path, "rb", buffering=0) as src:
+            while True:
+                count = src.readinto(buffer)
+                if not count:
+                    break
+                chunk = view[:count]
+                while chunk:
+                    done = os.write(fd, chunk)
+                    chunk = chunk[done:]
+                written += count
+                if progress:
+                    progress(written, total)
+        try:
+            os.fsync(fd)
+        except OSError:
+            # The bootrom may reboot as soon as the last block lands
+            if volume_present(drive, was_mount):
+                raise
+    finally:
+        try:
+            os.close(fd)
+        except OSError:
+            if volume_present(drive, was_mount):
+                raise
+
+    deadline = time.time() + timeout
+    while volume_present(drive, was_mount):
+        if time.time() >= deadline:
+            raise TimeoutError(f"{drive} did not disconnect after copying {uf2_path.name}")
+        time.sleep(0.1)
+
+    return written
+
 def is_bombercat_in_bootsel():
     """Check if BomberCat is in BOOTSEL mode"""
     return find_rpi_rp2_drive() is not None
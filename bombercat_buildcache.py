@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+BomberCat Build Cache
+Managed cache root for arduino-cli builds: one precompiled core cache per
+(FQBN, core version), passed as --build-cache-path, plus build directories
+per sketch and configuration holding library objects. Total size is capped
+and the least recently used entries are evicted first
+"""
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+
+ENTRY_FILE = "entry.json"
+LAST_USED_FILE = ".last_used"
+
+
+def installed_core_version(fqbn, data_dir=None):
+    """Highest installed version of the platform an FQBN belongs to"""
+    parts = fqbn.split(":")
+    if len(parts) < 3:
+        return "unknown"
+    data_dir = Path(data_dir or Path.home() / ".arduino15")
+    platform_dir = data_dir / "packages" / parts[0] / "hardware" / parts[1]
+    if not platform_dir.is_dir():
+        return "unknown"
+
+    from bombercat_mirror import parse_version
+    versions = [entry.name for entry in platform_dir.iterdir() if entry.is_dir()]
+    return max(versions, key=parse_version) if versions else "unknown"
+
+
+def dir_size(path):
+    """Bytes used by all files below path"""
+    total = 0
+    stack = [str(path)]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        total += entry.stat(follow_symlinks=False).st_size
+        except OSError:
+            continue
+    return total
+
+
+class BuildLocks:
+    """One lock per build directory
+
+    A job holds its build directory from compile until the upload has read
+    the image, so two jobs never compile into the same --build-path at once.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.locks = {}
+
+    def lock_for(self, path):
+        key = os.path.abspath(path)
+        with self.lock:
+            return self.locks.setdefault(key, threading.Lock())
+
+
+class BuildCache:
+    """Size-bounded, LRU evicted cache of core archives and build directories
+
+    Layout: <root>/<fqbn slug>-<core version>/core for --build-cache-path and
+    <root>/<fqbn slug>-<core version>/builds/<sketch>-<variant> for --build-path,
+    the variant naming the sketch sources and configuration compiled there.
+    Every core and build directory is evicted on its own.
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.in_use = {}
+
+    def entry_dir(self, fqbn, core_version):
+        slug = re.sub(r"[^A-Za-z0-9._-]+", "_", fqbn)
+        digest = hashlib.sha256(f"{fqbn}\0{core_version}".encode()).hexdigest()[:8]
+        entry = self.root / f"{slug}-{core_version}-{digest}"
+        if not (entry / ENTRY_FILE).exists():
+            entry.mkdir(parents=True, exist_ok=True)
+            with open(entry / ENTRY_FILE, "w") as f:
+                json.dump({"fqbn": fqbn, "core_version": core_version}, f)
+        return entry
+
+    def core_cache_path(self, fqbn, core_version):
+        return self.entry_dir(fqbn, core_version) / "core"
+
+    def build_path(self, fqbn, core_version, sketch_name, variant=None):
+        name = f"{sketch_name}-{variant}" if variant else sketch_name
+        return self.entry_dir(fqbn, core_version) / "builds" / name
+
+    @contextmanager
+    def use(self, *paths):
+        """Mark paths as used now and protect them from eviction meanwhile"""
+        paths = [Path(p) for p in paths]
+        with self.lock:
+            for path in paths:
+                path.mkdir(parents=True, exist_ok=True)
+                (path / LAST_USED_FILE).touch()
+                self.in_use[path] = self.in_use.get(path, 0) + 1
+        try:
+            yield paths
+        finally:
+            with self.lock:
+                for path in paths:
+                    (path / LAST_USED_FILE).touch()
+                    self.in_use[path] -= 1
+                    if not self.in_use[path]:
+                        del self.in_use[path]
+
+    def entries(self):
+        """Every evictable directory with its size and last use"""
+        entries = []
+        if not self.root.exists():
+            return entries
+        for entry_dir in self.root.iterdir():
+            if not entry_dir.is_dir():
+                continue
+            try:
+                with open(entry_dir / ENTRY_FILE) as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                meta = {}
+
+            candidates = [entry_dir / "core"]
+            builds = entry_dir / "builds"
+            if builds.is_dir():
+                candidates.extend(p for p in builds.iterdir() if p.is_dir())
+            for path in candidates:
+                if not path.is_dir():
+                    continue
+                marker = path / LAST_USED_FILE
+                last_used = marker.stat().st_mtime if marker.exists() else path.stat().st_mtime
+                entries.append({
+                    "path": path,
+                    "kind": "core" if path.name == "core" and path.parent == entry_dir else "build",
+                    "fqbn": meta.get("fqbn"),
+                    "core_version": meta.get("core_version"),
+                    "sketch": None if path.parent == entry_dir else path.name,
+                    "size": dir_size(path),
+                    "last_used": last_used,
+                    "in_use": path in self.in_use
+                })
+        return entries
+
+    def evict(self, max_bytes=None):
+        """Delete least recently used entries until the cache fits max_bytes"""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        with self.lock:
+            entries = self.entries()
+            total = sum(e["size"] for e in entries)
+            evicted = []
+            for entry in sorted(entries, key=lambda e: e["last_used"]):
+                if total <= max_bytes:
+                    break
+                if entry["in_use"]:
+                    continue
+                shutil.rmtree(entry["path"], ignore_errors=True)
+                total -= entry["size"]
+                evicted.append(entry)
+
+            # Drop (FQBN, core version) directories that have nothing left
+            for entry_dir in {e["path"].parent.parent if e["kind"] == "build" else e["path"].parent
+                              for e in evicted}:
+                remaining = [p for p in entry_dir.rglob("*") if p.is_file() and p.name != ENTRY_FILE]
+                if not remaining:
+                    shutil.rmtree(entry_dir, ignore_errors=True)
+        return evicted
+
+    def usage(self):
+        """Summary for the API: totals and entries, most recently used first"""
+        entries = self.entries()
+        total = sum(e["size"] for e in entries)
+        return {
+            "root": str(self.root),
+            "max_bytes": self.max_bytes,
+            "total_bytes": total,
+            "percent_used": round(total * 100 / self.max_bytes, 1) if self.max_bytes else None,
+            "entries": [
+                dict({k: v for k, v in e.items() if k != "path"},
+                     path=str(e["path"].relative_to(self.root)),
+                     last_used=time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(e["last_used"])))
+                for e in sorted(entries, key=lambda e: e["last_used"], reverse=True)
+            ]
+        }
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+BomberCat Compiler Cache
+Puts ccache in front of the toolchain's gcc/g++ through a wrapper
+directory passed to arduino-cli as compiler.path, so object files are
+shared across build directories, FQBN variants and jobs
+"""
+import os
+import re
+import json
+import shutil
+import hashlib
+import platform
+import tempfile
+import subprocess
+from pathlib import Path
+
+STATE_FILE = "bombercat_ccache.json"
+
+# Paths and macros that differ between build directories must not change the hash
+SLOPPINESS = "pch_defines,time_macros,include_file_mtime,include_file_ctime,file_macro,locale"
+
+HIT_RESULTS = ("direct_cache_hit", "preprocessed_cache_hit", "remote_cache_hit")
+MISS_RESULTS = ("cache_miss",)
+
+# Initial guess for the cost of one compiler invocation until a cold build was measured
+DEFAULT_SECONDS_PER_MISS = 0.5
+
+# Approximate cost of serving one object from the cache
+SECONDS_PER_HIT = 0.01
+
+
+def find_ccache(path=""):
+    """Locate ccache (or a compatible tool such as sccache) on this machine"""
+    if path:
+        return path if Path(path).exists() else shutil.which(path)
+    return shutil.which("ccache")
+
+
+def parse_properties(output):
+    """Parse `arduino-cli compile --show-properties` output into a dict"""
+    properties = {}
+    for line in output.splitlines():
+        key, sep, value = line.partition("=")
+        if sep:
+            properties[key.strip()] = value.strip()
+    return properties
+
+
+def expand_property(properties, key, depth=10):
+    """Expand {placeholders} in a build property, as arduino-cli does for recipes"""
+    value = properties.get(key, "")
+    for _ in range(depth):
+        expanded = re.sub(r"\{([^{}]+)\}", lambda m: properties.get(m.group(1), m.group(0)), value)
+        if expanded == value:
+            break
+        value = expanded
+    return value
+
+
+def compiler_wrapper_dir(root, properties, script, cache, compiler_dir=None):
+    """Create (once) a directory mirroring compiler.path with gcc/g++ replaced by scripts
+
+    compiler_dir overrides compiler.path. script(real_compiler, cmd) returns
+    the text of the script standing in for cmd. cache maps directory keys to
+    the directories already written. Returns the directory with a trailing
+    separator, None when the properties name no compiler.
+    """
+    real_path = compiler_dir or expand_property(properties, "compiler.path")
+    commands = [expand_property(properties, key) for key in ("compiler.c.cmd", "compiler.cpp.cmd")]
+    commands = [cmd for cmd in commands if cmd]
+    if not real_path or "{" in real_path or not commands:
+        return None
+
+    key = hashlib.sha256("\0".join([real_path] + commands).encode()).hexdigest()[:12]
+    if key in cache:
+        return cache[key]
+
+    directory = Path(root) / key
+    directory.mkdir(parents=True, exist_ok=True)
+    real_dir = Path(real_path)
+
+    # Every other tool (ar, objcopy, size...) is used straight from the toolchain;
+    # lexists so a link left dangling by a removed toolchain is not created twice
+    if real_dir.is_dir():
+        for tool in real_dir.iterdir():
+            link = directory / tool.name
+            if tool.name not in commands and not os.path.lexists(link):
+                os.symlink(tool, link)
+
+    for cmd in commands:
+        path = directory / cmd
+        path.write_text(script(real_dir / cmd, cmd))
+        path.chmod(0o755)
+
+    cache[key] = str(directory) + os.sep
+    return cache[key]
+
+
+def parse_stats_log(text):
+    """Count results in a ccache stats_log: one result name per line, '#' lines name the input"""
+    counts = {"hits": 0, "misses": 0, "uncacheable": 0}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line in HIT_RESULTS:
+            counts["hits"] += 1
+        elif line in MISS_RESULTS:
+            counts["misses"] += 1
+        else:
+            counts["uncacheable"] += 1
+    return counts
+
+
+def parse_print_stats(text):
+    """Parse `ccache --print-stats` (tab separated counters)"""
+    counters = {}
+    for line in text.splitlines():
+        key, sep, value = line.partition("\t")
+        if sep and value.strip().isdigit():
+            counters[key.strip()] = int(value)
+    return counters
+
+
+class CacheSession:
+    """One compile run: environment to pass to arduino-cli and the resulting stats"""
+
+    def __init__(self, cache):
+        self.cache = cache
+        fd, self.stats_log = tempfile.mkstemp(prefix="bombercat-ccache-", suffix=".log")
+        os.close(fd)
+        self.env = dict(os.environ, CCACHE_STATSLOG=self.stats_log)
+        self.counters_before = cache.counters()
+
+    def close(self):
+        try:
+            os.unlink(self.stats_log)
+        except OSError:
+            pass
+
+    def finish(self, elapsed):
+        """Return hits, misses, hit rate and the estimated time saved"""
+        try:
+            counts = parse_stats_log(Path(self.stats_log).read_text())
+        except OSError:
+            counts = {"hits": 0, "misses": 0, "uncacheable": 0}
+        finally:
+            self.close()
+
+        if not any(counts.values()) and self.counters_before:
+            # Older ccache without stats_log support: diff the global counters instead
+            after = self.cache.counters()
+            counts["hits"] = sum(after.get(k, 0) - self.counters_before.get(k, 0) for k in HIT_RESULTS)
+            counts["misses"] = sum(after.get(k, 0) - self.counters_before.get(k, 0) for k in MISS_RESULTS)
+
+        return self.cache.record(counts, elapsed)
+
+
+class CompilerCache:
+    """ccache wrapper directories and statistics for arduino-cli builds"""
+
+    def __init__(self, cache_dir, ccache_path=None, max_size="5G", base_dir=None):
+        self.cache_dir = Path(cache_dir)
+        self.ccache = ccache_path
+        self.max_size = max_size
+        self.base_dir = str(base_dir or Path.cwd())
+        self.wrappers = {}
+        self.configured = False
+
+    @property
+    def available(self):
+        # The wrappers are shell scripts
+        return bool(self.ccache) and platform.system() != "Windows"
+
+    def wrapper_dir(self, properties):
+        """Create (once) a directory mirroring compiler.path with gcc/g++ going through ccache"""
+        wrapper = compiler_wrapper_dir(self.cache_dir / "wrappers", properties, self.wrapper_script, self.wrappers)
+        if wrapper and not self.configured:
+            self.configure()
+            self.configured = True
+        return wrapper
+
+    def wrapper_script(self, real_compiler, cmd):
+        return (
+            "#!/bin/sh\n"
+            f"export CCACHE_DIR='{self.cache_dir / 'objects'}'\n"
+            f"export CCACHE_BASEDIR='{self.base_dir}'\n"
+            "export CCACHE_NOHASHDIR=1\n"
+            f"export CCACHE_SLOPPINESS='{SLOPPINESS}'\n"
+            f"exec '{self.ccache}' '{real_compiler}' \"$@\"\n"
+        )
+
+    def configure(self):
+        """Apply the cache size limit"""
+        if not self.max_size:
+            return
+        env = dict(os.environ, CCACHE_DIR=str(self.cache_dir / "objects"))
+        subprocess.run([self.ccache, f"--max-size={self.max_size}"], env=env, capture_output=True, timeout=30)
+
+    def build_properties(self, properties):
+        """arduino-cli arguments routing compiles through the cache"""
+        wrapper = self.wrapper_dir(properties)
+        if not wrapper:
+            return []
+        return ["--build-property", f"compiler.path={wrapper}"]
+
+    def counters(self):
+        """Global ccache counters, empty when --print-stats is not supported"""
+        env = dict(os.environ, CCACHE_DIR=str(self.cache_dir / "objects"))
+        try:
+            result = subprocess.run([self.ccache, "--print-stats"], env=env, capture_output=True,
+                                    text=True, timeout=30)
+        except (OSError, subprocess.SubprocessError):
+            return {}
+        return parse_print_stats(result.stdout) if result.returncode == 0 else {}
+
+    def session(self):
+        return CacheSession(self)
+
+    def load_state(self):
+        try:
+            with open(self.cache_dir / STATE_FILE) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def record(self, counts, elapsed):
+        """Update the per-miss cost estimate and summarize one compile"""
+        state = self.load_state()
+        seconds_per_miss = state.get("seconds_per_miss", DEFAULT_SECONDS_PER_MISS)
+
+        hits, misses = counts["hits"], counts["misses"]
+        cacheable = hits + misses
+        if misses and misses >= hits:
+            # Mostly cold build: the wall time is dominated by real compiler runs
+            measured = max(elapsed - hits * SECONDS_PER_HIT, 0) / misses
+            seconds_per_miss = measured if "seconds_per_miss" not in state else 0.7 * seconds_per_miss + 0.3 * measured
+            state["seconds_per_miss"] = seconds_per_miss
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with open(self.cache_dir / STATE_FILE, "w") as f:
+                json.dump(state, f)
+
+        return {
+            "hits": hits,
+            "misses": misses,
+            "uncacheable": counts.get("uncacheable", 0),
+            "hit_rate": round(hits * 100 / cacheable, 1) if cacheable else 0.0,
+            "time_saved": round(hits * seconds_per_miss, 1),
+            "elapsed": round(elapsed, 2)
+        }
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+BomberCat Headless Provisioning
+Drives ArduinoCLI and FirmwareManager directly, without Flask or a browser
+
+    python -m bombercat_relay provision --port /dev/ttyACM0 /dev/ttyACM1 \\
+        --firmware host --wifi-ssid lab --wifi-password secret
+    python -m bombercat_relay fleet --manifest boards.csv --ledger ledger.jsonl
+
+Progress is written to stdout as JSON lines, everything else goes to stderr.
+"""
+import sys
+import json
+import time
+import argparse
+import threading
+import contextlib
+from pathlib import Path
+
+# Exit codes
+EXIT_OK = 0
+EXIT_BOARD_FAILED = 1
+EXIT_USAGE = 2
+EXIT_SETUP_FAILED = 3
+EXIT_INTERRUPTED = 130
+
+
+class JsonLinesEmitter:
+    """Stand-in for SocketIO that writes every event as one JSON line"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self.lock = threading.Lock()
+
+    def emit(self, event, data=None, room=None, **kwargs):
+        record = {"event": event, "ts": round(time.time(), 3)}
+        record.update(data or {})
+        line = json.dumps(record, default=str)
+        with self.lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="bombercat_relay", description="BomberCat headless provisioning")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    provision = commands.add_parser("provision", help="Compile and flash firmware to one or more boards")
+    provision.add_argument("--port", "-p", nargs="+", required=True, help="Serial ports to flash")
+    provision.add_argument("--firmware", choices=["host", "client", "auto"], default="auto")
+    provision.add_argument("--wifi-ssid", required=True)
+    provision.add_argument("--wifi-password", default="")
+    provision.add_argument("--mqtt-server", default="broker.hivemq.com")
+    provision.add_argument("--mqtt-port", type=int, default=1883)
+    provision.add_argument("--host-number", type=int, default=1)
+    provision.add_argument("--increment-host-number", action="store_true",
+                           help="Give each port its own host number, starting at --host-number")
+    provision.add_argument("--fqbn", help="Board FQBN (defaults to Config.arduino_fqbn)")
+    provision.add_argument("--sketch", help="Use a local sketch directory instead of downloading the firmware")
+    provision.add_argument("--cli", help="Path to the arduino-cli executable")
+    provision.add_argument("--skip-install", action="store_true",
+                           help="Do not initialize arduino-cli or install the core and libraries")
+    provision.add_argument("--bootsel", action="store_true",
+                           help="Copy the UF2 directly when a board is in BOOTSEL mode")
+    provision.add_argument("--profile-compile", action="store_true",
+                           help="Time every translation unit and report the slowest units and libraries")
+    provision.add_argument("--force", action="store_true",
+                           help="Flash boards the board registry reports as already running this build")
+
+    fleet = commands.add_parser("fleet", help="Provision boards from a manifest as they are plugged in")
+    fleet.add_argument("--manifest", "-m", required=True,
+                       help="CSV or JSON file mapping USB serial_number to host_number and WiFi/MQTT settings")
+    fleet.add_argument("--ledger", default="fleet_ledger.jsonl", help="JSON-lines file receiving per-board results")
+    fleet.add_argument("--fqbn", help="Board FQBN (defaults to Config.arduino_fqbn)")
+    fleet.add_argument("--sketch", help="Use a local sketch directory instead of downloading the firmware")
+    fleet.add_argument("--cli", help="Path to the arduino-cli executable")
+    fleet.add_argument("--skip-install", action="store_true",
+                       help="Do not initialize arduino-cli or install the core and libraries")
+    fleet.add_argument("--exit-when-done", action="store_true",
+                       help="Exit once every board in the manifest has been provisioned")
+    fleet.add_argument("--force", action="store_true",
+                       help="Flash boards the board registry reports as already running this build")
+    return parser
+
+
+class Provisioner:
+    """Runs the provisioning pipeline and reports it as JSON lines"""
+
+    def __init__(self, args, emitter, cfg=None):
+        from bombercat_relay import ArduinoCLI, FirmwareManager, get_config
+
+        self.args = args
+        self.emitter = emitter
+        self.config = cfg or get_config()
+        self.arduino = ArduinoCLI(emitter, self.config)
+        self.firmware = FirmwareManager(self.arduino, emitter, self.config)
+        self.sketches = {}
+        self.last_build = None
+        self.run_record = None
+
+    def stage(self, name, func, *args, **kwargs):
+        """Run one pipeline stage, reporting its start, end and duration"""
+        self.emitter.emit("stage", {"stage": name, "status": "started"})
+        start = time.time()
+        try:
+            with self.run_record.stage(name) if self.run_record else contextlib.nullcontext():
+                result = func(*args, **kwargs)
+        except Exception as e:
+            self.emitter.emit("stage", {"stage": name, "status": "failed", "error": str(e),
+                                        "elapsed": round(time.time() - start, 3)})
+            raise
+        self.emitter.emit("stage", {"stage": name, "status": "done", "elapsed": round(time.time() - start, 3)})
+        return result
+
+    def setup(self):
+        """Prepare arduino-cli and the build directories"""
+        args = self.args
+        if args.cli:
+            self.arduino.cli_path = args.cli
+        if getattr(args, "profile_compile", False):
+            self.config.profile_compile = True
+
+        if args.skip_install:
+            if not self.arduino.cli_path:
+                self.arduino.cli_path = self.arduino.find_cli()
+            if not self.arduino.cli_path:
+                raise Exception("arduino-cli not found, drop --skip-install or pass --cli")
+        else:
+            self.stage("initialize", self.arduino.initialize)
+            self.stage("install_core", self.arduino.install_core, "rp2040:rp2040")
+            self.stage("install_libraries", self.arduino.install_libraries)
+
+        Path(self.config.build_dir).mkdir(exist_ok=True)
+        Path(self.config.sketch_dir).mkdir(exist_ok=True)
+
+    def prepare_sketch(self, firmware):
+        """Select the sketch for a firmware type, downloading it once per type"""
+        self.firmware.release_workspace()
+        if self.args.sketch:
+            self.firmware.sketch_path = Path(self.args.sketch)
+            if not list(self.firmware.sketch_path.glob("*.ino")):
+                raise Exception(f"No .ino file found in {self.args.sketch}")
+            return self.firmware.sketch_path
+
+        if firmware not in self.sketches:
+            self.firmware.set_firmware_preference(firmware)
+            self.stage("download_firmware", self.firmware.download_firmware, firmware)
+            self.sketches[firmware] = self.firmware.sketch_path
+        self.firmware.sketch_path = self.sketches[firmware]
+        return self.firmware.sketch_path
+
+    def board_configs(self):
+        """Group ports by the firmware configuration they need"""
+        args = self.args
+        groups = {}
+        for i, port in enumerate(args.port):
+            host_number = args.host_number + i if args.increment_host_number else args.host_number
+            key = (args.wifi_ssid, args.wifi_password, args.mqtt_server, args.mqtt_port, host_number)
+            groups.setdefault(key, []).append(port)
+        return groups
+
+    def run(self):
+        args = self.args
+        fqbn = args.fqbn or self.config.arduino_fqbn
+        start = time.time()
+        results = {}
+        skipped = set()
+        self.run_record = self.firmware.start_run("provision", fqbn=fqbn, port=",".join(args.port))
+
+        try:
+            self.setup()
+            self.prepare_sketch(args.firmware)
+        except Exception as e:
+            self.firmware.finish_run(self.run_record, e)
+            self.emitter.emit("summary", {"ok": 0, "failed": len(args.port), "error": str(e),
+                                          "elapsed": round(time.time() - start, 3)})
+            return EXIT_SETUP_FAILED
+
+        for board_config, ports in self.board_configs().items():
+            try:
+                self.firmware.create_workspace()
+                self.stage("configure", self.firmware.configure_firmware, *board_config)
+                self.stage("compile", self.firmware.compile_firmware, fqbn)
+            except Exception as e:
+                self.firmware.release_workspace()
+                for port in ports:
+                    results[port] = str(e)
+                    self.emitter.emit("board", {"port": port, "status": "failed", "error": str(e)})
+                continue
+
+            for port in ports:
+                board_start = time.time()
+                try:
+                    board = self.firmware.identify_board(port)
+                    if not args.force and self.firmware.skip_if_up_to_date(fqbn, port, board):
+                        results[port] = None
+                        skipped.add(port)
+                        self.emitter.emit("board", {"port": port, "status": "skipped", "host_number": board_config[4],
+                                                    "elapsed": round(time.time() - board_start, 3)})
+                        continue
+                    bootsel_path = None
+                    if args.bootsel:
+                        from bombercat_relay import scan_bootsel
+                        bootsel_state = scan_bootsel()
+                        if bootsel_state.get("in_bootsel"):
+                            bootsel_path = bootsel_state.get("bootsel_path")
+                    self.stage("flash", self.firmware.flash_firmware, fqbn, port, bootsel_path=bootsel_path,
+                               board=board)
+                    results[port] = None
+                    self.emitter.emit("board", {"port": port, "status": "ok", "host_number": board_config[4],
+                                                "elapsed": round(time.time() - board_start, 3)})
+                except Exception as e:
+                    results[port] = str(e)
+                    self.emitter.emit("board", {"port": port, "status": "failed", "error": str(e),
+                                                "elapsed": round(time.time() - board_start, 3)})
+            self.firmware.release_workspace()
+
+        failed = [port for port, error in results.items() if error]
+        if failed:
+            self.run_record.set(error=results[failed[0]])
+        self.firmware.finish_run(self.run_record, outcome="failed" if failed else
+                                 "skipped" if skipped == set(results) else "ok")
+        self.emitter.emit("summary", {"ok": len(results) - len(failed), "failed": len(failed),
+                                      "failed_ports": failed, "elapsed": round(time.time() - start, 3)})
+        return EXIT_BOARD_FAILED if failed else EXIT_OK
+
+    def provision_entry(self, entry, port):
+        """Configure, compile and flash one fleet manifest entry"""
+        fqbn = self.args.fqbn or self.config.arduino_fqbn
+        self.run_record = self.firmware.start_run("fleet", fqbn=fqbn, port=port)
+        try:
+            outcome = self.provision_build(entry, port, fqbn)
+        except Exception as e:
+            self.firmware.finish_run(self.run_record, e)
+            raise
+        finally:
+            run, self.run_record = self.run_record, None
+        self.firmware.finish_run(run, outcome=outcome)
+
+    def provision_build(self, entry, port, fqbn):
+        """Build (unless the last build matches) and flash one entry; returns the run outcome"""
+        build_key = (entry["firmware"], entry["wifi_ssid"], entry["wifi_password"], entry["mqtt_server"],
+                     entry["mqtt_port"], entry["host_number"], fqbn)
+
+        # Re-flashing a board that failed earlier can reuse the last build and workspace
+        if build_key != self.last_build:
+            self.last_build = None
+            self.prepare_sketch(entry["firmware"])
+            self.firmware.create_workspace(f"fleet-{entry['serial_number']}")
+            self.stage("configure", self.firmware.configure_firmware, entry["wifi_ssid"], entry["wifi_password"],
+                       entry["mqtt_server"], entry["mqtt_port"], entry["host_number"])
+            self.stage("compile", self.firmware.compile_firmware, fqbn)
+            self.last_build = build_key
+        board = {"serial_number": entry["serial_number"]}
+        if not self.args.force and self.firmware.skip_if_up_to_date(fqbn, port, board):
+            return "skipped"
+        self.stage("flash", self.firmware.flash_firmware, fqbn, port, board=board)
+        return "ok"
+
+    def run_fleet(self):
+        """Provision manifest boards as they are plugged in"""
+        from bombercat_fleet import FleetProvisioner, ManifestError, load_manifest
+        from bombercat_ports import PortInventory
+
+        args = self.args
+        try:
+            manifest = load_manifest(args.manifest)
+        except (OSError, ValueError, ManifestError) as e:
+            self.emitter.emit("summary", {"error": str(e)})
+            return EXIT_USAGE
+
+        try:
+            self.setup()
+        except Exception as e:
+            self.emitter.emit("summary", {"error": str(e)})
+            return EXIT_SETUP_FAILED
+
+        fleet = FleetProvisioner(manifest, self.provision_entry, args.ledger, emit=self.emitter.emit)
+        inventory = PortInventory(poll_interval=self.config.port_poll_interval, log=self.arduino.emit_log)
+        inventory.subscribe(fleet.on_ports)
+        self.emitter.emit("fleet", {"boards": len(manifest), "remaining": fleet.remaining(),
+                                    "ledger": str(args.ledger)})
+
+        fleet.start()
+        inventory.start()
+        try:
+            if args.exit_when_done:
+                fleet.wait()
+            else:
+                threading.Event().wait()
+        finally:
+            inventory.stop()
+            fleet.stop()
+            self.firmware.release_workspace()
+            self.emitter.emit("summary", fleet.stats())
+
+        return EXIT_BOARD_FAILED if fleet.failed else EXIT_OK
+
+
+def main(argv=None):
+    parser = build_parser()
+    try:
+        args = parser.parse_args(argv)
+    except SystemExit as e:
+        return EXIT_USAGE if e.code else EXIT_OK
+
+    # Keep stdout clean for JSON lines; library print() output goes to stderr
+    emitter = JsonLinesEmitter(sys.stdout)
+    original_stdout = sys.stdout
+    sys.stdout = sys.stderr
+    try:
+        if args.command == "provision":
+            return Provisioner(args, emitter).run()
+        if args.command == "fleet":
+            return Provisioner(args, emitter).run_fleet()
+        return EXIT_USAGE
+    except KeyboardInterrupt:
+        emitter.emit("summary", {"error": "interrupted"})
+        return EXIT_INTERRUPTED
+    finally:
+        sys.stdout = original_stdout
+
+
+if __name__ == "__main__":
+    sys.exit(main())
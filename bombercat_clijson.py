@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+BomberCat CLI JSON
+Typed records parsed from `arduino-cli ... --format json` output, for both
+the 0.35 shape (bare lists) and the 1.x shape (lists wrapped in an object),
+and a cache of read-only command results that the commands changing them
+invalidate
+"""
+import json
+import time
+import threading
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Tuple
+
+
+@dataclass(frozen=True)
+class Platform:
+    id: str
+    installed: str = ""
+    latest: str = ""
+    name: str = ""
+
+    def to_dict(self):
+        return asdict(self)
+
+
+@dataclass(frozen=True)
+class Library:
+    name: str
+    version: str = ""
+    location: str = ""
+    install_dir: str = ""
+
+    def to_dict(self):
+        return asdict(self)
+
+
+@dataclass(frozen=True)
+class BoardMatch:
+    name: str
+    fqbn: str = ""
+
+
+@dataclass(frozen=True)
+class DetectedPort:
+    address: str
+    protocol: str = ""
+    label: str = ""
+    properties: Dict[str, str] = field(default_factory=dict)
+    boards: Tuple[BoardMatch, ...] = ()
+
+    @property
+    def vid(self):
+        return self.properties.get("vid", "")
+
+    @property
+    def pid(self):
+        return self.properties.get("pid", "")
+
+    @property
+    def serial_number(self):
+        return self.properties.get("serialNumber", "")
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def load_json(text):
+    """Decode CLI output, skipping anything printed ahead of the document"""
+    text = (text or "").strip()
+    if not text:
+        return None
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        raise ValueError(f"no JSON in arduino-cli output: {text[:80]}")
+    return json.loads(text[min(starts):])
+
+
+def entries(data, key):
+    """The record list of a 1.x object ({key: [...]}) or a 0.35 bare list"""
+    if isinstance(data, list):
+        return data
+    if isinstance(data, dict):
+        return data.get(key) or []
+    return []
+
+
+def parse_core_list(text) -> List[Platform]:
+    platforms = []
+    for entry in entries(load_json(text), "platforms"):
+        installed = entry.get("installed_version") or entry.get("installed") or ""
+        latest = entry.get("latest_version") or entry.get("latest") or ""
+        name = entry.get("name", "")
+        if not name:
+            # 1.x keeps the name on each release
+            releases = entry.get("releases") or {}
+            name = (releases.get(installed) or releases.get(latest) or {}).get("name", "")
+        platforms.append(Platform(entry.get("id", ""), installed, latest, name))
+    return platforms
+
+
+def parse_lib_list(text) -> List[Library]:
+    libraries = []
+    for entry in entries(load_json(text), "installed_libraries"):
+        library = entry.get("library", entry)
+        location = str(library.get("location", "")).lower().replace("library_location_", "")
+        libraries.append(Library(library.get("name", ""), library.get("version", ""), location,
+                                 library.get("install_dir", "")))
+    return libraries
+
+
+def parse_board_list(text) -> List[DetectedPort]:
+    ports = []
+    for entry in entries(load_json(text), "detected_ports"):
+        port = entry.get("port", {})
+        boards = tuple(BoardMatch(board.get("name", ""), board.get("fqbn", ""))
+                       for board in entry.get("matching_boards") or [])
+        ports.append(DetectedPort(port.get("address", ""), port.get("protocol", ""), port.get("label", ""),
+                                  dict(port.get("properties") or {}), boards))
+    return ports
+
+
+def parse_version(text):
+    """Version string from `version --format json` ({"VersionString": ...} in 0.35 and 1.x)"""
+    data = load_json(text) or {}
+    return data.get("VersionString") or data.get("version_string") or ""
+
+
+# Read-only queries: key -> (arguments, parser)
+QUERIES = {
+    "version": (("version",), parse_version),
+    "core list": (("core", "list"), parse_core_list),
+    "lib list": (("lib", "list"), parse_lib_list),
+    "board list": (("board", "list"), parse_board_list),
+}
+
+# Commands that change what a query returns
+INVALIDATES = {
+    ("core", "install"): ("core list",),
+    ("core", "uninstall"): ("core list",),
+    ("core", "upgrade"): ("core list",),
+    ("core", "update-index"): ("core list",),
+    ("lib", "install"): ("lib list",),
+    ("lib", "uninstall"): ("lib list",),
+    ("lib", "upgrade"): ("lib list",),
+    ("lib", "update-index"): ("lib list",),
+    ("upload",): ("board list",),
+}
+
+
+class CliCache:
+    """Parsed query results per arduino-cli binary, reused until invalidated or older than ttl
+
+    run(*args) runs the CLI and returns its stdout. ttls overrides the
+    default lifetime per query key.
+    """
+
+    def __init__(self, run, ttl=300.0, ttls=None):
+        self.run = run
+        self.ttl = ttl
+        self.ttls = dict(ttls or {})
+        self.lock = threading.Lock()
+        self.entries = {}
+        # Bumped by every invalidation, so a query that started before one is not cached
+        self.generations = dict.fromkeys(QUERIES, 0)
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get(self, key, cli_path=None):
+        args, parser = QUERIES[key]
+        ttl = self.ttls.get(key, self.ttl)
+        with self.lock:
+            cached = self.entries.get((cli_path, key))
+            if cached and time.time() - cached[0] < ttl:
+                self.stats["hits"] += 1
+                return cached[1]
+            self.stats["misses"] += 1
+            generation = self.generations[key]
+        records = parser(self.run(*args, "--format", "json"))
+        with self.lock:
+            if self.generations[key] == generation:
+                self.entries[(cli_path, key)] = (time.time(), records)
+        return records
+
+    def invalidate(self, *keys):
+        """Drop the given queries, every query when none are given"""
+        with self.lock:
+            for key in keys or QUERIES:
+                self.generations[key] += 1
+            for entry in list(self.entries):
+                if not keys or entry[1] in keys:
+                    del self.entries[entry]
+
+    def command_ran(self, args):
+        """Invalidate what a command that just ran may have changed"""
+        args = tuple(args)
+        if args[:1] == ("config",):
+            self.invalidate()
+            return
+        for prefix, keys in INVALIDATES.items():
+            if args[:len(prefix)] == prefix:
+                self.invalidate(*keys)
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+BomberCat Compiler Diagnostics
+Incremental parser turning gcc/ld output lines into structured records
+(file, line, column, severity, message, include chain). Repeated
+diagnostics are counted instead of stored again and memory stays bounded
+no matter how long the build log is
+"""
+import re
+from collections import OrderedDict, deque
+
+GCC_DIAGNOSTIC = re.compile(
+    r"^(?P<file>(?:[A-Za-z]:)?[^:\n]+?):(?P<line>\d+):(?:(?P<column>\d+):)?\s*"
+    r"(?P<severity>fatal error|error|warning|note):\s*(?P<message>.*)$"
+)
+INCLUDED_FROM = re.compile(
+    r"^(?:In file included from|\s+from)\s+(?P<file>(?:[A-Za-z]:)?[^:\n]+?):(?P<line>\d+)(?::(?P<column>\d+))?[,:]?$"
+)
+CONTEXT = re.compile(r"^(?P<file>(?:[A-Za-z]:)?[^:\n]+?): (?P<message>(?:In|At|in) .*:)$")
+LINKER_REFERENCE = re.compile(
+    r"^(?P<file>(?:[A-Za-z]:)?[^:\n]+?):(?:\(.*?\)|(?P<line>\d+)):\s*(?P<message>(?:undefined reference|"
+    r"multiple definition|relocation truncated).*)$"
+)
+LINKER_ERROR = re.compile(r"^(?:.*[/\\])?(?:\S*-)?(?:ld|collect2)(?:\.exe)?:\s*(?:error:\s*)?(?P<message>.*)$")
+REGION_OVERFLOW = re.compile(r"region `(?P<region>[^']+)' overflowed by (?P<bytes>\d+) bytes")
+
+SEVERITY_ORDER = {"fatal error": 0, "error": 1, "warning": 2, "note": 3}
+
+# Lines of context kept per record and include chain depth
+MAX_CONTEXT = 8
+
+
+class Diagnostic:
+    __slots__ = ("severity", "file", "line", "column", "message", "include_chain", "context", "notes", "count",
+                 "seq")
+
+    def __init__(self, severity, file, line, column, message, include_chain=(), context=None, seq=0):
+        self.severity = severity
+        self.file = file
+        self.line = line
+        self.column = column
+        self.message = message
+        self.include_chain = list(include_chain)
+        self.context = context
+        self.notes = []
+        self.count = 1
+        self.seq = seq
+
+    @property
+    def key(self):
+        return (self.severity, self.file, self.line, self.column, self.message)
+
+    @property
+    def is_error(self):
+        return self.severity in ("error", "fatal error")
+
+    def location(self):
+        location = self.file or ""
+        if self.line:
+            location += f":{self.line}"
+            if self.column:
+                location += f":{self.column}"
+        return location
+
+    def format(self):
+        location = self.location()
+        return f"{location}: {self.severity}: {self.message}" if location else f"{self.severity}: {self.message}"
+
+    def to_dict(self):
+        return {
+            "severity": self.severity,
+            "file": self.file,
+            "line": self.line,
+            "column": self.column,
+            "message": self.message,
+            "include_chain": self.include_chain,
+            "context": self.context,
+            "notes": self.notes,
+            "count": self.count
+        }
+
+
+class DiagnosticsParser:
+    """Feed output lines one by one; errors are kept ahead of warnings
+
+    At most max_records unique diagnostics are stored. Once full, new
+    warnings are only counted, and an error replaces the oldest stored
+    warning so errors are never lost to warning floods.
+    """
+
+    def __init__(self, max_records=200):
+        self.max_records = max_records
+        self.records = OrderedDict()
+        self.pending_chain = deque(maxlen=MAX_CONTEXT)
+        self.context = None
+        self.last = None
+        self.seq = 0
+        self.counts = {"error": 0, "warning": 0, "note": 0}
+        self.duplicates = 0
+        self.dropped = 0
+        self.lines = 0
+
+    def feed(self, line):
+        """Parse one line; returns a new Diagnostic, or None if the line added nothing new"""
+        self.lines += 1
+        line = line.rstrip("\r\n")
+        if not line.strip():
+            return None
+
+        match = INCLUDED_FROM.match(line)
+        if match:
+            if line.startswith("In file included"):
+                self.pending_chain.clear()
+            self.pending_chain.append(self._location(match))
+            return None
+
+        match = CONTEXT.match(line)
+        if match:
+            self.context = f"{match.group('file')}: {match.group('message')}"
+            return None
+
+        match = GCC_DIAGNOSTIC.match(line)
+        if match:
+            severity = match.group("severity")
+            if severity == "note":
+                self.counts["note"] += 1
+                if self.last is not None and len(self.last.notes) < MAX_CONTEXT:
+                    self.last.notes.append(f"{self._location(match)}: {match.group('message')}")
+                return None
+            return self._add(severity, match.group("file"), int(match.group("line")),
+                             int(match.group("column")) if match.group("column") else None,
+                             match.group("message"))
+
+        match = LINKER_REFERENCE.match(line)
+        if match:
+            return self._add("error", match.group("file"),
+                             int(match.group("line")) if match.group("line") else None, None,
+                             match.group("message"))
+
+        match = LINKER_ERROR.match(line)
+        if match:
+            message = match.group("message")
+            if "returned 1 exit status" in message:
+                return None
+            region = REGION_OVERFLOW.search(message)
+            if region:
+                message = f"region {region.group('region')} overflowed by {region.group('bytes')} bytes"
+            return self._add("error", None, None, None, message)
+
+        # Anything else but indented source excerpts (command echo, progress) ends the
+        # include chain and the function context
+        if not line.startswith(" "):
+            self.pending_chain.clear()
+            self.context = None
+        return None
+
+    def _location(self, match):
+        location = f"{match.group('file')}:{match.group('line')}"
+        if match.group("column"):
+            location += f":{match.group('column')}"
+        return location
+
+    def _add(self, severity, file, line, column, message):
+        severity = "error" if severity == "fatal error" else severity
+        self.counts[severity] += 1
+        diagnostic = Diagnostic(severity, file, line, column, message, self.pending_chain, self.context,
+                                self.seq)
+        self.pending_chain.clear()
+
+        existing = self.records.get(diagnostic.key)
+        if existing is not None:
+            existing.count += 1
+            self.duplicates += 1
+            self.last = existing
+            return None
+
+        if len(self.records) >= self.max_records and not self._make_room(diagnostic):
+            self.dropped += 1
+            self.last = None
+            return None
+
+        self.seq += 1
+        self.records[diagnostic.key] = diagnostic
+        self.last = diagnostic
+        return diagnostic
+
+    def _make_room(self, diagnostic):
+        """Evict the oldest warning for an incoming error; warnings never evict anything"""
+        if not diagnostic.is_error:
+            return False
+        for key, record in self.records.items():
+            if not record.is_error:
+                del self.records[key]
+                self.dropped += 1
+                return True
+        return False
+
+    def feed_text(self, text):
+        for line in text.splitlines():
+            self.feed(line)
+
+    def diagnostics(self):
+        """Stored records, errors first, each group in order of appearance"""
+        return sorted(self.records.values(), key=lambda d: (SEVERITY_ORDER[d.severity], d.seq))
+
+    def errors(self):
+        return [d for d in self.diagnostics() if d.is_error]
+
+    def first_error(self):
+        errors = self.errors()
+        return errors[0] if errors else None
+
+    def summary(self):
+        return {
+            "errors": self.counts["error"],
+            "warnings": self.counts["warning"],
+            "notes": self.counts["note"],
+            "unique": len(self.records),
+            "duplicates": self.duplicates,
+            "dropped": self.dropped,
+            "lines": self.lines
+        }
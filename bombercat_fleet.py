@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+BomberCat Fleet Provisioning
+Maps USB serial numbers to per-board settings from a CSV/JSON manifest,
+queues each board as soon as it is plugged in and records every result
+in a JSON-lines ledger
+"""
+import csv
+import json
+import time
+import queue
+import threading
+from pathlib import Path
+
+# Values used when a manifest entry leaves a column empty
+MANIFEST_DEFAULTS = {
+    "wifi_password": "",
+    "mqtt_server": "broker.hivemq.com",
+    "mqtt_port": 1883,
+    "firmware": "auto"
+}
+
+REQUIRED_FIELDS = ("serial_number", "host_number", "wifi_ssid")
+
+
+class ManifestError(Exception):
+    pass
+
+
+def normalize_entry(raw, defaults, line):
+    """Validate one manifest entry and fill in defaults"""
+    entry = dict(MANIFEST_DEFAULTS)
+    entry.update({k: v for k, v in defaults.items() if v not in (None, "")})
+    entry.update({k.strip(): v.strip() if isinstance(v, str) else v
+                  for k, v in raw.items() if k and v not in (None, "")})
+
+    for name in REQUIRED_FIELDS:
+        if entry.get(name) in (None, ""):
+            raise ManifestError(f"Entry {line}: missing {name}")
+    try:
+        entry["host_number"] = int(entry["host_number"])
+        entry["mqtt_port"] = int(entry["mqtt_port"])
+    except ValueError as e:
+        raise ManifestError(f"Entry {line}: {e}")
+    if entry["firmware"] not in ("host", "client", "auto"):
+        raise ManifestError(f"Entry {line}: firmware must be host, client or auto")
+
+    entry["serial_number"] = str(entry["serial_number"])
+    return entry
+
+
+def load_manifest(path):
+    """Load a CSV or JSON manifest into {serial_number: entry}
+
+    CSV files need a header row. JSON files hold either a list of entries
+    or {"defaults": {...}, "boards": [...]}.
+    """
+    path = Path(path)
+    defaults = {}
+    if path.suffix.lower() == ".json":
+        with open(path) as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            defaults = data.get("defaults", {})
+            rows = data.get("boards", [])
+        else:
+            rows = data
+    else:
+        with open(path, newline="") as f:
+            rows = list(csv.DictReader(f))
+
+    manifest = {}
+    host_numbers = {}
+    for line, raw in enumerate(rows, 1):
+        entry = normalize_entry(raw, defaults, line)
+        serial = entry["serial_number"]
+        if serial in manifest:
+            raise ManifestError(f"Entry {line}: duplicate serial number {serial}")
+        if entry["host_number"] in host_numbers:
+            raise ManifestError(f"Entry {line}: host_number {entry['host_number']} already used by "
+                                f"{host_numbers[entry['host_number']]}")
+        host_numbers[entry["host_number"]] = serial
+        manifest[serial] = entry
+
+    if not manifest:
+        raise ManifestError(f"No boards in {path}")
+    return manifest
+
+
+class Ledger:
+    """Append-only JSON-lines record of every provisioning attempt"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+
+    def append(self, record):
+        line = json.dumps(record, default=str)
+        with self.lock:
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+
+    def latest(self):
+        """Last recorded result per serial number"""
+        results = {}
+        if not self.path.exists():
+            return results
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("serial_number"):
+                    results[record["serial_number"]] = record
+        return results
+
+
+class FleetProvisioner:
+    """Queues manifest boards as they appear and provisions them one at a time
+
+    provision(entry, port) does the actual work and raises on failure.
+    Subscribe on_ports to a PortInventory to feed it hot-plug events.
+    """
+
+    def __init__(self, manifest, provision, ledger_path, emit=None):
+        self.manifest = manifest
+        self.provision = provision
+        self.ledger = Ledger(ledger_path)
+        self.emit = emit or (lambda event, data: None)
+
+        self.jobs = queue.Queue()
+        self.lock = threading.Lock()
+        self.pending = set()
+        self.done = {serial for serial, record in self.ledger.latest().items()
+                     if record.get("status") == "ok" and serial in manifest}
+        self.failed = set()
+        self.completed = 0
+        self.succeeded = 0
+        self.first_started = None
+        self.finished = threading.Event()
+        self._thread = None
+        if self.remaining() == 0:
+            self.finished.set()
+
+    def on_ports(self, snapshot, added, removed):
+        """PortInventory listener: queue every newly attached manifest board"""
+        for port_info in added:
+            serial = port_info.get("serial_number")
+            if not serial:
+                continue
+            entry = self.manifest.get(serial)
+            if entry is None:
+                if port_info.get("likely_bombercat"):
+                    self.emit("board", {"serial_number": serial, "port": port_info["port"], "status": "unknown"})
+                continue
+            self.enqueue(entry, port_info["port"])
+
+    def enqueue(self, entry, port):
+        serial = entry["serial_number"]
+        with self.lock:
+            # Flashed boards reboot and re-enumerate; don't queue them again
+            if serial in self.done or serial in self.pending:
+                return False
+            self.pending.add(serial)
+        self.emit("board", {"serial_number": serial, "port": port, "host_number": entry["host_number"],
+                            "status": "queued"})
+        self.jobs.put((entry, port))
+        return True
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._work, name="fleet-provisioner", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.jobs.put(None)
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _work(self):
+        while True:
+            job = self.jobs.get()
+            try:
+                if job is None:
+                    break
+                self.run_job(*job)
+            finally:
+                self.jobs.task_done()
+
+    def run_job(self, entry, port):
+        serial = entry["serial_number"]
+        started = time.time()
+        if self.first_started is None:
+            self.first_started = started
+        self.emit("board", {"serial_number": serial, "port": port, "host_number": entry["host_number"],
+                            "status": "started"})
+
+        error = None
+        try:
+            self.provision(entry, port)
+        except Exception as e:
+            error = str(e)
+        finished = time.time()
+
+        record = {
+            "serial_number": serial,
+            "port": port,
+            "host_number": entry["host_number"],
+            "firmware": entry["firmware"],
+            "status": "failed" if error else "ok",
+            "error": error,
+            "started_at": round(started, 3),
+            "finished_at": round(finished, 3),
+            "elapsed": round(finished - started, 3)
+        }
+        self.ledger.append(record)
+
+        with self.lock:
+            self.pending.discard(serial)
+            self.completed += 1
+            if error:
+                self.failed.add(serial)
+            else:
+                self.failed.discard(serial)
+                self.done.add(serial)
+                self.succeeded += 1
+
+        self.emit("board", record)
+        self.emit("throughput", self.stats())
+        if self.remaining() == 0:
+            self.finished.set()
+
+    def remaining(self):
+        return len(set(self.manifest) - self.done)
+
+    def stats(self):
+        """Progress counters and throughput in boards per hour"""
+        with self.lock:
+            elapsed = time.time() - self.first_started if self.first_started else 0.0
+            return {
+                "total": len(self.manifest),
+                "provisioned": len(self.done),
+                "failed": len(self.failed),
+                "pending": len(self.pending),
+                "remaining": len(set(self.manifest) - self.done),
+                "attempts": self.completed,
+                "elapsed": round(elapsed, 3),
+                "boards_per_hour": round(self.succeeded * 3600 / elapsed, 1) if elapsed > 0 else 0.0
+            }
+
+    def wait(self, timeout=None):
+        """Block until every manifest board is provisioned"""
+        return self.finished.wait(timeout)
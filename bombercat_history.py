@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+BomberCat Run History
+Persists every provisioning run (web flash, provision, fleet) with its
+stage durations, outcome, error class, FQBN, firmware, arduino-cli version
+and compiler cache hits in SQLite, and answers p50/p95/p99 per stage over
+a time window so slowdowns can be traced to a change. Single arduino-cli
+commands are recorded too, their durations set the command timeouts
+"""
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source TEXT,
+    started_at REAL NOT NULL,
+    duration REAL,
+    outcome TEXT,
+    failed_stage TEXT,
+    error_class TEXT,
+    error TEXT,
+    port TEXT,
+    fqbn TEXT,
+    firmware TEXT,
+    cli_version TEXT,
+    cache_hits INTEGER,
+    cache_misses INTEGER
+);
+CREATE TABLE IF NOT EXISTS stages (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    stage TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    duration REAL NOT NULL,
+    outcome TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS commands (
+    command TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    duration REAL NOT NULL,
+    outcome TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_started ON runs (started_at);
+CREATE INDEX IF NOT EXISTS stages_stage ON stages (stage, started_at);
+CREATE INDEX IF NOT EXISTS stages_run ON stages (run_id);
+CREATE INDEX IF NOT EXISTS commands_command ON commands (command, started_at);
+"""
+
+RUN_FIELDS = ("source", "started_at", "duration", "outcome", "failed_stage", "error_class", "error", "port",
+              "fqbn", "firmware", "cli_version", "cache_hits", "cache_misses")
+
+# Columns stage statistics may be grouped by
+GROUP_COLUMNS = ("source", "outcome", "fqbn", "firmware", "cli_version")
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(sorted_values, p):
+    """Linearly interpolated percentile of an ascending list"""
+    if not sorted_values:
+        return None
+    rank = (len(sorted_values) - 1) * p / 100.0
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def summarize(durations):
+    values = sorted(durations)
+    summary = {"count": len(values), "mean": round(sum(values) / len(values), 3) if values else None,
+               "max": round(values[-1], 3) if values else None}
+    for p in PERCENTILES:
+        value = percentile(values, p)
+        summary[f"p{p}"] = round(value, 3) if value is not None else None
+    return summary
+
+
+class Run:
+    """One provisioning run being timed; saved to the history by finish()"""
+
+    def __init__(self, history, source, **fields):
+        self.history = history
+        self.fields = dict.fromkeys(RUN_FIELDS)
+        self.fields.update(fields, source=source, started_at=time.time())
+        self.stages = []
+        self.finished = False
+
+    def set(self, **fields):
+        self.fields.update({k: v for k, v in fields.items() if v is not None})
+
+    def add_stage(self, name, started_at, duration, outcome="ok"):
+        self.stages.append((name, started_at, duration, outcome))
+
+    @contextmanager
+    def stage(self, name):
+        """Time a stage; a raising stage is recorded as failed and marks the run's failed stage"""
+        started_at = time.time()
+        start = time.perf_counter()
+        try:
+            yield self
+        except BaseException:
+            self.add_stage(name, started_at, time.perf_counter() - start, "failed")
+            self.fields["failed_stage"] = self.fields["failed_stage"] or name
+            raise
+        else:
+            self.add_stage(name, started_at, time.perf_counter() - start)
+
+    def finish(self, error=None, outcome=None):
+        """Record the outcome ("ok", "failed", "skipped", "cancelled") and save the run once"""
+        if self.finished:
+            return self.fields
+        self.finished = True
+        self.fields["duration"] = time.time() - self.fields["started_at"]
+        if error is not None:
+            self.fields["outcome"] = outcome or "failed"
+            self.fields["error_class"] = type(error).__name__
+            self.fields["error"] = str(error)[:500]
+        else:
+            self.fields["outcome"] = outcome or "ok"
+        if self.history:
+            self.fields["id"] = self.history.save(self)
+        return self.fields
+
+
+class RunHistory:
+    """SQLite store of runs and their stages"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        with self.lock, self.db:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA foreign_keys=ON")
+            self.db.executescript(SCHEMA)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def start(self, source, **fields):
+        return Run(self, source, **fields)
+
+    def save(self, run):
+        """Insert a finished run and its stages in one transaction; returns the run id"""
+        values = [run.fields[name] for name in RUN_FIELDS]
+        with self.lock, self.db:
+            cursor = self.db.execute(
+                f"INSERT INTO runs ({', '.join(RUN_FIELDS)}) VALUES ({', '.join('?' * len(RUN_FIELDS))})", values)
+            run_id = cursor.lastrowid
+            self.db.executemany("INSERT INTO stages (run_id, stage, started_at, duration, outcome) "
+                                "VALUES (?, ?, ?, ?, ?)",
+                                [(run_id,) + stage for stage in run.stages])
+        return run_id
+
+    def record_command(self, command, started_at, duration, outcome="ok"):
+        """Store one arduino-cli command ("upload", "core install"...) and how it ended"""
+        with self.lock, self.db:
+            self.db.execute("INSERT INTO commands (command, started_at, duration, outcome) VALUES (?, ?, ?, ?)",
+                            (command, started_at, duration, outcome))
+
+    def command_durations(self, command, limit=500):
+        """Durations of the latest successful runs of a command"""
+        with self.lock:
+            rows = self.db.execute("SELECT duration FROM commands WHERE command = ? AND outcome = 'ok' "
+                                   "ORDER BY started_at DESC LIMIT ?", (command, limit)).fetchall()
+        return [row[0] for row in rows]
+
+    def recent(self, limit=50):
+        """Latest runs, newest first, each with its stages"""
+        with self.lock:
+            runs = [dict(row) for row in self.db.execute(
+                "SELECT * FROM runs ORDER BY started_at DESC LIMIT ?", (limit,))]
+            for run in runs:
+                run["stages"] = [dict(row) for row in self.db.execute(
+                    "SELECT stage, duration, outcome FROM stages WHERE run_id = ? ORDER BY started_at", (run["id"],))]
+        return runs
+
+    def stage_stats(self, since=None, until=None, group_by=None, include_failed=False, **filters):
+        """Duration percentiles per stage, plus "total" for whole runs
+
+        since/until bound the run start time (epoch seconds). group_by is
+        one of GROUP_COLUMNS and splits the result per value, e.g. per
+        arduino-cli version. filters match run columns exactly. Failed
+        stages, and failed or skipped runs in "total", are left out unless
+        include_failed is set.
+        """
+        if group_by is not None and group_by not in GROUP_COLUMNS:
+            raise ValueError(f"cannot group by {group_by}")
+        conditions = ["r.started_at >= ?", "r.started_at <= ?"]
+        params = [since or 0, until or time.time()]
+        for name, value in filters.items():
+            if name not in GROUP_COLUMNS:
+                raise ValueError(f"cannot filter by {name}")
+            if value is not None:
+                conditions.append(f"r.{name} = ?")
+                params.append(value)
+        where = " AND ".join(conditions)
+        group = f"r.{group_by}" if group_by else "NULL"
+        stage_filter = "" if include_failed else " AND s.outcome = 'ok'"
+        run_filter = "" if include_failed else " AND r.outcome = 'ok'"
+
+        with self.lock:
+            stage_rows = self.db.execute(
+                f"SELECT {group} AS grp, s.stage, s.duration FROM stages s JOIN runs r ON r.id = s.run_id "
+                f"WHERE {where}{stage_filter}", params).fetchall()
+            run_rows = self.db.execute(
+                f"SELECT {group} AS grp, r.duration FROM runs r WHERE {where}{run_filter}", params).fetchall()
+
+        groups = {}
+        for row in stage_rows:
+            groups.setdefault(row["grp"], {}).setdefault(row["stage"], []).append(row["duration"])
+        for row in run_rows:
+            groups.setdefault(row["grp"], {}).setdefault("total", []).append(row["duration"])
+
+        stats = {grp: {stage: summarize(durations) for stage, durations in stages.items()}
+                 for grp, stages in groups.items()}
+        if group_by:
+            return {"unknown" if grp is None else str(grp): stages for grp, stages in stats.items()}
+        return stats.get(None, {})
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+BomberCat HTTP Downloader
+One pooled requests Session shared by every download: connect/read
+timeouts, jittered exponential backoff on transient failures, resume of
+interrupted downloads with Range requests and a concurrency limit per host.
+Bodies are copied through a reusable buffer and hashed as they stream in
+"""
+import os
+import time
+import hashlib
+import random
+import threading
+from pathlib import Path
+from urllib.parse import urlparse
+
+# Statuses worth retrying: timeouts, rate limits and server side hiccups
+RETRY_STATUSES = (408, 425, 429, 500, 502, 503, 504)
+
+
+class RetryableStatus(Exception):
+    def __init__(self, response):
+        super().__init__(f"HTTP {response.status_code} for {response.url}")
+        self.response = response
+
+
+class IncompleteDownload(Exception):
+    pass
+
+
+class ChecksumMismatch(Exception):
+    pass
+
+
+def new_digest(checksum):
+    """hashlib object for an index style checksum ("SHA-256:<hex>"), None without one"""
+    if not checksum or ":" not in checksum:
+        return None
+    return hashlib.new(checksum.split(":", 1)[0].replace("-", "").lower())
+
+
+def hash_file(path, digest, buffer):
+    """Feed a file already on disk into digest"""
+    view = memoryview(buffer)
+    try:
+        with open(path, "rb", buffering=0) as f:
+            for count in iter(lambda: f.readinto(buffer), 0):
+                digest.update(view[:count])
+    finally:
+        view.release()
+
+
+def retry_after_seconds(response):
+    """Seconds from a Retry-After header, None when absent or a date"""
+    value = response.headers.get("Retry-After") if response is not None else None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class Downloader:
+    """Shared HTTP client for package, library, CLI and firmware downloads"""
+
+    def __init__(self, connect_timeout=10, read_timeout=60, retries=4, backoff=0.5, max_backoff=30,
+                 per_host=4, pool_size=16, buffer_size=1024 * 1024, progress_interval=0.5, on_retry=None,
+                 sleep=time.sleep):
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.per_host = per_host
+        self.pool_size = pool_size
+        self.buffer_size = buffer_size
+        self.progress_interval = progress_interval
+        self.buffers = threading.local()
+        self.on_retry = on_retry or (lambda message: None)
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.host_slots = {}
+        self._session = None
+        self.stats = {"requests": 0, "retries": 0, "resumed": 0, "bytes": 0, "progress_events": 0}
+
+    @property
+    def session(self):
+        with self.lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=0)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers["User-Agent"] = "bombercat-flasher"
+                self._session = session
+            return self._session
+
+    def host_slot(self, url):
+        """Semaphore bounding concurrent requests to the host of url"""
+        host = urlparse(url).netloc
+        with self.lock:
+            if host not in self.host_slots:
+                self.host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return self.host_slots[host]
+
+    def backoff_delay(self, attempt, retry_after=None):
+        """Exponential backoff with full jitter, at least Retry-After when given"""
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_backoff))
+        return delay
+
+    def retry(self, attempt, url, error, response=None):
+        """Sleep before the next attempt, or re-raise once retries are used up"""
+        if attempt > self.retries:
+            raise error
+        delay = self.backoff_delay(attempt, retry_after_seconds(response))
+        with self.lock:
+            self.stats["retries"] += 1
+        self.on_retry(f"Retrying {url} in {delay:.1f}s (attempt {attempt + 1}/{self.retries + 1}): {error}")
+        self.sleep(delay)
+
+    def request(self, method, url, **kwargs):
+        """Send a request, retrying connection errors, timeouts and transient statuses
+
+        The final response is returned whatever its status; callers decide
+        what to do with 304s and 4xx.
+        """
+        import requests
+        kwargs.setdefault("timeout", self.timeout)
+        attempt = 0
+        while True:
+            attempt += 1
+            response = None
+            try:
+                with self.host_slot(url):
+                    with self.lock:
+                        self.stats["requests"] += 1
+                    response = self.session.request(method, url, **kwargs)
+                if response.status_code in RETRY_STATUSES and attempt <= self.retries:
+                    raise RetryableStatus(response)
+                return response
+            except RetryableStatus as e:
+                response.close()
+                self.retry(attempt, url, e, response)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.retry(attempt, url, e)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def head(self, url, **kwargs):
+        kwargs.setdefault("allow_redirects", True)
+        return self.request("HEAD", url, **kwargs)
+
+    def get_json(self, url, **kwargs):
+        response = self.get(url, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    def buffer(self):
+        """Read buffer of this thread, allocated once and reused for every download"""
+        buffer = getattr(self.buffers, "buffer", None)
+        if buffer is None:
+            buffer = self.buffers.buffer = bytearray(self.buffer_size)
+        return buffer
+
+    def read_body(self, response, f, digest, downloaded, total, report):
+        """Copy the body into f through the reusable buffer; returns the byte count
+
+        The bytes are stored as sent: Content-Length and Range offsets count
+        encoded bytes, so decoding here would break totals and resumes.
+        """
+        import requests
+        from urllib3.exceptions import HTTPError as Urllib3Error, ReadTimeoutError
+        buffer = self.buffer()
+        view = memoryview(buffer)
+        raw = response.raw
+        raw.decode_content = False
+        try:
+            while True:
+                count = raw.readinto(buffer)
+                if not count:
+                    break
+                chunk = view[:count]
+                f.write(chunk)
+                if digest:
+                    digest.update(chunk)
+                downloaded += count
+                report(downloaded, total)
+        except ReadTimeoutError as e:
+            raise requests.exceptions.ReadTimeout(e)
+        except Urllib3Error as e:
+            raise requests.exceptions.ChunkedEncodingError(e)
+        finally:
+            view.release()
+        return downloaded
+
+    def progress_reporter(self, progress):
+        """Wrap progress so it fires only when the whole percentage changes
+
+        Without a known length it fires at most every progress_interval
+        seconds. Returns the wrapper and a flush for the final call.
+        """
+        last = {"percent": None, "time": 0.0, "args": None}
+
+        def report(downloaded, total):
+            last["args"] = (downloaded, total)
+            if total:
+                percent = downloaded * 100 // total
+                if percent == last["percent"]:
+                    return
+                last["percent"] = percent
+            else:
+                now = time.monotonic()
+                if now - last["time"] < self.progress_interval:
+                    return
+                last["time"] = now
+            with self.lock:
+                self.stats["progress_events"] += 1
+            progress(downloaded, total)
+            last["args"] = None
+
+        def flush():
+            if last["args"] is not None and last["args"][1] == 0:
+                with self.lock:
+                    self.stats["progress_events"] += 1
+                progress(*last["args"])
+
+        if progress is None:
+            return (lambda downloaded, total: None), (lambda: None)
+        return report, flush
+
+    def download(self, url, target, progress=None, headers=None, checksum=None):
+        """Stream url to target, resuming with a Range request after a dropped connection
+
+        progress(downloaded, total) is called when the whole percentage
+        changes; total is 0 when the server does not send a length. An
+        index style checksum ("SHA-256:<hex>") is verified while the data
+        streams in. The file only appears at target once it is complete.
+        """
+        import requests
+        target = Path(target)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        partial_path = target.with_suffix(target.suffix + ".part")
+        if partial_path.exists():
+            # Left by another run, possibly of a different version of the file
+            partial_path.unlink()
+        report, flush = self.progress_reporter(progress)
+
+        validator = None
+        attempt = 0
+        while True:
+            attempt += 1
+            offset = partial_path.stat().st_size if partial_path.exists() else 0
+            request_headers = dict(headers or {})
+            # Ask for the file itself so lengths and offsets match the bytes on disk
+            request_headers.setdefault("Accept-Encoding", "identity")
+            if offset:
+                request_headers["Range"] = f"bytes={offset}-"
+                if validator:
+                    # Send the whole file again if it changed since the first attempt
+                    request_headers["If-Range"] = validator
+            response = None
+            try:
+                with self.host_slot(url):
+                    with self.lock:
+                        self.stats["requests"] += 1
+                    with self.session.get(url, stream=True, timeout=self.timeout, headers=request_headers) as response:
+                        if response.status_code in RETRY_STATUSES:
+                            raise RetryableStatus(response)
+                        if response.status_code == 416 and offset:
+                            partial_path.unlink()
+                            raise IncompleteDownload("range not satisfiable, restarting")
+                        response.raise_for_status()
+
+                        resumed = offset and response.status_code == 206
+                        if offset and not resumed:
+                            offset = 0
+                        elif resumed:
+                            with self.lock:
+                                self.stats["resumed"] += 1
+                        validator = validator or response.headers.get("ETag") or response.headers.get("Last-Modified")
+                        length = int(response.headers.get("Content-Length", 0) or 0)
+                        total = offset + length if length else 0
+
+                        digest = new_digest(checksum)
+                        if digest and resumed:
+                            hash_file(partial_path, digest, self.buffer())
+                        with open(partial_path, "ab" if resumed else "wb") as f:
+                            downloaded = self.read_body(response, f, digest, offset, total, report)
+                        with self.lock:
+                            self.stats["bytes"] += downloaded - offset
+                        if total and downloaded < total:
+                            raise IncompleteDownload(f"got {downloaded} of {total} bytes")
+                flush()
+                if digest and digest.hexdigest().lower() != checksum.split(":", 1)[1].lower():
+                    partial_path.unlink()
+                    raise ChecksumMismatch(f"checksum mismatch for {target.name}")
+                os.replace(partial_path, target)
+                return target
+            except (RetryableStatus, requests.ConnectionError, requests.Timeout,
+                    requests.exceptions.ChunkedEncodingError, IncompleteDownload) as e:
+                try:
+                    self.retry(attempt, url, e, response if isinstance(e, RetryableStatus) else None)
+                except Exception:
+                    # Out of retries: a later call must not find a stale partial file
+                    if partial_path.exists():
+                        partial_path.unlink()
+                    raise
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_downloader(**options):
+    """The process wide downloader, created with options on first use"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = Downloader(**options)
+        return _shared
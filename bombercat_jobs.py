@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+BomberCat Jobs
+Background flash and install tasks run as jobs that can be cancelled.
+Every arduino-cli process a job starts gets its own process group, so
+cancelling kills the CLI together with the uploader and toolchain
+processes it spawned, and the job unwinds through its own cleanup
+(workspace, locks, run history) right away
+"""
+import os
+import uuid
+import time
+import signal
+import platform
+import threading
+import subprocess
+
+_current = threading.local()
+
+
+class JobCancelled(BaseException):
+    """Raised inside a job once it has been cancelled
+
+    A BaseException, like KeyboardInterrupt, so the `except Exception`
+    fallbacks a task passes through on its way out do not swallow it.
+    """
+
+
+def current_job():
+    """The job the calling thread runs, None outside of a job"""
+    return getattr(_current, "job", None)
+
+
+def process_group_kwargs():
+    """Popen arguments that start the child in a process group of its own"""
+    if platform.system() == "Windows":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+def kill_process_tree(process, grace=2.0):
+    """Terminate a process started with process_group_kwargs() and everything it spawned
+
+    The group gets SIGTERM, then SIGKILL after grace seconds or as soon as
+    the leader exits, so grandchildren that ignore SIGTERM or outlive
+    their parent do not keep the serial port or the pipes open.
+    """
+    if platform.system() == "Windows":
+        subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)], capture_output=True)
+        process.kill()
+        process.wait()
+        return
+
+    def signal_group(sig):
+        try:
+            os.killpg(process.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    signal_group(signal.SIGTERM)
+    try:
+        process.wait(timeout=grace)
+    except subprocess.TimeoutExpired:
+        pass
+    signal_group(signal.SIGKILL)
+    process.wait()
+
+
+class Job:
+    """A background task, the processes it is running and its cancel flag"""
+
+    def __init__(self, kind, kill_grace=2.0, **info):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.info = info
+        self.kill_grace = kill_grace
+        self.state = "pending"
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.cancel_requested = threading.Event()
+        self.done = threading.Event()
+        self.lock = threading.Lock()
+        self.processes = set()
+
+    @property
+    def cancelled(self):
+        return self.cancel_requested.is_set()
+
+    def checkpoint(self):
+        if self.cancelled:
+            raise JobCancelled(f"{self.kind} job {self.id} was cancelled")
+
+    def attach(self, process):
+        """Track a process of this job; one started after cancel() is killed at once"""
+        with self.lock:
+            self.processes.add(process)
+        if self.cancelled:
+            kill_process_tree(process, self.kill_grace)
+
+    def detach(self, process):
+        with self.lock:
+            self.processes.discard(process)
+
+    def cancel(self):
+        """Flag the job and kill its running process groups; returns False when it already ended"""
+        if self.done.is_set():
+            return False
+        self.cancel_requested.set()
+        with self.lock:
+            if self.state == "running":
+                self.state = "cancelling"
+            processes = list(self.processes)
+        for process in processes:
+            kill_process_tree(process, self.kill_grace)
+        return True
+
+    def run(self, target, *args, **kwargs):
+        """Run target as this job on the calling thread"""
+        _current.job = self
+        with self.lock:
+            if self.state == "pending":
+                self.state = "running"
+        try:
+            self.checkpoint()
+            target(*args, **kwargs)
+            self.state = "cancelled" if self.cancelled else "finished"
+        except JobCancelled:
+            self.state = "cancelled"
+        except Exception as e:
+            self.state = "cancelled" if self.cancelled else "failed"
+            self.error = str(e)
+        finally:
+            _current.job = None
+            self.finished_at = time.time()
+            self.done.set()
+
+    def to_dict(self):
+        return {"id": self.id, "kind": self.kind, "state": self.state, "error": self.error,
+                "created_at": self.created_at, "finished_at": self.finished_at,
+                "processes": len(self.processes), **self.info}
+
+
+class JobRegistry:
+    """Jobs started by the server, looked up by id to be cancelled
+
+    start_task(func, *args) starts func in the background, e.g.
+    socketio.start_background_task. Finished jobs are kept (up to keep)
+    so their final state can still be read.
+    """
+
+    def __init__(self, start_task, kill_grace=2.0, keep=50):
+        self.start_task = start_task
+        self.kill_grace = kill_grace
+        self.keep = keep
+        self.lock = threading.Lock()
+        self.jobs = {}
+
+    def start(self, kind, target, *args, **info):
+        job = Job(kind, self.kill_grace, **info)
+        with self.lock:
+            self.jobs[job.id] = job
+            finished = [j for j in self.jobs.values() if j.done.is_set()]
+            for old in sorted(finished, key=lambda j: j.created_at)[:max(0, len(finished) - self.keep)]:
+                del self.jobs[old.id]
+        self.start_task(job.run, target, *args)
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def list(self):
+        with self.lock:
+            jobs = sorted(self.jobs.values(), key=lambda j: j.created_at, reverse=True)
+        return [job.to_dict() for job in jobs]
+
+    def cancel(self, job_id, wait=5.0):
+        """Cancel a job and wait up to wait seconds for it to unwind; None when unknown"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        if job.cancel():
+            job.done.wait(wait)
+        return job
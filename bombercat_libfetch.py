@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+BomberCat Library Fetcher
+Resolves missing libraries and their dependencies against the Arduino
+library index, downloads the release zips concurrently into a staging
+directory over a bounded pool, verifies their checksums and lists them in
+dependency order for `lib install --zip-path`
+"""
+import json
+import time
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from bombercat_http import shared_downloader
+from bombercat_mirror import parse_version, verify_checksum
+
+
+def load_library_index(path):
+    """Latest release per library name from a library_index.json"""
+    with open(path, encoding="utf-8") as f:
+        index = json.load(f)
+    latest = {}
+    for release in index.get("libraries", []):
+        current = latest.get(release["name"])
+        if current is None or parse_version(release["version"]) > parse_version(current["version"]):
+            latest[release["name"]] = release
+    return latest
+
+
+def resolve_releases(latest, names, alternatives=None, installed=None):
+    """Map requested names to releases and collect their missing dependencies
+
+    Returns (resolved, releases, unknown): resolved maps each requested
+    name to the library name found in the index (possibly an alternative),
+    releases holds every release to download, unknown the names found
+    nowhere. installed(name) tells whether a dependency is already present.
+    """
+    alternatives = alternatives or {}
+    installed = installed or (lambda name: False)
+    resolved = {}
+    releases = {}
+    unknown = []
+
+    for name in names:
+        candidates = [name] + list(alternatives.get(name, []))
+        match = next((candidate for candidate in candidates if candidate in latest), None)
+        if match is None:
+            unknown.append(name)
+            continue
+        resolved[name] = match
+
+        pending = [match]
+        while pending:
+            lib = pending.pop(0)
+            if lib in releases or lib not in latest:
+                continue
+            if lib != match and installed(lib):
+                continue
+            release = latest[lib]
+            releases[lib] = release
+            pending.extend(dep["name"] for dep in release.get("dependencies", []))
+
+    return resolved, releases, unknown
+
+
+def install_order(releases):
+    """Release names with every dependency ahead of the libraries needing it"""
+    ordered = []
+    visiting = set()
+
+    def visit(name):
+        if name in ordered or name in visiting or name not in releases:
+            return
+        visiting.add(name)
+        for dep in releases[name].get("dependencies", []):
+            visit(dep["name"])
+        visiting.discard(name)
+        ordered.append(name)
+
+    for name in sorted(releases):
+        visit(name)
+    return ordered
+
+
+class LibraryFetcher:
+    """Concurrent, checksum verified library zip downloads into a staging directory"""
+
+    def __init__(self, staging_dir, max_workers=4, emit_log=None, downloader=None):
+        self.staging_dir = Path(staging_dir)
+        self.max_workers = max(1, max_workers)
+        self.emit_log = emit_log or (lambda message, level="info": None)
+        self.downloader = downloader or shared_downloader()
+
+    def archive_path(self, release):
+        return self.staging_dir / release["archiveFileName"]
+
+    def fetch_one(self, release):
+        """Download one release unless a verified copy is already staged"""
+        target = self.archive_path(release)
+        result = {"name": release["name"], "version": release["version"], "path": target,
+                  "cached": False, "elapsed": 0.0, "size": 0, "error": None}
+        start = time.time()
+        try:
+            if target.exists() and verify_checksum(target, release.get("checksum")):
+                result["cached"] = True
+            else:
+                self.downloader.download(release["url"], target, checksum=release.get("checksum"))
+            result["size"] = target.stat().st_size
+        except Exception as e:
+            result["error"] = str(e)
+            self.emit_log(f"Download of library {release['name']} failed: {e}", "warning")
+        result["elapsed"] = time.time() - start
+        return result
+
+    def fetch(self, releases):
+        """Fetch all releases concurrently; returns per-library results and timings"""
+        self.staging_dir.mkdir(parents=True, exist_ok=True)
+        releases = list(releases)
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(releases) or 1)) as pool:
+            results = list(pool.map(self.fetch_one, releases))
+        wall = time.time() - start
+
+        downloaded = [r for r in results if not r["cached"] and not r["error"]]
+        return {
+            "results": {r["name"]: r for r in results},
+            "wall": round(wall, 2),
+            "downloaded": len(downloaded),
+            "cached": sum(1 for r in results if r["cached"]),
+            "failed": sum(1 for r in results if r["error"]),
+            "bytes": sum(r["size"] for r in downloaded),
+            "workers": self.max_workers
+        }
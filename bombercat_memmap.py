@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+BomberCat Firmware Size Analysis
+Reads the ELF and GNU ld map file of a build: section sizes, flash and RAM
+use against the RP2040 limits, the largest symbols and how much each
+library contributes. Map files are parsed line by line so multi-MB maps
+never sit in memory. A JSON-lines history per firmware and FQBN shows how
+the image grows between upstream versions
+"""
+import re
+import json
+import time
+import struct
+import threading
+from pathlib import Path
+
+# RP2040 address map: XIP flash and striped SRAM (including the scratch banks)
+FLASH_START, FLASH_END = 0x10000000, 0x20000000
+RAM_START, RAM_END = 0x20000000, 0x20042000
+
+DEFAULT_FLASH_SIZE = 2 * 1024 * 1024
+DEFAULT_RAM_SIZE = 256 * 1024
+
+SHT_SYMTAB = 2
+SHT_NOBITS = 8
+SHF_ALLOC = 0x2
+STT_OBJECT, STT_FUNC = 1, 2
+
+# arduino-cli compile summary, gives the limits the core actually enforces
+FLASH_SUMMARY = re.compile(r"Sketch uses (\d+) bytes.*?Maximum is (\d+) bytes")
+RAM_SUMMARY = re.compile(r"Global variables use (\d+) bytes.*?Maximum is (\d+) bytes")
+
+# " .text.setup    0x10000100       0x2c /path/to/object.o" (or the address/size/object
+# part alone on the next line when the input section name is long)
+MAP_INPUT_SECTION = re.compile(r"^ (?P<section>[.\w$@-][^\s]*)?\s+0x(?P<addr>[0-9a-fA-F]+)\s+"
+                               r"0x(?P<size>[0-9a-fA-F]+)\s+(?P<object>\S.*)$")
+MAP_SECTION_ONLY = re.compile(r"^ (?P<section>[.\w$@-]\S*|COMMON)$")
+MAP_START = "Linker script and memory map"
+
+
+def region_of(address):
+    if FLASH_START <= address < FLASH_END:
+        return "flash"
+    if RAM_START <= address < RAM_END:
+        return "ram"
+    return None
+
+
+def read_elf(path):
+    """Allocated sections and sized symbols of an ELF file
+
+    Returns (sections, symbols); only the section header table, the symbol
+    table and its string table are read.
+    """
+    with open(path, "rb") as f:
+        ident = f.read(16)
+        if ident[:4] != b"\x7fELF":
+            raise ValueError(f"{path} is not an ELF file")
+        is_64 = ident[4] == 2
+        endian = "<" if ident[5] == 1 else ">"
+
+        if is_64:
+            header = struct.unpack(endian + "HHIQQQIHHHHHH", f.read(48))
+            shoff, shentsize, shnum, shstrndx = header[5], header[10], header[11], header[12]
+            section_format, symbol_format = endian + "IIQQQQIIQQ", endian + "IBBHQQ"
+        else:
+            header = struct.unpack(endian + "HHIIIIIHHHHHH", f.read(36))
+            shoff, shentsize, shnum, shstrndx = header[5], header[10], header[11], header[12]
+            section_format, symbol_format = endian + "IIIIIIIIII", endian + "IIIBBH"
+
+        f.seek(shoff)
+        table = f.read(shentsize * shnum)
+        headers = [struct.unpack_from(section_format, table, i * shentsize) for i in range(shnum)]
+
+        def read_at(offset, size):
+            f.seek(offset)
+            return f.read(size)
+
+        # sh_name, sh_type, sh_flags, sh_addr, sh_offset, sh_size, sh_link, ...
+        names = read_at(headers[shstrndx][4], headers[shstrndx][5]) if shstrndx < shnum else b""
+
+        def name_at(strings, offset):
+            return strings[offset:strings.index(b"\0", offset)].decode(errors="replace")
+
+        sections = []
+        for index, (name, kind, flags, addr, offset, size, link, _, _, _) in enumerate(headers):
+            sections.append({
+                "index": index,
+                "name": name_at(names, name) if names else "",
+                "type": kind,
+                "flags": flags,
+                "address": addr,
+                "size": size
+            })
+
+        symbols = []
+        symtab = next((h for h in headers if h[1] == SHT_SYMTAB), None)
+        if symtab is not None:
+            strtab = headers[symtab[6]]
+            strings = read_at(strtab[4], strtab[5])
+            data = read_at(symtab[4], symtab[5])
+            for entry in struct.iter_unpack(symbol_format, data[:len(data) - len(data) % symtab[9]]):
+                if is_64:
+                    name, info, _, shndx, value, size = entry
+                else:
+                    name, value, size, info, _, shndx = entry
+                kind = info & 0xF
+                if size == 0 or kind not in (STT_OBJECT, STT_FUNC) or shndx >= len(sections):
+                    continue
+                symbols.append({
+                    "name": name_at(strings, name),
+                    "address": value & ~1 if kind == STT_FUNC else value,
+                    "size": size,
+                    "kind": "function" if kind == STT_FUNC else "object",
+                    "section": sections[shndx]["name"]
+                })
+
+    sections = [s for s in sections if s["flags"] & SHF_ALLOC and s["size"]]
+    return sections, symbols
+
+
+def section_usage(sections):
+    """Flash and RAM bytes used; initialised RAM data also occupies flash"""
+    flash = ram = 0
+    for section in sections:
+        region = region_of(section["address"])
+        loaded = section["type"] != SHT_NOBITS
+        if region == "ram":
+            ram += section["size"]
+            if loaded:
+                flash += section["size"]
+        elif region == "flash" and loaded:
+            flash += section["size"]
+    return flash, ram
+
+
+def library_of(object_path):
+    """Library name an input object belongs to"""
+    path = object_path.replace("\\", "/")
+    archive, _, member = path.partition("(")
+    parts = archive.split("/")
+    if "libraries" in parts:
+        index = len(parts) - 1 - parts[::-1].index("libraries")
+        if index + 1 < len(parts):
+            return parts[index + 1]
+    name = parts[-1]
+    if member or name.endswith(".a"):
+        return re.sub(r"\.a$", "", name)
+    if "sketch" in parts[:-1]:
+        return "sketch"
+    if "core" in parts[:-1]:
+        return "core"
+    return re.sub(r"\.(o|obj)$", "", name)
+
+
+def iter_map_sections(lines):
+    """Yield (section, address, size, object) for each input section of a map file"""
+    started = False
+    pending = None
+    for line in lines:
+        if not started:
+            started = line.startswith(MAP_START)
+            continue
+        line = line.rstrip("\r\n")
+        match = MAP_INPUT_SECTION.match(line)
+        if match:
+            section = match.group("section") or pending
+            pending = None
+            size = int(match.group("size"), 16)
+            if section and size and not section.startswith("*"):
+                yield section, int(match.group("addr"), 16), size, match.group("object").strip()
+            continue
+        match = MAP_SECTION_ONLY.match(line)
+        pending = match.group("section") if match else None
+
+
+def library_usage(map_path):
+    """Flash and RAM bytes per library from a linker map file"""
+    libraries = {}
+    with open(map_path, errors="replace") as f:
+        for section, address, size, obj in iter_map_sections(f):
+            region = region_of(address)
+            if region is None:
+                continue
+            usage = libraries.setdefault(library_of(obj), {"flash": 0, "ram": 0})
+            if region == "ram":
+                usage["ram"] += size
+                if not section.startswith((".bss", "COMMON", ".noinit", ".uninitialized")):
+                    usage["flash"] += size
+            else:
+                usage["flash"] += size
+    return libraries
+
+
+def parse_compile_summary(output):
+    """(flash_max, ram_max) from arduino-cli compile output, None when absent"""
+    flash = FLASH_SUMMARY.search(output or "")
+    ram = RAM_SUMMARY.search(output or "")
+    return (int(flash.group(2)) if flash else None, int(ram.group(2)) if ram else None)
+
+
+def find_build_outputs(build_dir, sketch_name):
+    """The ELF and map file the compile of sketch_name wrote to a build directory
+
+    Only <sketch>.ino.elf counts: a shared build directory can hold older
+    outputs of other sketches.
+    """
+    build_dir = Path(build_dir)
+    elf = build_dir / f"{sketch_name}.ino.elf"
+    if not elf.exists():
+        return None, None
+    map_file = elf.with_suffix(".map")
+    return elf, map_file if map_file.exists() else None
+
+
+def analyze_build(build_dir, sketch_name, flash_size=DEFAULT_FLASH_SIZE, ram_size=DEFAULT_RAM_SIZE, top_n=20):
+    """Size report of a sketch's build, None when the build directory has no ELF for it"""
+    elf, map_file = find_build_outputs(build_dir, sketch_name)
+    if elf is None:
+        return None
+
+    try:
+        sections, symbols = read_elf(elf)
+    except (struct.error, IndexError) as e:
+        raise ValueError(f"{elf} is truncated or corrupt: {e}")
+    flash, ram = section_usage(sections)
+    symbols.sort(key=lambda s: s["size"], reverse=True)
+    for symbol in symbols[:top_n]:
+        symbol["region"] = region_of(symbol["address"])
+
+    libraries = library_usage(map_file) if map_file else {}
+    return {
+        "elf": str(elf),
+        "map": str(map_file) if map_file else None,
+        "flash": {"used": flash, "size": flash_size, "percent": round(flash * 100 / flash_size, 1)},
+        "ram": {"used": ram, "size": ram_size, "percent": round(ram * 100 / ram_size, 1)},
+        "sections": [{"name": s["name"], "address": s["address"], "size": s["size"],
+                      "region": region_of(s["address"])} for s in sections],
+        "top_symbols": symbols[:top_n],
+        "libraries": [dict(usage, name=name) for name, usage in
+                      sorted(libraries.items(), key=lambda item: (-item[1]["flash"], -item[1]["ram"]))]
+    }
+
+
+class SizeHistory:
+    """Append-only JSON-lines record of image sizes per firmware and FQBN"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+
+    def append(self, firmware, fqbn, report, **extra):
+        record = dict(extra, timestamp=time.time(), firmware=firmware, fqbn=fqbn,
+                      flash=report["flash"]["used"], ram=report["ram"]["used"],
+                      flash_size=report["flash"]["size"], ram_size=report["ram"]["size"],
+                      libraries={lib["name"]: lib["flash"] for lib in report["libraries"][:10]})
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.lock:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+        return record
+
+    def records(self, firmware=None, fqbn=None):
+        results = []
+        if not self.path.exists():
+            return results
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if firmware and record.get("firmware") != firmware:
+                    continue
+                if fqbn and record.get("fqbn") != fqbn:
+                    continue
+                results.append(record)
+        return results
+
+    def latest(self, firmware, fqbn):
+        records = self.records(firmware, fqbn)
+        return records[-1] if records else None
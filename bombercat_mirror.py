@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+BomberCat Package Mirror
+Syncs the additional board manager indexes, their core/tool archives and
+library zips into a local directory once, then serves them to arduino-cli
+over a small local HTTP server. arduino-cli still fetches its primary
+package_index.json and its builtin tools (discoveries, monitor) from
+downloads.arduino.cc: their URLs are built into it, so a machine needs to
+reach upstream once before it can provision offline
+"""
+import sys
+import json
+import hashlib
+import platform
+import threading
+from functools import partial
+from pathlib import Path
+from urllib.parse import urlparse
+
+from bombercat_http import ChecksumMismatch, shared_downloader
+
+LIBRARY_INDEX_URL = "https://downloads.arduino.cc/libraries/library_index.json"
+
+MANIFEST_FILE = "mirror.json"
+
+# Indexes are stored with this placeholder and published with the real base URL
+URL_PLACEHOLDER = "@MIRROR_URL@/"
+
+
+def parse_version(version):
+    """Turn a semver-ish string into a sortable tuple"""
+    parts = []
+    for piece in version.replace("-", ".").split("."):
+        parts.append((0, int(piece), "") if piece.isdigit() else (1, 0, piece))
+    return tuple(parts)
+
+
+def host_matches(host, system=None, machine=None):
+    """Check whether an arduino tool host triplet runs on this machine"""
+    system = (system or platform.system()).lower()
+    machine = (machine or platform.machine()).lower()
+    host = host.lower()
+
+    if system == "windows":
+        return "mingw" in host or "windows" in host
+    if system == "darwin":
+        if "darwin" not in host and "apple" not in host:
+            return False
+        if machine in ("arm64", "aarch64"):
+            return "arm64" in host or "aarch64" in host
+        return "x86_64" in host or "i386" in host
+    if system == "linux":
+        if "linux" not in host:
+            return False
+        if machine in ("x86_64", "amd64"):
+            return host.startswith("x86_64")
+        if machine in ("aarch64", "arm64"):
+            return host.startswith("aarch64")
+        if machine.startswith("arm"):
+            return host.startswith("arm")
+        return host.startswith(("i686", "i386"))
+    return False
+
+
+def verify_checksum(path, checksum):
+    """Verify an index style checksum ("SHA-256:<hex>")"""
+    if not checksum or ":" not in checksum:
+        return True
+    algorithm, expected = checksum.split(":", 1)
+    digest = hashlib.new(algorithm.replace("-", "").lower())
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest().lower() == expected.lower()
+
+
+class PackageMirror:
+    """Local mirror of package indexes, archives and libraries"""
+
+    def __init__(self, mirror_dir, base_url=None, emit_log=None, downloader=None):
+        self.mirror_dir = Path(mirror_dir)
+        self.base_url = base_url.rstrip("/") + "/" if base_url else None
+        self.emit_log = emit_log or (lambda message, level="info": print(f"[{level.upper()}] {message}"))
+        self.downloader = downloader or shared_downloader()
+        self.server = None
+
+    # Sync
+
+    def sync(self, index_urls, platforms, libraries=(), library_index_url=LIBRARY_INDEX_URL, all_hosts=False):
+        """Download indexes, the latest release of each platform, its tools and the libraries"""
+        for subdir in ("archives", "libraries", "index_templates"):
+            (self.mirror_dir / subdir).mkdir(parents=True, exist_ok=True)
+
+        indexes = {}
+        for url in index_urls:
+            self.emit_log(f"Fetching index {url}")
+            indexes[url] = self.fetch_json(url)
+
+        wanted = set(platforms)
+        selected_platforms = {}
+        for index in indexes.values():
+            for package in index.get("packages", []):
+                for entry in package.get("platforms", []):
+                    key = f"{package['name']}:{entry['architecture']}"
+                    if key in wanted:
+                        current = selected_platforms.get(key)
+                        if current is None or parse_version(entry["version"]) > parse_version(current["version"]):
+                            selected_platforms[key] = entry
+
+        missing = wanted - set(selected_platforms)
+        if missing:
+            self.emit_log(f"Platforms not found in any index: {', '.join(sorted(missing))}", "warning")
+
+        needed_tools = set()
+        for entry in selected_platforms.values():
+            self.mirror_archive(entry)
+            for dep in entry.get("toolsDependencies", []):
+                needed_tools.add((dep["packager"], dep["name"], dep["version"]))
+
+        local_indexes = []
+        for url, index in indexes.items():
+            pruned = self.prune_index(index, selected_platforms, needed_tools, all_hosts)
+            if not pruned["packages"]:
+                continue
+            filename = Path(urlparse(url).path).name or "package_index.json"
+            with open(self.mirror_dir / "index_templates" / filename, "w") as f:
+                json.dump(pruned, f)
+            local_indexes.append(filename)
+
+        library_files = {}
+        if libraries:
+            library_files = self.sync_libraries(libraries, library_index_url)
+
+        manifest = {
+            "indexes": local_indexes,
+            "platforms": {key: entry["version"] for key, entry in selected_platforms.items()},
+            "libraries": library_files
+        }
+        with open(self.mirror_dir / MANIFEST_FILE, "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        self.emit_log(f"Mirror synced: {len(local_indexes)} indexes, {len(selected_platforms)} platforms, "
+                      f"{len(library_files)} libraries", "success")
+        if self.base_url:
+            self.publish(self.base_url)
+        return manifest
+
+    def prune_index(self, index, selected_platforms, needed_tools, all_hosts):
+        """Keep only mirrored entries and point their URLs at the mirror"""
+        packages = []
+        for package in index.get("packages", []):
+            platforms = []
+            for entry in package.get("platforms", []):
+                key = f"{package['name']}:{entry['architecture']}"
+                if selected_platforms.get(key) is entry:
+                    platforms.append(dict(entry, url=self.archive_url(entry["archiveFileName"])))
+
+            tools = []
+            for tool in package.get("tools", []):
+                if (package["name"], tool["name"], tool["version"]) not in needed_tools:
+                    continue
+                systems = []
+                for system in tool.get("systems", []):
+                    if all_hosts or host_matches(system["host"]):
+                        self.mirror_archive(system)
+                        systems.append(dict(system, url=self.archive_url(system["archiveFileName"])))
+                if systems:
+                    tools.append(dict(tool, systems=systems))
+
+            if platforms or tools:
+                packages.append(dict(package, platforms=platforms, tools=tools))
+
+        return dict(index, packages=packages)
+
+    def mirror_archive(self, entry):
+        """Download one archive referenced by an index entry, skipping verified copies"""
+        target = self.mirror_dir / "archives" / entry["archiveFileName"]
+        checksum = entry.get("checksum")
+        if target.exists() and verify_checksum(target, checksum):
+            return target
+
+        self.emit_log(f"Downloading {entry['archiveFileName']}")
+        try:
+            self.download(entry["url"], target, checksum)
+        except ChecksumMismatch:
+            raise Exception(f"Checksum mismatch for {entry['archiveFileName']}")
+        return target
+
+    def sync_libraries(self, libraries, library_index_url):
+        """Mirror the latest release of each library and its dependencies"""
+        self.emit_log("Fetching library index...")
+        index = self.fetch_json(library_index_url)
+
+        latest = {}
+        for release in index.get("libraries", []):
+            current = latest.get(release["name"])
+            if current is None or parse_version(release["version"]) > parse_version(current["version"]):
+                latest[release["name"]] = release
+
+        files = {}
+        pending = list(libraries)
+        while pending:
+            name = pending.pop(0)
+            if name in files:
+                continue
+            release = latest.get(name)
+            if release is None:
+                self.emit_log(f"Library not found in index: {name}", "warning")
+                continue
+
+            target = self.mirror_dir / "libraries" / release["archiveFileName"]
+            if not (target.exists() and verify_checksum(target, release.get("checksum"))):
+                self.emit_log(f"Downloading library {name} {release['version']}")
+                try:
+                    self.download(release["url"], target, release.get("checksum"))
+                except ChecksumMismatch:
+                    raise Exception(f"Checksum mismatch for library {name}")
+
+            dependencies = [dep["name"] for dep in release.get("dependencies", [])]
+            files[name] = {
+                "version": release["version"],
+                "file": f"libraries/{release['archiveFileName']}",
+                "checksum": release.get("checksum"),
+                "dependencies": dependencies
+            }
+            pending.extend(dependencies)
+
+        return files
+
+    def fetch_json(self, url):
+        """Fetch a JSON document"""
+        return self.downloader.get_json(url)
+
+    def download(self, url, target, checksum=None):
+        """Stream a file to disk, verifying checksum on the way"""
+        self.downloader.download(url, target, checksum=checksum)
+
+    # Serve
+
+    def archive_url(self, filename):
+        return f"{URL_PLACEHOLDER}archives/{filename}"
+
+    def publish(self, base_url):
+        """Write the served indexes with archive URLs pointing at base_url"""
+        self.base_url = base_url.rstrip("/") + "/"
+        manifest = self.manifest() or {}
+        for name in manifest.get("indexes", []):
+            template = (self.mirror_dir / "index_templates" / name).read_text()
+            (self.mirror_dir / name).write_text(template.replace(URL_PLACEHOLDER, self.base_url))
+        return self.base_url
+
+    def manifest(self):
+        """Load the manifest written by the last sync"""
+        manifest_file = self.mirror_dir / MANIFEST_FILE
+        if not manifest_file.exists():
+            return None
+        with open(manifest_file) as f:
+            return json.load(f)
+
+    def index_urls(self):
+        """URLs arduino-cli should use as additional board manager URLs"""
+        manifest = self.manifest() or {}
+        return [f"{self.base_url}{name}" for name in manifest.get("indexes", [])]
+
+    def library_archives(self, name):
+        """Local zips for a mirrored library and its dependencies, dependencies first"""
+        manifest = self.manifest() or {}
+        libraries = manifest.get("libraries", {})
+        ordered = []
+
+        def visit(lib, seen):
+            entry = libraries.get(lib)
+            if not entry or lib in seen:
+                return
+            seen.add(lib)
+            for dep in entry.get("dependencies", []):
+                visit(dep, seen)
+            path = self.mirror_dir / entry["file"]
+            if path.exists() and path not in ordered:
+                ordered.append(path)
+
+        visit(name, set())
+        return ordered
+
+    def serve(self, host="127.0.0.1", port=8765, public_url=None):
+        """Serve the mirror directory over HTTP from a daemon thread"""
+        if self.server:
+            return self.base_url
+
+        from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+        class QuietHandler(SimpleHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+        handler = partial(QuietHandler, directory=str(self.mirror_dir))
+        self.server = ThreadingHTTPServer((host, port), handler)
+        thread = threading.Thread(target=self.server.serve_forever, name="package-mirror", daemon=True)
+        thread.start()
+
+        return self.publish(public_url or f"http://{host}:{self.server.server_address[1]}/")
+
+    def shutdown(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+def main():
+    from bombercat_relay import Config
+
+    if len(sys.argv) < 3 or sys.argv[1] not in ("sync", "serve"):
+        print("Usage: bombercat_mirror.py sync <mirror_dir> [--all-hosts]")
+        print("       bombercat_mirror.py serve <mirror_dir> [port] [public_url]")
+        sys.exit(2)
+
+    cfg = Config()
+    mirror_dir = sys.argv[2]
+
+    if sys.argv[1] == "sync":
+        mirror = PackageMirror(mirror_dir)
+        libraries = list(cfg.required_libraries)
+        for alternatives in cfg.library_alternatives.values():
+            libraries.extend(alternatives)
+        mirror.sync(cfg.board_urls, cfg.mirror_platforms, libraries, all_hosts="--all-hosts" in sys.argv)
+    else:
+        port = int(sys.argv[3]) if len(sys.argv) > 3 else cfg.mirror_port
+        public_url = sys.argv[4] if len(sys.argv) > 4 else f"http://{platform.node()}:{port}/"
+        mirror = PackageMirror(mirror_dir)
+        url = mirror.serve("0.0.0.0", port, public_url)
+        print(f"✅ Serving {mirror_dir} at {url}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            mirror.shutdown()
+
+
+if __name__ == "__main__":
+    main()
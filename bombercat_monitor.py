@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+BomberCat Serial Monitor
+Reads any number of serial ports from one selector loop. Every port keeps
+its recent output in a bounded ring buffer and streams it only to the
+clients subscribed to it; each client acknowledges what it has processed
+and gets at most a window of unacknowledged bytes, so a slow browser tab
+falls behind (and is told how much it missed) without slowing the others
+"""
+import os
+import time
+import codecs
+import selectors
+import threading
+from contextlib import contextmanager
+
+
+def default_open_port(port, baudrate):
+    """Open a serial port with pyserial, non-blocking"""
+    import serial
+    return serial.Serial(port, baudrate, timeout=0)
+
+
+def room_for(port):
+    """Socket.IO room of a port's subscribers"""
+    return f"monitor:{port}"
+
+
+class RingBuffer:
+    """The last capacity bytes of a stream, addressed by absolute offsets
+
+    end is the number of bytes written so far; offsets before start have
+    been overwritten.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.buffer = bytearray(capacity)
+        self.end = 0
+
+    @property
+    def start(self):
+        return max(0, self.end - self.capacity)
+
+    def write(self, data):
+        data = memoryview(data)
+        if len(data) > self.capacity:
+            self.end += len(data) - self.capacity
+            data = data[-self.capacity:]
+        pos = self.end % self.capacity
+        first = min(len(data), self.capacity - pos)
+        self.buffer[pos:pos + first] = data[:first]
+        self.buffer[:len(data) - first] = data[first:]
+        self.end += len(data)
+
+    def read(self, offset, limit):
+        """(data, next offset, bytes skipped because they were overwritten) from offset on"""
+        skipped = max(0, self.start - offset)
+        offset = max(offset, self.start)
+        size = max(0, min(limit, self.end - offset))
+        pos = offset % self.capacity
+        first = min(size, self.capacity - pos)
+        data = bytes(self.buffer[pos:pos + first]) + bytes(self.buffer[:size - first])
+        return data, offset + size, skipped
+
+
+class Subscriber:
+    """A client's position in a port's stream"""
+
+    def __init__(self, sid, cursor):
+        self.sid = sid
+        self.cursor = cursor    # next offset to send
+        self.acked = cursor     # offset the client confirmed
+        self.skipped = 0
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    @property
+    def in_flight(self):
+        return self.cursor - self.acked
+
+
+class MonitoredPort:
+    """An open (or reopening) serial port and its subscribers"""
+
+    def __init__(self, name, baudrate, buffer_size):
+        self.name = name
+        self.baudrate = baudrate
+        self.ring = RingBuffer(buffer_size)
+        self.subscribers = {}
+        self.handle = None
+        self.fd = None
+        self.state = "opening"
+        self.error = None
+        self.retry_at = 0.0
+        self.bytes_read = 0
+
+    def to_dict(self):
+        return {"port": self.name, "baudrate": self.baudrate, "state": self.state, "error": self.error,
+                "bytes_read": self.bytes_read, "buffered": self.ring.end - self.ring.start,
+                "subscribers": len(self.subscribers),
+                "lagging": sum(1 for s in self.subscribers.values() if s.skipped)}
+
+
+class SerialMonitor:
+    """Serial ports shared by Socket.IO subscribers, read by one selector loop
+
+    emit(event, data, room) sends to a Socket.IO room or client sid.
+    open_port(port, baudrate) returns a pyserial-like object; ports whose
+    object has no fileno() (Windows) are polled through in_waiting.
+    """
+
+    def __init__(self, emit, open_port=None, baudrate=115200, buffer_size=64 * 1024, window=16 * 1024,
+                 flush_interval=0.05, reopen_interval=0.5):
+        self.emit = emit
+        self.open_port = open_port or default_open_port
+        self.baudrate = baudrate
+        self.buffer_size = buffer_size
+        self.window = window
+        self.flush_interval = flush_interval
+        self.reopen_interval = reopen_interval
+        self.lock = threading.RLock()
+        self.ports = {}
+        self.pending_status = []
+        self.selector = selectors.DefaultSelector()
+        self.thread = None
+        self.running = False
+
+    # Subscriptions (Socket.IO handlers)
+
+    def subscribe(self, sid, port, baudrate=None, backlog=True):
+        """Add a client to a port, opening the port on first use
+
+        With backlog the client first gets what the ring buffer still
+        holds, otherwise only new output. Returns the port state.
+        """
+        with self.lock:
+            monitored = self.ports.get(port)
+            if monitored is None:
+                monitored = MonitoredPort(port, baudrate or self.baudrate, self.buffer_size)
+                self.ports[port] = monitored
+                self.open(monitored)
+            ring = monitored.ring
+            monitored.subscribers[sid] = Subscriber(sid, ring.start if backlog else ring.end)
+            self.ensure_running()
+            state = monitored.to_dict()
+        self.emit_status()
+        return state
+
+    def unsubscribe(self, sid, port=None):
+        """Remove a client from one port, or from all of them; unwatched ports are closed"""
+        with self.lock:
+            for name in ([port] if port else list(self.ports)):
+                monitored = self.ports.get(name)
+                if monitored is None or monitored.subscribers.pop(sid, None) is None:
+                    continue
+                if not monitored.subscribers:
+                    self.close(monitored)
+                    del self.ports[name]
+
+    def ack(self, sid, port, offset):
+        """Record that a client processed the stream up to offset, reopening its window"""
+        with self.lock:
+            monitored = self.ports.get(port)
+            subscriber = monitored and monitored.subscribers.get(sid)
+            if subscriber:
+                subscriber.acked = max(subscriber.acked, min(int(offset), subscriber.cursor))
+
+    def write(self, port, data):
+        """Send data (str or bytes) to a monitored port"""
+        with self.lock:
+            monitored = self.ports.get(port)
+            if monitored is None or monitored.handle is None:
+                raise ValueError(f"{port} is not open")
+            if isinstance(data, str):
+                data = data.encode("utf-8")
+            return monitored.handle.write(data)
+
+    def status(self):
+        with self.lock:
+            return [monitored.to_dict() for monitored in self.ports.values()]
+
+    @contextmanager
+    def paused(self, port):
+        """Release a port while something else needs it (e.g. an upload), then reopen it"""
+        with self.lock:
+            monitored = self.ports.get(port)
+            if monitored is not None:
+                self.close(monitored)
+                self.set_state(monitored, "paused")
+        self.emit_status()
+        try:
+            yield
+        finally:
+            with self.lock:
+                if monitored is not None and self.ports.get(port) is monitored:
+                    self.set_state(monitored, "reopening")
+                    monitored.retry_at = 0.0
+            self.emit_status()
+
+    # Port handling
+
+    def set_state(self, monitored, state, error=None):
+        """Change a port's state; the event is queued and sent by emit_status"""
+        monitored.state = state
+        monitored.error = error
+        self.pending_status.append((monitored.to_dict(), room_for(monitored.name)))
+
+    def emit_status(self):
+        """Send queued state changes; called without the lock so a slow emit stalls no reader"""
+        with self.lock:
+            pending, self.pending_status = self.pending_status, []
+        for status, room in pending:
+            self.emit("monitor_status", status, room)
+
+    def open(self, monitored):
+        try:
+            handle = self.open_port(monitored.name, monitored.baudrate)
+        except Exception as e:
+            monitored.retry_at = time.monotonic() + self.reopen_interval
+            self.set_state(monitored, "reopening", str(e))
+            return
+        monitored.handle = handle
+        try:
+            monitored.fd = handle.fileno()
+            self.selector.register(monitored.fd, selectors.EVENT_READ, monitored)
+        except (AttributeError, OSError, ValueError):
+            monitored.fd = None
+        self.set_state(monitored, "open")
+
+    def close(self, monitored):
+        if monitored.fd is not None:
+            try:
+                self.selector.unregister(monitored.fd)
+            except (KeyError, ValueError):
+                pass
+        if monitored.handle is not None:
+            try:
+                monitored.handle.close()
+            except Exception:
+                pass
+        monitored.handle = None
+        monitored.fd = None
+
+    def lost(self, monitored, error):
+        """The port went away (unplugged, reset into BOOTSEL...): keep the buffer and retry"""
+        self.close(monitored)
+        monitored.retry_at = time.monotonic() + self.reopen_interval
+        self.set_state(monitored, "reopening", error)
+
+    def read(self, monitored):
+        try:
+            if monitored.fd is not None:
+                data = os.read(monitored.fd, 4096)
+                if not data:
+                    raise OSError("port closed")
+            else:
+                waiting = monitored.handle.in_waiting
+                data = monitored.handle.read(waiting) if waiting else b""
+        except BlockingIOError:
+            return
+        except Exception as e:
+            self.lost(monitored, str(e))
+            return
+        if data:
+            monitored.ring.write(data)
+            monitored.bytes_read += len(data)
+
+    # Reader loop
+
+    def ensure_running(self):
+        with self.lock:
+            if not self.running:
+                self.running = True
+                self.thread = threading.Thread(target=self.loop, name="serial-monitor", daemon=True)
+                self.thread.start()
+
+    def loop(self):
+        next_flush = time.monotonic()
+        while True:
+            with self.lock:
+                if not self.ports:
+                    self.running = False
+                    return
+                polled = [m for m in self.ports.values() if m.handle is not None and m.fd is None]
+                reopen = [m for m in self.ports.values()
+                          if m.state == "reopening" and time.monotonic() >= m.retry_at]
+                registered = bool(self.selector.get_map())
+            for monitored in reopen:
+                with self.lock:
+                    if self.ports.get(monitored.name) is monitored and monitored.state == "reopening":
+                        self.open(monitored)
+            self.emit_status()
+
+            timeout = max(0.0, next_flush - time.monotonic())
+            if registered:
+                try:
+                    events = self.selector.select(timeout)
+                except OSError:
+                    events = []
+            else:
+                time.sleep(timeout)
+                events = []
+            with self.lock:
+                for key, _ in events:
+                    if key.data.handle is not None:
+                        self.read(key.data)
+                for monitored in polled:
+                    if monitored.handle is not None:
+                        self.read(monitored)
+            self.emit_status()
+            if time.monotonic() >= next_flush:
+                self.flush()
+                next_flush = time.monotonic() + self.flush_interval
+
+    def flush(self):
+        """Send each subscriber what it has room for in its window"""
+        sends = []
+        with self.lock:
+            for monitored in self.ports.values():
+                ring = monitored.ring
+                for subscriber in monitored.subscribers.values():
+                    room = self.window - subscriber.in_flight
+                    if room <= 0 or subscriber.cursor >= ring.end:
+                        continue
+                    data, cursor, skipped = ring.read(subscriber.cursor, room)
+                    if skipped:
+                        # Too slow: the unread part was overwritten, resume at the oldest data
+                        subscriber.skipped += skipped
+                        subscriber.acked = cursor - len(data)
+                        subscriber.decoder.reset()
+                    subscriber.cursor = cursor
+                    sends.append((subscriber.sid, {"port": monitored.name, "text": subscriber.decoder.decode(data),
+                                                   "offset": cursor, "skipped": skipped}))
+        for sid, message in sends:
+            self.emit("monitor_data", message, sid)
+
+    def stop(self):
+        with self.lock:
+            for monitored in self.ports.values():
+                self.close(monitored)
+            self.ports.clear()
+        if self.thread:
+            self.thread.join(5)
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+BomberCat Port Inventory
+Keeps a cached, hot-plug aware snapshot of serial ports and BOOTSEL state
+so the web endpoints never have to rescan the system on every request
+"""
+import time
+import select
+import socket
+import platform
+import threading
+
+# Vendor IDs of RP2040 based boards
+RP2040_VIDS = (0x2E8A, 0x239A)  # Raspberry Pi, Adafruit
+
+# Linux kobject uevent netlink protocol number
+NETLINK_KOBJECT_UEVENT = 15
+
+# Subsystems whose hot-plug events should trigger a rescan
+HOTPLUG_SUBSYSTEMS = ("tty", "usb", "block")
+
+
+def default_list_ports():
+    """List serial ports using pyserial"""
+    import serial.tools.list_ports
+    return serial.tools.list_ports.comports()
+
+
+def port_key(port):
+    """Identity of a physical port, used to classify each device only once"""
+    return (port.device, port.vid, port.pid, port.serial_number, port.hwid)
+
+
+def classify_port(port):
+    """Build the port description served by /api/detect_boards"""
+    port_info = {
+        "port": port.device,
+        "description": port.description,
+        "hwid": port.hwid,
+        "vid": port.vid,
+        "pid": port.pid,
+        "serial_number": port.serial_number,
+        "location": getattr(port, "location", None),
+        "manufacturer": port.manufacturer,
+        "product": port.product,
+        "likely_bombercat": False
+    }
+
+    # Check if it's likely a BomberCat (RP2040-based)
+    if port.vid in RP2040_VIDS:
+        port_info['likely_bombercat'] = True
+    elif "RP2040" in (port.description or ""):
+        port_info['likely_bombercat'] = True
+    elif "Pico" in (port.description or ""):
+        port_info['likely_bombercat'] = True
+    elif port.manufacturer and "Raspberry Pi" in port.manufacturer:
+        port_info['likely_bombercat'] = True
+
+    return port_info
+
+
+def parse_uevent(data):
+    """Parse a raw kernel uevent message into a dict"""
+    fields = data.split(b"\0")
+    event = {}
+    if fields and b"@" in fields[0]:
+        action, _, devpath = fields[0].partition(b"@")
+        event["ACTION"] = action.decode(errors="replace")
+        event["DEVPATH"] = devpath.decode(errors="replace")
+    for item in fields[1:]:
+        key, sep, value = item.partition(b"=")
+        if sep:
+            event[key.decode(errors="replace")] = value.decode(errors="replace")
+    return event
+
+
+def open_uevent_socket():
+    """Open a netlink socket receiving kernel hot-plug events (Linux only)"""
+    if platform.system() != "Linux" or not hasattr(socket, "AF_NETLINK"):
+        return None
+    try:
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+        sock.bind((0, 1))
+        sock.setblocking(False)
+        return sock
+    except OSError:
+        return None
+
+
+def open_mounts_file():
+    """Open the mount table, which signals POLLPRI whenever it changes (Linux only)"""
+    if platform.system() != "Linux":
+        return None
+    try:
+        return open("/proc/self/mounts", "rb")
+    except OSError:
+        return None
+
+
+class PortInventory:
+    """Cached inventory of serial ports and BOOTSEL state
+
+    The snapshot is rebuilt on hot-plug events (netlink uevents and mount
+    table changes on Linux) and by a low-rate poll everywhere else. Each
+    physical port is classified once and reused until it disappears.
+    log(message, level) reports watcher and listener errors.
+    """
+
+    def __init__(self, list_ports=None, bootsel_scanner=None, poll_interval=5.0, debounce=0.2, log=None):
+        self.list_ports = list_ports or default_list_ports
+        self.bootsel_scanner = bootsel_scanner
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.log = log or (lambda message, level="info": print(f"[{level.upper()}] {message}"))
+
+        self._classified = {}
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._stop = threading.Event()
+        self._thread = None
+        self.hotplug = False
+
+    def snapshot(self):
+        """Return the current inventory; the returned dict must not be mutated"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self.refresh()
+        return snapshot
+
+    def cached(self):
+        """The current inventory without scanning, None before the first scan"""
+        return self._snapshot
+
+    def subscribe(self, callback):
+        """Call callback(snapshot, added, removed) after every change"""
+        self._listeners.append(callback)
+
+    def refresh(self, ports=True, bootsel=True):
+        """Rescan ports and/or BOOTSEL state and publish a new snapshot"""
+        with self._lock:
+            previous = self._snapshot or {}
+
+            if ports or not previous:
+                classified = {}
+                port_list = []
+                for port in self.list_ports():
+                    key = port_key(port)
+                    info = self._classified.get(key)
+                    if info is None:
+                        info = classify_port(port)
+                    classified[key] = info
+                    port_list.append(info)
+                added = [info for key, info in classified.items() if key not in self._classified]
+                removed = [info for key, info in self._classified.items() if key not in classified]
+                self._classified = classified
+            else:
+                port_list = previous.get("ports", [])
+                added = removed = []
+
+            in_bootsel = previous.get("in_bootsel", False)
+            bootsel_path = previous.get("bootsel_path")
+            if (bootsel or not previous) and self.bootsel_scanner:
+                bootsel_state = self.bootsel_scanner()
+                in_bootsel = bootsel_state.get("in_bootsel", False)
+                bootsel_path = bootsel_state.get("bootsel_path")
+
+            snapshot = {
+                "ports": port_list,
+                "in_bootsel": in_bootsel,
+                "bootsel_path": bootsel_path,
+                "generation": previous.get("generation", 0) + 1,
+                "updated_at": time.time(),
+                "hotplug": self.hotplug
+            }
+            changed = (added or removed or in_bootsel != previous.get("in_bootsel")
+                       or bootsel_path != previous.get("bootsel_path"))
+            self._snapshot = snapshot
+
+        if changed:
+            for listener in list(self._listeners):
+                try:
+                    listener(snapshot, added, removed)
+                except Exception as e:
+                    self.log(f"Port inventory listener error: {e}", "warning")
+
+        return snapshot
+
+    def update_bootsel(self, bootsel_state):
+        """Publish a BOOTSEL state obtained elsewhere (e.g. an explicit check)"""
+        with self._lock:
+            if self._snapshot is None:
+                return
+            snapshot = dict(self._snapshot)
+            snapshot["in_bootsel"] = bootsel_state.get("in_bootsel", False)
+            snapshot["bootsel_path"] = bootsel_state.get("bootsel_path")
+            snapshot["generation"] += 1
+            snapshot["updated_at"] = time.time()
+            self._snapshot = snapshot
+
+    def start(self):
+        """Start the background watcher thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="port-inventory", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background watcher thread"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def _watch(self):
+        """Refresh on hot-plug events, polling at a low rate as a fallback"""
+        uevents = open_uevent_socket()
+        mounts = open_mounts_file()
+        poller = None
+
+        if hasattr(select, "poll") and (uevents or mounts):
+            poller = select.poll()
+            if uevents:
+                poller.register(uevents, select.POLLIN)
+            if mounts:
+                poller.register(mounts, select.POLLPRI | select.POLLERR)
+            self.hotplug = bool(uevents)
+
+        last_poll = None
+        try:
+            while not self._stop.is_set():
+                # A failed rescan (comports(), netlink, a BOOTSEL scan) keeps the last
+                # snapshot and is retried after poll_interval instead of ending the watcher
+                try:
+                    if last_poll is None:
+                        self.refresh()
+                        last_poll = time.monotonic()
+                        continue
+
+                    if not poller:
+                        self._stop.wait(self.poll_interval)
+                        if not self._stop.is_set():
+                            self.refresh()
+                        continue
+
+                    timeout = max(0.0, self.poll_interval - (time.monotonic() - last_poll))
+                    events = poller.poll(min(timeout, 1.0) * 1000)
+                    rescan_ports = rescan_bootsel = False
+
+                    for fd, _ in events:
+                        if uevents and fd == uevents.fileno():
+                            rescan_ports |= self._drain_uevents(uevents)
+                            rescan_bootsel = rescan_ports or rescan_bootsel
+                        elif mounts and fd == mounts.fileno():
+                            mounts.seek(0)
+                            mounts.read()
+                            rescan_bootsel = True
+
+                    if rescan_ports or rescan_bootsel:
+                        # Events arrive in bursts; let the device settle first
+                        self._stop.wait(self.debounce)
+                        if uevents:
+                            rescan_ports |= self._drain_uevents(uevents)
+                        self.refresh(ports=rescan_ports, bootsel=True)
+                        last_poll = time.monotonic()
+                    elif time.monotonic() - last_poll >= self.poll_interval:
+                        self.refresh()
+                        last_poll = time.monotonic()
+
+                except Exception as e:
+                    self.log(f"Port inventory watcher error: {e}, retrying in {self.poll_interval:g}s", "warning")
+                    self._stop.wait(self.poll_interval)
+                    if last_poll is not None:
+                        last_poll = time.monotonic()
+        finally:
+            if uevents:
+                uevents.close()
+            if mounts:
+                mounts.close()
+
+    def _drain_uevents(self, sock):
+        """Read all pending uevents and report whether a relevant one arrived"""
+        relevant = False
+        while True:
+            try:
+                data = sock.recv(65536)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                break
+            if parse_uevent(data).get("SUBSYSTEM") in HOTPLUG_SUBSYSTEMS:
+                relevant = True
+        return relevant
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+BomberCat Compile Profiler
+Puts a timing shim in front of the toolchain's gcc/g++ (through
+compiler.path, like the ccache wrappers) that records wall and CPU time of
+every translation unit, then reports the slowest units and a rollup per
+library, core and sketch
+"""
+import os
+import sys
+import json
+import platform
+import tempfile
+from pathlib import Path
+
+from bombercat_ccache import compiler_wrapper_dir
+
+PROFILE_LOG_ENV = "BOMBERCAT_PROFILE_LOG"
+
+SOURCE_SUFFIXES = (".c", ".cpp", ".cc", ".cxx", ".S", ".s")
+
+# Compiler options whose value is the next argument
+VALUE_OPTIONS = ("-o", "-MF", "-MT", "-MQ", "-include", "-imacros", "-iprefix", "-isystem", "-x", "-I")
+
+# Runs the real compiler, then appends one JSON line to $BOMBERCAT_PROFILE_LOG.
+# -S skips site imports to keep the shim's own startup cost low
+SHIM = """#!{python} -S
+import os, sys, json, time, resource, subprocess
+start = time.monotonic()
+before = resource.getrusage(resource.RUSAGE_CHILDREN)
+code = subprocess.call([{real!r}] + sys.argv[1:])
+after = resource.getrusage(resource.RUSAGE_CHILDREN)
+log = os.environ.get("{env}")
+if log:
+    record = {{
+        "args": sys.argv[1:],
+        "tool": {tool!r},
+        "wall": time.monotonic() - start,
+        "cpu": (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime),
+        "exit": code
+    }}
+    with open(log, "a") as f:
+        f.write(json.dumps(record) + "\\n")
+sys.exit(code)
+"""
+
+
+def source_of(args):
+    """The translation unit of a compiler command line, None for link steps"""
+    if "-c" not in args:
+        return None
+    skip = False
+    source = None
+    for arg in args:
+        if skip:
+            skip = False
+            continue
+        if arg in VALUE_OPTIONS:
+            skip = True
+            continue
+        if not arg.startswith("-") and arg.endswith(SOURCE_SUFFIXES):
+            source = arg
+    return source
+
+
+def unit_group(source):
+    """Library, core or sketch a translation unit belongs to"""
+    if source is None:
+        return "link"
+    parts = source.replace("\\", "/").split("/")
+    if "libraries" in parts:
+        index = len(parts) - 1 - parts[::-1].index("libraries")
+        if index + 1 < len(parts) - 1:
+            return parts[index + 1]
+    if "cores" in parts or "variants" in parts or "hardware" in parts:
+        return "core"
+    if "sketch" in parts:
+        return "sketch"
+    return "other"
+
+
+def summarize(records, top_n=10):
+    """Slowest units and per-group totals from shim records"""
+    units = []
+    groups = {}
+    for record in records:
+        source = source_of(record.get("args", []))
+        group = unit_group(source)
+        unit = {
+            "source": source or "link",
+            "group": group,
+            "tool": record.get("tool"),
+            "wall": round(record.get("wall", 0.0), 3),
+            "cpu": round(record.get("cpu", 0.0), 3),
+            "exit": record.get("exit", 0)
+        }
+        units.append(unit)
+        totals = groups.setdefault(group, {"name": group, "units": 0, "wall": 0.0, "cpu": 0.0})
+        totals["units"] += 1
+        totals["wall"] += unit["wall"]
+        totals["cpu"] += unit["cpu"]
+
+    for totals in groups.values():
+        totals["wall"] = round(totals["wall"], 3)
+        totals["cpu"] = round(totals["cpu"], 3)
+
+    units.sort(key=lambda u: u["wall"], reverse=True)
+    return {
+        "units": len(units),
+        "wall": round(sum(u["wall"] for u in units), 3),
+        "cpu": round(sum(u["cpu"] for u in units), 3),
+        "slowest": units[:top_n],
+        "groups": sorted(groups.values(), key=lambda g: g["wall"], reverse=True)
+    }
+
+
+class ProfileSession:
+    """One compile run: environment to pass to arduino-cli and the resulting profile"""
+
+    def __init__(self, profiler, env=None):
+        self.profiler = profiler
+        fd, self.log = tempfile.mkstemp(prefix="bombercat-profile-", suffix=".jsonl")
+        os.close(fd)
+        self.env = dict(env or os.environ, **{PROFILE_LOG_ENV: self.log})
+
+    def close(self):
+        try:
+            os.unlink(self.log)
+        except OSError:
+            pass
+
+    def records(self):
+        records = []
+        try:
+            with open(self.log) as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except OSError:
+            pass
+        return records
+
+    def finish(self, elapsed, top_n=10):
+        """Return the profile of the compile and remove the log"""
+        try:
+            report = summarize(self.records(), top_n)
+        finally:
+            self.close()
+        report["elapsed"] = round(elapsed, 2)
+        return report
+
+
+class CompileProfiler:
+    """Timing shim directories for arduino-cli builds"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.shims = {}
+
+    @property
+    def available(self):
+        # The shims are scripts run through their shebang line
+        return platform.system() != "Windows"
+
+    def shim_dir(self, properties, compiler_dir=None):
+        """Create (once) a directory mirroring compiler_dir with gcc/g++ timed
+
+        compiler_dir defaults to the toolchain's compiler.path; pass the
+        ccache wrapper directory to time cached compiles.
+        """
+        return compiler_wrapper_dir(self.root, properties, self.shim_script, self.shims, compiler_dir)
+
+    def shim_script(self, real_compiler, cmd):
+        return SHIM.format(python=os.path.realpath(sys.executable), real=str(real_compiler),
+                           env=PROFILE_LOG_ENV, tool=cmd)
+
+    def build_properties(self, properties, compiler_dir=None):
+        """arduino-cli arguments routing compiles through the timing shims"""
+        shim = self.shim_dir(properties, compiler_dir)
+        if not shim:
+            return []
+        return ["--build-property", f"compiler.path={shim}"]
+
+    def session(self, env=None):
+        return ProfileSession(self, env)
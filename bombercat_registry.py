@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+BomberCat Board Registry
+Remembers every board flashed from this machine in a small SQLite database,
+keyed by USB serial number (or USB location for boards without one), so
+detection can show what a board runs and unchanged boards can skip a flash
+"""
+import time
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS boards (
+    board_key TEXT PRIMARY KEY,
+    serial_number TEXT,
+    location TEXT,
+    vid INTEGER,
+    pid INTEGER,
+    port TEXT,
+    fqbn TEXT,
+    firmware TEXT,
+    artifact_hash TEXT,
+    config_hash TEXT,
+    flashed_at REAL,
+    flash_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS boards_serial ON boards (serial_number);
+CREATE INDEX IF NOT EXISTS boards_location ON boards (location);
+"""
+
+
+def board_key(serial_number=None, location=None):
+    """Registry key of a board: its USB serial number, else its USB location"""
+    if serial_number:
+        return f"serial:{serial_number}"
+    if location:
+        return f"location:{location}"
+    return None
+
+
+def file_digest(path):
+    """sha256 hex digest of a file"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def text_digest(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def build_artifact(build_dir, sketch_name):
+    """The image the compile of sketch_name produced: its .bin, else its .uf2 or .elf"""
+    build_dir = Path(build_dir)
+    for suffix in (".bin", ".uf2", ".elf"):
+        if (build_dir / f"{sketch_name}.ino{suffix}").exists():
+            return build_dir / f"{sketch_name}.ino{suffix}"
+    return None
+
+
+class BoardRegistry:
+    """SQLite table of boards and what was last flashed onto them"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        with self.lock, self.db:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.executescript(SCHEMA)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def lookup(self, serial_number=None, location=None):
+        """Record of a board by serial number, falling back to its USB location"""
+        with self.lock:
+            row = None
+            if serial_number:
+                row = self.db.execute("SELECT * FROM boards WHERE serial_number = ?", (serial_number,)).fetchone()
+            elif location:
+                # A location only identifies boards that have no serial number
+                row = self.db.execute("SELECT * FROM boards WHERE location = ? AND serial_number IS NULL",
+                                      (location,)).fetchone()
+        return dict(row) if row else None
+
+    def record_flash(self, serial_number=None, location=None, vid=None, pid=None, port=None, fqbn=None,
+                     firmware=None, artifact_hash=None, config_hash=None, flashed_at=None):
+        """Store what was just flashed onto a board; returns its key, None for unidentifiable boards"""
+        key = board_key(serial_number, location)
+        if key is None:
+            return None
+        values = (key, serial_number or None, location, vid, pid, port, fqbn, firmware,
+                  artifact_hash, config_hash, flashed_at or time.time())
+        with self.lock, self.db:
+            self.db.execute("""
+                INSERT INTO boards (board_key, serial_number, location, vid, pid, port, fqbn, firmware,
+                                    artifact_hash, config_hash, flashed_at, flash_count)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
+                ON CONFLICT (board_key) DO UPDATE SET
+                    location = excluded.location, vid = excluded.vid, pid = excluded.pid,
+                    port = excluded.port, fqbn = excluded.fqbn, firmware = excluded.firmware,
+                    artifact_hash = excluded.artifact_hash, config_hash = excluded.config_hash,
+                    flashed_at = excluded.flashed_at, flash_count = flash_count + 1
+            """, values)
+        return key
+
+    def is_up_to_date(self, record, fqbn, firmware, artifact_hash, config_hash):
+        """True when record says the board already runs exactly this build"""
+        return bool(record and artifact_hash and record["artifact_hash"] == artifact_hash
+                    and record["config_hash"] == config_hash and record["fqbn"] == fqbn
+                    and record["firmware"] == firmware)
+
+    def enrich(self, port_info):
+        """Add the registry record ("registry", None when unknown) to a port description"""
+        record = self.lookup(port_info.get("serial_number"), port_info.get("location"))
+        port_info["registry"] = record
+        return port_info
+
+    def boards(self):
+        with self.lock:
+            rows = self.db.execute("SELECT * FROM boards ORDER BY flashed_at DESC").fetchall()
+        return [dict(row) for row in rows]
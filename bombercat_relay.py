@@ -11,19 +11,18 @@ import time
 import shutil
 import platform
 import subprocess
-import tempfile
-import zipfile
-import requests
 import threading
 import re
 import string
 from pathlib import Path
+from collections import deque
+from urllib.parse import urlparse
 from dataclasses import dataclass, field
 from typing import Optional, Dict, Any, List
-from flask import Flask, render_template, jsonify, request
-from flask_socketio import SocketIO, emit
-import serial
-import serial.tools.list_ports
+from bombercat_ports import PortInventory
+from bombercat_clijson import CliCache
+from bombercat_bootloader_detector import copy_uf2_to_drive
+from bombercat_workspace import WorkspaceStore, replace_file
 
 # Configuration
 @dataclass
@@ -127,30 +126,162 @@ class Config:
     flask_port: int = 8081
     flask_debug: bool = False
 
-config = Config()
+    # Socket.IO async mode: "eventlet", "gevent" or "threading" (empty means threading; a
+    # green mode needs the monkey patching done by main()) and how many blocking calls
+    # handlers may run at once
+    async_mode: str = ""
+    blocking_workers: int = 4
+
+    # Port inventory fallback poll interval (seconds), hot-plug events refresh immediately
+    port_poll_interval: float = 5.0
+
+    # Local package mirror (empty mirror_dir disables it). With mirror_url empty the
+    # mirror is served from a local HTTP server on mirror_port, otherwise mirror_url
+    # points at a LAN server running "bombercat_mirror.py serve". Only board_urls
+    # indexes are mirrored: arduino-cli's primary package_index.json and builtin
+    # tools still come from downloads.arduino.cc, once per machine
+    mirror_dir: str = ""
+    mirror_url: str = ""
+    mirror_port: int = 8765
+    mirror_platforms: List[str] = field(default_factory=lambda: [
+        "rp2040:rp2040",
+        "electroniccats:rp2040"
+    ])
 
-# Load additional libraries to skip from skip_problematic_libs.txt
-config.load_skip_libraries()
+    # Missing libraries and their dependencies are downloaded this many at a time into
+    # library_staging_dir (empty means ~/.cache/bombercat/libraries); 0 installs them
+    # one by one by name
+    library_download_workers: int = 4
+    library_staging_dir: str = ""
+
+    # Downloads (CLI, indexes, mirror, libraries, firmware) share one pooled HTTP
+    # session. Connection errors, timeouts and 429/5xx are retried http_retries times
+    # with jittered exponential backoff from http_backoff seconds, interrupted
+    # transfers resume with a Range request, and at most http_per_host requests run
+    # against one host at a time
+    http_connect_timeout: float = 10
+    http_read_timeout: float = 60
+    http_retries: int = 4
+    http_backoff: float = 0.5
+    http_per_host: int = 4
+
+    # Parsed `core list`/`lib list` results are reused for cli_cache_ttl seconds unless
+    # an install or index update invalidates them; `board list` for board_list_ttl
+    cli_cache_ttl: float = 300
+    board_list_ttl: float = 2.0
+
+    # Package indexes younger than this (seconds) are not refreshed on initialize
+    index_ttl: float = 6 * 3600
+
+    # Compiler cache: gcc/g++ run through ccache when it is installed (POSIX only).
+    # Empty ccache_dir means ~/.cache/bombercat/ccache
+    use_ccache: bool = True
+    ccache_path: str = ""
+    ccache_dir: str = ""
+    ccache_max_size: str = "5G"
+
+    # A fetched firmware archive is reused by flashes for this long (seconds)
+    firmware_ttl: float = 3600
+
+    # Background warm-up at server start: check the CLI and refresh stale indexes,
+    # prefetch the firmware, build the catalog and precompile the core for arduino_fqbn
+    warmup: bool = True
+
+    # Shared build cache: core archives per (FQBN, core version) and per-sketch build
+    # directories, evicted least recently used first above the size cap.
+    # Empty build_cache_dir means ~/.cache/bombercat/build; disabled, build_dir is used
+    use_build_cache: bool = True
+    build_cache_dir: str = ""
+    build_cache_max_size: int = 4 * 1024 ** 3
+
+    # Compiler diagnostics: unique gcc/ld diagnostics kept per command (duplicates
+    # are counted) and how many stderr/stdout lines are kept for failure checks and
+    # the compile summary (queries with log_output=False keep their whole stdout)
+    max_diagnostics: int = 200
+    stderr_tail_lines: int = 200
+    stdout_tail_lines: int = 200
+
+    # Firmware size analysis after each compile. The limits arduino-cli reports win
+    # over these defaults; empty size_history_path means ~/.cache/bombercat/size_history.jsonl
+    flash_size: int = 2 * 1024 * 1024
+    ram_size: int = 256 * 1024
+    size_top_symbols: int = 20
+    size_history_path: str = ""
+
+    # Registry of flashed boards keyed by USB serial number (or USB location), used to
+    # enrich detection and to skip flashing boards that already run the same build.
+    # Empty board_registry_path means ~/.cache/bombercat/boards.sqlite3
+    use_board_registry: bool = True
+    board_registry_path: str = ""
+
+    # History of provisioning runs with per-stage durations, served as p50/p95/p99 by
+    # /api/runs/stats. Empty run_history_path means ~/.cache/bombercat/runs.sqlite3
+    use_run_history: bool = True
+    run_history_path: str = ""
+
+    # Cancelling a job (POST /api/jobs/<id>/cancel) sends SIGTERM to the process groups
+    # it runs and SIGKILL after job_kill_grace seconds; the request waits up to
+    # job_cancel_wait seconds for the job to release its workspace and locks
+    job_kill_grace: float = 2.0
+    job_cancel_wait: float = 5.0
+
+    # arduino-cli subcommands time out after the p99 of their recorded durations times
+    # command_timeout_factor (never below the floors in bombercat_timeouts), with fixed
+    # defaults until command_timeout_min_samples runs are recorded. Subcommands in
+    # stall_timeouts are killed after printing nothing for that long; a timed-out or
+    # stalled subcommand is retried command_retries times before the job fails
+    use_command_timeouts: bool = True
+    command_timeout_factor: float = 3.0
+    command_timeout_min_samples: int = 20
+    stall_timeouts: Dict[str, float] = field(default_factory=lambda: {"upload": 60})
+    command_retries: Dict[str, int] = field(default_factory=lambda: {
+        "upload": 1,
+        "core update-index": 1,
+        "lib update-index": 1
+    })
 
-# Create Flask app with SocketIO
-app = Flask(__name__, template_folder='templates')
-app.config['SECRET_KEY'] = 'bombercat-secret-key'
-socketio = SocketIO(app, cors_allowed_origins="*", ping_timeout=120, ping_interval=25)
-
-# Global state for installation progress
-installation_state = {
-    "in_progress": False,
-    "completed": False,
-    "error": False,
-    "message": ""
-}
+    # Serial monitor shared by Socket.IO clients: one reader for every open port, the
+    # last monitor_buffer_size bytes kept per port, and at most monitor_window bytes sent
+    # to a client before it acknowledges them (slower clients skip ahead)
+    monitor_baudrate: int = 115200
+    monitor_buffer_size: int = 64 * 1024
+    monitor_window: int = 16 * 1024
+    monitor_flush_interval: float = 0.05
+
+    # Per translation unit compile timing through a shim in front of gcc/g++ (POSIX
+    # only). Off by default since the shim adds a short-lived process per unit
+    profile_compile: bool = False
+    profile_top_units: int = 20
+
+# Shared configuration and default web application, both created on first use
+_config = None
+_app = None
+
+def get_config():
+    """Return the shared configuration, loading skip_problematic_libs.txt on first use"""
+    global _config
+    if _config is None:
+        _config = Config()
+        # Load additional libraries to skip from skip_problematic_libs.txt
+        _config.load_skip_libraries()
+    return _config
 
 # Arduino CLI Manager
 class ArduinoCLI:
-    def __init__(self, socketio):
+    def __init__(self, socketio, cfg=None):
         self.socketio = socketio
+        self.config = cfg or get_config()
         self.cli_path = None
         self.initialized = False
+        self.init_lock = threading.Lock()
+        self.mirror = None
+        self.last_diagnostics = None
+        self.library_fetch_report = None
+        self.downloader = None
+        self.run_history = None
+        self.command_timeouts = None
+        self.cli_cache = CliCache(self.query_output, self.config.cli_cache_ttl,
+                                  {"board list": self.config.board_list_ttl, "version": 24 * 3600})
 
     def emit_log(self, message, level="info"):
         """Emit log message to web interface"""
@@ -171,6 +302,63 @@ class ArduinoCLI:
         except Exception as e:
             print(f"Error emitting progress: {e}")
 
+    def get_run_history(self):
+        """Run and command history shared by the firmware manager and the command timeouts"""
+        if not self.config.use_run_history:
+            return None
+        if self.run_history is None:
+            from bombercat_history import RunHistory
+            path = self.config.run_history_path or Path.home() / ".cache" / "bombercat" / "runs.sqlite3"
+            self.run_history = RunHistory(path)
+        return self.run_history
+
+    def command_durations(self, key):
+        history = self.get_run_history()
+        return history.command_durations(key) if history else []
+
+    def get_command_timeouts(self):
+        if self.command_timeouts is None:
+            from bombercat_timeouts import CommandTimeouts
+            self.command_timeouts = CommandTimeouts(
+                self.command_durations if self.config.use_run_history else None,
+                factor=self.config.command_timeout_factor,
+                min_samples=self.config.command_timeout_min_samples,
+                stall_timeouts=self.config.stall_timeouts,
+                retries=self.config.command_retries)
+        return self.command_timeouts
+
+    def command_limits(self, args, key=None):
+        """Timeout, stall limit and retries for an arduino-cli argument list, or for key"""
+        from bombercat_timeouts import Limits, command_key
+        if not self.config.use_command_timeouts:
+            return Limits(key or command_key(args))
+        return self.get_command_timeouts().limits(args, key)
+
+    def record_command(self, key, started_at, outcome="ok"):
+        """Add a command's duration to the history its timeout is derived from"""
+        from bombercat_timeouts import LIMITS
+        if key not in LIMITS or not LIMITS[key].adaptive:
+            return
+        try:
+            history = self.get_run_history()
+            if history:
+                history.record_command(key, started_at, time.time() - started_at, outcome)
+        except Exception as e:
+            print(f"Could not record {key} duration: {e}")
+
+    def get_downloader(self):
+        """Pooled HTTP client shared by every download of this app"""
+        if self.downloader is None:
+            from bombercat_http import Downloader
+            self.downloader = Downloader(
+                connect_timeout=self.config.http_connect_timeout,
+                read_timeout=self.config.http_read_timeout,
+                retries=self.config.http_retries,
+                backoff=self.config.http_backoff,
+                per_host=self.config.http_per_host,
+                on_retry=lambda message: self.emit_log(message, "warning"))
+        return self.downloader
+
     def get_platform_info(self):
         """Get platform-specific Arduino CLI download info"""
         system = platform.system().lower()
@@ -200,34 +388,31 @@ class ArduinoCLI:
 
         # Download URL
         base_url = "https://downloads.arduino.cc/arduino-cli"
-        filename = f"arduino-cli_{config.arduino_cli_version}_{platform_name}{ext}"
+        filename = f"arduino-cli_{self.config.arduino_cli_version}_{platform_name}{ext}"
         url = f"{base_url}/{filename}"
 
-        # Download file
-        response = requests.get(url, stream=True)
-        response.raise_for_status()
-
         tools_dir = Path("tools")
         tools_dir.mkdir(exist_ok=True)
 
         archive_path = tools_dir / filename
 
-        # Save archive
-        total_size = int(response.headers.get('content-length', 0))
-        downloaded = 0
+        # Download file, broadcasting only when the 5-15 progress step changes
+        last_progress = [None]
 
-        with open(archive_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-                downloaded += len(chunk)
-                if total_size:
-                    progress = 5 + int((downloaded / total_size) * 10)
+        def report(downloaded, total_size):
+            if total_size:
+                progress = 5 + int((downloaded / total_size) * 10)
+                if progress != last_progress[0]:
+                    last_progress[0] = progress
                     self.emit_progress(progress)
 
+        self.get_downloader().download(url, archive_path, progress=report)
+
         # Extract archive
         self.emit_log("Extracting Arduino CLI...")
 
         if ext == ".zip":
+            import zipfile
             with zipfile.ZipFile(archive_path, 'r') as zip_ref:
                 zip_ref.extractall(tools_dir)
         else:  # tar.gz
@@ -250,41 +435,160 @@ class ArduinoCLI:
 
         return True
 
+    def emit_event(self, event, data):
+        """Emit a structured event to web interface"""
+        try:
+            self.socketio.emit(event, data, room=None)
+        except Exception as e:
+            print(f"Error emitting {event}: {e}")
+
     def run_command(self, *args, **kwargs):
-        """Run Arduino CLI command"""
+        """Run Arduino CLI command
+
+        Output is read line by line as it arrives. gcc/ld diagnostics are
+        parsed into records, errors are reported the moment they appear and
+        a deduplicated summary, errors first, follows when the command ends.
+        log_output=False keeps stdout (e.g. JSON documents) out of the log
+        and returns all of it; otherwise only its last lines are kept.
+        The CLI runs in its own process group, attached to the calling job
+        so cancelling the job kills it with everything it spawned.
+
+        Without an explicit timeout the subcommand's limits apply: a total
+        timeout from its recorded durations and, for upload, a watchdog on
+        output stalls. A command that hits one is killed and retried as
+        configured, then fails with a CommandTimeout saying why.
+        limit_key picks the limits and history to use instead of the
+        subcommand's own (e.g. "compile cold"); record=False keeps the run
+        out of the durations those limits come from.
+        """
+        from dataclasses import replace
+        from bombercat_timeouts import CommandTimeout
+
+        record = kwargs.pop("record", True)
         args = [str(arg) for arg in args if arg is not None]
+        limits = self.command_limits(args, kwargs.pop("limit_key", None))
+        if "timeout" in kwargs:
+            limits = replace(limits, timeout=kwargs.pop("timeout"), retries=0, basis="explicit")
+
+        attempts = limits.retries + 1
+        for attempt in range(1, attempts + 1):
+            started_at = time.time()
+            try:
+                result = self.run_attempt(args, limits, **kwargs)
+            except CommandTimeout as e:
+                if record:
+                    self.record_command(limits.key, started_at, "stalled" if e.stalled else "timeout")
+                if attempt < attempts:
+                    self.emit_log(f"{e}; retrying ({attempt}/{limits.retries})", "warning")
+                    continue
+                if attempts > 1:
+                    e.reason += f" (gave up after {attempts} attempts)"
+                self.emit_log(f"Command error: {e}", "error")
+                raise
+            if result.returncode == 0 and record:
+                self.record_command(limits.key, started_at)
+            return result
+
+    def run_attempt(self, args, limits, log_output=True, **kwargs):
+        """Run one arduino-cli process for run_command under the given limits"""
+        from bombercat_diagnostics import DiagnosticsParser
+        from bombercat_jobs import JobCancelled, current_job, kill_process_tree, process_group_kwargs
+        from bombercat_timeouts import CommandTimeout, wait_for
+
         cmd = [self.cli_path] + args
 
         self.emit_log(f"Running: {' '.join(cmd)}", "info")
 
+        is_board_list = "board" in args and "list" in args
+        max_lines = 10 if is_board_list else 100
+        parser = DiagnosticsParser(self.config.max_diagnostics)
+        if args[0] == "compile" and log_output:
+            # /api/diagnostics shows the last build, not whatever query ran after it
+            self.last_diagnostics = parser
+        lock = threading.Lock()
+        # Queries parse their whole stdout; for everything else the tail is enough
+        stdout_lines = deque(maxlen=None if not log_output else self.config.stdout_tail_lines)
+        stderr_tail = deque(maxlen=self.config.stderr_tail_lines)
+        line_counts = {"stdout": 0, "stderr": 0}
+        last_output = [time.monotonic()]
+
+        def handle_line(stream, line):
+            with lock:
+                line_counts[stream] += 1
+                shown = line_counts[stream] <= max_lines
+                diagnostic = parser.feed(line)
+            if diagnostic is not None:
+                self.emit_event('compile_diagnostic', diagnostic.to_dict())
+                if diagnostic.is_error:
+                    self.emit_log(diagnostic.format(), "error")
+                    return
+            if shown and line.strip() and (log_output or stream == "stderr"):
+                self.emit_log(line.rstrip("\r\n"), "info" if stream == "stdout" else "warning")
+
+        def read_stream(pipe, stream, keep):
+            for line in pipe:
+                last_output[0] = time.monotonic()
+                keep.append(line)
+                handle_line(stream, line)
+
+        job = current_job()
+        if job is not None:
+            job.checkpoint()
+        for key, value in process_group_kwargs().items():
+            kwargs.setdefault(key, value)
+
         try:
-            result = subprocess.run(
+            process = subprocess.Popen(
                 cmd,
-                capture_output=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
                 text=True,
+                errors="replace",
                 **kwargs
             )
-
-            is_board_list = "board" in args and "list" in args
-            max_lines = 10 if is_board_list else 100
-
-            if result.stdout:
-                lines = result.stdout.strip().split('\n')
-                for i, line in enumerate(lines):
-                    if i >= max_lines:
-                        self.emit_log(f"... (truncated {len(lines) - max_lines} more lines)", "info")
-                        break
-                    if line:
-                        self.emit_log(line, "info")
-
-            if result.stderr:
-                lines = result.stderr.strip().split('\n')
-                for i, line in enumerate(lines):
-                    if i >= max_lines:
-                        self.emit_log(f"... (truncated {len(lines) - max_lines} more lines)", "warning")
-                        break
-                    if line:
-                        self.emit_log(line, "warning")
+            if job is not None:
+                job.attach(process)
+            readers = [
+                threading.Thread(target=read_stream, args=(process.stdout, "stdout", stdout_lines), daemon=True),
+                threading.Thread(target=read_stream, args=(process.stderr, "stderr", stderr_tail), daemon=True)
+            ]
+            for reader in readers:
+                reader.start()
+            try:
+                wait_for(process, limits, lambda: last_output[0])
+            except BaseException:
+                # Timeout, stall or Ctrl-C: the group does not get the terminal's signals
+                kill_process_tree(process, self.config.job_kill_grace)
+                raise
+            finally:
+                for reader in readers:
+                    reader.join()
+                process.stdout.close()
+                process.stderr.close()
+                if job is not None:
+                    job.detach(process)
+                self.cli_cache.command_ran(args)
+
+            if job is not None and job.cancelled:
+                self.emit_log(f"Cancelled: {' '.join(cmd)}", "warning")
+                raise JobCancelled(f"{job.kind} job {job.id} was cancelled")
+
+            for stream, level in (("stdout", "info"), ("stderr", "warning")):
+                if line_counts[stream] > max_lines and (log_output or stream == "stderr"):
+                    self.emit_log(f"... (truncated {line_counts[stream] - max_lines} more lines)", level)
+
+            summary = parser.summary()
+            if parser.records:
+                self.emit_event('compile_diagnostics', {
+                    "summary": summary,
+                    "diagnostics": [d.to_dict() for d in parser.diagnostics()]
+                })
+                self.emit_log(f"Diagnostics: {summary['errors']} errors, {summary['warnings']} warnings "
+                              f"({summary['unique']} unique)",
+                              "error" if summary["errors"] else "warning")
+
+            result = subprocess.CompletedProcess(cmd, process.returncode, "".join(stdout_lines),
+                                                 "".join(stderr_tail))
 
             if result.returncode != 0:
                 if "config init" in ' '.join(args) and "already exists" in result.stderr:
@@ -295,60 +599,242 @@ class ArduinoCLI:
                     return result
                 else:
                     error_msg = f"Command failed with code {result.returncode}"
-                    if result.stderr:
-                        error_msg += f": {result.stderr.strip()[:200]}"
+                    first_error = parser.first_error()
+                    if first_error:
+                        error_msg += f": {first_error.format()}"
+                        if summary["errors"] > 1:
+                            error_msg += f" (+{summary['errors'] - 1} more errors)"
+                    elif result.stderr:
+                        error_msg += f": {result.stderr.strip()[-200:]}"
                     raise Exception(error_msg)
 
             return result
 
+        except CommandTimeout:
+            raise
         except Exception as e:
             self.emit_log(f"Command error: {str(e)}", "error")
             raise
 
+    def query_output(self, *args):
+        """stdout of a read-only CLI query, kept out of the log"""
+        return self.run_command(*args, log_output=False).stdout
+
+    def installed_cores(self):
+        """Platforms from `core list --format json`, cached"""
+        return self.cli_cache.get("core list", self.cli_path)
+
+    def installed_libraries(self):
+        """Libraries from `lib list --format json`, cached"""
+        return self.cli_cache.get("lib list", self.cli_path)
+
+    def board_list(self):
+        """Detected ports from `board list --format json`, cached briefly"""
+        return self.cli_cache.get("board list", self.cli_path)
+
+    def cli_version(self):
+        """Version of the arduino-cli in use, None when it cannot be asked (e.g. in a cancelled job)"""
+        from bombercat_jobs import JobCancelled
+        if not self.cli_path:
+            return None
+        try:
+            return self.cli_cache.get("version", self.cli_path) or None
+        except (Exception, JobCancelled):
+            return None
+
+    def core_installed(self, core_name):
+        return any(core.id == core_name and core.installed for core in self.installed_cores())
+
+    def find_cli(self):
+        """Locate an Arduino CLI installed by a previous run"""
+        _, exe_name, _ = self.get_platform_info()
+        local_cli = Path("tools") / exe_name
+        if local_cli.exists():
+            return str(local_cli)
+        return shutil.which("arduino-cli")
+
     def initialize(self):
-        """Initialize Arduino CLI"""
+        """Initialize Arduino CLI
+
+        Warm-up and an install may call this at the same time; the lock makes
+        the second caller wait for the first instead of binding the mirror
+        port and updating the index again.
+        """
         if self.initialized:
             return True
 
-        self.emit_log("Initializing Arduino CLI...")
+        with self.init_lock:
+            if self.initialized:
+                return True
+
+            self.emit_log("Initializing Arduino CLI...")
+
+            # Check if Arduino CLI exists
+            if not self.cli_path or not os.path.exists(self.cli_path):
+                self.cli_path = self.find_cli()
+            if not self.cli_path:
+                self.download_arduino_cli()
+
+            # Create Arduino CLI config directory
+            home_dir = Path.home()
+            arduino_dir = home_dir / ".arduino15"
+            arduino_dir.mkdir(exist_ok=True)
+
+            board_urls = self.config.board_urls
+            if self.config.mirror_dir:
+                board_urls = self.setup_mirror()
+
+            # Initialize configuration with all board manager URLs in a single write
+            config_file = arduino_dir / "arduino-cli.yaml"
+            if not config_file.exists():
+                try:
+                    self.run_command("config", "init", "--additional-urls", ",".join(board_urls))
+                except Exception as e:
+                    self.emit_log(f"Config init warning: {e}", "warning")
+            else:
+                config_text = config_file.read_text(errors="ignore")
+                if all(url in config_text for url in board_urls):
+                    self.emit_log("Arduino CLI config already up to date", "info")
+                else:
+                    try:
+                        self.run_command("config", "set", "board_manager.additional_urls", *board_urls)
+                    except Exception as e:
+                        self.emit_log(f"Board URL configuration error: {e}", "warning")
+
+            if self.mirror:
+                # Mirrored libraries are installed from their zip files
+                try:
+                    self.enable_zip_installs()
+                except Exception as e:
+                    self.emit_log(f"Could not enable zip library installs: {e}", "warning")
+
+            # Update core index only when an index is missing, older than the TTL or changed upstream
+            self.emit_log("Updating board definitions...")
+            self.emit_progress(20)
+            self.update_index_if_stale(board_urls, arduino_dir)
 
-        # Check if Arduino CLI exists
-        if not self.cli_path or not os.path.exists(self.cli_path):
-            self.download_arduino_cli()
+            self.initialized = True
+            return True
 
-        # Create Arduino CLI config directory
-        home_dir = Path.home()
-        arduino_dir = home_dir / ".arduino15"
-        arduino_dir.mkdir(exist_ok=True)
+    def index_file(self, url, arduino_dir):
+        """Local path arduino-cli stores a package index under"""
+        return arduino_dir / Path(urlparse(url).path).name
 
-        # Initialize configuration
-        config_file = arduino_dir / "arduino-cli.yaml"
-        if not config_file.exists():
+    def load_index_state(self, arduino_dir):
+        """Load fetch times and ETags of the package indexes"""
+        state_file = arduino_dir / "bombercat_index_state.json"
+        if state_file.exists():
             try:
-                self.run_command("config", "init")
-            except Exception as e:
-                self.emit_log(f"Config init warning: {e}", "warning")
-        else:
-            self.emit_log("Arduino CLI config already exists", "info")
+                with open(state_file, 'r') as f:
+                    return json.load(f)
+            except Exception:
+                pass
+        return {}
+
+    def save_index_state(self, arduino_dir, state):
+        """Persist fetch times and ETags of the package indexes"""
+        state_file = arduino_dir / "bombercat_index_state.json"
+        with open(state_file, 'w') as f:
+            json.dump(state, f, indent=2)
+
+    def index_changed(self, url, entry):
+        """Ask the server whether an index changed since it was last fetched"""
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = self.get_downloader().head(url, headers=headers, timeout=(5, 10))
+        if response.status_code == 304:
+            return False, entry
+        response.raise_for_status()
+
+        new_entry = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified")
+        }
+        if entry.get("etag") and new_entry["etag"] == entry["etag"]:
+            return False, entry
+        return True, new_entry
+
+    def update_index_if_stale(self, board_urls, arduino_dir):
+        """Run core update-index unless every index is younger than Config.index_ttl"""
+        state = self.load_index_state(arduino_dir)
+        now = time.time()
+
+        urls = [url for url in board_urls if not url.startswith("file://")]
+        missing = [url for url in urls if not self.index_file(url, arduino_dir).exists()]
+        if not (arduino_dir / "package_index.json").exists():
+            missing.append("package_index.json")
 
-        # Add board manager URLs
-        for url in config.board_urls:
+        expired = [url for url in urls if url not in missing
+                   and now - state.get(url, {}).get("fetched_at", 0) > self.config.index_ttl]
+
+        if not missing and not expired:
+            self.emit_log("Board indexes are fresh, skipping update", "info")
+            return False
+
+        changed = list(missing)
+        for url in expired:
             try:
-                self.run_command("config", "add", "board_manager.additional_urls", url)
+                is_changed, entry = self.index_changed(url, state.get(url, {}))
             except Exception as e:
-                self.emit_log(f"Board URL already added or error: {e}", "warning")
+                self.emit_log(f"Could not check {url} for changes: {e}", "warning")
+                continue
+            entry["fetched_at"] = now
+            state[url] = entry
+            if is_changed:
+                changed.append(url)
+
+        if not changed:
+            self.emit_log("Board indexes unchanged upstream, skipping update", "info")
+            self.save_index_state(arduino_dir, state)
+            return False
 
-        # Update core index
-        self.emit_log("Updating board definitions...")
-        self.emit_progress(20)
         try:
             self.run_command("core", "update-index")
         except Exception as e:
             self.emit_log(f"Core update warning: {e}", "warning")
-
-        self.initialized = True
+            if self.mirror and "package_index.json" in missing:
+                self.emit_log("The package mirror does not hold arduino-cli's primary package_index.json "
+                              "or builtin tools; this machine must reach downloads.arduino.cc once", "warning")
+            return False
+
+        for url in urls:
+            entry = state.setdefault(url, {})
+            if url in missing:
+                try:
+                    _, fresh = self.index_changed(url, {})
+                    entry.update(fresh)
+                except Exception:
+                    pass
+            entry["fetched_at"] = now
+        self.save_index_state(arduino_dir, state)
         return True
 
+    def setup_mirror(self):
+        """Point arduino-cli at the local package mirror and return its index URLs"""
+        from bombercat_mirror import PackageMirror
+        if self.mirror is not None:
+            # Already serving from an earlier, failed initialize()
+            return self.mirror.index_urls()
+        self.mirror = PackageMirror(self.config.mirror_dir, base_url=self.config.mirror_url or None,
+                                    emit_log=self.emit_log, downloader=self.get_downloader())
+
+        if not self.mirror.manifest():
+            self.emit_log("Package mirror is empty, syncing it once from upstream...", "info")
+            libraries = list(self.config.required_libraries)
+            for alternatives in self.config.library_alternatives.values():
+                libraries.extend(alternatives)
+            self.mirror.sync(self.config.board_urls, self.config.mirror_platforms, libraries)
+
+        if not self.config.mirror_url:
+            self.mirror.serve("127.0.0.1", self.config.mirror_port)
+        self.emit_log(f"Using package mirror at {self.mirror.base_url}", "info")
+
+        return self.mirror.index_urls()
+
     def install_core(self, core_name="rp2040:rp2040"):
         """Install board core"""
         self.emit_log(f"Installing {core_name} core...")
@@ -356,8 +842,7 @@ class ArduinoCLI:
 
         try:
             # Check if already installed
-            result = self.run_command("core", "list")
-            if core_name in result.stdout:
+            if self.core_installed(core_name):
                 self.emit_log(f"{core_name} core already installed", "success")
                 self.emit_progress(35)
                 return
@@ -379,51 +864,79 @@ class ArduinoCLI:
         self.emit_log("Installing required libraries...")
         self.emit_progress(40)
 
-        total_libs = len(config.required_libraries)
+        total_libs = len(self.config.required_libraries)
         installed_count = 0
         failed_libs = []
 
-        for i, lib in enumerate(config.required_libraries):
-            self.emit_log(f"Installing library: {lib}")
-
-            installed = False
-
-            # Check if already installed
-            try:
-                result = self.run_command("lib", "list")
-                if any(lib_part in result.stdout for lib_part in lib.split()):
-                    self.emit_log(f"{lib} already installed", "info")
-                    installed = True
-                    installed_count += 1
-            except:
-                pass
+        # One listing serves every "already installed" check
+        try:
+            installed = {library.name.lower() for library in self.installed_libraries()}
+        except Exception as e:
+            self.emit_log(f"Could not list installed libraries: {e}", "warning")
+            installed = set()
+
+        pending = []
+        for lib in self.config.required_libraries:
+            names = [lib] + list(self.config.library_alternatives.get(lib, []))
+            if any(name.lower() in installed for name in names):
+                self.emit_log(f"{lib} already installed", "info")
+                installed_count += 1
+            else:
+                pending.append(lib)
 
-            if not installed:
-                # Try primary name
+        if pending and self.mirror:
+            for lib in list(pending):
+                archives = self.mirror.library_archives(lib)
+                if not archives:
+                    continue
                 try:
-                    self.run_command("lib", "install", lib)
-                    self.emit_log(f"{lib} installed", "success")
-                    installed = True
+                    for archive in archives:
+                        self.run_command("lib", "install", "--zip-path", str(archive))
+                    self.emit_log(f"{lib} installed from mirror", "success")
                     installed_count += 1
+                    pending.remove(lib)
                 except Exception as e:
-                    # Try alternative names
-                    if lib in config.library_alternatives:
-                        for alt_name in config.library_alternatives[lib]:
-                            try:
-                                self.emit_log(f"Trying alternative: {alt_name}")
-                                self.run_command("lib", "install", alt_name)
-                                self.emit_log(f"{lib} installed as {alt_name}", "success")
-                                installed = True
-                                installed_count += 1
-                                break
-                            except:
-                                continue
+                    self.emit_log(f"Mirror install of {lib} failed: {e}", "warning")
 
-                    if not installed:
-                        self.emit_log(f"Warning: Failed to install {lib}: {e}", "warning")
-                        failed_libs.append(lib)
+        if pending and self.config.library_download_workers > 0:
+            try:
+                staged = self.install_staged_libraries(pending, installed)
+            except Exception as e:
+                self.emit_log(f"Concurrent library download unavailable: {e}", "warning")
+                staged = set()
+            installed_count += len(staged)
+            pending = [lib for lib in pending if lib not in staged]
+            self.emit_progress(45)
 
-            progress = 40 + int((i + 1) / total_libs * 10)
+        for i, lib in enumerate(pending):
+            self.emit_log(f"Installing library: {lib}")
+            installed = False
+
+            # Try primary name
+            try:
+                self.run_command("lib", "install", lib)
+                self.emit_log(f"{lib} installed", "success")
+                installed = True
+                installed_count += 1
+            except Exception as e:
+                # Try alternative names
+                if lib in self.config.library_alternatives:
+                    for alt_name in self.config.library_alternatives[lib]:
+                        try:
+                            self.emit_log(f"Trying alternative: {alt_name}")
+                            self.run_command("lib", "install", alt_name)
+                            self.emit_log(f"{lib} installed as {alt_name}", "success")
+                            installed = True
+                            installed_count += 1
+                            break
+                        except:
+                            continue
+
+                if not installed:
+                    self.emit_log(f"Warning: Failed to install {lib}: {e}", "warning")
+                    failed_libs.append(lib)
+
+            progress = 45 + int((i + 1) / len(pending) * 5)
             self.emit_progress(progress)
 
         if failed_libs:
@@ -434,40 +947,93 @@ class ArduinoCLI:
 
         self.emit_progress(50)
 
+    def library_index_path(self):
+        """arduino-cli's library index, fetched with lib update-index when missing"""
+        index = Path.home() / ".arduino15" / "library_index.json"
+        if not index.exists():
+            self.run_command("lib", "update-index")
+        if not index.exists():
+            raise Exception("library index not found")
+        return index
+
+    def install_staged_libraries(self, libraries, installed=()):
+        """Download libraries and dependencies concurrently, then install the zips in dependency order
+
+        Returns the requested names that were installed; the rest are left
+        to the per-library `lib install` path. installed holds the lowercase
+        names of libraries already present.
+        """
+        from bombercat_libfetch import LibraryFetcher, install_order, load_library_index, resolve_releases
+
+        latest = load_library_index(self.library_index_path())
+        resolved, releases, unknown = resolve_releases(
+            latest, libraries, self.config.library_alternatives,
+            installed=lambda name: name.lower() in installed
+        )
+        if unknown:
+            self.emit_log(f"Not in the library index: {', '.join(unknown)}", "warning")
+        if not releases:
+            return set()
+
+        staging_dir = self.config.library_staging_dir or Path.home() / ".cache" / "bombercat" / "libraries"
+        fetcher = LibraryFetcher(staging_dir, self.config.library_download_workers, self.emit_log,
+                                 downloader=self.get_downloader())
+        self.emit_log(f"Downloading {len(releases)} library archives with "
+                      f"{fetcher.max_workers} parallel downloads...")
+        report = fetcher.fetch(releases.values())
+        self.library_fetch_report = report
+        self.emit_log(f"Fetched {report['downloaded']} archives ({report['bytes'] / (1024 * 1024):.1f} MB, "
+                      f"{report['cached']} already staged) in {report['wall']:.1f}s "
+                      f"with {report['workers']} parallel downloads", "info")
+
+        self.enable_zip_installs()
+        results = report["results"]
+        failed = set()
+        for name in install_order(releases):
+            deps = [dep["name"] for dep in releases[name].get("dependencies", [])]
+            if results[name]["error"] or any(dep in failed for dep in deps):
+                failed.add(name)
+                continue
+            try:
+                self.run_command("lib", "install", "--zip-path", str(results[name]["path"]))
+                self.emit_log(f"{name} {results[name]['version']} installed", "success")
+            except Exception as e:
+                self.emit_log(f"Zip install of {name} failed: {e}", "warning")
+                failed.add(name)
+
+        return {lib for lib, name in resolved.items() if name in releases and name not in failed}
+
+    def enable_zip_installs(self):
+        """Allow lib install --zip-path, which arduino-cli refuses by default"""
+        config_file = Path.home() / ".arduino15" / "arduino-cli.yaml"
+        config_text = config_file.read_text(errors="ignore") if config_file.exists() else ""
+        if "enable_unsafe_install: true" not in config_text:
+            self.run_command("config", "set", "library.enable_unsafe_install", "true")
+
     def detect_boards(self):
         """Detect connected boards"""
         self.emit_log("Detecting connected boards...")
 
         try:
-            result = self.run_command("board", "list")
-
             bombercat_boards = []
-            lines = result.stdout.strip().split('\n')
-
-            for line in lines[1:]:
-                if line.strip():
-                    parts = line.split()
-                    if len(parts) >= 2:
-                        port = parts[0]
-                        if '/dev/' in port or 'COM' in port:
-                            board_info = {
-                                'port': port,
-                                'fqbn': 'rp2040:rp2040:rpipico',
-                                'name': 'RP2040 Device'
-                            }
-
-                            try:
-                                if len(parts) > 4:
-                                    name_parts = [p for p in parts[3:-2] if p is not None]
-                                    if name_parts:
-                                        board_info['name'] = ' '.join(name_parts)
-
-                                    if 'rp2040' in line.lower() and len(parts) > 5:
-                                        board_info['fqbn'] = parts[-2]
-                            except Exception as e:
-                                self.emit_log(f"Warning parsing board info: {e}", "warning")
-
-                            bombercat_boards.append(board_info)
+            for port in self.board_list():
+                if port.protocol != "serial":
+                    continue
+                board_info = {
+                    'port': port.address,
+                    'fqbn': 'rp2040:rp2040:rpipico',
+                    'name': 'RP2040 Device',
+                    'vid': port.vid,
+                    'pid': port.pid,
+                    'serial_number': port.serial_number
+                }
+                for board in port.boards:
+                    if board.name:
+                        board_info['name'] = board.name
+                    if board.fqbn:
+                        board_info['fqbn'] = board.fqbn
+                        break
+                bombercat_boards.append(board_info)
 
             if not bombercat_boards:
                 self.emit_log("No boards detected via Arduino CLI, using serial port detection", "warning")
@@ -480,51 +1046,95 @@ class ArduinoCLI:
 
 # Firmware Manager
 class FirmwareManager:
-    def __init__(self, arduino_cli, socketio):
+    def __init__(self, arduino_cli, socketio, cfg=None, parent=None):
         self.arduino = arduino_cli
         self.socketio = socketio
+        self.config = cfg or arduino_cli.config
+        self.parent = parent
         self.sketch_path = None
-
-    def download_firmware(self):
-        """Download firmware from GitHub"""
-        self.arduino.emit_log("Downloading BomberCat firmware from GitHub...")
-        self.arduino.emit_progress(55)
-
-        sketch_dir = Path(config.sketch_dir)
-        sketch_dir.mkdir(exist_ok=True)
-
-        zip_url = f"https://github.com/{config.repo_owner}/{config.repo_name}/archive/refs/heads/main.zip"
-
-        try:
-            response = requests.get(zip_url, stream=True)
-            response.raise_for_status()
-        except requests.exceptions.HTTPError as e:
-            self.arduino.emit_log(f"Error downloading firmware: {e}", "error")
-            return self.create_example_firmware()
-
-        zip_path = sketch_dir / "bombercat.zip"
-
-        with open(zip_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-
-        self.arduino.emit_log("Extracting firmware...")
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall(sketch_dir)
-
-        extracted_dir = sketch_dir / f"{config.repo_name}-main"
+        self.workspaces = parent.workspaces if parent else WorkspaceStore(Path(self.config.sketch_dir) / "workspaces")
+        self.workspace = None
+        self.workspace_source = None
+        self.compiler_cache = None
+        self.compiler_properties = parent.compiler_properties if parent else {}
+        self.build_cache = None
+        self.build_path = None
+        self.build_hold = None
+        self.source_digest = None
+        self.size_report = None
+        self.size_history = None
+        self.compile_profiler = None
+        self.compile_profile = None
+        self.fetch_lock = parent.fetch_lock if parent else threading.RLock()
+        self.firmware_fetched_at = None
+        self.catalog = None
+        self.config_hash = None
+        self.artifact_hash = None
+        self.board_registry = None
+        self.compile_cache_stats = None
+        from bombercat_buildcache import BuildLocks
+        self.build_locks = parent.build_locks if parent else BuildLocks()
+
+    def for_job(self):
+        """A manager for one flash job
+
+        The job gets its own sketch, workspace, build directory and hashes,
+        so concurrent jobs never see each other's edits; the caches, the
+        workspace store and the fetched firmware archive stay shared.
+        """
+        return FirmwareManager(self.arduino, self.socketio, self.config, parent=self)
+
+    def set_firmware_preference(self, firmware_type):
+        """Remember whether the HOST or CLIENT relay firmware should be selected"""
+        if firmware_type in ['host', 'client']:
+            preference_file = Path(self.config.sketch_dir) / "relay_preference.txt"
+            preference_file.write_text(firmware_type)
+            self.arduino.emit_log(f"Set firmware preference to: {firmware_type.upper()}", "info")
+
+    def firmware_is_fresh(self):
+        """True when the firmware archive was fetched less than firmware_ttl seconds ago"""
+        if self.parent:
+            return self.parent.firmware_is_fresh()
+        extracted_dir = Path(self.config.sketch_dir) / f"{self.config.repo_name}-main"
+        return (self.firmware_fetched_at is not None and extracted_dir.is_dir()
+                and time.time() - self.firmware_fetched_at < self.config.firmware_ttl)
+
+    def fetch_firmware_archive(self):
+        """Download and extract the firmware repository archive"""
+        if self.parent:
+            return self.parent.fetch_firmware_archive()
+        with self.fetch_lock:
+            sketch_dir = Path(self.config.sketch_dir)
+            sketch_dir.mkdir(exist_ok=True)
+
+            zip_url = f"https://github.com/{self.config.repo_owner}/{self.config.repo_name}/archive/refs/heads/main.zip"
+
+            zip_path = sketch_dir / "bombercat.zip"
+            self.arduino.get_downloader().download(zip_url, zip_path)
+
+            self.arduino.emit_log("Extracting firmware...")
+            import zipfile
+            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+                zip_ref.extractall(sketch_dir)
+            zip_path.unlink()
+
+            self.firmware_fetched_at = time.time()
+            self.catalog = None
+            return sketch_dir / f"{self.config.repo_name}-main"
+
+    def firmware_catalog(self):
+        """Firmwares found in the extracted repository, scanned once per fetch"""
+        if self.parent:
+            return self.parent.firmware_catalog()
+        if self.catalog is not None:
+            return self.catalog
+
+        extracted_dir = Path(self.config.sketch_dir) / f"{self.config.repo_name}-main"
         firmware_dir = extracted_dir / "firmware"
 
-        self.arduino.emit_log("Looking for firmware files...", "info")
-
-        preference_file = sketch_dir / "relay_preference.txt"
-        selected_firmware = None
-        if preference_file.exists():
-            selected_firmware = preference_file.read_text().strip().lower()
-
         available_firmwares = []
         if firmware_dir.exists():
-            for subdir in firmware_dir.iterdir():
+            for subdir in sorted(firmware_dir.iterdir()):
                 if subdir.is_dir():
                     ino_files = list(subdir.glob("*.ino"))
                     if ino_files:
@@ -533,10 +1143,8 @@ class FirmwareManager:
                             'path': subdir,
                             'ino_file': ino_files[0].name
                         })
-                        self.arduino.emit_log(f"Found firmware: {subdir.name}/{ino_files[0].name}", "info")
 
-        if not available_firmwares:
-            self.arduino.emit_log("Searching for .ino files in entire repository...", "info")
+        if not available_firmwares and extracted_dir.exists():
             for ino_file in extracted_dir.rglob("*.ino"):
                 if 'examples' not in str(ino_file).lower() and 'test' not in str(ino_file).lower():
                     available_firmwares.append({
@@ -544,7 +1152,51 @@ class FirmwareManager:
                         'path': ino_file.parent,
                         'ino_file': ino_file.name
                     })
-                    self.arduino.emit_log(f"Found: {ino_file.parent.name}/{ino_file.name}", "info")
+
+        # An empty scan is retried, the archive may not have been fetched yet
+        self.catalog = available_firmwares or None
+        return available_firmwares
+
+    def download_firmware(self, firmware_type=None):
+        """Download firmware from GitHub, reusing a fresh prefetched archive
+
+        firmware_type "host" or "client" selects the relay firmware; any
+        other value falls back to the stored preference. When the download
+        fails the previously fetched archive is used if there is one,
+        otherwise the error is raised.
+        """
+        self.arduino.emit_log("Downloading BomberCat firmware from GitHub...")
+        self.arduino.emit_progress(55)
+
+        sketch_dir = Path(self.config.sketch_dir)
+        sketch_dir.mkdir(exist_ok=True)
+
+        with self.fetch_lock:
+            if self.firmware_is_fresh():
+                self.arduino.emit_log(f"Using prefetched firmware "
+                                      f"({time.time() - (self.parent or self).firmware_fetched_at:.0f}s old)",
+                                      "info")
+            else:
+                try:
+                    self.fetch_firmware_archive()
+                except Exception as e:
+                    # 4xx, or retries used up on 5xx/dropped transfers: never flash a stand-in sketch
+                    if not (sketch_dir / f"{self.config.repo_name}-main").is_dir():
+                        self.arduino.emit_log(f"Error downloading firmware: {e}", "error")
+                        raise Exception(f"Could not download the BomberCat firmware: {e}") from e
+                    self.arduino.emit_log(f"Error downloading firmware: {e}, "
+                                          f"reusing the previously fetched archive", "warning")
+
+        self.arduino.emit_log("Looking for firmware files...", "info")
+
+        preference_file = sketch_dir / "relay_preference.txt"
+        selected_firmware = firmware_type if firmware_type in ('host', 'client') else None
+        if selected_firmware is None and preference_file.exists():
+            selected_firmware = preference_file.read_text().strip().lower()
+
+        available_firmwares = self.firmware_catalog()
+        for fw in available_firmwares:
+            self.arduino.emit_log(f"Found firmware: {fw['name']}/{fw['ino_file']}", "info")
 
         self.sketch_path = None
 
@@ -585,14 +1237,12 @@ class FirmwareManager:
             self.sketch_path = available_firmwares[0]['path']
             self.arduino.emit_log(f"Selected firmware: {available_firmwares[0]['name']}", "success")
 
-        zip_path.unlink()
-
         if not self.sketch_path:
             self.arduino.emit_log("No firmware found in repository, creating example", "warning")
             return self.create_example_firmware()
 
-        self.fix_firmware_compatibility()
-
+        # The compatibility fixes are applied in each job's workspace (create_workspace),
+        # the extracted sources stay as downloaded
         self.arduino.emit_log("Firmware downloaded successfully", "success")
         self.arduino.emit_progress(60)
 
@@ -662,7 +1312,7 @@ class FirmwareManager:
                                 continue
 
                         should_comment = False
-                        for incompatible in config.incompatible_libraries:
+                        for incompatible in self.config.incompatible_libraries:
                             # Check for exact matches
                             if f'#include <{incompatible}>' in line or f'#include "{incompatible}"' in line:
                                 should_comment = True
@@ -683,7 +1333,7 @@ class FirmwareManager:
                     if modified:
                         content = '\n'.join(new_lines)
 
-                        if '#ifdef ARDUINO_ARCH_RP2040' not in content and any(inc in original_content for inc in config.incompatible_libraries):
+                        if '#ifdef ARDUINO_ARCH_RP2040' not in content and any(inc in original_content for inc in self.config.incompatible_libraries):
                             defines = """
 // Platform compatibility defines
 #ifdef ARDUINO_ARCH_RP2040
@@ -705,8 +1355,7 @@ class FirmwareManager:
                             content = '\n'.join(new_lines)
                             self.arduino.emit_log(f"Added platform compatibility defines to {file_path.name}", "info")
 
-                        with open(file_path, 'w', encoding='utf-8') as f:
-                            f.write(content)
+                        replace_file(file_path, content)
 
                 except Exception as e:
                     self.arduino.emit_log(f"Warning: Could not process {file_path.name}: {e}", "warning")
@@ -715,7 +1364,7 @@ class FirmwareManager:
         """Create example BomberCat firmware for RP2040"""
         self.arduino.emit_log("Creating example BomberCat firmware...", "info")
 
-        sketch_dir = Path(config.sketch_dir) / "BomberCat"
+        sketch_dir = Path(self.config.sketch_dir) / "BomberCat"
         sketch_dir.mkdir(parents=True, exist_ok=True)
 
         sketch_content = """
@@ -981,6 +1630,43 @@ void mqttCallback(char* topic, byte* payload, unsigned int length) {
 
         return str(self.sketch_path)
 
+    def create_workspace(self, job_id=None):
+        """Switch to a private copy-on-write workspace of the selected sketch
+
+        Firmware from the downloaded archive gets its compatibility fixes here.
+        """
+        self.release_workspace()
+        if not self.sketch_path:
+            raise Exception("No sketch path set")
+
+        start = time.time()
+        self.workspace = self.workspaces.checkout(self.sketch_path, job_id)
+        self.source_digest = self.workspace.snapshot.parent.name
+        self.workspace_source = self.sketch_path
+        self.sketch_path = self.workspace.sketch_path
+        self.arduino.emit_log(f"Created workspace {self.workspace.root.name} ({self.workspace.method}) "
+                              f"in {(time.time() - start) * 1000:.1f} ms", "info")
+
+        extracted_dir = (Path(self.config.sketch_dir) / f"{self.config.repo_name}-main").resolve()
+        if extracted_dir in Path(self.workspace_source).resolve().parents:
+            # Upstream firmware is patched in this job's copy only; replace_file breaks
+            # the links to the snapshot instead of writing through them
+            self.fix_firmware_compatibility()
+        return self.sketch_path
+
+    def release_workspace(self):
+        """Delete the current workspace and go back to the pristine sketch"""
+        self.release_build()
+        if not self.workspace:
+            return
+        try:
+            self.workspace.release()
+        except OSError as e:
+            self.arduino.emit_log(f"Could not remove workspace {self.workspace.root}: {e}", "warning")
+        self.sketch_path = self.workspace_source
+        self.workspace = None
+        self.workspace_source = None
+
     def configure_firmware(self, wifi_ssid, wifi_pass, mqtt_server, mqtt_port, host_number):
         """Configure firmware parameters"""
         self.arduino.emit_log("Configuring firmware parameters...")
@@ -1020,8 +1706,9 @@ void mqttCallback(char* topic, byte* payload, unsigned int length) {
 """
 
         config_file = self.sketch_path / "bombercat_config.h"
-        with open(config_file, 'w') as f:
-            f.write(config_header)
+        replace_file(config_file, config_header)
+        from bombercat_registry import text_digest
+        self.config_hash = text_digest(config_header)
 
         if '#include "bombercat_config.h"' not in content:
             lines = content.split('\n')
@@ -1034,19 +1721,169 @@ void mqttCallback(char* topic, byte* payload, unsigned int length) {
             lines.insert(insert_idx, '#include "bombercat_config.h"')
             content = '\n'.join(lines)
 
-            with open(sketch_file, 'w') as f:
-                f.write(content)
+            replace_file(sketch_file, content)
 
         self.arduino.emit_log("Firmware configured successfully", "success")
         self.arduino.emit_progress(70)
 
-    def compile_firmware(self, fqbn, port=None):
-        """Compile firmware"""
+    def get_compiler_cache(self):
+        """Create the compiler cache on first use; None when disabled or ccache is missing"""
+        if self.parent:
+            return self.parent.get_compiler_cache()
+        if not self.config.use_ccache:
+            return None
+        if self.compiler_cache is None:
+            from bombercat_ccache import CompilerCache, find_ccache
+            cache_dir = self.config.ccache_dir or Path.home() / ".cache" / "bombercat" / "ccache"
+            self.compiler_cache = CompilerCache(cache_dir, find_ccache(self.config.ccache_path),
+                                                self.config.ccache_max_size)
+            if not self.compiler_cache.available:
+                self.arduino.emit_log("ccache not found, compiling without compiler cache", "info")
+        return self.compiler_cache if self.compiler_cache.available else None
+
+    def get_build_properties(self, fqbn, purpose="compiler cache"):
+        """Build properties of the sketch for an FQBN, None when arduino-cli cannot report them"""
+        if fqbn not in self.compiler_properties:
+            from bombercat_ccache import parse_properties
+            try:
+                # Through run_command so a cancelled job kills it; not a build, so not a compile sample
+                result = self.arduino.run_command("compile", "--fqbn", fqbn, "--show-properties",
+                                                  str(self.sketch_path), log_output=False, timeout=120,
+                                                  record=False)
+            except Exception:
+                self.arduino.emit_log(f"Could not read build properties for {fqbn}, {purpose} disabled", "warning")
+                return None
+            self.compiler_properties[fqbn] = parse_properties(result.stdout)
+        return self.compiler_properties[fqbn]
+
+    def compiler_cache_args(self, cache, fqbn):
+        """Build properties pointing the toolchain at the ccache wrappers for this FQBN"""
+        properties = self.get_build_properties(fqbn)
+        if properties is None:
+            return []
+
+        build_properties = cache.build_properties(properties)
+        if not build_properties:
+            self.arduino.emit_log("Toolchain path not found in build properties, compiler cache disabled", "warning")
+        return build_properties
+
+    def get_compile_profiler(self):
+        """Create the compile profiler on first use; None when disabled or unsupported"""
+        if self.parent:
+            return self.parent.get_compile_profiler()
+        if not self.config.profile_compile:
+            return None
+        if self.compile_profiler is None:
+            from bombercat_profile import CompileProfiler
+            self.compile_profiler = CompileProfiler(Path.home() / ".cache" / "bombercat" / "profile-shims")
+        return self.compile_profiler if self.compile_profiler.available else None
+
+    def compile_profile_args(self, profiler, fqbn, cmd_args):
+        """Route the compiler (or the ccache wrappers already in cmd_args) through the timing shims"""
+        properties = self.get_build_properties(fqbn, "compile profiling")
+        if properties is None:
+            return []
+
+        compiler_dir = None
+        for i, arg in enumerate(cmd_args[:-1]):
+            if arg == "--build-property" and cmd_args[i + 1].startswith("compiler.path="):
+                compiler_dir = cmd_args[i + 1].partition("=")[2]
+                # The shim wraps this directory instead
+                del cmd_args[i:i + 2]
+                break
+        return profiler.build_properties(properties, compiler_dir)
+
+    def report_compile_profile(self, profile_session, elapsed):
+        """Log the slowest translation units and the per-library rollup"""
+        profile = profile_session.finish(elapsed, self.config.profile_top_units)
+        self.compile_profile = profile
+        if self.parent:
+            self.parent.compile_profile = profile
+        if not profile["units"]:
+            return profile
+        self.arduino.emit_event('compile_profile', profile)
+        self.arduino.emit_log(f"Compile profile: {profile['units']} units, {profile['wall']:.1f}s wall, "
+                              f"{profile['cpu']:.1f}s CPU", "info")
+        for unit in profile["slowest"][:5]:
+            self.arduino.emit_log(f"  {unit['wall']:.2f}s {Path(unit['source']).name} ({unit['group']})", "info")
+        groups = ", ".join(f"{group['name']} {group['wall']:.1f}s" for group in profile["groups"][:5])
+        self.arduino.emit_log(f"Compile time by library: {groups}", "info")
+        return profile
+
+    def get_build_cache(self):
+        """Create the shared build cache on first use; None when disabled"""
+        if self.parent:
+            return self.parent.get_build_cache()
+        if not self.config.use_build_cache:
+            return None
+        if self.build_cache is None:
+            from bombercat_buildcache import BuildCache
+            root = self.config.build_cache_dir or Path.home() / ".cache" / "bombercat" / "build"
+            self.build_cache = BuildCache(root, self.config.build_cache_max_size)
+        return self.build_cache
+
+    def build_variant(self):
+        """Build directory suffix for the sketch sources and configuration being compiled"""
+        if not self.source_digest and not self.config_hash:
+            return None
+        from bombercat_registry import text_digest
+        return text_digest(f"{self.source_digest}\0{self.config_hash}")[:12]
+
+    def hold_build(self, build_dir, build_cache=None):
+        """Keep build_dir to this job until release_build
+
+        No other job compiles into it and the build cache does not evict it
+        before the upload has read the image.
+        """
+        from contextlib import ExitStack
+        from bombercat_jobs import current_job
+        self.release_build()
+        lock = self.build_locks.lock_for(build_dir)
+        waiting = False
+        while not lock.acquire(timeout=0.5):
+            if not waiting:
+                waiting = True
+                self.arduino.emit_log(f"Waiting for another job to finish with {build_dir}...", "info")
+            job = current_job()
+            if job is not None:
+                job.checkpoint()
+        hold = ExitStack()
+        hold.callback(lock.release)
+        if build_cache:
+            hold.enter_context(build_cache.use(build_dir))
+        self.build_hold = hold
+
+    def release_build(self):
+        if self.build_hold is not None:
+            hold, self.build_hold = self.build_hold, None
+            hold.close()
+
+    def compile_firmware(self, fqbn, port=None, record=True):
+        """Compile firmware
+
+        The compile is timed as "compile cold" when no built core is cached
+        for it yet; record=False keeps it out of the compile durations.
+        """
         self.arduino.emit_log("Compiling firmware...")
         self.arduino.emit_progress(75)
-
-        build_dir = Path(config.build_dir)
-        build_dir.mkdir(exist_ok=True)
+        self.compile_cache_stats = None
+
+        build_dir = Path(self.config.build_dir)
+        cache_paths = []
+        core_version = None
+        build_cache = self.get_build_cache()
+        if build_cache:
+            from bombercat_buildcache import installed_core_version
+            core_version = installed_core_version(fqbn)
+            build_dir = build_cache.build_path(fqbn, core_version, Path(self.sketch_path).name,
+                                               self.build_variant())
+            cache_paths = [build_dir, build_cache.core_cache_path(fqbn, core_version)]
+        build_dir.mkdir(parents=True, exist_ok=True)
+        # Without the build cache every job shares build_dir and they take turns
+        self.hold_build(build_dir, build_cache)
+        self.build_path = build_dir
+        core_dir = cache_paths[1] if cache_paths else build_dir / "core"
+        cold = not (core_dir.is_dir() and any(core_dir.iterdir()))
 
         cmd_args = [
             "compile",
@@ -1055,30 +1892,331 @@ void mqttCallback(char* topic, byte* payload, unsigned int length) {
             str(self.sketch_path)
         ]
 
+        if cache_paths:
+            cmd_args[-1:-1] = ["--build-cache-path", str(cache_paths[1])]
+
         if port:
             cmd_args.extend(["--port", port])
 
+        run_kwargs = {"limit_key": "compile cold" if cold else "compile", "record": record}
+        cache_session = None
+        cache = self.get_compiler_cache()
+        if cache:
+            try:
+                build_properties = self.compiler_cache_args(cache, fqbn)
+                if build_properties:
+                    cmd_args[1:1] = build_properties
+                    cache_session = cache.session()
+                    run_kwargs["env"] = cache_session.env
+            except Exception as e:
+                self.arduino.emit_log(f"Compiler cache unavailable: {e}", "warning")
+
+        profile_session = None
+        profiler = self.get_compile_profiler()
+        if profiler:
+            try:
+                build_properties = self.compile_profile_args(profiler, fqbn, cmd_args)
+                if build_properties:
+                    cmd_args[1:1] = build_properties
+                    profile_session = profiler.session(run_kwargs.get("env"))
+                    run_kwargs["env"] = profile_session.env
+            except Exception as e:
+                self.arduino.emit_log(f"Compile profiling unavailable: {e}", "warning")
+
         try:
-            self.arduino.run_command(*cmd_args)
+            start = time.time()
+            if build_cache:
+                with build_cache.use(*cache_paths):
+                    result = self.arduino.run_command(*cmd_args, **run_kwargs)
+                    self.report_firmware_size(fqbn, build_dir, result, core_version)
+                    # Evict while this build's entries are still protected
+                    self.evict_build_cache(build_cache)
+            else:
+                result = self.arduino.run_command(*cmd_args, **run_kwargs)
+                self.report_firmware_size(fqbn, build_dir, result, core_version)
+            self.record_artifact(build_dir)
             self.arduino.emit_log("Firmware compiled successfully", "success")
+            if cache_session:
+                stats = cache_session.finish(time.time() - start)
+                self.compile_cache_stats = stats
+                self.arduino.emit_log(
+                    f"Compiler cache: {stats['hits']}/{stats['hits'] + stats['misses']} hits "
+                    f"({stats['hit_rate']:.0f}%), ~{stats['time_saved']:.1f}s saved", "info")
+            if profile_session:
+                self.report_compile_profile(profile_session, time.time() - start)
             self.arduino.emit_progress(85)
             return True
         except Exception as e:
             self.arduino.emit_log(f"Compilation error: {e}", "error")
             raise
+        finally:
+            # Also after a cancel or Ctrl-C; closing a finished session is a no-op
+            if cache_session:
+                cache_session.close()
+            if profile_session:
+                profile_session.close()
+
+    def get_size_history(self):
+        """The shared size history, so appends from parallel jobs go through one lock"""
+        if self.parent:
+            return self.parent.get_size_history()
+        if self.size_history is None:
+            from bombercat_memmap import SizeHistory
+            path = self.config.size_history_path or Path.home() / ".cache" / "bombercat" / "size_history.jsonl"
+            self.size_history = SizeHistory(path)
+        return self.size_history
+
+    def report_firmware_size(self, fqbn, build_dir, result=None, core_version=None):
+        """Log flash/RAM use of the build and record it in the size history"""
+        from bombercat_memmap import analyze_build, parse_compile_summary
+        self.size_report = None
+        try:
+            flash_max, ram_max = parse_compile_summary(getattr(result, "stdout", ""))
+            report = analyze_build(build_dir, Path(self.sketch_path).name, flash_max or self.config.flash_size,
+                                   ram_max or self.config.ram_size, self.config.size_top_symbols)
+        except (OSError, ValueError) as e:
+            self.arduino.emit_log(f"Firmware size analysis failed: {e}", "warning")
+            return None
+        if report is None:
+            return None
+
+        flash, ram = report["flash"], report["ram"]
+        level = "warning" if max(flash["percent"], ram["percent"]) >= 90 else "info"
+        self.arduino.emit_log(f"Flash: {flash['used'] / 1024:.1f} KB of {flash['size'] / 1024:.1f} KB "
+                              f"({flash['percent']}%), RAM: {ram['used'] / 1024:.1f} KB of "
+                              f"{ram['size'] / 1024:.1f} KB ({ram['percent']}%)", level)
+        if report["libraries"]:
+            largest = ", ".join(f"{lib['name']} {lib['flash'] / 1024:.1f} KB" for lib in report["libraries"][:5])
+            self.arduino.emit_log(f"Largest libraries: {largest}", "info")
+
+        firmware = Path(self.workspace_source or self.sketch_path).name
+        history = self.get_size_history()
+        try:
+            previous = history.latest(firmware, fqbn)
+            history.append(firmware, fqbn, report, source=self.source_digest,
+                           core_version=core_version)
+        except OSError as e:
+            self.arduino.emit_log(f"Could not record firmware size: {e}", "warning")
+            previous = None
+        if previous:
+            flash_delta = (flash["used"] - previous["flash"]) / 1024
+            ram_delta = (ram["used"] - previous["ram"]) / 1024
+            self.arduino.emit_log(f"Size change since previous build: {flash_delta:+.1f} KB flash, "
+                                  f"{ram_delta:+.1f} KB RAM", "info")
+
+        self.size_report = dict(report, firmware=firmware, fqbn=fqbn)
+        if self.parent:
+            self.parent.size_report = self.size_report
+        return self.size_report
+
+    def precompile_core(self, fqbn):
+        """Compile an empty sketch so the core for fqbn is built and cached"""
+        sketch = Path(self.config.sketch_dir) / "warmup" / "BomberCatWarmup"
+        sketch.mkdir(parents=True, exist_ok=True)
+        replace_file(sketch / "BomberCatWarmup.ino", "void setup() {}\nvoid loop() {}\n")
+        self.sketch_path = sketch
+        try:
+            # An empty sketch says nothing about how long real builds take
+            return self.compile_firmware(fqbn, record=False)
+        finally:
+            self.release_build()
+
+    def evict_build_cache(self, build_cache):
+        """Keep the build cache under its size cap"""
+        try:
+            evicted = build_cache.evict()
+        except OSError as e:
+            self.arduino.emit_log(f"Build cache eviction failed: {e}", "warning")
+            return
+        if evicted:
+            freed = sum(entry["size"] for entry in evicted) / (1024 * 1024)
+            self.arduino.emit_log(f"Build cache: evicted {len(evicted)} least recently used "
+                                  f"entries ({freed:.1f} MB)", "info")
+
+    def record_artifact(self, build_dir):
+        """Remember the hash of the image the last compile produced"""
+        from bombercat_registry import build_artifact, file_digest
+        artifact = build_artifact(build_dir, Path(self.sketch_path).name) if self.sketch_path else None
+        self.artifact_hash = file_digest(artifact) if artifact else None
+
+    def get_board_registry(self):
+        if self.parent:
+            return self.parent.get_board_registry()
+        if not self.config.use_board_registry:
+            return None
+        if self.board_registry is None:
+            from bombercat_registry import BoardRegistry
+            path = self.config.board_registry_path or Path.home() / ".cache" / "bombercat" / "boards.sqlite3"
+            self.board_registry = BoardRegistry(path)
+        return self.board_registry
+
+    def identify_board(self, port, ports=None):
+        """USB identity (serial number, location, vid, pid) of the board on a port
+
+        ports is a list of port descriptions such as a PortInventory
+        snapshot; without one the serial ports are listed now.
+        """
+        if ports is None:
+            from bombercat_ports import classify_port, default_list_ports
+            try:
+                ports = [classify_port(p) for p in default_list_ports()]
+            except Exception:
+                ports = []
+        for port_info in ports:
+            if port_info.get("port") == port:
+                return {key: port_info.get(key) for key in ("serial_number", "location", "vid", "pid")}
+        return None
+
+    def up_to_date_record(self, board, fqbn):
+        """Registry record of board when it already runs the last compiled build, else None"""
+        registry = self.get_board_registry()
+        if not registry or not board:
+            return None
+        record = registry.lookup(board.get("serial_number"), board.get("location"))
+        firmware = Path(self.sketch_path).name if self.sketch_path else None
+        if registry.is_up_to_date(record, fqbn, firmware, self.artifact_hash, self.config_hash):
+            return record
+        return None
+
+    def skip_if_up_to_date(self, fqbn, port, board=None):
+        """Log and return True when the board on port needs no flash"""
+        record = self.up_to_date_record(board or self.identify_board(port), fqbn)
+        if not record:
+            return False
+        age = time.time() - record["flashed_at"]
+        self.arduino.emit_log(f"Board {record['serial_number'] or record['location']} on {port} already runs "
+                              f"{record['firmware']} with this configuration (flashed {age / 60:.0f} min ago), "
+                              f"skipping flash", "success")
+        self.arduino.emit_progress(100)
+        return True
+
+    def record_flash(self, board, fqbn, port):
+        """Store the flashed build in the board registry"""
+        if not board:
+            return
+        registry = self.get_board_registry()
+        if not registry:
+            return
+        try:
+            registry.record_flash(board.get("serial_number"), board.get("location"), board.get("vid"),
+                                  board.get("pid"), port, fqbn,
+                                  Path(self.sketch_path).name if self.sketch_path else None,
+                                  self.artifact_hash, self.config_hash)
+        except Exception as e:
+            self.arduino.emit_log(f"Could not update the board registry: {e}", "warning")
+
+    def get_run_history(self):
+        return self.arduino.get_run_history()
+
+    def start_run(self, source, **fields):
+        """Start timing a provisioning run; stages are timed with `with run.stage(name)`"""
+        from bombercat_history import Run
+        try:
+            history = self.get_run_history()
+        except Exception as e:
+            self.arduino.emit_log(f"Run history unavailable: {e}", "warning")
+            history = None
+        return Run(history, source, **fields)
+
+    def finish_run(self, run, error=None, outcome=None):
+        """Fill in what the run produced and save it; never fails the pipeline"""
+        try:
+            stats = self.compile_cache_stats or {}
+            # A run that failed before any stage never used the CLI, don't start it now
+            run.set(firmware=Path(self.sketch_path).name if self.sketch_path else None,
+                    cli_version=self.arduino.cli_version() if run.stages else None,
+                    cache_hits=stats.get("hits"), cache_misses=stats.get("misses"))
+            return run.finish(error, outcome)
+        except Exception as e:
+            self.arduino.emit_log(f"Could not record the run: {e}", "warning")
+
+    def find_uf2(self):
+        """Find the UF2 image the last compile produced for this sketch
+
+        Only <sketch>.ino.uf2 (or a UF2 packed from <sketch>.ino.bin/.elf)
+        is used; anything else in the build directory may belong to another
+        sketch or an older build.
+        """
+        if not self.sketch_path:
+            return None
+        build_dir = self.build_path or Path(self.config.build_dir)
+        sketch_name = Path(self.sketch_path).name
+        uf2_file = build_dir / f"{sketch_name}.ino.uf2"
+        if uf2_file.exists():
+            return uf2_file
+
+        # Only a raw image or ELF was produced, pack it into a UF2 ourselves
+        from bombercat_uf2 import UF2Error, convert_to_uf2
+        for suffix in (".bin", ".elf"):
+            artifact = build_dir / f"{sketch_name}.ino{suffix}"
+            if artifact.exists():
+                try:
+                    uf2_file = convert_to_uf2(artifact)
+                    self.arduino.emit_log(f"Packed {artifact.name} into {uf2_file.name}", "info")
+                    return uf2_file
+                except UF2Error as e:
+                    self.arduino.emit_log(f"Could not convert {artifact.name} to UF2: {e}", "warning")
+        return None
+
+    def flash_uf2(self, uf2_file, bootsel_path):
+        """Flash by copying the UF2 image straight to the RPI-RP2 volume"""
+        from bombercat_uf2 import inspect_uf2
+        info = inspect_uf2(uf2_file.read_bytes())
+        if not info.valid:
+            raise Exception(f"Invalid UF2 image {uf2_file.name}: {'; '.join(info.errors)}")
+
+        self.arduino.emit_log(f"Copying {uf2_file.name} to BOOTSEL drive {bootsel_path}...")
+        self.arduino.emit_progress(90)
+
+        last_percent = [-1]
+
+        def report(written, total):
+            percent = int(written * 100 / total) if total else 100
+            if percent != last_percent[0]:
+                last_percent[0] = percent
+                self.arduino.emit_progress(90 + percent * 9 // 100)
+                self.arduino.emit_log(f"Written {written}/{total} bytes ({percent}%)", "info")
+
+        start = time.time()
+        written = copy_uf2_to_drive(uf2_file, bootsel_path, progress=report)
+        elapsed = time.time() - start
+
+        self.arduino.emit_log(f"Copied {written} bytes in {elapsed:.2f}s, board rebooted", "info")
+        self.arduino.emit_log("Firmware flashed successfully!", "success")
+        self.arduino.emit_progress(100)
+        return True
+
+    def flash_firmware(self, fqbn, port, bootsel_path=None, board=None):
+        """Flash firmware to device
+
+        board is the USB identity of the board on port; it is looked up
+        before flashing when not given, as the port goes away on reset.
+        """
+        if board is None and self.config.use_board_registry:
+            board = self.identify_board(port)
+
+        if bootsel_path:
+            uf2_file = self.find_uf2()
+            if uf2_file:
+                try:
+                    self.flash_uf2(uf2_file, bootsel_path)
+                    self.record_flash(board, fqbn, port)
+                    return True
+                except Exception as e:
+                    self.arduino.emit_log(f"Direct UF2 copy failed, falling back to upload: {e}", "warning")
+            else:
+                self.arduino.emit_log(f"No UF2 image of {Path(self.sketch_path).name} in the build directory, "
+                                      f"using upload", "warning")
 
-    def flash_firmware(self, fqbn, port):
-        """Flash firmware to device"""
         self.arduino.emit_log(f"Flashing firmware to {port}...")
         self.arduino.emit_progress(90)
 
         try:
-            self.arduino.run_command(
-                "upload",
-                "--fqbn", fqbn,
-                "--port", port,
-                str(self.sketch_path)
-            )
+            upload_args = ["upload", "--fqbn", fqbn, "--port", port]
+            if self.build_path:
+                upload_args.extend(["--input-dir", str(self.build_path)])
+            self.arduino.run_command(*upload_args, str(self.sketch_path))
+            self.record_flash(board, fqbn, port)
 
             self.arduino.emit_log("Firmware flashed successfully!", "success")
             self.arduino.emit_progress(100)
@@ -1088,30 +2226,8 @@ void mqttCallback(char* topic, byte* payload, unsigned int length) {
             self.arduino.emit_log(f"Flash error: {e}", "error")
             raise
 
-# Global instances
-arduino_cli = ArduinoCLI(socketio)
-firmware_manager = FirmwareManager(arduino_cli, socketio)
-
-# Ensure directories exist
-Path("tools").mkdir(exist_ok=True)
-Path("build").mkdir(exist_ok=True)
-Path("sketch").mkdir(exist_ok=True)
-Path("templates").mkdir(exist_ok=True)
-
-# Flask Routes
-@app.route("/")
-def index():
-    """Serve the main web interface"""
-    return render_template("index.html")
-
-@app.route("/wizard")
-def wizard():
-    """Serve the Arduino flash wizard"""
-    return render_template("wizard.html")
-
-@app.route("/api/check_bootsel", methods=["GET"])
-def check_bootsel():
-    """Check if device is in BOOTSEL mode"""
+def scan_bootsel():
+    """Scan mounted volumes for an RP2040 in BOOTSEL mode"""
     try:
         in_bootsel = False
         bootsel_path = None
@@ -1225,293 +2341,561 @@ def check_bootsel():
                 except:
                     pass
 
-        return jsonify({
+        return {
             "in_bootsel": in_bootsel,
             "bootsel_path": bootsel_path,
             "platform": platform.system()
-        })
+        }
 
     except Exception as e:
-        arduino_cli.emit_log(f"Error checking BOOTSEL: {str(e)}", "warning")
-        return jsonify({
+        print(f"[WARNING] Error checking BOOTSEL: {str(e)}")
+        return {
             "in_bootsel": False, 
             "error": str(e),
             "platform": platform.system()
-        })
+        }
 
-@app.route("/api/check_dependencies", methods=["GET"])
-def check_dependencies():
-    """Check if Arduino CLI and dependencies are installed"""
-    try:
-        marker_file = Path(".dependencies_installed.json")
-        if marker_file.exists():
-            try:
-                with open(marker_file, 'r') as f:
-                    marker_data = json.load(f)
-                    if marker_data.get("arduino_cli") and marker_data.get("boards"):
-                        arduino_cli.initialized = True
-                        return jsonify({
-                            "arduino_cli": True,
-                            "boards": True,
-                            "initialized": True,
-                            "from_marker": True
-                        })
-            except:
-                pass
+def create_app(cfg=None):
+    """Build the Flask/SocketIO application and the services behind it"""
+    from flask import Flask, render_template, jsonify, request
+    from flask_socketio import SocketIO, emit, join_room, leave_room
+
+    from bombercat_async import BlockingWork, resolve_async_mode
+    from bombercat_jobs import JobCancelled, JobRegistry
+    from bombercat_monitor import SerialMonitor, room_for
+    from bombercat_warmup import SkipStep, Warmup
+    config = cfg or get_config()
+    async_mode = resolve_async_mode(config.async_mode, require_patched=True)
+
+    # Create Flask app with SocketIO
+    app = Flask(__name__, template_folder='templates')
+    app.config['SECRET_KEY'] = 'bombercat-secret-key'
+    socketio = SocketIO(app, async_mode=async_mode, cors_allowed_origins="*", ping_timeout=120, ping_interval=25)
+
+    # Bounded pool for blocking work done inside request handlers
+    blocking = BlockingWork(async_mode, config.blocking_workers)
+
+    # Flash and install tasks, cancellable through /api/jobs/<id>/cancel
+    jobs = JobRegistry(socketio.start_background_task, config.job_kill_grace)
+
+    # Serial output of flashed boards, streamed to the clients subscribed to each port
+    serial_monitor = SerialMonitor(
+        emit=lambda event, data, room: socketio.emit(event, data, room=room),
+        baudrate=config.monitor_baudrate,
+        buffer_size=config.monitor_buffer_size,
+        window=config.monitor_window,
+        flush_interval=config.monitor_flush_interval
+    )
+
+    # State for installation progress
+    installation_state = {
+        "in_progress": False,
+        "completed": False,
+        "error": False,
+        "message": ""
+    }
 
-        arduino_installed = arduino_cli.cli_path and os.path.exists(arduino_cli.cli_path)
+    # Service instances
+    arduino_cli = ArduinoCLI(socketio, config)
+    firmware_manager = FirmwareManager(arduino_cli, socketio, config)
+
+    # Ensure directories exist
+    Path("tools").mkdir(exist_ok=True)
+    Path(config.build_dir).mkdir(exist_ok=True)
+    Path(config.sketch_dir).mkdir(exist_ok=True)
+    Path("templates").mkdir(exist_ok=True)
+
+    # Background warm-up so the first flash after a restart skips the slow setup
+    def warm_cli():
+        if not arduino_cli.cli_path or not os.path.exists(arduino_cli.cli_path):
+            arduino_cli.cli_path = arduino_cli.find_cli()
+        if not arduino_cli.cli_path:
+            raise SkipStep("arduino-cli is not installed yet")
+        arduino_cli.initialize()
+        return "CLI ready, stale indexes refreshed"
+
+    def warm_firmware():
+        if firmware_manager.firmware_is_fresh():
+            raise SkipStep("firmware archive already fetched")
+        firmware_manager.fetch_firmware_archive()
+
+    def warm_catalog():
+        return f"{len(firmware_manager.firmware_catalog())} firmwares"
+
+    def warm_core():
+        from bombercat_buildcache import installed_core_version
+        if not arduino_cli.initialized:
+            raise SkipStep("arduino-cli is not ready")
+        if installed_core_version(config.arduino_fqbn) == "unknown":
+            raise SkipStep(f"core for {config.arduino_fqbn} is not installed")
+        firmware_manager.for_job().precompile_core(config.arduino_fqbn)
+
+    warmup = Warmup(
+        [("cli", warm_cli), ("firmware", warm_firmware), ("catalog", warm_catalog), ("core", warm_core)],
+        start_task=socketio.start_background_task,
+        emit=lambda event, data: socketio.emit(event, data, room=None)
+    )
+
+    # Flask Routes
+    @app.route("/")
+    def index():
+        """Serve the main web interface"""
+        return render_template("index.html")
+
+    @app.route("/wizard")
+    def wizard():
+        """Serve the Arduino flash wizard"""
+        return render_template("wizard.html")
+
+    # Cached serial port / BOOTSEL inventory, refreshed by hot-plug events
+    port_inventory = PortInventory(
+        bootsel_scanner=scan_bootsel,
+        poll_interval=config.port_poll_interval,
+        log=arduino_cli.emit_log
+    )
+
+    @app.route("/api/check_bootsel", methods=["GET"])
+    def check_bootsel():
+        """Check if device is in BOOTSEL mode"""
+        bootsel_state = blocking.run(scan_bootsel)
+        port_inventory.update_bootsel(bootsel_state)
+        return jsonify(bootsel_state)
+
+    @app.route("/api/check_dependencies", methods=["GET"])
+    def check_dependencies():
+        """Check if Arduino CLI and dependencies are installed"""
+        try:
+            marker_file = Path(".dependencies_installed.json")
+            if marker_file.exists():
+                try:
+                    with open(marker_file, 'r') as f:
+                        marker_data = json.load(f)
+                        if marker_data.get("arduino_cli") and marker_data.get("boards"):
+                            arduino_cli.initialized = True
+                            return jsonify({
+                                "arduino_cli": True,
+                                "boards": True,
+                                "initialized": True,
+                                "from_marker": True
+                            })
+                except:
+                    pass
 
-        boards_installed = False
-        if arduino_installed:
-            try:
-                result = arduino_cli.run_command("core", "list")
-                if result.stdout and 'rp2040:rp2040' in result.stdout:
-                    boards_installed = True
-            except:
-                pass
+            arduino_installed = arduino_cli.cli_path and os.path.exists(arduino_cli.cli_path)
 
-        if installation_state["completed"]:
-            arduino_installed = True
-            boards_installed = True
-            arduino_cli.initialized = True
+            boards_installed = False
+            if arduino_installed:
+                try:
+                    boards_installed = blocking.run(arduino_cli.core_installed, "rp2040:rp2040")
+                except:
+                    pass
 
-        return jsonify({
-            "arduino_cli": arduino_installed,
-            "boards": boards_installed,
-            "initialized": arduino_cli.initialized
-        })
+            if installation_state["completed"]:
+                arduino_installed = True
+                boards_installed = True
+                arduino_cli.initialized = True
 
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+            return jsonify({
+                "arduino_cli": arduino_installed,
+                "boards": boards_installed,
+                "initialized": arduino_cli.initialized
+            })
 
-@app.route("/api/install_dependencies", methods=["POST"])
-def install_dependencies():
-    """Install all dependencies"""
-    if installation_state["in_progress"]:
-        return jsonify({"status": "Installation already in progress"})
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
 
-    def install_task():
-        installation_state["in_progress"] = True
-        installation_state["completed"] = False
-        installation_state["error"] = False
+    @app.route("/api/install_dependencies", methods=["POST"])
+    def install_dependencies():
+        """Install all dependencies"""
+        if installation_state["in_progress"]:
+            return jsonify({"status": "Installation already in progress"})
 
-        try:
-            arduino_cli.initialize()
-            arduino_cli.install_core("rp2040:rp2040")
-            arduino_cli.install_libraries()
+        def install_task():
+            installation_state["in_progress"] = True
+            installation_state["completed"] = False
+            installation_state["error"] = False
 
-            arduino_cli.emit_log("All dependencies installed successfully!", "success")
+            try:
+                arduino_cli.initialize()
+                arduino_cli.install_core("rp2040:rp2040")
+                arduino_cli.install_libraries()
 
-            installation_state["completed"] = True
-            installation_state["message"] = "All dependencies installed successfully!"
+                arduino_cli.emit_log("All dependencies installed successfully!", "success")
 
-            socketio.emit('installation_complete', {
-                'success': True,
-                'message': installation_state["message"]
-            }, room=None)
+                installation_state["completed"] = True
+                installation_state["message"] = "All dependencies installed successfully!"
 
-        except Exception as e:
-            arduino_cli.emit_log(f"Installation failed: {str(e)}", "error")
-            installation_state["error"] = True
-            installation_state["message"] = str(e)
+                socketio.emit('installation_complete', {
+                    'success': True,
+                    'message': installation_state["message"]
+                }, room=None)
 
-            socketio.emit('installation_complete', {
-                'success': False,
-                'message': installation_state["message"]
-            }, room=None)
+            except JobCancelled:
+                arduino_cli.emit_log("Installation cancelled", "warning")
+                installation_state["message"] = "Installation cancelled"
 
-        finally:
-            installation_state["in_progress"] = False
+                socketio.emit('installation_complete', {
+                    'success': False,
+                    'cancelled': True,
+                    'message': installation_state["message"]
+                }, room=None)
 
-    thread = threading.Thread(target=install_task)
-    thread.daemon = True
-    thread.start()
+            except Exception as e:
+                arduino_cli.emit_log(f"Installation failed: {str(e)}", "error")
+                installation_state["error"] = True
+                installation_state["message"] = str(e)
 
-    return jsonify({"status": "Installation started"})
+                socketio.emit('installation_complete', {
+                    'success': False,
+                    'message': installation_state["message"]
+                }, room=None)
 
-@app.route("/api/detect_boards", methods=["GET"])
-def detect_boards():
-    """Detect connected BomberCat boards"""
-    try:
-        ports = []
-        for port in serial.tools.list_ports.comports():
-            port_info = {
-                "port": port.device,
-                "description": port.description,
-                "hwid": port.hwid,
-                "vid": port.vid,
-                "pid": port.pid,
-                "serial_number": port.serial_number,
-                "manufacturer": port.manufacturer,
-                "product": port.product,
-                "likely_bombercat": False
-            }
+            finally:
+                installation_state["in_progress"] = False
 
-            # Check if it's likely a BomberCat (RP2040-based)
-            if port.vid == 0x2E8A:  # Raspberry Pi vendor ID
-                port_info['likely_bombercat'] = True
-            elif port.vid == 0x239A:  # Adafruit vendor ID
-                port_info['likely_bombercat'] = True
-            elif "RP2040" in (port.description or ""):
-                port_info['likely_bombercat'] = True
-            elif "Pico" in (port.description or ""):
-                port_info['likely_bombercat'] = True
-            elif port.manufacturer and "Raspberry Pi" in port.manufacturer:
-                port_info['likely_bombercat'] = True
+        job = jobs.start("install", install_task)
 
-            ports.append(port_info)
+        return jsonify({"status": "Installation started", "job_id": job.id})
 
-        # Check BOOTSEL mode
-        bootsel_check = check_bootsel().get_json()
+    @app.route("/api/detect_boards", methods=["GET"])
+    def detect_boards():
+        """Detect connected BomberCat boards"""
+        try:
+            # Served from memory; only the very first scan goes through the blocking pool
+            inventory = port_inventory.cached() or blocking.run(port_inventory.snapshot)
+            ports = inventory["ports"]
+            registry = firmware_manager.get_board_registry()
+            if registry and ports:
+                ports = blocking.run(lambda: [registry.enrich(dict(port_info)) for port_info in ports])
+
+            return jsonify({
+                "ports": ports,
+                "in_bootsel": inventory["in_bootsel"],
+                "bootsel_path": inventory["bootsel_path"]
+            })
 
-        return jsonify({
-            "ports": ports,
-            "in_bootsel": bootsel_check.get("in_bootsel", False),
-            "bootsel_path": bootsel_check.get("bootsel_path")
-        })
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+
+    @app.route("/api/flash", methods=["POST"])
+    def flash():
+        """Flash firmware with configuration"""
+        data = request.get_json()
+
+        port = data.get('port')
+        wifi_ssid = data.get('wifi_ssid')
+        wifi_pass = data.get('wifi_password')
+        mqtt_server = data.get('mqtt_server', 'broker.hivemq.com')
+        mqtt_port = data.get('mqtt_port', 1883)
+        host_number = data.get('host_number', 1)
+        fqbn = data.get('fqbn', config.arduino_fqbn)
+        firmware_type = data.get('firmware_type', 'auto')
+        force = bool(data.get('force', False))
+
+        if not all([port, wifi_ssid]):
+            return jsonify({"error": "Missing required parameters"}), 400
+
+        def flash_task():
+            # Each job works on its own manager; caches and the firmware archive are shared
+            manager = firmware_manager.for_job()
+            run = manager.start_run("web", port=port, fqbn=fqbn)
+            try:
+                manager.set_firmware_preference(firmware_type)
+
+                with run.stage("download_firmware"):
+                    manager.download_firmware(firmware_type)
+                with run.stage("workspace"):
+                    manager.create_workspace()
+                with run.stage("configure"):
+                    manager.configure_firmware(
+                        wifi_ssid, wifi_pass, mqtt_server, mqtt_port, host_number
+                    )
+                with run.stage("compile"):
+                    manager.compile_firmware(fqbn, port)
+
+                board = manager.identify_board(port, port_inventory.snapshot()["ports"])
+                if not force and manager.skip_if_up_to_date(fqbn, port, board):
+                    manager.finish_run(run, outcome="skipped")
+                    return
+
+                with run.stage("flash"), serial_monitor.paused(port):
+                    bootsel_state = scan_bootsel()
+                    port_inventory.update_bootsel(bootsel_state)
+                    bootsel_path = bootsel_state.get("bootsel_path") if bootsel_state.get("in_bootsel") else None
+                    manager.flash_firmware(fqbn, port, bootsel_path=bootsel_path, board=board)
+
+                manager.finish_run(run)
+                arduino_cli.emit_log("BomberCat is ready to use!", "success")
+
+            except JobCancelled as e:
+                manager.finish_run(run, e, outcome="cancelled")
+                arduino_cli.emit_log("Flash cancelled", "warning")
+            except Exception as e:
+                manager.finish_run(run, e)
+                arduino_cli.emit_log(f"Flash failed: {str(e)}", "error")
+            finally:
+                manager.release_workspace()
 
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        job = jobs.start("flash", flash_task, port=port)
 
-@app.route("/api/flash", methods=["POST"])
-def flash():
-    """Flash firmware with configuration"""
-    data = request.get_json()
+        return jsonify({"status": "Flash operation started", "job_id": job.id})
 
-    port = data.get('port')
-    wifi_ssid = data.get('wifi_ssid')
-    wifi_pass = data.get('wifi_password')
-    mqtt_server = data.get('mqtt_server', 'broker.hivemq.com')
-    mqtt_port = data.get('mqtt_port', 1883)
-    host_number = data.get('host_number', 1)
-    fqbn = data.get('fqbn', config.arduino_fqbn)
-    firmware_type = data.get('firmware_type', 'auto')
+    @app.route("/api/ports", methods=["GET"])
+    def get_ports():
+        """Get available serial ports (legacy endpoint)"""
+        return detect_boards()
+
+    @app.route("/api/status", methods=["GET"])
+    def get_status():
+        """Get current status"""
+        return jsonify({
+            "initialized": arduino_cli.initialized,
+            "arduino_cli_installed": bool(arduino_cli.cli_path),
+            "flashing": False,
+            "active": False,
+            "mqtt_connected": False,
+            "async_mode": async_mode,
+            "blocking": blocking.stats(),
+            "warmup": warmup.status()
+        })
 
-    if not all([port, wifi_ssid]):
-        return jsonify({"error": "Missing required parameters"}), 400
+    @app.route("/api/build_cache", methods=["GET"])
+    def build_cache_usage():
+        """Get build cache size, cap and entries"""
+        build_cache = firmware_manager.get_build_cache()
+        if not build_cache:
+            return jsonify({"enabled": False})
+        return jsonify(dict(build_cache.usage(), enabled=True))
+
+    @app.route("/api/firmware_size", methods=["GET"])
+    def firmware_size():
+        """Get the size report of the last compile and the size history"""
+        report = firmware_manager.size_report
+        firmware = request.args.get("firmware") or (report or {}).get("firmware")
+        fqbn = request.args.get("fqbn") or (report or {}).get("fqbn")
+        history = firmware_manager.get_size_history().records(firmware, fqbn)
+        return jsonify({"report": report, "history": history})
+
+    @app.route("/api/compile_profile", methods=["GET"])
+    def compile_profile():
+        """Get the per translation unit timing of the last profiled compile"""
+        return jsonify({"enabled": config.profile_compile, "profile": firmware_manager.compile_profile})
+
+    @app.route("/api/diagnostics", methods=["GET"])
+    def diagnostics():
+        """Get the diagnostics of the last Arduino CLI command, errors first"""
+        parser = arduino_cli.last_diagnostics
+        if parser is None:
+            return jsonify({"summary": None, "diagnostics": []})
+        return jsonify({
+            "summary": parser.summary(),
+            "diagnostics": [d.to_dict() for d in parser.diagnostics()]
+        })
 
-    def flash_task():
+    @app.route("/api/jobs", methods=["GET"])
+    def list_jobs():
+        """Get the running and recently finished flash/install jobs"""
+        return jsonify({"jobs": jobs.list()})
+
+    @app.route("/api/jobs/<job_id>/cancel", methods=["POST"])
+    def cancel_job(job_id):
+        """Cancel a job: kill its arduino-cli process groups and wait for it to clean up"""
+        job = jobs.get(job_id)
+        if job is None:
+            return jsonify({"error": f"Unknown job {job_id}"}), 404
+        if job.done.is_set():
+            return jsonify({"error": f"Job already {job.state}", "job": job.to_dict()}), 409
+        jobs.cancel(job_id, config.job_cancel_wait)
+        # 202 while the job is still unwinding after job_cancel_wait
+        return jsonify({"job": job.to_dict()}), 200 if job.done.is_set() else 202
+
+    @app.route("/api/monitor", methods=["GET"])
+    def monitor_status():
+        """Get the monitored serial ports, their buffers and subscribers"""
+        return jsonify({"ports": serial_monitor.status()})
+
+    @app.route("/api/runs", methods=["GET"])
+    def runs():
+        """Get the latest provisioning runs with their stage durations"""
+        history = firmware_manager.get_run_history()
+        if not history:
+            return jsonify({"enabled": False, "runs": []})
+        limit = request.args.get("limit", 50, type=int)
+        return jsonify({"enabled": True, "runs": blocking.run(history.recent, limit)})
+
+    @app.route("/api/runs/stats", methods=["GET"])
+    def run_stats():
+        """Get p50/p95/p99 per stage over a time window (?window=seconds or ?since=&until=)
+
+        ?group_by=cli_version (or source, outcome, fqbn, firmware) splits the
+        result to compare, e.g., arduino-cli versions; the same names filter.
+        """
+        history = firmware_manager.get_run_history()
+        if not history:
+            return jsonify({"enabled": False, "stages": {}})
+        until = request.args.get("until", type=float) or time.time()
+        since = request.args.get("since", type=float)
+        if since is None:
+            since = until - request.args.get("window", 7 * 24 * 3600, type=float)
+        filters = {name: request.args.get(name) for name in ("source", "outcome", "fqbn", "firmware", "cli_version")
+                   if request.args.get(name)}
         try:
-            if firmware_type in ['host', 'client']:
-                preference_file = Path(config.sketch_dir) / "relay_preference.txt"
-                preference_file.write_text(firmware_type)
-                arduino_cli.emit_log(f"Set firmware preference to: {firmware_type.upper()}", "info")
-
-            firmware_manager.download_firmware()
-            firmware_manager.configure_firmware(
-                wifi_ssid, wifi_pass, mqtt_server, mqtt_port, host_number
-            )
-            firmware_manager.compile_firmware(fqbn, port)
-            firmware_manager.flash_firmware(fqbn, port)
+            stages = blocking.run(history.stage_stats, since, until, request.args.get("group_by"), **filters)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify({"enabled": True, "since": since, "until": until, "stages": stages})
+
+    @app.route("/api/runs/timeouts", methods=["GET"])
+    def command_timeouts():
+        """Get the current timeout, stall limit and retries of each arduino-cli subcommand"""
+        if not config.use_command_timeouts:
+            return jsonify({"enabled": False, "commands": {}})
+        return jsonify({"enabled": True, "commands": blocking.run(arduino_cli.get_command_timeouts().describe)})
+
+    @app.route("/api/relay/start", methods=["POST"])
+    def start_relay():
+        """Start relay (placeholder for compatibility)"""
+        return jsonify({"status": "started"})
+
+    @app.route("/api/relay/stop", methods=["POST"])
+    def stop_relay():
+        """Stop relay (placeholder for compatibility)"""
+        return jsonify({"status": "stopped"})
+
+    @app.route("/api/firmware_info", methods=["GET"])
+    def firmware_info():
+        """Get information about available firmwares"""
+        available_firmwares = []
+        for firmware in firmware_manager.firmware_catalog():
+            fw_info = {
+                'name': firmware['name'],
+                'type': 'unknown'
+            }
 
-            arduino_cli.emit_log("BomberCat is ready to use!", "success")
+            if 'host_relay_nfc' in firmware['name'].lower():
+                fw_info['type'] = 'host'
+                fw_info['description'] = 'HOST device - connects to NFC reader'
+            elif 'client_relay_nfc' in firmware['name'].lower():
+                fw_info['type'] = 'client'
+                fw_info['description'] = 'CLIENT device - emulates NFC card'
+            elif 'magspoof' in firmware['name'].lower():
+                fw_info['type'] = 'magstripe'
+                fw_info['description'] = 'Magnetic stripe emulator'
+            elif 'detecttags' in firmware['name'].lower():
+                fw_info['type'] = 'detector'
+                fw_info['description'] = 'NFC tag detector'
+
+            available_firmwares.append(fw_info)
+
+        return jsonify({"firmwares": available_firmwares})
+
+    # SocketIO Events
+    @socketio.on('connect')
+    def handle_connect():
+        emit('connected', {'data': 'Connected to BomberCat Arduino Flasher'})
+        print(f"Client connected: {request.sid}")
+
+        if installation_state["in_progress"]:
+            emit('installation_status', {
+                'in_progress': True,
+                'message': 'Installation in progress...'
+            })
+        elif installation_state["completed"]:
+            emit('installation_status', {
+                'completed': True,
+                'message': installation_state["message"]
+            })
+
+    @socketio.on('disconnect')
+    def handle_disconnect():
+        serial_monitor.unsubscribe(request.sid)
+        print(f'Client disconnected: {request.sid}')
+
+    @socketio.on('monitor_subscribe')
+    def handle_monitor_subscribe(data):
+        """Stream a port's output to this client as monitor_data events, acknowledged with monitor_ack"""
+        port = (data or {}).get('port')
+        if not port:
+            return {"error": "Missing port"}
+        join_room(room_for(port))
+        return serial_monitor.subscribe(request.sid, port, data.get('baudrate'), data.get('backlog', True))
+
+    @socketio.on('monitor_unsubscribe')
+    def handle_monitor_unsubscribe(data):
+        port = (data or {}).get('port')
+        if port:
+            leave_room(room_for(port))
+        serial_monitor.unsubscribe(request.sid, port)
 
-        except Exception as e:
-            arduino_cli.emit_log(f"Flash failed: {str(e)}", "error")
-
-    thread = threading.Thread(target=flash_task)
-    thread.daemon = True
-    thread.start()
-
-    return jsonify({"status": "Flash operation started"})
-
-@app.route("/api/ports", methods=["GET"])
-def get_ports():
-    """Get available serial ports (legacy endpoint)"""
-    return detect_boards()
-
-@app.route("/api/status", methods=["GET"])
-def get_status():
-    """Get current status"""
-    return jsonify({
-        "initialized": arduino_cli.initialized,
-        "arduino_cli_installed": bool(arduino_cli.cli_path),
-        "flashing": False,
-        "active": False,
-        "mqtt_connected": False
-    })
+    @socketio.on('monitor_ack')
+    def handle_monitor_ack(data):
+        serial_monitor.ack(request.sid, data.get('port'), data.get('offset', 0))
 
-@app.route("/api/relay/start", methods=["POST"])
-def start_relay():
-    """Start relay (placeholder for compatibility)"""
-    return jsonify({"status": "started"})
-
-@app.route("/api/relay/stop", methods=["POST"])
-def stop_relay():
-    """Stop relay (placeholder for compatibility)"""
-    return jsonify({"status": "stopped"})
-
-@app.route("/api/firmware_info", methods=["GET"])
-def firmware_info():
-    """Get information about available firmwares"""
-    sketch_dir = Path(config.sketch_dir)
-    extracted_dir = sketch_dir / f"{config.repo_name}-main"
-    firmware_dir = extracted_dir / "firmware"
-
-    available_firmwares = []
-    if firmware_dir.exists():
-        for subdir in firmware_dir.iterdir():
-            if subdir.is_dir():
-                ino_files = list(subdir.glob("*.ino"))
-                if ino_files:
-                    fw_info = {
-                        'name': subdir.name,
-                        'type': 'unknown'
-                    }
-
-                    if 'host_relay_nfc' in subdir.name.lower():
-                        fw_info['type'] = 'host'
-                        fw_info['description'] = 'HOST device - connects to NFC reader'
-                    elif 'client_relay_nfc' in subdir.name.lower():
-                        fw_info['type'] = 'client'
-                        fw_info['description'] = 'CLIENT device - emulates NFC card'
-                    elif 'magspoof' in subdir.name.lower():
-                        fw_info['type'] = 'magstripe'
-                        fw_info['description'] = 'Magnetic stripe emulator'
-                    elif 'detecttags' in subdir.name.lower():
-                        fw_info['type'] = 'detector'
-                        fw_info['description'] = 'NFC tag detector'
-
-                    available_firmwares.append(fw_info)
-
-    return jsonify({"firmwares": available_firmwares})
-
-# SocketIO Events
-@socketio.on('connect')
-def handle_connect():
-    emit('connected', {'data': 'Connected to BomberCat Arduino Flasher'})
-    print(f"Client connected: {request.sid}")
-
-    if installation_state["in_progress"]:
-        emit('installation_status', {
-            'in_progress': True,
-            'message': 'Installation in progress...'
-        })
-    elif installation_state["completed"]:
-        emit('installation_status', {
-            'completed': True,
-            'message': installation_state["message"]
-        })
+    @socketio.on('monitor_write')
+    def handle_monitor_write(data):
+        try:
+            return {"written": serial_monitor.write(data.get('port'), data.get('data', ''))}
+        except Exception as e:
+            return {"error": str(e)}
 
-@socketio.on('disconnect')
-def handle_disconnect():
-    print(f'Client disconnected: {request.sid}')
+    @socketio.on('ping')
+    def handle_ping():
+        emit('pong')
 
-@socketio.on('ping')
-def handle_ping():
-    emit('pong')
+    # Error handlers
+    @app.errorhandler(404)
+    def not_found(e):
+        return jsonify({"error": "Not found"}), 404
 
-# Error handlers
-@app.errorhandler(404)
-def not_found(e):
-    return jsonify({"error": "Not found"}), 404
+    @app.errorhandler(500)
+    def server_error(e):
+        return jsonify({"error": str(e)}), 500
 
-@app.errorhandler(500)
-def server_error(e):
-    return jsonify({"error": str(e)}), 500
+    app.extensions["bombercat"] = {
+        "config": config,
+        "socketio": socketio,
+        "installation_state": installation_state,
+        "arduino_cli": arduino_cli,
+        "firmware_manager": firmware_manager,
+        "port_inventory": port_inventory,
+        "blocking": blocking,
+        "warmup": warmup,
+        "jobs": jobs,
+        "serial_monitor": serial_monitor
+    }
+    return app
+
+def get_app():
+    """Return the default application, creating it on first use"""
+    global _app
+    if _app is None:
+        _app = create_app()
+    return _app
+
+def __getattr__(name):
+    """Lazily provide the module-level objects older scripts import"""
+    if name == "config":
+        return get_config()
+    if name == "app":
+        return get_app()
+    if name in ("socketio", "installation_state", "arduino_cli", "firmware_manager", "port_inventory"):
+        return get_app().extensions["bombercat"][name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Main
-if __name__ == "__main__":
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] in ("provision", "fleet"):
+        from bombercat_cli import main as cli_main
+        sys.exit(cli_main(sys.argv[1:]))
+
+    from bombercat_async import patch_for, resolve_async_mode
+    config = get_config()
+    # Green-thread modes need the standard library patched before the app starts
+    patch_for(resolve_async_mode(config.async_mode))
+    app = get_app()
+    services = app.extensions["bombercat"]
+    socketio = services["socketio"]
+
     print("""
 ╔══════════════════════════════════════════════╗
 ║      🔥 BOMBERCAT ARDUINO FLASHER 🔥         ║
@@ -1554,4 +2938,13 @@ BOOTSEL Mode Instructions:
 Starting server on http://localhost:{0}
 """.format(config.flask_port))
 
-    socketio.run(app, host=config.flask_host, port=config.flask_port, debug=config.flask_debug)
+    services["port_inventory"].start()
+    if config.warmup:
+        services["warmup"].start()
+
+    # Werkzeug only serves threading mode; it is fine for a local flashing tool
+    socketio.run(app, host=config.flask_host, port=config.flask_port, debug=config.flask_debug,
+                 allow_unsafe_werkzeug=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+BomberCat Command Timeouts
+Limits for each arduino-cli subcommand: the total timeout is the p99 of
+its recent successful durations times a factor, never below a floor, with
+a fixed default until enough runs are recorded. Subcommands that keep
+printing while they work (upload) also get an output-stall limit, so a
+board that hangs mid-transfer is killed and retried instead of holding
+the job forever
+"""
+import time
+import threading
+import subprocess
+from dataclasses import dataclass
+
+from bombercat_history import percentile
+
+
+@dataclass(frozen=True)
+class CommandLimit:
+    default: float          # timeout (seconds) while there is not enough history
+    floor: float            # the adaptive timeout never goes below this
+    adaptive: bool = True   # durations are recorded and drive the timeout
+
+
+# Subcommand key -> limits. Compiles print nothing until they end and core
+# installs download toolchains silently, so only the total timeout applies.
+# A compile that has to build the core first ("compile cold") takes many times
+# longer than one reusing it, so the two keep separate histories
+LIMITS = {
+    "compile": CommandLimit(1800, 300),
+    "compile cold": CommandLimit(1800, 1200),
+    "upload": CommandLimit(300, 60),
+    "core install": CommandLimit(3600, 300),
+    "core update-index": CommandLimit(600, 60),
+    "lib install": CommandLimit(900, 120),
+    "lib update-index": CommandLimit(600, 60),
+    "board list": CommandLimit(60, 60, adaptive=False),
+    "config": CommandLimit(60, 60, adaptive=False),
+    "version": CommandLimit(30, 30, adaptive=False),
+}
+
+# Subcommands whose key includes their second word
+GROUPS = ("core", "lib", "board")
+
+
+def command_key(args):
+    """Limit key of an arduino-cli argument list, e.g. ("core", "install", ...) -> "core install" """
+    args = [str(arg) for arg in args]
+    if not args:
+        return ""
+    if args[0] in GROUPS and len(args) > 1 and not args[1].startswith("-"):
+        return f"{args[0]} {args[1]}"
+    return args[0]
+
+
+class CommandTimeout(subprocess.TimeoutExpired):
+    """A command ran past its timeout or stopped printing; str() says which and why"""
+
+    def __init__(self, cmd, timeout, reason, stalled=False):
+        super().__init__(cmd, timeout)
+        self.reason = reason
+        self.stalled = stalled
+
+    def __str__(self):
+        return self.reason
+
+
+@dataclass(frozen=True)
+class Limits:
+    key: str
+    timeout: float = None   # None: no total timeout
+    stall: float = None     # None: no output-stall watchdog
+    retries: int = 0        # attempts after a timeout or stall
+    basis: str = ""         # how the timeout was chosen, for messages
+
+    def to_dict(self):
+        return {"timeout": self.timeout, "stall": self.stall, "retries": self.retries, "basis": self.basis}
+
+
+class CommandTimeouts:
+    """Timeouts per subcommand from their recorded durations
+
+    durations(key) returns the recent successful durations of a
+    subcommand (seconds); None uses the fixed defaults. Computed timeouts
+    are reused for refresh seconds.
+    """
+
+    def __init__(self, durations=None, factor=3.0, min_samples=20, stall_timeouts=None, retries=None,
+                 refresh=60.0):
+        self.durations = durations
+        self.factor = factor
+        self.min_samples = min_samples
+        self.stall_timeouts = dict(stall_timeouts or {})
+        self.retries = dict(retries or {})
+        self.refresh = refresh
+        self.lock = threading.Lock()
+        self.computed = {}
+
+    def timeout_for(self, key):
+        """(timeout, basis) of a subcommand key, (None, "") for unknown ones"""
+        limit = LIMITS.get(key)
+        if limit is None:
+            return None, ""
+        if not limit.adaptive or self.durations is None:
+            return limit.default, "default"
+
+        with self.lock:
+            cached = self.computed.get(key)
+            if cached and time.time() - cached[0] < self.refresh:
+                return cached[1]
+        try:
+            values = sorted(self.durations(key))
+        except Exception:
+            values = []
+        if len(values) < self.min_samples:
+            result = (limit.default, f"default, {len(values)}/{self.min_samples} runs recorded")
+        else:
+            p99 = percentile(values, 99)
+            result = (max(limit.floor, p99 * self.factor),
+                      f"p99 {p99:.1f}s x {self.factor:g} over {len(values)} runs, floor {limit.floor:g}s")
+        with self.lock:
+            self.computed[key] = (time.time(), result)
+        return result
+
+    def limits(self, args, key=None):
+        """Limits of an argument list, under key instead of its command_key when given"""
+        key = key or command_key(args)
+        timeout, basis = self.timeout_for(key)
+        return Limits(key, timeout, self.stall_timeouts.get(key), self.retries.get(key, 0), basis)
+
+    def describe(self):
+        """Current limits of every known subcommand"""
+        return {key: self.limits(key.split(), key).to_dict() for key in LIMITS}
+
+
+def wait_for(process, limits, last_output):
+    """Wait for a process, raising CommandTimeout once it runs past limits
+
+    last_output() returns the time.monotonic() of the latest output line;
+    with limits.stall set, that long without output counts as a hang.
+    """
+    if not limits.timeout and not limits.stall:
+        return process.wait()
+    start = time.monotonic()
+    step = min(1.0, max(0.05, min(limit for limit in (limits.timeout, limits.stall) if limit) / 10))
+    while True:
+        try:
+            return process.wait(timeout=step)
+        except subprocess.TimeoutExpired:
+            pass
+        now = time.monotonic()
+        if limits.timeout and now - start >= limits.timeout:
+            raise CommandTimeout(process.args, limits.timeout,
+                                 f"arduino-cli {limits.key} did not finish within {limits.timeout:g}s ({limits.basis})")
+        if limits.stall and now - last_output() >= limits.stall:
+            raise CommandTimeout(process.args, limits.stall,
+                                 f"arduino-cli {limits.key} printed nothing for {limits.stall:g}s, "
+                                 f"the device stopped responding", stalled=True)
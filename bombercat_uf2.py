@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+BomberCat UF2 Tools
+Packs .bin/.elf images into RP2040 UF2 files and inspects existing UF2 files
+Block headers and payloads are written with strided memoryview assignments,
+so there is no per-byte (or per-block) Python loop
+"""
+import sys
+import struct
+from array import array
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+# UF2 block layout (all fields little-endian 32-bit words)
+UF2_MAGIC_START0 = 0x0A324655
+UF2_MAGIC_START1 = 0x9E5D5157
+UF2_MAGIC_END = 0x0AB16F30
+UF2_BLOCK_SIZE = 512
+UF2_MAX_PAYLOAD = 476
+
+UF2_FLAG_NOT_MAIN_FLASH = 0x00000001
+UF2_FLAG_FAMILY_ID_PRESENT = 0x00002000
+
+RP2040_FAMILY_ID = 0xE48BFF56
+RP2040_FLASH_BASE = 0x10000000
+RP2040_PAGE_SIZE = 256
+
+WORDS_PER_BLOCK = UF2_BLOCK_SIZE // 4
+
+# ELF constants
+PT_LOAD = 1
+
+
+class UF2Error(Exception):
+    """Raised for malformed input images"""
+
+
+@dataclass
+class UF2Info:
+    """Summary of a UF2 file"""
+    num_blocks: int = 0
+    family_id: Optional[int] = None
+    payload_size: int = 0
+    start_address: Optional[int] = None
+    end_address: Optional[int] = None
+    ranges: List[Tuple[int, int]] = field(default_factory=list)
+    gaps: List[Tuple[int, int]] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def valid(self):
+        return not self.errors
+
+    def to_dict(self):
+        return {
+            "num_blocks": self.num_blocks,
+            "family_id": f"0x{self.family_id:08x}" if self.family_id is not None else None,
+            "payload_size": self.payload_size,
+            "start_address": f"0x{self.start_address:08x}" if self.start_address is not None else None,
+            "end_address": f"0x{self.end_address:08x}" if self.end_address is not None else None,
+            "ranges": [[f"0x{a:08x}", f"0x{b:08x}"] for a, b in self.ranges],
+            "gaps": [[f"0x{a:08x}", f"0x{b:08x}"] for a, b in self.gaps],
+            "errors": list(self.errors),
+            "valid": self.valid
+        }
+
+
+def _le_words(values):
+    """Build a little-endian uint32 array regardless of host byte order"""
+    words = array("I", values)
+    if sys.byteorder == "big":
+        words.byteswap()
+    return words
+
+
+def _words_to_list(view):
+    """Decode a (possibly strided) uint32 memoryview as little-endian ints"""
+    words = array("I", view.tobytes())
+    if sys.byteorder == "big":
+        words.byteswap()
+    return words.tolist()
+
+
+def pack_pages(data, addresses, family_id=RP2040_FAMILY_ID, page_size=RP2040_PAGE_SIZE):
+    """Pack consecutive page_size chunks of data into UF2 blocks at the given addresses"""
+    if page_size % 4 or page_size > UF2_MAX_PAYLOAD:
+        raise UF2Error(f"Invalid page size: {page_size}")
+
+    count = len(addresses)
+    if len(data) != count * page_size:
+        raise UF2Error("Data length does not match the number of pages")
+
+    out = bytearray(count * UF2_BLOCK_SIZE)
+    if not count:
+        return bytes(out)
+
+    words = memoryview(out).cast("I")
+
+    # Header and footer words, one strided assignment per field
+    words[0::WORDS_PER_BLOCK] = _le_words([UF2_MAGIC_START0]) * count
+    words[1::WORDS_PER_BLOCK] = _le_words([UF2_MAGIC_START1]) * count
+    words[2::WORDS_PER_BLOCK] = _le_words([UF2_FLAG_FAMILY_ID_PRESENT]) * count
+    words[3::WORDS_PER_BLOCK] = _le_words(addresses)
+    words[4::WORDS_PER_BLOCK] = _le_words([page_size]) * count
+    words[5::WORDS_PER_BLOCK] = _le_words(range(count))
+    words[6::WORDS_PER_BLOCK] = _le_words([count]) * count
+    words[7::WORDS_PER_BLOCK] = _le_words([family_id]) * count
+    words[WORDS_PER_BLOCK - 1::WORDS_PER_BLOCK] = _le_words([UF2_MAGIC_END]) * count
+
+    # Payload, one strided assignment per column of 8 (or 4) bytes, copied verbatim
+    width = 8 if page_size % 8 == 0 else 4
+    fmt = "Q" if width == 8 else "I"
+    columns = memoryview(out).cast(fmt)
+    data_columns = memoryview(data).cast("B").cast(fmt)
+    per_page = page_size // width
+    per_block = UF2_BLOCK_SIZE // width
+    first = 32 // width
+    for column in range(per_page):
+        columns[first + column::per_block] = data_columns[column::per_page]
+
+    return bytes(out)
+
+
+def pack_bin(data, base_address=RP2040_FLASH_BASE, family_id=RP2040_FAMILY_ID, page_size=RP2040_PAGE_SIZE):
+    """Pack a raw flash image into UF2"""
+    if base_address % page_size:
+        raise UF2Error(f"Base address 0x{base_address:08x} is not page aligned")
+
+    remainder = len(data) % page_size
+    if remainder:
+        data = bytes(data) + b"\0" * (page_size - remainder)
+
+    count = len(data) // page_size
+    addresses = range(base_address, base_address + count * page_size, page_size)
+    return pack_pages(data, addresses, family_id, page_size)
+
+
+def elf_load_segments(elf_data):
+    """Return (physical_address, bytes) for every loadable segment of a 32-bit little-endian ELF"""
+    view = memoryview(elf_data)
+    if bytes(view[:4]) != b"\x7fELF":
+        raise UF2Error("Not an ELF file")
+    if view[4] != 1 or view[5] != 1:
+        raise UF2Error("Only 32-bit little-endian ELF files are supported")
+
+    e_phoff, = struct.unpack_from("<I", view, 28)
+    e_phentsize, e_phnum = struct.unpack_from("<HH", view, 42)
+
+    segments = []
+    for index in range(e_phnum):
+        p_type, p_offset, _, p_paddr, p_filesz = struct.unpack_from("<5I", view, e_phoff + index * e_phentsize)
+        if p_type == PT_LOAD and p_filesz:
+            segments.append((p_paddr, bytes(view[p_offset:p_offset + p_filesz])))
+    return segments
+
+
+def pack_elf(elf_data, family_id=RP2040_FAMILY_ID, page_size=RP2040_PAGE_SIZE,
+             flash_start=RP2040_FLASH_BASE, flash_end=RP2040_FLASH_BASE + 16 * 1024 * 1024):
+    """Pack the flash-resident loadable segments of an ELF into UF2"""
+    segments = [(addr, data) for addr, data in elf_load_segments(elf_data)
+                if flash_start <= addr < flash_end]
+    if not segments:
+        raise UF2Error("ELF has no loadable segments in flash")
+
+    low = min(addr for addr, _ in segments) // page_size * page_size
+    high = max(addr + len(data) for addr, data in segments)
+    high = -(-high // page_size) * page_size
+
+    image = bytearray(high - low)
+    touched = set()
+    for addr, data in segments:
+        image[addr - low:addr - low + len(data)] = data
+        touched.update(range((addr - low) // page_size, -(-(addr - low + len(data)) // page_size)))
+
+    pages = sorted(touched)
+    if len(pages) == len(image) // page_size:
+        payload = bytes(image)
+    else:
+        view = memoryview(image)
+        payload = b"".join(view[p * page_size:(p + 1) * page_size] for p in pages)
+    addresses = [low + p * page_size for p in pages]
+    return pack_pages(payload, addresses, family_id, page_size)
+
+
+def inspect_uf2(data, family_id=RP2040_FAMILY_ID):
+    """Parse and validate a UF2 image (magic numbers, block counts, address ranges, gaps)"""
+    info = UF2Info()
+    if not data or len(data) % UF2_BLOCK_SIZE:
+        info.errors.append(f"File size {len(data)} is not a multiple of {UF2_BLOCK_SIZE}")
+        return info
+
+    count = len(data) // UF2_BLOCK_SIZE
+    info.num_blocks = count
+    words = memoryview(data).cast("B").cast("I")
+
+    magic0 = _words_to_list(words[0::WORDS_PER_BLOCK])
+    magic1 = _words_to_list(words[1::WORDS_PER_BLOCK])
+    magic_end = _words_to_list(words[WORDS_PER_BLOCK - 1::WORDS_PER_BLOCK])
+    flags = _words_to_list(words[2::WORDS_PER_BLOCK])
+    addresses = _words_to_list(words[3::WORDS_PER_BLOCK])
+    sizes = _words_to_list(words[4::WORDS_PER_BLOCK])
+    block_numbers = _words_to_list(words[5::WORDS_PER_BLOCK])
+    totals = _words_to_list(words[6::WORDS_PER_BLOCK])
+    families = _words_to_list(words[7::WORDS_PER_BLOCK])
+
+    if (magic0.count(UF2_MAGIC_START0) != count or magic1.count(UF2_MAGIC_START1) != count
+            or magic_end.count(UF2_MAGIC_END) != count):
+        bad_magic = [i for i in range(count) if magic0[i] != UF2_MAGIC_START0
+                     or magic1[i] != UF2_MAGIC_START1 or magic_end[i] != UF2_MAGIC_END]
+        info.errors.append(f"{len(bad_magic)} blocks with bad magic (first at block {bad_magic[0]})")
+        return info
+
+    if block_numbers != list(range(count)):
+        info.errors.append("Block numbers are not sequential")
+    if set(totals) != {count}:
+        info.errors.append(f"numBlocks field does not match block count {count}")
+
+    oversized = [s for s in sizes if s > UF2_MAX_PAYLOAD or s == 0]
+    if oversized:
+        info.errors.append(f"{len(oversized)} blocks with invalid payload size")
+    info.payload_size = max(sizes)
+
+    family_ids = {families[i] for i in range(count) if flags[i] & UF2_FLAG_FAMILY_ID_PRESENT}
+    if len(family_ids) > 1:
+        info.errors.append("Mixed family IDs: " + ", ".join(f"0x{f:08x}" for f in sorted(family_ids)))
+    elif family_ids:
+        info.family_id = family_ids.pop()
+        if family_id is not None and info.family_id != family_id:
+            info.errors.append(f"Family ID 0x{info.family_id:08x} does not match 0x{family_id:08x}")
+    elif family_id is not None:
+        info.errors.append("No family ID present")
+
+    spans = sorted((addresses[i], addresses[i] + sizes[i]) for i in range(count)
+                   if not flags[i] & UF2_FLAG_NOT_MAIN_FLASH)
+    for start, end in spans:
+        if info.ranges and start < info.ranges[-1][1]:
+            info.errors.append(f"Overlapping blocks at 0x{start:08x}")
+            info.ranges[-1] = (info.ranges[-1][0], max(end, info.ranges[-1][1]))
+        elif info.ranges and start == info.ranges[-1][1]:
+            info.ranges[-1] = (info.ranges[-1][0], end)
+        else:
+            if info.ranges:
+                info.gaps.append((info.ranges[-1][1], start))
+            info.ranges.append((start, end))
+
+    if info.ranges:
+        info.start_address = info.ranges[0][0]
+        info.end_address = info.ranges[-1][1]
+
+    return info
+
+
+def convert_to_uf2(path, out_path=None):
+    """Convert a .bin or .elf build artifact into a .uf2 next to it"""
+    path = Path(path)
+    data = path.read_bytes()
+    if data[:4] == b"\x7fELF":
+        uf2_data = pack_elf(data)
+    else:
+        uf2_data = pack_bin(data)
+
+    out_path = Path(out_path) if out_path else path.with_suffix(".uf2")
+    out_path.write_bytes(uf2_data)
+    return out_path
+
+
+def main():
+    if len(sys.argv) >= 3 and sys.argv[1] == "pack":
+        out_path = convert_to_uf2(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None)
+        print(f"✅ Wrote {out_path}")
+    elif len(sys.argv) == 3 and sys.argv[1] == "info":
+        info = inspect_uf2(Path(sys.argv[2]).read_bytes())
+        for key, value in info.to_dict().items():
+            print(f"{key}: {value}")
+        sys.exit(0 if info.valid else 1)
+    else:
+        print("Usage: bombercat_uf2.py pack <image.bin|image.elf> [out.uf2]")
+        print("       bombercat_uf2.py info <image.uf2>")
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+BomberCat Warm-up
+Runs the slow first-flash preparation (CLI check, index refresh, firmware
+prefetch, catalog, core precompile) in the background after the server
+starts, and reports per-step readiness for the status API
+"""
+import time
+import threading
+
+
+class SkipStep(Exception):
+    """Raised by a step that has nothing to do in the current setup"""
+
+
+class Warmup:
+    """Ordered warm-up steps run once in a background task
+
+    steps is a list of (name, func). A step that fails or is skipped does
+    not stop the others; each step checks its own preconditions.
+    """
+
+    def __init__(self, steps, start_task=None, emit=None):
+        self.steps = list(steps)
+        self.start_task = start_task or (lambda func: threading.Thread(target=func, daemon=True).start())
+        self.emit = emit or (lambda event, data: None)
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.state = "idle"
+        self.started = None
+        self.finished = None
+        self.results = {name: {"name": name, "status": "pending"} for name, _ in self.steps}
+
+    def start(self):
+        with self.lock:
+            if self.state != "idle":
+                return False
+            self.state = "running"
+            self.started = time.time()
+        self.start_task(self.run)
+        return True
+
+    def run(self):
+        try:
+            for name, func in self.steps:
+                result = self.results[name]
+                result["status"] = "running"
+                self.emit("warmup_status", self.status())
+                step_start = time.time()
+                try:
+                    detail = func()
+                    result["status"] = "done"
+                    if detail:
+                        result["detail"] = detail
+                except SkipStep as e:
+                    result["status"] = "skipped"
+                    result["detail"] = str(e)
+                except Exception as e:
+                    result["status"] = "failed"
+                    result["error"] = str(e)
+                result["elapsed"] = round(time.time() - step_start, 2)
+        finally:
+            with self.lock:
+                self.state = "finished"
+                self.finished = time.time()
+            self.done.set()
+            self.emit("warmup_status", self.status())
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+    def status(self):
+        with self.lock:
+            steps = [dict(self.results[name]) for name, _ in self.steps]
+            end = self.finished or time.time()
+            return {
+                "state": self.state,
+                "ready": self.state == "finished" and all(s["status"] in ("done", "skipped") for s in steps),
+                "elapsed": round(end - self.started, 2) if self.started else None,
+                "steps": steps
+            }
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+BomberCat Sketch Workspaces
+Each job gets its own copy-on-write view of a pristine sketch snapshot:
+files are reflinked where the filesystem supports it and hardlinked
+otherwise, and every write replaces the file instead of modifying it in
+place, so jobs never see each other's edits
+"""
+import os
+import uuid
+import stat
+import shutil
+import hashlib
+import platform
+import threading
+from pathlib import Path
+
+# ioctl request number of FICLONE (Linux, btrfs/xfs/bcachefs...)
+FICLONE = 0x40049409
+
+READ_ONLY = stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH
+
+
+def reflink_file(src, dst):
+    """Clone src to dst sharing extents; raises OSError when unsupported"""
+    import fcntl
+    with open(src, "rb") as s, open(dst, "wb") as d:
+        try:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        except OSError:
+            d.close()
+            os.unlink(dst)
+            raise
+
+
+def replace_file(path, content, encoding="utf-8"):
+    """Write a file through a temp file and os.replace
+
+    Replacing the directory entry gives the path a new inode, so a file
+    that is hardlinked to a snapshot is broken out instead of modified.
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    data = content.encode(encoding) if isinstance(content, str) else content
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def tree_digest(source_dir):
+    """Content hash of a directory tree, used to name its snapshot"""
+    digest = hashlib.sha256()
+    source_dir = Path(source_dir)
+    for path in sorted(source_dir.rglob("*")):
+        if path.is_file():
+            digest.update(path.relative_to(source_dir).as_posix().encode() + b"\0")
+            digest.update(path.read_bytes())
+            digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+class Workspace:
+    """A job's private sketch directory"""
+
+    def __init__(self, store, root, sketch_path, method, snapshot=None):
+        self.store = store
+        self.root = root
+        self.sketch_path = sketch_path
+        self.method = method
+        self.snapshot = snapshot
+
+    def release(self):
+        self.store.release(self)
+
+
+class WorkspaceStore:
+    """Pristine sketch snapshots and the per-job workspaces created from them
+
+    Layout: <root>/snapshots/<digest>/<sketch name> (read-only files) and
+    <root>/jobs/<job id>/<sketch name>. Snapshots behind a workspace made
+    by checkout() are pinned until it is released and never pruned.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.snapshots_dir = self.root / "snapshots"
+        self.jobs_dir = self.root / "jobs"
+        self.lock = threading.RLock()
+        self.pins = {}
+        # Reflinks are only attempted until the filesystem first refuses them
+        self.reflinks = platform.system() == "Linux"
+
+    def snapshot(self, source_dir):
+        """Freeze a sketch directory; identical trees share one snapshot"""
+        source_dir = Path(source_dir)
+        snapshot = self.snapshots_dir / tree_digest(source_dir) / source_dir.name
+        with self.lock:
+            if snapshot.exists():
+                return snapshot
+
+            staging = self.snapshots_dir / f".staging-{uuid.uuid4().hex[:8]}"
+            shutil.copytree(source_dir, staging / source_dir.name)
+            for path in (staging / source_dir.name).rglob("*"):
+                if path.is_file():
+                    path.chmod(READ_ONLY)
+            snapshot.parent.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(staging, snapshot.parent)
+        return snapshot
+
+    def create(self, snapshot, job_id=None):
+        """Create a job workspace linked to a snapshot"""
+        snapshot = Path(snapshot)
+        job_root = self.jobs_dir / (job_id or uuid.uuid4().hex[:12])
+        if job_root.exists():
+            shutil.rmtree(job_root, onerror=self._force_remove)
+        sketch_path = job_root / snapshot.name
+
+        methods = set()
+        for dirpath, dirnames, filenames in os.walk(snapshot):
+            relative = Path(dirpath).relative_to(snapshot)
+            target_dir = sketch_path / relative
+            target_dir.mkdir(parents=True, exist_ok=True)
+            for name in filenames:
+                methods.add(self.clone(Path(dirpath) / name, target_dir / name))
+
+        method = "+".join(sorted(methods)) or "empty"
+        return Workspace(self, job_root, sketch_path, method)
+
+    def checkout(self, source_dir, job_id=None):
+        """Snapshot a sketch and create a job workspace from it
+
+        When the sources changed (e.g. a new firmware download) the older
+        snapshots of the same sketch that no workspace uses are pruned.
+        """
+        source_dir = Path(source_dir)
+        with self.lock:
+            existing = set(self.snapshots_dir.iterdir()) if self.snapshots_dir.exists() else set()
+            snapshot = self.snapshot(source_dir)
+            self.pin(snapshot, 1)
+            if snapshot.parent not in existing:
+                self.prune(keep=[snapshot], name=snapshot.name)
+        try:
+            workspace = self.create(snapshot, job_id)
+        except BaseException:
+            self.pin(snapshot, -1)
+            raise
+        workspace.snapshot = snapshot
+        return workspace
+
+    def pin(self, snapshot, count):
+        """Add count (+1/-1) users of a snapshot"""
+        digest = Path(snapshot).parent.name
+        with self.lock:
+            self.pins[digest] = self.pins.get(digest, 0) + count
+            if self.pins[digest] <= 0:
+                del self.pins[digest]
+
+    def clone(self, src, dst):
+        """Reflink, hardlink or (last resort) copy one file"""
+        if self.reflinks:
+            try:
+                reflink_file(src, dst)
+                return "reflink"
+            except OSError:
+                self.reflinks = False
+        try:
+            os.link(src, dst)
+            return "hardlink"
+        except OSError:
+            shutil.copy2(src, dst)
+            return "copy"
+
+    def release(self, workspace):
+        """Delete a job workspace; the snapshot is left untouched"""
+        try:
+            shutil.rmtree(workspace.root, onerror=self._force_remove)
+        finally:
+            if workspace.snapshot is not None:
+                self.pin(workspace.snapshot, -1)
+                workspace.snapshot = None
+
+    def prune(self, keep=(), name=None):
+        """Delete unpinned snapshots other than the ones in keep, only those of sketch name if given"""
+        keep = {Path(path).parent.name for path in keep}
+        with self.lock:
+            if not self.snapshots_dir.exists():
+                return
+            for entry in self.snapshots_dir.iterdir():
+                if entry.name in keep or entry.name in self.pins or entry.name.startswith(".staging-"):
+                    continue
+                if name is not None and not (entry / name).is_dir():
+                    continue
+                shutil.rmtree(entry, onerror=self._force_remove)
+
+    @staticmethod
+    def _force_remove(func, path, exc_info):
+        """Make read-only snapshot entries writable so they can be removed"""
+        os.chmod(os.path.dirname(path), stat.S_IRWXU)
+        if os.path.isfile(path):
+            os.chmod(path, stat.S_IRUSR | stat.S_IWUSR)
+        func(path)
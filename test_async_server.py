@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the async server mode and bounded blocking work
+The load test measures /api/status latency while 4 fake compiles run
+"""
+import os
+import sys
+import json
+import time
+import socket
+import shutil
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+
+# Add current directory to path to import bombercat modules
+sys.path.insert(0, '.')
+
+from bombercat_async import ASYNC_MODES, BlockingWork, mode_available, resolve_async_mode
+
+REPO_DIR = Path(__file__).resolve().parent
+
+COMPILES = 4
+REQUESTS = 300
+P99_BUDGET_MS = 250
+
+# Burns CPU for a second like a compiler, then writes the build output
+FAKE_CLI = """#!{python}
+import sys, time
+from pathlib import Path
+args = sys.argv[1:]
+end = time.time() + 1.0
+while time.time() < end:
+    sum(range(1000))
+if args[0] == "compile":
+    build = Path(args[args.index("--build-path") + 1])
+    (build / "BomberCat.ino.bin").write_bytes(b"\\0" * 256)
+"""
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def run_load_test(mode):
+    """Serve the app in the given mode and time status requests during 4 compiles"""
+    from bombercat_async import patch_for
+    patch_for(mode)
+
+    import urllib.request
+    from bombercat_relay import ArduinoCLI, Config, FirmwareManager, create_app
+
+    root = Path(tempfile.mkdtemp(prefix="bombercat-async-"))
+    os.chdir(root)
+    try:
+        cli = root / "arduino-cli"
+        cli.write_text(FAKE_CLI.format(python=sys.executable))
+        cli.chmod(0o755)
+        sketch = root / "BomberCat"
+        sketch.mkdir()
+        (sketch / "BomberCat.ino").write_text("void setup() {}\nvoid loop() {}\n")
+
+        cfg = Config(async_mode=mode, build_dir=str(root / "build"), sketch_dir=str(root / "sketch"),
+                     use_ccache=False, use_build_cache=False, run_history_path=str(root / "runs.sqlite3"))
+        app = create_app(cfg)
+        socketio = app.extensions["bombercat"]["socketio"]
+        port = free_port()
+        socketio.start_background_task(socketio.run, app, host="127.0.0.1", port=port,
+                                       allow_unsafe_werkzeug=True, log_output=False)
+        url = f"http://127.0.0.1:{port}/api/status"
+
+        deadline = time.time() + 10
+        while True:
+            try:
+                urllib.request.urlopen(url, timeout=1).read()
+                break
+            except OSError:
+                if time.time() > deadline:
+                    raise
+                time.sleep(0.05)
+
+        finished = []
+
+        def compile_job(i):
+            arduino = ArduinoCLI(socketio, cfg)
+            arduino.cli_path = str(cli)
+            arduino.emit_log = lambda message, level="info": None
+            manager = FirmwareManager(arduino, socketio, Config(build_dir=str(root / f"build{i}"),
+                                                                sketch_dir=cfg.sketch_dir, use_ccache=False,
+                                                                use_build_cache=False))
+            manager.sketch_path = sketch
+            manager.compile_firmware("rp2040:rp2040:rpipico")
+            finished.append(time.time())
+
+        start = time.time()
+        for i in range(COMPILES):
+            socketio.start_background_task(compile_job, i)
+
+        latencies = []
+        while len(latencies) < REQUESTS:
+            t0 = time.perf_counter()
+            body = json.loads(urllib.request.urlopen(url, timeout=10).read())
+            latencies.append((time.perf_counter() - t0) * 1000)
+            if len(finished) == COMPILES and len(latencies) >= REQUESTS // 2:
+                break
+            socketio.sleep(0.005)
+
+        while len(finished) < COMPILES and time.time() - start < 30:
+            socketio.sleep(0.05)
+
+        return {
+            "mode": body["async_mode"],
+            "requests": len(latencies),
+            "compiles": len(finished),
+            "compile_wall": round(max(finished) - start, 2) if finished else None,
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "max_ms": round(max(latencies), 2)
+        }
+    finally:
+        os.chdir(REPO_DIR)
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def load_test_in_subprocess(mode):
+    result = subprocess.run([sys.executable, str(Path(__file__).resolve()), "--load-test", mode],
+                            capture_output=True, text=True, timeout=120, cwd=REPO_DIR)
+    assert result.returncode == 0, result.stderr[-2000:]
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_blocking_work_is_bounded():
+    """No more than max_workers blocking calls run at once"""
+    print("🧪 Testing bounded blocking work...")
+
+    work = BlockingWork("threading", max_workers=2)
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def blocking_call():
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        time.sleep(0.1)
+        with lock:
+            running.pop()
+        return "done"
+
+    start = time.time()
+    threads = [threading.Thread(target=lambda: work.run(blocking_call)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert max(peak) == 2
+    assert time.time() - start >= 0.3
+    stats = work.stats()
+    assert stats["completed"] == 6 and stats["active"] == 0 and stats["waiting"] == 0
+    print(f"✅ Peak concurrency {max(peak)}, average wait {stats['avg_wait_ms']} ms")
+
+
+def test_resolve_async_mode():
+    """Unknown modes are rejected, missing or unpatched ones fall back to threading"""
+    assert resolve_async_mode("threading") == "threading"
+    assert resolve_async_mode("") == "threading"
+    for mode in ("eventlet", "gevent"):
+        assert resolve_async_mode(mode) == (mode if mode_available(mode) else "threading")
+        # This process never monkey patched, so create_app() would not use the green mode
+        assert resolve_async_mode(mode, require_patched=True) == "threading"
+    try:
+        resolve_async_mode("asyncio")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("asyncio is not a supported async mode")
+
+
+def test_status_latency_during_compiles():
+    """/api/status p99 stays low while 4 compiles run, in every installed async mode"""
+    print("\n🧪 Load testing /api/status during 4 compiles...")
+
+    for mode in ASYNC_MODES:
+        if not mode_available(mode):
+            print(f"   {mode}: not installed, skipped")
+            continue
+        report = load_test_in_subprocess(mode)
+        print(f"   {mode}: {report['requests']} requests, p50 {report['p50_ms']} ms, "
+              f"p99 {report['p99_ms']} ms, 4 compiles in {report['compile_wall']}s")
+        assert report["mode"] == mode
+        assert report["compiles"] == COMPILES
+        # The compiles overlapped instead of queuing behind each other
+        assert report["compile_wall"] < COMPILES * 1.0
+        assert report["p99_ms"] < P99_BUDGET_MS
+    print("✅ Status endpoint stayed responsive")
+
+
+def main():
+    if len(sys.argv) == 3 and sys.argv[1] == "--load-test":
+        report = run_load_test(sys.argv[2])
+        print(json.dumps(report))
+        return
+
+    print("""
+╔══════════════════════════════════════════════╗
+║        🧪 ASYNC SERVER MODE LOAD TEST 🧪     ║
+╚══════════════════════════════════════════════╝
+""")
+    test_blocking_work_is_bounded()
+    test_resolve_async_mode()
+    test_status_latency_during_compiles()
+    print("\n✅ ALL TESTS PASSED!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the persistent board registry
+Boards are recorded after a flash, enrich detection and are skipped when unchanged;
+a fake arduino-cli compiles the configuration into the image and logs uploads
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add current directory to path to import bombercat modules
+sys.path.insert(0, '.')
+
+from bombercat_registry import BoardRegistry
+
+REPO_DIR = Path(__file__).resolve().parent
+
+FQBN = "electroniccats:rp2040:bombercat"
+
+# The image embeds the configuration header, so a new config changes its hash
+FAKE_CLI = """#!{python}
+import sys
+from pathlib import Path
+args = sys.argv[1:]
+with open({log!r}, "a") as log:
+    log.write(" ".join(args) + "\\n")
+if args[0] == "compile":
+    sketch = next(Path(arg) for arg in args if (Path(arg) / "bombercat_config.h").exists())
+    build = Path(args[args.index("--build-path") + 1])
+    build.mkdir(parents=True, exist_ok=True)
+    (build / (sketch.name + ".ino.bin")).write_bytes((sketch / "bombercat_config.h").read_bytes())
+"""
+
+
+def fake_port(device, serial_number, location="1-1.2:1.0"):
+    """Create an object shaped like a pyserial ListPortInfo"""
+    return SimpleNamespace(device=device, description="BomberCat", hwid=f"USB SER={serial_number}", vid=0x2E8A,
+                           pid=0x000A, serial_number=serial_number, location=location,
+                           manufacturer="Electronic Cats", product="BomberCat")
+
+
+def test_registry_records():
+    """Boards are keyed by serial number, else USB location, and looked up by index"""
+    print("🧪 Testing board registry records...")
+    root = Path(tempfile.mkdtemp(prefix="bombercat-registry-"))
+    try:
+        registry = BoardRegistry(root / "boards.sqlite3")
+        registry.record_flash("E661A", "1-1.2:1.0", 0x2E8A, 0x000A, "/dev/ttyACM0", FQBN, "host_Relay_NFC",
+                              "a" * 64, "c" * 64)
+        registry.record_flash(None, "1-1.3:1.0", port="/dev/ttyACM1", fqbn=FQBN, firmware="client_Relay_NFC")
+        assert registry.record_flash(None, None) is None
+
+        record = registry.lookup("E661A")
+        assert record["firmware"] == "host_Relay_NFC" and record["flash_count"] == 1
+        assert registry.lookup(location="1-1.3:1.0")["firmware"] == "client_Relay_NFC"
+        # A board with a serial number is not found through a location it happened to use
+        assert registry.lookup(location="1-1.2:1.0") is None
+
+        registry.record_flash("E661A", "1-1.4:1.0", port="/dev/ttyACM2", fqbn=FQBN, firmware="host_Relay_NFC",
+                              artifact_hash="b" * 64, config_hash="c" * 64)
+        record = registry.lookup("E661A")
+        assert record["flash_count"] == 2 and record["port"] == "/dev/ttyACM2"
+        assert registry.is_up_to_date(record, FQBN, "host_Relay_NFC", "b" * 64, "c" * 64)
+        assert not registry.is_up_to_date(record, FQBN, "host_Relay_NFC", "a" * 64, "c" * 64)
+        assert not registry.is_up_to_date(None, FQBN, "host_Relay_NFC", "b" * 64, "c" * 64)
+        registry.close()
+
+        # Survives a restart, and lookups stay fast with many boards
+        registry = BoardRegistry(root / "boards.sqlite3")
+        for i in range(5000):
+            registry.record_flash(f"SN{i:05d}", fqbn=FQBN, firmware="host_Relay_NFC")
+        assert registry.lookup("E661A")["flash_count"] == 2
+        plan = registry.db.execute("EXPLAIN QUERY PLAN SELECT * FROM boards WHERE serial_number = ?",
+                                   ("SN04999",)).fetchall()
+        assert any("boards_serial" in row[-1] for row in plan), plan
+        start = time.perf_counter()
+        for i in range(1000):
+            registry.lookup(f"SN{i * 5:05d}")
+        per_lookup = (time.perf_counter() - start) / 1000
+        assert per_lookup < 0.005
+        registry.close()
+        print(f"✅ Registry OK, {per_lookup * 1e6:.0f} µs per lookup among 5002 boards")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def test_flash_skips_unchanged_boards():
+    """Detection shows the last flash and an unchanged build is not flashed again"""
+    print("\n🧪 Testing registry in the flash flow...")
+
+    from bombercat_relay import Config, create_app
+
+    root = Path(tempfile.mkdtemp(prefix="bombercat-registry-"))
+    old_home = os.environ.get("HOME")
+    os.environ["HOME"] = str(root)
+    os.chdir(root)
+    try:
+        log = root / "cli.log"
+        cli = root / "arduino-cli"
+        cli.write_text(FAKE_CLI.format(python=sys.executable, log=str(log)))
+        cli.chmod(0o755)
+        sketch = root / "sketch" / "BomberCat-main" / "firmware" / "host_Relay_NFC"
+        sketch.mkdir(parents=True)
+        (sketch / "host_Relay_NFC.ino").write_text("void setup() {}\nvoid loop() {}\n")
+
+        cfg = Config(build_dir=str(root / "build"), sketch_dir=str(root / "sketch"), use_build_cache=False,
+                     use_ccache=False, async_mode="threading", board_registry_path=str(root / "boards.sqlite3"))
+        app = create_app(cfg)
+        services = app.extensions["bombercat"]
+        arduino = services["arduino_cli"]
+        arduino.cli_path = str(cli)
+        # The extracted firmware archive counts as freshly fetched
+        services["firmware_manager"].firmware_fetched_at = time.time()
+        inventory = services["port_inventory"]
+        inventory.list_ports = lambda: [fake_port("/dev/ttyACM0", "E661A")]
+        inventory.bootsel_scanner = lambda: {"in_bootsel": False, "bootsel_path": None}
+        inventory.refresh()
+
+        messages = []
+        arduino.emit_log = lambda message, level="info": messages.append(message)
+        arduino.emit_progress = lambda progress: None
+
+        client = app.test_client()
+        assert client.get("/api/detect_boards").get_json()["ports"][0]["registry"] is None
+
+        def flash(host_number, force=False):
+            messages.clear()
+            response = client.post("/api/flash", json={"port": "/dev/ttyACM0", "wifi_ssid": "lab",
+                                                        "host_number": host_number, "fqbn": FQBN, "force": force})
+            assert response.status_code == 200
+            deadline = time.time() + 20
+            while time.time() < deadline:
+                if any("ready to use" in m or "skipping flash" in m or "Flash failed" in m for m in messages):
+                    break
+                time.sleep(0.05)
+            assert not any("Flash failed" in m for m in messages), "\n".join(messages)
+            return sum(1 for line in log.read_text().splitlines() if line.startswith("upload"))
+
+        assert flash(1) == 1
+        port = client.get("/api/detect_boards").get_json()["ports"][0]
+        record = port["registry"]
+        assert record["serial_number"] == "E661A" and record["location"] == "1-1.2:1.0"
+        assert record["firmware"] == "host_Relay_NFC" and record["fqbn"] == FQBN
+        assert len(record["artifact_hash"]) == 64 and len(record["config_hash"]) == 64
+
+        # Same build: skipped; forced or new config: flashed
+        assert flash(1) == 1
+        assert any("skipping flash" in m for m in messages)
+        assert flash(1, force=True) == 2
+        assert flash(2) == 3
+        record = client.get("/api/detect_boards").get_json()["ports"][0]["registry"]
+        assert record["flash_count"] == 3 and record["config_hash"] != port["registry"]["config_hash"]
+        print("✅ Unchanged board skipped, forced and reconfigured boards flashed")
+    finally:
+        os.chdir(REPO_DIR)
+        if old_home is None:
+            os.environ.pop("HOME", None)
+        else:
+            os.environ["HOME"] = old_home
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main():
+    print("""
+╔══════════════════════════════════════════════╗
+║        🧪 BOARD IDENTITY REGISTRY 🧪         ║
+╚══════════════════════════════════════════════╝
+""")
+    test_registry_records()
+    test_flash_skips_unchanged_boards()
+    print("\n✅ ALL TESTS PASSED!")
+
+
+if __name__ == "__main__":
+    main()
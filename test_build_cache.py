@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the shared, size-bounded build cache
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+
+# Add current directory to path to import bombercat modules
+sys.path.insert(0, '.')
+
+from bombercat_buildcache import BuildCache, installed_core_version
+
+FQBN = "rp2040:rp2040:rpipico"
+
+
+def fill(path, size):
+    """Write size bytes of objects into a cache directory"""
+    path.mkdir(parents=True, exist_ok=True)
+    (path / "objects.a").write_bytes(b"\0" * size)
+
+
+def test_lru_eviction():
+    """Oldest entries go first, entries in use are never evicted"""
+    print("🧪 Testing LRU eviction...")
+
+    root = Path(tempfile.mkdtemp(prefix="bombercat-buildcache-"))
+    try:
+        cache = BuildCache(root / "cache", max_bytes=10_000)
+        paths = {
+            "core": cache.core_cache_path(FQBN, "3.9.0"),
+            "relay": cache.build_path(FQBN, "3.9.0", "host_Relay_NFC"),
+            "client": cache.build_path(FQBN, "3.9.0", "client_Relay_NFC"),
+            "old_core": cache.core_cache_path(FQBN, "3.8.0"),
+        }
+        now = time.time()
+        for age, name in enumerate(["client", "relay", "core", "old_core"]):
+            with cache.use(paths[name]):
+                fill(paths[name], 4_000)
+            os.utime(paths[name] / ".last_used", (now - age * 60, now - age * 60))
+
+        usage = cache.usage()
+        assert usage["total_bytes"] == 16_000
+        assert [e["kind"] for e in usage["entries"]] == ["build", "build", "core", "core"]
+        assert usage["entries"][0]["sketch"] == "client_Relay_NFC"
+
+        # old_core is the least recently used but busy, so core and relay go instead
+        with cache.use(paths["old_core"]):
+            evicted = cache.evict()
+        assert [e["path"] for e in evicted] == [paths["core"], paths["relay"]]
+        assert paths["old_core"].exists() and paths["client"].exists()
+        assert cache.usage()["total_bytes"] <= 10_000
+
+        # Once nothing is left for a (FQBN, core version) its directory is removed too
+        cache.evict(max_bytes=0)
+        assert list((root / "cache").iterdir()) == []
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    print("✅ Least recently used entries evicted")
+
+
+def test_installed_core_version():
+    """The core version comes from the installed platform directories"""
+    root = Path(tempfile.mkdtemp(prefix="bombercat-buildcache-"))
+    try:
+        for version in ("3.8.0", "3.10.1", "3.9.0"):
+            (root / "packages" / "rp2040" / "hardware" / "rp2040" / version).mkdir(parents=True)
+        assert installed_core_version(FQBN, root) == "3.10.1"
+        assert installed_core_version("electroniccats:rp2040:bombercat", root) == "unknown"
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def test_firmware_manager_uses_cache():
+    """compile_firmware builds into the cache and upload reads from the same place"""
+    print("\n🧪 Testing FirmwareManager build cache...")
+
+    from bombercat_relay import ArduinoCLI, Config, FirmwareManager
+
+    root = Path(tempfile.mkdtemp(prefix="bombercat-buildcache-"))
+    try:
+        cfg = Config(build_dir=str(root / "build"), sketch_dir=str(root / "sketch"), use_ccache=False,
+                     build_cache_dir=str(root / "cache"), build_cache_max_size=1_000)
+        arduino = ArduinoCLI(None, cfg)
+        arduino.emit_log = lambda message, level="info": None
+        arduino.emit_progress = lambda progress: None
+
+        commands = []
+
+        def run_command(*args, **kwargs):
+            commands.append(args)
+            if args[0] == "compile":
+                build_path = Path(args[args.index("--build-path") + 1])
+                fill(Path(args[args.index("--build-cache-path") + 1]), 600)
+                fill(build_path, 600)
+
+        arduino.run_command = run_command
+        manager = FirmwareManager(arduino, None, cfg)
+
+        for sketch_name in ("host_Relay_NFC", "client_Relay_NFC"):
+            manager.sketch_path = root / sketch_name
+            manager.compile_firmware(FQBN)
+
+        compile_args = commands[-1]
+        build_path = Path(compile_args[compile_args.index("--build-path") + 1])
+        core_path = Path(compile_args[compile_args.index("--build-cache-path") + 1])
+        assert build_path.name == "client_Relay_NFC" and core_path.name == "core"
+        assert root / "cache" in build_path.parents
+        assert manager.build_path == build_path
+
+        # The cap only fits the entries of the last compile
+        usage = manager.get_build_cache().usage()
+        assert usage["total_bytes"] == 1_200
+        assert not (build_path.parent / "host_Relay_NFC").exists()
+
+        (build_path / "client_Relay_NFC.ino.uf2").write_bytes(b"uf2")
+        assert manager.find_uf2() == build_path / "client_Relay_NFC.ino.uf2"
+
+        manager.flash_firmware(FQBN, "/dev/ttyACM0")
+        assert commands[-1][commands[-1].index("--input-dir") + 1] == str(build_path)
+        assert not (root / "build").exists()
+        manager.release_build()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    print("✅ Builds cached per FQBN/core version and bounded")
+
+
+def test_builds_are_kept_per_configuration():
+    """Jobs compiling one sketch with different settings never share a build directory"""
+    print("\n🧪 Testing build directories per configuration...")
+
+    from bombercat_relay import ArduinoCLI, Config, FirmwareManager
+
+    root = Path(tempfile.mkdtemp(prefix="bombercat-buildcache-"))
+    try:
+        cfg = Config(build_dir=str(root / "build"), sketch_dir=str(root / "sketch"), use_ccache=False,
+                     build_cache_dir=str(root / "cache"))
+        arduino = ArduinoCLI(None, cfg)
+        arduino.emit_log = lambda message, level="info": None
+        arduino.emit_progress = lambda progress: None
+        compiled = []
+
+        def run_command(*args, **kwargs):
+            if args[0] == "compile":
+                compiled.append(Path(args[args.index("--build-path") + 1]))
+
+        arduino.run_command = run_command
+
+        def manager(config_hash):
+            manager = FirmwareManager(arduino, None, cfg)
+            manager.build_locks, manager.build_cache = shared.build_locks, shared.get_build_cache()
+            manager.sketch_path = root / "host_Relay_NFC"
+            manager.source_digest = "0123456789abcdef"
+            manager.config_hash = config_hash
+            return manager
+
+        shared = FirmwareManager(arduino, None, cfg)
+        first, second, same = manager("a" * 64), manager("b" * 64), manager("a" * 64)
+        first.compile_firmware(FQBN)
+        second.compile_firmware(FQBN)
+        assert first.build_path != second.build_path
+        assert first.build_path.name.startswith("host_Relay_NFC-")
+
+        # The same configuration waits until the first job has uploaded from it
+        thread = threading.Thread(target=same.compile_firmware, args=(FQBN,), daemon=True)
+        thread.start()
+        time.sleep(0.3)
+        assert len(compiled) == 2
+        assert all(e["in_use"] for e in shared.get_build_cache().entries() if e["kind"] == "build")
+        first.release_workspace()
+        thread.join(5)
+        assert compiled[2] == first.build_path == same.build_path
+        same.release_build()
+        second.release_build()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    print("✅ One build directory per sketch configuration, held until the upload")
+
+
+def main():
+    print("""
+╔══════════════════════════════════════════════╗
+║       🧪 SHARED BUILD CACHE WITH LRU 🧪      ║
+╚══════════════════════════════════════════════╝
+""")
+    test_lru_eviction()
+    test_installed_core_version()
+    test_firmware_manager_uses_cache()
+    test_builds_are_kept_per_configuration()
+    print("\n✅ ALL TESTS PASSED!")
+
+
+if __name__ == "__main__":
+    main()
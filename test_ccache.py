@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the compiler cache integration of compile_firmware
+A fake toolchain, ccache and arduino-cli model a core build without real compilers
+"""
+import os
+import sys
+import shutil
+import tempfile
+from pathlib import Path
+
+# Add current directory to path to import bombercat modules
+sys.path.insert(0, '.')
+
+from bombercat_ccache import expand_property, parse_print_stats, parse_stats_log
+
+FAKE_COMPILER = """#!{python}
+import sys, time
+args = sys.argv[1:]
+out = args[args.index("-o") + 1]
+time.sleep(0.05)
+with open(args[-1]) as src, open(out, "w") as obj:
+    obj.write("OBJ " + src.read())
+"""
+
+# Caches objects by compiler, flags and source content, like ccache in direct mode
+FAKE_CCACHE = """#!{python}
+import os, sys, json, shutil, hashlib, subprocess
+from pathlib import Path
+cache = Path(os.environ.get("CCACHE_DIR", "/tmp/fake-ccache"))
+cache.mkdir(parents=True, exist_ok=True)
+args = sys.argv[1:]
+if args[0].startswith("-"):
+    if args[0] == "--print-stats":
+        stats = cache / "stats.json"
+        counters = json.loads(stats.read_text()) if stats.exists() else {{}}
+        for key, value in counters.items():
+            print(f"{{key}}\\t{{value}}")
+    sys.exit(0)
+compiler, flags = args[0], args[1:]
+out = flags[flags.index("-o") + 1]
+key_flags = [f for f in flags if f not in (out, flags[-1])]
+key = hashlib.sha256((Path(compiler).name + repr(key_flags) + Path(flags[-1]).read_text()).encode()).hexdigest()
+entry = cache / key
+if entry.exists():
+    shutil.copy(entry, out)
+    result = "direct_cache_hit"
+else:
+    subprocess.run([compiler] + flags, check=True)
+    shutil.copy(out, entry)
+    result = "cache_miss"
+stats = cache / "stats.json"
+counters = json.loads(stats.read_text()) if stats.exists() else {{}}
+counters[result] = counters.get(result, 0) + 1
+stats.write_text(json.dumps(counters))
+if os.environ.get("CCACHE_STATSLOG"):
+    with open(os.environ["CCACHE_STATSLOG"], "a") as log:
+        log.write(f"# {{flags[-1]}}\\n{{result}}\\n")
+"""
+
+FAKE_ARDUINO_CLI = """#!{python}
+import sys, subprocess
+from pathlib import Path
+args = sys.argv[1:]
+props = {{
+    "runtime.tools.pqt-gcc.path": {toolchain!r},
+    "compiler.path": "{{runtime.tools.pqt-gcc.path}}/bin/",
+    "compiler.c.cmd": "arm-none-eabi-gcc",
+    "compiler.cpp.cmd": "arm-none-eabi-g++",
+}}
+for i, arg in enumerate(args):
+    if arg == "--build-property":
+        key, _, value = args[i + 1].partition("=")
+        props[key] = value
+if "--show-properties" in args:
+    for key, value in props.items():
+        print(f"{{key}}={{value}}")
+    sys.exit(0)
+compiler_path = props["compiler.path"].replace("{{runtime.tools.pqt-gcc.path}}", props["runtime.tools.pqt-gcc.path"])
+build = Path(args[args.index("--build-path") + 1]) / "core"
+build.mkdir(parents=True, exist_ok=True)
+for src in sorted(Path({core!r}).glob("*.c*")):
+    cmd = props["compiler.cpp.cmd"] if src.suffix == ".cpp" else props["compiler.c.cmd"]
+    subprocess.run([compiler_path + cmd, "-c", "-Os", str(src), "-o", str(build / (src.name + ".o")), str(src)],
+                   check=True)
+"""
+
+
+class Recorder:
+    """SocketIO stand-in keeping every flash_log message"""
+
+    def __init__(self):
+        self.logs = []
+
+    def emit(self, event, data=None, room=None):
+        if event == "flash_log":
+            self.logs.append(data["message"])
+
+
+def script(path, template, **values):
+    path.write_text(template.format(python=sys.executable, **values))
+    path.chmod(0o755)
+    return path
+
+
+def make_environment(root):
+    """Create the fake toolchain, core sources, ccache and arduino-cli"""
+    toolchain = root / "pqt-gcc"
+    (toolchain / "bin").mkdir(parents=True)
+    for name in ("arm-none-eabi-gcc", "arm-none-eabi-g++", "arm-none-eabi-ar"):
+        script(toolchain / "bin" / name, FAKE_COMPILER)
+
+    core = root / "core"
+    core.mkdir()
+    for i in range(6):
+        (core / f"core{i}.cpp").write_text(f"int core{i}() {{ return {i}; }}\n")
+    (core / "startup.c").write_text("void startup(void) {}\n")
+
+    ccache = script(root / "ccache", FAKE_CCACHE)
+    cli = script(root / "arduino-cli", FAKE_ARDUINO_CLI, toolchain=str(toolchain), core=str(core))
+
+    sketch = root / "BomberCat"
+    sketch.mkdir()
+    (sketch / "BomberCat.ino").write_text("void setup() {}\nvoid loop() {}\n")
+    return ccache, cli, sketch
+
+
+def test_parsers():
+    """Stats and build property parsing"""
+    print("🧪 Testing ccache output parsers...")
+    assert parse_stats_log("# a.c\ndirect_cache_hit\n# b.c\ncache_miss\n# c\ncalled_for_link\n") == {
+        "hits": 1, "misses": 1, "uncacheable": 1}
+    assert parse_print_stats("cache_miss\t4\ndirect_cache_hit\t10\nstats_updated_timestamp\t0\n")[
+        "direct_cache_hit"] == 10
+    props = {"runtime.tools.pqt-gcc.path": "/opt/gcc", "compiler.path": "{runtime.tools.pqt-gcc.path}/bin/"}
+    assert expand_property(props, "compiler.path") == "/opt/gcc/bin/"
+    print("✅ Parsers OK")
+
+
+def test_wrapper_dir_tolerates_dangling_links():
+    """A wrapper directory is rebuilt over links whose tool is gone, for ccache and the profiler alike"""
+    print("\n🧪 Testing wrapper directories over dangling links...")
+
+    from bombercat_ccache import CompilerCache
+    from bombercat_profile import CompileProfiler
+
+    root = Path(tempfile.mkdtemp(prefix="bombercat-ccache-"))
+    try:
+        toolchain = root / "bin"
+        toolchain.mkdir()
+        for name in ("arm-none-eabi-gcc", "arm-none-eabi-g++", "arm-none-eabi-size", "arm-none-eabi-strip"):
+            (toolchain / name).write_text("#!/bin/sh\n")
+        props = {"compiler.path": str(toolchain) + "/", "compiler.c.cmd": "arm-none-eabi-gcc",
+                 "compiler.cpp.cmd": "arm-none-eabi-g++"}
+
+        for make in (lambda: CompilerCache(root / "cache", "ccache", max_size=""),
+                     lambda: CompileProfiler(root / "shims")):
+            wrapper = Path(make().build_properties(props)[1].split("=", 1)[1])
+            assert os.path.islink(wrapper / "arm-none-eabi-size")
+            # The toolchain loses a tool; a new process mirrors the directory again
+            (toolchain / "arm-none-eabi-strip").unlink()
+            assert make().build_properties(props) == ["--build-property", f"compiler.path={wrapper}{os.sep}"]
+            assert os.access(wrapper / "arm-none-eabi-gcc", os.X_OK)
+            (toolchain / "arm-none-eabi-strip").write_text("#!/bin/sh\n")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    print("✅ Both wrappers rebuilt without FileExistsError")
+
+
+def test_objects_shared_across_build_dirs():
+    """A second compile into a fresh build directory is served from the cache"""
+    print("\n🧪 Testing compiler cache across build directories...")
+
+    from bombercat_relay import ArduinoCLI, Config, FirmwareManager
+
+    root = Path(tempfile.mkdtemp(prefix="bombercat-ccache-"))
+    try:
+        ccache, cli, sketch = make_environment(root)
+        cfg = Config(build_dir=str(root / "build-a"), sketch_dir=str(root / "sketch"),
+                     ccache_path=str(ccache), ccache_dir=str(root / "cache"), ccache_max_size="",
+                     use_build_cache=False, run_history_path=str(root / "runs.sqlite3"))
+        recorder = Recorder()
+        arduino = ArduinoCLI(recorder, cfg)
+        arduino.cli_path = str(cli)
+        manager = FirmwareManager(arduino, recorder, cfg)
+        manager.sketch_path = sketch
+
+        manager.compile_firmware("rp2040:rp2040:rpipico")
+        assert "Compiler cache: 0/7 hits (0%), ~0.0s saved" in recorder.logs
+
+        # New build path and workspace, same sources: everything is a hit
+        cfg.build_dir = str(root / "build-b")
+        recorder.logs.clear()
+        manager.compile_firmware("rp2040:rp2040:rpipico")
+        summary = [line for line in recorder.logs if line.startswith("Compiler cache:")]
+        assert summary and summary[0].startswith("Compiler cache: 7/7 hits (100%)"), recorder.logs
+        assert (root / "build-b" / "core" / "core0.cpp.o").read_text().startswith("OBJ int core0")
+
+        wrapper = next((root / "cache" / "wrappers").iterdir())
+        assert os.path.islink(wrapper / "arm-none-eabi-ar")
+        assert not os.path.islink(wrapper / "arm-none-eabi-gcc")
+        print(f"✅ {summary[0]}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def test_compile_without_ccache():
+    """Missing ccache leaves the compile command untouched"""
+    print("\n🧪 Testing compile without ccache...")
+
+    from bombercat_relay import ArduinoCLI, Config, FirmwareManager
+
+    root = Path(tempfile.mkdtemp(prefix="bombercat-ccache-"))
+    try:
+        ccache, cli, sketch = make_environment(root)
+        cfg = Config(build_dir=str(root / "build"), sketch_dir=str(root / "sketch"),
+                     ccache_path=str(root / "missing-ccache"), ccache_dir=str(root / "cache"),
+                     use_build_cache=False, run_history_path=str(root / "runs.sqlite3"))
+        recorder = Recorder()
+        arduino = ArduinoCLI(recorder, cfg)
+        arduino.cli_path = str(cli)
+
+        commands = []
+        arduino.run_command = lambda *args, **kwargs: commands.append((args, kwargs))
+        manager = FirmwareManager(arduino, recorder, cfg)
+        manager.sketch_path = sketch
+        manager.compile_firmware("rp2040:rp2040:rpipico")
+
+        assert "--build-property" not in commands[0][0]
+        assert "env" not in commands[0][1]
+        assert not (root / "cache").exists()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    print("✅ Plain compile when ccache is missing")
+
+
+def test_cancelled_compile_cleans_up():
+    """A cancelled compile still removes its stats log; build properties go through run_command"""
+    print("\n🧪 Testing cleanup after a cancelled compile...")
+
+    from bombercat_jobs import JobCancelled
+    from bombercat_relay import ArduinoCLI, Config, FirmwareManager
+
+    root = Path(tempfile.mkdtemp(prefix="bombercat-ccache-"))
+    try:
+        ccache, cli, sketch = make_environment(root)
+        cfg = Config(build_dir=str(root / "build"), sketch_dir=str(root / "sketch"),
+                     ccache_path=str(ccache), ccache_dir=str(root / "cache"), ccache_max_size="",
+                     use_build_cache=False, run_history_path=str(root / "runs.sqlite3"))
+        recorder = Recorder()
+        arduino = ArduinoCLI(recorder, cfg)
+        arduino.cli_path = str(cli)
+        run_command = arduino.run_command
+        queries = []
+        stats_logs = []
+
+        def cancelled_compile(*args, **kwargs):
+            if "--show-properties" in args:
+                queries.append(kwargs)
+                return run_command(*args, **kwargs)
+            stats_logs.append(kwargs["env"]["CCACHE_STATSLOG"])
+            raise JobCancelled("flash job was cancelled")
+
+        arduino.run_command = cancelled_compile
+        manager = FirmwareManager(arduino, recorder, cfg)
+        manager.sketch_path = sketch
+        try:
+            manager.compile_firmware("rp2040:rp2040:rpipico")
+            assert False, "the cancel must propagate"
+        except JobCancelled:
+            pass
+
+        assert queries and queries[0]["log_output"] is False and queries[0]["record"] is False
+        assert stats_logs and not os.path.exists(stats_logs[0])
+        assert not any(line.startswith("Compilation error") for line in recorder.logs)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    print("✅ Stats log removed after the cancel")
+
+
+def main():
+    print("""
+╔══════════════════════════════════════════════╗
+║        🧪 COMPILER CACHE (CCACHE) 🧪         ║
+╚══════════════════════════════════════════════╝
+""")
+    test_parsers()
+    test_wrapper_dir_tolerates_dangling_links()
+    test_objects_shared_across_build_dirs()
+    test_compile_without_ccache()
+    test_cancelled_compile_cleans_up()
+    print("\n✅ ALL TESTS PASSED!")
+
+
+if __name__ == "__main__":
+    main()
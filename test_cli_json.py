@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Test script to verify JSON-mode arduino-cli queries and their cache
+Fixtures cover the 0.35 and 1.x output shapes; a fake arduino-cli counts calls
+"""
+import os
+import sys
+import json
+import shutil
+import tempfile
+from pathlib import Path
+
+# Add current directory to path to import bombercat modules
+sys.path.insert(0, '.')
+
+from bombercat_clijson import parse_board_list, parse_core_list, parse_lib_list
+
+# arduino-cli 0.35: bare lists
+CORE_LIST_035 = [{"id": "rp2040:rp2040", "installed": "3.6.0", "latest": "3.9.0",
+                  "name": "Raspberry Pi RP2040 Boards(3.6.0)"}]
+LIB_LIST_035 = [{"library": {"name": "NDEF Library", "version": "1.1.0", "location": "user",
+                             "install_dir": "/home/u/Arduino/libraries/NDEF_Library"}}]
+BOARD_LIST_035 = [
+    {"port": {"address": "/dev/ttyACM0", "label": "/dev/ttyACM0", "protocol": "serial",
+              "properties": {"vid": "0x2E8A", "pid": "0x000A", "serialNumber": "E6614C311B4F5A2B"}},
+     "matching_boards": [{"name": "BomberCat", "fqbn": "electroniccats:rp2040:bombercat"}]},
+    {"port": {"address": "192.168.1.9", "label": "esp", "protocol": "network"}}
+]
+
+# arduino-cli 1.x: the same records wrapped in objects, names on releases
+CORE_LIST_1X = {"platforms": [{"id": "rp2040:rp2040", "installed_version": "3.9.0", "latest_version": "3.9.0",
+                               "releases": {"3.9.0": {"name": "Raspberry Pi Pico/RP2040"}}}]}
+LIB_LIST_1X = {"installed_libraries": [
+    {"library": {"name": "PubSubClient", "version": "2.8", "location": "LIBRARY_LOCATION_USER"}},
+    {"library": {"name": "NDEF Library", "version": "1.1.0", "location": "LIBRARY_LOCATION_USER"}}]}
+BOARD_LIST_1X = {"detected_ports": [
+    {"port": {"address": "/dev/ttyACM1", "label": "/dev/ttyACM1", "protocol": "serial",
+              "properties": {"vid": "0x2E8A", "pid": "0x000A", "serialNumber": "AB12"}}}]}
+
+FAKE_CLI = """#!{python}
+import sys, json
+args = sys.argv[1:]
+with open({log!r}, "a") as log:
+    log.write(" ".join(args) + "\\n")
+if args[:2] == ["core", "list"]:
+    print("warning: index is older than a week")
+    print(json.dumps({core}))
+elif args[:2] == ["lib", "list"]:
+    print(json.dumps({libs}))
+elif args[:2] == ["board", "list"]:
+    print(json.dumps({boards}))
+"""
+
+
+def test_parse_both_shapes():
+    """0.35 and 1.x documents give the same typed records"""
+    print("🧪 Testing JSON parsing of both CLI versions...")
+    for core_list, installed, name in ((CORE_LIST_035, "3.6.0", "Raspberry Pi RP2040 Boards(3.6.0)"),
+                                       (CORE_LIST_1X, "3.9.0", "Raspberry Pi Pico/RP2040")):
+        platform = parse_core_list(json.dumps(core_list))[0]
+        assert (platform.id, platform.installed, platform.latest, platform.name) == (
+            "rp2040:rp2040", installed, "3.9.0", name)
+
+    for lib_list in (LIB_LIST_035, LIB_LIST_1X):
+        library = [lib for lib in parse_lib_list(json.dumps(lib_list)) if lib.name == "NDEF Library"][0]
+        assert library.version == "1.1.0" and library.location == "user"
+
+    ports = parse_board_list(json.dumps(BOARD_LIST_035))
+    assert [p.protocol for p in ports] == ["serial", "network"]
+    assert ports[0].serial_number == "E6614C311B4F5A2B" and ports[0].vid == "0x2E8A"
+    assert ports[0].boards[0].fqbn == "electroniccats:rp2040:bombercat"
+    port = parse_board_list(json.dumps(BOARD_LIST_1X))[0]
+    assert port.address == "/dev/ttyACM1" and port.boards == ()
+
+    assert parse_lib_list("") == [] and parse_board_list("[]") == []
+    print("✅ Both output shapes parsed")
+
+
+def test_cached_queries():
+    """Status checks reuse parsed results, installs invalidate them, names match exactly"""
+    print("\n🧪 Testing cached CLI queries...")
+
+    from bombercat_relay import ArduinoCLI, Config
+
+    root = Path(tempfile.mkdtemp(prefix="bombercat-clijson-"))
+    old_home = os.environ.get("HOME")
+    os.environ["HOME"] = str(root)
+    try:
+        log = root / "cli.log"
+        cli = root / "arduino-cli"
+        cli.write_text(FAKE_CLI.format(python=sys.executable, log=str(log), core=repr(CORE_LIST_1X),
+                                       libs=repr(LIB_LIST_035), boards=repr(BOARD_LIST_035)))
+        cli.chmod(0o755)
+
+        cfg = Config(required_libraries=["NDEF Library", "Library"], library_alternatives={},
+                     library_download_workers=0)
+        arduino = ArduinoCLI(None, cfg)
+        arduino.cli_path = str(cli)
+        logs = []
+        arduino.emit_log = lambda message, level="info": logs.append((level, message))
+        arduino.emit_progress = lambda progress: None
+
+        def commands(prefix):
+            return [line for line in log.read_text().splitlines() if line.startswith(prefix)]
+
+        assert arduino.core_installed("rp2040:rp2040")
+        assert not arduino.core_installed("electroniccats:rp2040")
+        arduino.install_core("rp2040:rp2040")
+        assert commands("core") == ["core list --format json"]
+        # The JSON document is not echoed into the flash log
+        assert not any("platforms" in message for _, message in logs)
+
+        # "Library" is not installed just because "NDEF Library" is
+        arduino.install_libraries()
+        assert commands("lib install") == ["lib install Library"]
+        assert ("info", "NDEF Library already installed") in logs
+
+        # The install invalidated the library listing, not the core listing
+        arduino.installed_libraries()
+        arduino.installed_cores()
+        assert commands("lib list") == ["lib list --format json"] * 2
+        assert commands("core list") == ["core list --format json"]
+        arduino.run_command("core", "update-index")
+        arduino.installed_cores()
+        assert len(commands("core list")) == 2
+
+        boards = arduino.detect_boards()
+        assert boards == [{"port": "/dev/ttyACM0", "fqbn": "electroniccats:rp2040:bombercat", "name": "BomberCat",
+                           "vid": "0x2E8A", "pid": "0x000A", "serial_number": "E6614C311B4F5A2B"}]
+        arduino.detect_boards()
+        assert len(commands("board list")) == 1
+        print(f"✅ {arduino.cli_cache.stats['hits']} cache hits, "
+              f"{arduino.cli_cache.stats['misses']} CLI runs")
+    finally:
+        if old_home is None:
+            os.environ.pop("HOME", None)
+        else:
+            os.environ["HOME"] = old_home
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def test_query_racing_an_install_is_not_cached():
+    """A core list that started before an install does not put its stale result in the cache"""
+    print("\n🧪 Testing queries racing an invalidation...")
+
+    from bombercat_clijson import CliCache
+
+    installed = []
+    cache = None
+
+    def run(*args):
+        before = json.dumps({"platforms": [{"id": core} for core in installed]})
+        if not installed:
+            # The install finishes while this query is still reading the old state
+            installed.append("rp2040:rp2040")
+            cache.command_ran(["core", "install", "rp2040:rp2040"])
+        return before
+
+    cache = CliCache(run)
+    assert [core.id for core in cache.get("core list")] == []
+    assert [core.id for core in cache.get("core list")] == ["rp2040:rp2040"]
+    assert cache.stats == {"hits": 0, "misses": 2}
+    assert [core.id for core in cache.get("core list")] == ["rp2040:rp2040"]
+    assert cache.stats["hits"] == 1
+    print("✅ Stale result discarded, fresh one cached")
+
+
+def main():
+    print("""
+╔══════════════════════════════════════════════╗
+║        🧪 ARDUINO-CLI JSON QUERIES 🧪        ║
+╚══════════════════════════════════════════════╝
+""")
+    test_parse_both_shapes()
+    test_cached_queries()
+    test_query_racing_an_install_is_not_cached()
+    print("\n✅ ALL TESTS PASSED!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Test script to verify adaptive command timeouts and the output-stall watchdog
+Timeouts follow the recorded durations; a fake arduino-cli upload that stops
+printing is killed, retried once and reported with a clear reason
+"""
+import sys
+import time
+import shutil
+import tempfile
+from pathlib import Path
+
+# Add current directory to path to import bombercat modules
+sys.path.insert(0, '.')
+
+from bombercat_timeouts import LIMITS, CommandTimeout, CommandTimeouts, command_key
+
+FAKE_CLI = """#!{python}
+import sys
+import time
+args = sys.argv[1:]
+with open({log!r}, "a") as log:
+    log.write(" ".join(args) + "\\n")
+port = args[args.index("--port") + 1] if "--port" in args else ""
+if args[0] == "compile" and "--build-path" in args:
+    # A build leaves the compiled core behind for the next one
+    from pathlib import Path
+    core = Path(args[args.index("--build-path") + 1]) / "core"
+    core.mkdir(parents=True, exist_ok=True)
+    (core / "core.a").write_bytes(b"core")
+if port.endswith("STUCK"):
+    print("Resetting the board...", flush=True)
+    time.sleep(60)
+elif port.endswith("SLOW"):
+    for i in range(8):
+        print(f"Writing {{i * 12}}%", flush=True)
+        time.sleep(0.2)
+"""
+
+
+def test_timeouts_follow_history():
+    """p99 x factor once enough runs are recorded, never below the floor"""
+    print("🧪 Testing adaptive timeouts...")
+    assert command_key(["core", "install", "rp2040:rp2040"]) == "core install"
+    assert command_key(["upload", "--fqbn", "x"]) == "upload" and command_key(["config", "init"]) == "config"
+
+    recorded = {"upload": [float(i) for i in range(50, 150)], "compile": [2.0] * 30, "compile cold": [500.0] * 30,
+                "lib install": [1.0] * 5}
+    calls = []
+
+    def durations(key):
+        calls.append(key)
+        return recorded.get(key, [])
+
+    timeouts = CommandTimeouts(durations, factor=3.0, min_samples=20)
+    upload = timeouts.limits(["upload", "--port", "/dev/ttyACM0"])
+    assert round(upload.timeout, 2) == round(148.01 * 3, 2) and "p99" in upload.basis
+    # Fast compiles keep the floor, too little history keeps the default
+    assert timeouts.limits(["compile"]).timeout == LIMITS["compile"].floor
+    # Builds of the core have their own history and a much higher floor
+    cold = timeouts.limits(["compile", "--fqbn", "x"], "compile cold")
+    assert cold.key == "compile cold" and cold.timeout == 1500.0
+    assert LIMITS["compile cold"].floor > LIMITS["compile"].floor
+    assert timeouts.describe()["compile cold"]["timeout"] == 1500.0
+    assert timeouts.limits(["lib", "install", "x"]).timeout == LIMITS["lib install"].default
+    assert timeouts.limits(["version"]).timeout == LIMITS["version"].default
+    assert timeouts.limits(["sketch", "new"]).timeout is None
+    timeouts.limits(["upload"])
+    assert calls.count("upload") == 1 and "version" not in calls
+    assert CommandTimeouts(None).limits(["upload"]).timeout == LIMITS["upload"].default
+    print(f"✅ upload timeout {upload.timeout:.0f}s ({upload.basis})")
+
+
+def test_stalled_upload_is_killed_and_retried():
+    """An upload that stops printing is retried once, then fails fast with the reason"""
+    print("\n🧪 Testing the output-stall watchdog...")
+
+    from bombercat_relay import ArduinoCLI, Config
+
+    root = Path(tempfile.mkdtemp(prefix="bombercat-timeouts-"))
+    try:
+        log = root / "cli.log"
+        cli = root / "arduino-cli"
+        cli.write_text(FAKE_CLI.format(python=sys.executable, log=str(log)))
+        cli.chmod(0o755)
+        cfg = Config(run_history_path=str(root / "runs.sqlite3"), stall_timeouts={"upload": 0.5},
+                     command_retries={"upload": 1}, job_kill_grace=0.2)
+        arduino = ArduinoCLI(None, cfg)
+        arduino.cli_path = str(cli)
+        messages = []
+        arduino.emit_log = lambda message, level="info": messages.append(message)
+
+        start = time.perf_counter()
+        try:
+            arduino.run_command("upload", "--port", "/dev/ttySTUCK", "BomberCat")
+            assert False, "the stalled upload must fail"
+        except CommandTimeout as e:
+            assert e.stalled and "printed nothing for 0.5s" in str(e) and "2 attempts" in str(e), str(e)
+        elapsed = time.perf_counter() - start
+        assert elapsed < 5, elapsed
+        assert log.read_text().count("upload") == 2
+        assert any("retrying (1/1)" in m for m in messages)
+
+        # Steady progress is not a stall, and successful runs feed the history
+        arduino.run_command("upload", "--port", "/dev/ttySLOW", "BomberCat")
+        arduino.run_command("compile", "--fqbn", "rp2040:rp2040:rpipico", "BomberCat")
+        arduino.run_command("version")
+        history = arduino.get_run_history()
+        assert len(history.command_durations("upload")) == 1 and history.command_durations("upload")[0] > 1
+        assert len(history.command_durations("compile")) == 1 and history.command_durations("version") == []
+        outcomes = [row[0] for row in history.db.execute("SELECT outcome FROM commands WHERE command = 'upload'")]
+        assert sorted(outcomes) == ["ok", "stalled", "stalled"]
+        history.close()
+        print(f"✅ Stalled upload gave up after {elapsed:.1f}s and 2 attempts")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def test_compile_samples_split_warm_and_cold():
+    """Core builds are timed as cold compiles and warm-up builds are not recorded"""
+    print("\n🧪 Testing warm and cold compile samples...")
+
+    from bombercat_relay import ArduinoCLI, Config, FirmwareManager
+
+    root = Path(tempfile.mkdtemp(prefix="bombercat-timeouts-"))
+    try:
+        cli = root / "arduino-cli"
+        cli.write_text(FAKE_CLI.format(python=sys.executable, log=str(root / "cli.log")))
+        cli.chmod(0o755)
+        cfg = Config(run_history_path=str(root / "runs.sqlite3"), build_dir=str(root / "warmup-build"),
+                     sketch_dir=str(root / "sketch"), use_ccache=False, use_build_cache=False)
+        arduino = ArduinoCLI(None, cfg)
+        arduino.cli_path = str(cli)
+        arduino.emit_log = lambda message, level="info": None
+        arduino.emit_progress = lambda progress: None
+        history = arduino.get_run_history()
+
+        FirmwareManager(arduino, None, cfg).precompile_core("rp2040:rp2040:rpipico")
+        assert history.command_durations("compile cold") == [] and history.command_durations("compile") == []
+
+        cfg.build_dir = str(root / "build")
+        manager = FirmwareManager(arduino, None, cfg)
+        manager.sketch_path = root / "BomberCat"
+        manager.compile_firmware("rp2040:rp2040:rpipico")
+        assert len(history.command_durations("compile cold")) == 1 and history.command_durations("compile") == []
+        manager.compile_firmware("rp2040:rp2040:rpipico")
+        assert len(history.command_durations("compile cold")) == 1
+        assert len(history.command_durations("compile")) == 1
+        history.close()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    print("✅ Warm-up skipped, first build cold, second warm")
+
+
+def main():
+    print("""
+╔══════════════════════════════════════════════╗
+║       🧪 COMMAND TIMEOUTS & WATCHDOG 🧪      ║
+╚══════════════════════════════════════════════╝
+""")
+    test_timeouts_follow_history()
+    test_stalled_upload_is_killed_and_retried()
+    test_compile_samples_split_warm_and_cold()
+    print("\n✅ ALL TESTS PASSED!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Test script to verify per translation unit compile timing
+A fake toolchain and arduino-cli compile core, library and sketch sources
+"""
+import sys
+import shutil
+import tempfile
+from pathlib import Path
+
+# Add current directory to path to import bombercat modules
+sys.path.insert(0, '.')
+
+from bombercat_profile import source_of, summarize, unit_group
+
+# Spends CPU in proportion to the "cost" comment of the source
+FAKE_COMPILER = """#!{python}
+import re, sys, time
+args = sys.argv[1:]
+if "-c" in args:
+    source = open(args[args.index("-o") - 1]).read()
+    cost = float(re.search(r"cost (\\S+)", source).group(1))
+    end = time.process_time() + cost
+    while time.process_time() < end:
+        sum(range(1000))
+    open(args[args.index("-o") + 1], "w").write("OBJ")
+"""
+
+FAKE_ARDUINO_CLI = """#!{python}
+import sys, subprocess
+from pathlib import Path
+args = sys.argv[1:]
+props = {{
+    "runtime.tools.pqt-gcc.path": {toolchain!r},
+    "compiler.path": "{{runtime.tools.pqt-gcc.path}}/bin/",
+    "compiler.c.cmd": "arm-none-eabi-gcc",
+    "compiler.cpp.cmd": "arm-none-eabi-g++",
+}}
+for i, arg in enumerate(args):
+    if arg == "--build-property":
+        key, _, value = args[i + 1].partition("=")
+        props[key] = value
+if "--show-properties" in args:
+    for key, value in props.items():
+        print(f"{{key}}={{value}}")
+    sys.exit(0)
+compiler_path = props["compiler.path"].replace("{{runtime.tools.pqt-gcc.path}}", props["runtime.tools.pqt-gcc.path"])
+build = Path(args[args.index("--build-path") + 1])
+build.mkdir(parents=True, exist_ok=True)
+objects = []
+for src in sorted(Path({sources!r}).rglob("*.c*")):
+    cmd = props["compiler.cpp.cmd"] if src.suffix == ".cpp" else props["compiler.c.cmd"]
+    obj = build / (src.name + ".o")
+    subprocess.run([compiler_path + cmd, "-c", "-Os", "-MMD", str(src), "-o", str(obj)], check=True)
+    objects.append(str(obj))
+subprocess.run([compiler_path + props["compiler.cpp.cmd"], "-Os", "-o", str(build / "BomberCat.ino.elf")] + objects,
+               check=True)
+"""
+
+# Relative source path and CPU seconds the fake compiler spends on it
+SOURCES = {
+    "packages/rp2040/hardware/rp2040/3.9.0/cores/rp2040/wiring.cpp": 0.02,
+    "packages/rp2040/hardware/rp2040/3.9.0/cores/rp2040/main.c": 0.02,
+    "Arduino/libraries/FastLED/src/FastLED.cpp": 0.4,
+    "Arduino/libraries/FastLED/src/colorutils.cpp": 0.3,
+    "Arduino/libraries/PubSubClient/src/PubSubClient.cpp": 0.05,
+    "build/sketch/BomberCat.ino.cpp": 0.1,
+}
+
+
+def script(path, template, **values):
+    path.write_text(template.format(python=sys.executable, **values))
+    path.chmod(0o755)
+    return path
+
+
+def test_command_line_parsing():
+    """Sources and groups are taken from gcc command lines"""
+    print("🧪 Testing compiler command line parsing...")
+    args = ["-c", "-Os", "-I", "/x/include.cpp", "-MMD", "/lib/libraries/SD/src/SD.cpp", "-o", "/b/SD.cpp.o"]
+    assert source_of(args) == "/lib/libraries/SD/src/SD.cpp"
+    assert source_of(["-Os", "-o", "fw.elf", "a.o"]) is None
+    assert unit_group("/home/u/Arduino/libraries/SD/src/SD.cpp") == "SD"
+    assert unit_group("/home/u/.arduino15/packages/rp2040/hardware/rp2040/3.9.0/cores/rp2040/main.c") == "core"
+    assert unit_group("/tmp/build/sketch/BomberCat.ino.cpp") == "sketch"
+    assert unit_group(None) == "link"
+
+    report = summarize([
+        {"args": ["-c", "a/libraries/X/a.cpp", "-o", "a.o"], "wall": 2.0, "cpu": 1.5},
+        {"args": ["-c", "a/libraries/X/b.cpp", "-o", "b.o"], "wall": 1.0, "cpu": 0.5},
+        {"args": ["-c", "sketch/s.cpp", "-o", "s.o"], "wall": 1.5, "cpu": 1.0},
+    ], top_n=2)
+    assert [u["source"] for u in report["slowest"]] == ["a/libraries/X/a.cpp", "sketch/s.cpp"]
+    assert report["groups"][0] == {"name": "X", "units": 2, "wall": 3.0, "cpu": 2.0}
+    print("✅ Parsing OK")
+
+
+def test_profiled_compile():
+    """compile_firmware records every unit and ranks the expensive library first"""
+    print("\n🧪 Testing profiled compile...")
+
+    from bombercat_relay import ArduinoCLI, Config, FirmwareManager
+
+    root = Path(tempfile.mkdtemp(prefix="bombercat-profile-"))
+    try:
+        toolchain = root / "pqt-gcc"
+        (toolchain / "bin").mkdir(parents=True)
+        for name in ("arm-none-eabi-gcc", "arm-none-eabi-g++", "arm-none-eabi-objcopy"):
+            script(toolchain / "bin" / name, FAKE_COMPILER)
+
+        sources = root / "src"
+        for relative, cost in SOURCES.items():
+            path = sources / relative
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(f"// cost {cost}\n")
+
+        cli = script(root / "arduino-cli", FAKE_ARDUINO_CLI, toolchain=str(toolchain), sources=str(sources))
+        sketch = root / "BomberCat"
+        sketch.mkdir()
+        (sketch / "BomberCat.ino").write_text("void setup() {}\nvoid loop() {}\n")
+
+        cfg = Config(build_dir=str(root / "build"), sketch_dir=str(root / "sketch"), use_ccache=False,
+                     use_build_cache=False, profile_compile=True, run_history_path=str(root / "runs.sqlite3"))
+        arduino = ArduinoCLI(None, cfg)
+        arduino.cli_path = str(cli)
+        logs = []
+        arduino.emit_log = lambda message, level="info": logs.append(message)
+        arduino.emit_progress = lambda progress: None
+        manager = FirmwareManager(arduino, None, cfg)
+        manager.sketch_path = sketch
+
+        from bombercat_profile import CompileProfiler
+        manager.compile_profiler = CompileProfiler(root / "shims")
+        manager.compile_firmware("rp2040:rp2040:rpipico")
+
+        profile = manager.compile_profile
+        assert profile["units"] == len(SOURCES) + 1
+        assert Path(profile["slowest"][0]["source"]).name == "FastLED.cpp"
+        assert profile["slowest"][0]["cpu"] >= 0.3
+        groups = [group["name"] for group in profile["groups"]]
+        assert groups[0] == "FastLED"
+        assert {"core", "sketch", "PubSubClient", "link"} <= set(groups)
+        fastled = profile["groups"][0]
+        assert fastled["units"] == 2 and fastled["cpu"] >= 0.6
+
+        # Tools other than gcc/g++ are used straight from the toolchain
+        shim = next((root / "shims").iterdir())
+        assert (shim / "arm-none-eabi-objcopy").is_symlink()
+        assert any(line.startswith("Compile profile: 7 units") for line in logs)
+        assert any(line.startswith("Compile time by library: FastLED") for line in logs)
+        print(f"✅ {next(line for line in logs if line.startswith('Compile time by library'))}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main():
+    print("""
+╔══════════════════════════════════════════════╗
+║       🧪 COMPILE TIMING PROFILE 🧪           ║
+╚══════════════════════════════════════════════╝
+""")
+    test_command_line_parsing()
+    test_profiled_compile()
+    print("\n✅ ALL TESTS PASSED!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Test script to verify structured compiler diagnostics
+Parses gcc/ld output and checks run_command reports the first real error
+"""
+import sys
+import shutil
+import tempfile
+from pathlib import Path
+
+# Add current directory to path to import bombercat modules
+sys.path.insert(0, '.')
+
+from bombercat_diagnostics import DiagnosticsParser
+
+COMPILE_LOG = """In file included from /sketch/BomberCat/BomberCat.ino:12:
+/libs/PN7150/src/Electroniccats_PN7150.h:20:10: fatal error: FlashIAPBlockDevice.h: No such file or directory
+   20 | #include "FlashIAPBlockDevice.h"
+      |          ^~~~~~~~~~~~~~~~~~~~~~~
+compilation terminated.
+/sketch/BomberCat/relay.cpp: In function 'void loop()':
+/sketch/BomberCat/relay.cpp:5:3: warning: unused variable 'x' [-Wunused-variable]
+/sketch/BomberCat/relay.cpp:5:3: warning: unused variable 'x' [-Wunused-variable]
+/sketch/BomberCat/relay.cpp:9:1: note: declared here
+/tmp/build/sketch/relay.cpp.o: in function `loop':
+relay.cpp:(.text.loop+0x8): undefined reference to `relayInit()'
+/opt/pqt-gcc/bin/../arm-none-eabi/bin/ld: region `FLASH' overflowed by 1234 bytes
+collect2: error: ld returned 1 exit status
+"""
+
+# Compiles flood stderr with warnings, then fail on a single error near the end;
+# any other command prints a long listing on stdout
+FAKE_CLI = """#!{python}
+import sys
+if sys.argv[1] != "compile":
+    for i in range(5000):
+        print(f"library {{i}}")
+    sys.exit(0)
+for i in range(5000):
+    print(f"/libs/FastLED/src/led.h:{{i % 50}}:1: warning: deprecated register", file=sys.stderr)
+print("/sketch/BomberCat/BomberCat.ino:42:7: error: 'relay' was not declared in this scope", file=sys.stderr)
+print("Error during build: exit status 1", file=sys.stderr)
+sys.exit(1)
+"""
+
+
+class Recorder:
+    """SocketIO stand-in keeping every event"""
+
+    def __init__(self):
+        self.events = []
+
+    def emit(self, event, data=None, room=None):
+        self.events.append((event, data))
+
+
+def test_parse_compile_log():
+    """Include chains, notes, duplicates and linker errors become records"""
+    print("🧪 Testing gcc/ld diagnostic parsing...")
+
+    parser = DiagnosticsParser()
+    new_records = [d for d in map(parser.feed, COMPILE_LOG.splitlines()) if d]
+    assert len(new_records) == 4
+
+    records = parser.diagnostics()
+    assert [d.severity for d in records] == ["error", "error", "error", "warning"]
+
+    missing_header = records[0]
+    assert missing_header.file == "/libs/PN7150/src/Electroniccats_PN7150.h"
+    assert (missing_header.line, missing_header.column) == (20, 10)
+    assert missing_header.include_chain == ["/sketch/BomberCat/BomberCat.ino:12"]
+
+    assert records[1].message == "undefined reference to `relayInit()'"
+    assert records[1].context == "/tmp/build/sketch/relay.cpp.o: in function `loop':"
+    assert records[2].message == "region FLASH overflowed by 1234 bytes"
+
+    warning = records[3]
+    assert warning.count == 2
+    assert warning.context == "/sketch/BomberCat/relay.cpp: In function 'void loop()':"
+    assert warning.notes == ["/sketch/BomberCat/relay.cpp:9:1: declared here"]
+
+    summary = parser.summary()
+    assert summary["errors"] == 3 and summary["warnings"] == 2 and summary["duplicates"] == 1
+    print(f"✅ {summary['unique']} unique diagnostics from {summary['lines']} lines")
+
+
+def test_memory_is_bounded():
+    """A huge log keeps at most max_records, and errors push warnings out"""
+    print("\n🧪 Testing bounded diagnostic storage...")
+
+    parser = DiagnosticsParser(max_records=20)
+    for i in range(100_000):
+        parser.feed(f"/src/file{i}.cpp:1:1: warning: unique warning {i}")
+    parser.feed("/src/main.cpp:3:1: error: expected ';' before '}' token")
+
+    assert len(parser.records) == 20
+    assert parser.first_error().file == "/src/main.cpp"
+    assert parser.summary()["dropped"] == 100_001 - 20
+    print(f"✅ {parser.summary()['lines']} lines parsed into {len(parser.records)} records")
+
+
+def test_run_command_reports_first_error():
+    """The real error survives a warning flood and ends up in the exception"""
+    print("\n🧪 Testing run_command diagnostics...")
+
+    from bombercat_relay import ArduinoCLI, Config
+
+    root = Path(tempfile.mkdtemp(prefix="bombercat-diagnostics-"))
+    try:
+        cli = root / "arduino-cli"
+        cli.write_text(FAKE_CLI.format(python=sys.executable))
+        cli.chmod(0o755)
+
+        recorder = Recorder()
+        arduino = ArduinoCLI(recorder, Config(run_history_path=str(root / "runs.sqlite3")))
+        arduino.cli_path = str(cli)
+
+        try:
+            arduino.run_command("compile", "--fqbn", "rp2040:rp2040:rpipico", "BomberCat")
+        except Exception as e:
+            error = str(e)
+        else:
+            raise AssertionError("compile should have failed")
+
+        assert error == ("Command failed with code 1: /sketch/BomberCat/BomberCat.ino:42:7: "
+                         "error: 'relay' was not declared in this scope")
+
+        logs = [data for event, data in recorder.events if event == "flash_log"]
+        assert len(logs) < 200
+        assert any(log["level"] == "error" and "'relay' was not declared" in log["message"] for log in logs)
+
+        summaries = [data for event, data in recorder.events if event == "compile_diagnostics"]
+        assert len(summaries) == 1
+        diagnostics = summaries[0]["diagnostics"]
+        assert diagnostics[0]["severity"] == "error"
+        assert len(diagnostics) == 51
+        assert sum(d["count"] for d in diagnostics[1:]) == 5000
+        assert arduino.last_diagnostics.summary()["warnings"] == 5000
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    print("✅ First error reported ahead of 5000 warnings")
+
+
+def test_stdout_is_bounded():
+    """Logged commands keep a stdout tail, queries all of it, and neither replaces the compile diagnostics"""
+    print("\n🧪 Testing bounded command output...")
+
+    from bombercat_relay import ArduinoCLI, Config
+
+    root = Path(tempfile.mkdtemp(prefix="bombercat-diagnostics-"))
+    try:
+        cli = root / "arduino-cli"
+        cli.write_text(FAKE_CLI.format(python=sys.executable))
+        cli.chmod(0o755)
+
+        arduino = ArduinoCLI(Recorder(), Config(run_history_path=str(root / "runs.sqlite3"), stdout_tail_lines=50))
+        arduino.cli_path = str(cli)
+        try:
+            arduino.run_command("compile", "--fqbn", "rp2040:rp2040:rpipico", "BomberCat")
+        except Exception:
+            pass
+        compile_diagnostics = arduino.last_diagnostics
+
+        lines = arduino.run_command("lib", "list").stdout.splitlines()
+        assert len(lines) == 50 and lines[-1] == "library 4999"
+        assert len(arduino.query_output("lib", "list").splitlines()) == 5000
+        assert arduino.last_diagnostics is compile_diagnostics
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    print("✅ 50 of 5000 stdout lines kept, compile diagnostics untouched")
+
+
+def main():
+    print("""
+╔══════════════════════════════════════════════╗
+║      🧪 STRUCTURED COMPILER DIAGNOSTICS 🧪   ║
+╚══════════════════════════════════════════════╝
+""")
+    test_parse_compile_log()
+    test_memory_is_bounded()
+    test_run_command_reports_first_error()
+    test_stdout_is_bounded()
+    print("\n✅ ALL TESTS PASSED!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Test script to verify manifest-driven fleet provisioning
+Fake ports are plugged into a PortInventory and a fake provision step records the work
+"""
+import sys
+import json
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add current directory to path to import bombercat modules
+sys.path.insert(0, '.')
+
+from bombercat_fleet import FleetProvisioner, ManifestError, load_manifest
+from bombercat_ports import PortInventory
+
+
+def fake_port(device, serial_number, vid=0x2E8A):
+    """Create an object shaped like a pyserial ListPortInfo"""
+    return SimpleNamespace(device=device, description="Pico", hwid=f"USB SER={serial_number}", vid=vid,
+                           pid=0x000A, serial_number=serial_number, manufacturer="Raspberry Pi", product="Pico")
+
+
+def test_load_manifest():
+    """CSV and JSON manifests are validated and filled with defaults"""
+    print("🧪 Testing manifest loading...")
+
+    root = Path(tempfile.mkdtemp(prefix="bombercat-fleet-"))
+    try:
+        csv_file = root / "boards.csv"
+        csv_file.write_text("serial_number,host_number,wifi_ssid,wifi_password,firmware\n"
+                            "E661A,1,lab,secret,host\n"
+                            "E661B,2,lab,,client\n")
+        manifest = load_manifest(csv_file)
+        assert manifest["E661A"]["host_number"] == 1
+        assert manifest["E661B"]["wifi_password"] == ""
+        assert manifest["E661B"]["mqtt_port"] == 1883
+        assert manifest["E661B"]["firmware"] == "client"
+
+        json_file = root / "boards.json"
+        json_file.write_text(json.dumps({
+            "defaults": {"wifi_ssid": "lab", "mqtt_server": "10.0.0.2"},
+            "boards": [{"serial_number": "E661C", "host_number": "3"}]
+        }))
+        manifest = load_manifest(json_file)
+        assert manifest["E661C"]["mqtt_server"] == "10.0.0.2"
+        assert manifest["E661C"]["host_number"] == 3
+
+        for rows in ("serial_number,host_number,wifi_ssid\nA,1,lab\nB,1,lab\n",
+                     "serial_number,host_number,wifi_ssid\nA,1,lab\nA,2,lab\n",
+                     "serial_number,host_number,wifi_ssid\nA,,lab\n"):
+            csv_file.write_text(rows)
+            try:
+                load_manifest(csv_file)
+            except ManifestError:
+                pass
+            else:
+                raise AssertionError(f"Manifest should be rejected: {rows!r}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    print("✅ Manifests loaded and validated")
+
+
+def test_boards_are_queued_on_plug_in():
+    """Plugged-in manifest boards are provisioned once and written to the ledger"""
+    print("\n🧪 Testing fleet provisioning...")
+
+    root = Path(tempfile.mkdtemp(prefix="bombercat-fleet-"))
+    try:
+        manifest = {serial: {"serial_number": serial, "host_number": n, "wifi_ssid": "lab", "wifi_password": "",
+                             "mqtt_server": "broker", "mqtt_port": 1883, "firmware": "host"}
+                    for n, serial in enumerate(["E661A", "E661B", "E661C"], 1)}
+        ledger = root / "ledger.jsonl"
+
+        provisioned = []
+        attempts = {}
+        all_done = threading.Event()
+
+        def provision(entry, port):
+            serial = entry["serial_number"]
+            attempts[serial] = attempts.get(serial, 0) + 1
+            if serial == "E661B" and attempts[serial] == 1:
+                raise Exception("No device found on port")
+            provisioned.append((serial, port, entry["host_number"]))
+
+        events = []
+
+        def emit(event, data):
+            events.append((event, data))
+            if event == "throughput" and data["remaining"] == 0:
+                all_done.set()
+
+        plugged = []
+        inventory = PortInventory(list_ports=lambda: list(plugged))
+        fleet = FleetProvisioner(manifest, provision, ledger, emit=emit)
+        inventory.subscribe(fleet.on_ports)
+        fleet.start()
+        try:
+            plugged.extend([fake_port("/dev/ttyACM0", "E661A"), fake_port("/dev/ttyACM1", "E661B"),
+                            fake_port("/dev/ttyACM2", "UNKNOWN")])
+            inventory.refresh()
+            fleet.jobs.join()
+
+            # A flashed board reboots and re-enumerates on another port: not queued again
+            plugged[0] = fake_port("/dev/ttyACM3", "E661A")
+            inventory.refresh()
+
+            # The failed board is unplugged and plugged back in, then the last board arrives
+            plugged.pop(1)
+            inventory.refresh()
+            plugged.extend([fake_port("/dev/ttyACM1", "E661B"), fake_port("/dev/ttyACM4", "E661C")])
+            inventory.refresh()
+
+            assert all_done.wait(5)
+            assert fleet.wait(0)
+        finally:
+            fleet.stop()
+
+        assert provisioned == [("E661A", "/dev/ttyACM0", 1), ("E661B", "/dev/ttyACM1", 2),
+                               ("E661C", "/dev/ttyACM4", 3)]
+        assert ("board", {"serial_number": "UNKNOWN", "port": "/dev/ttyACM2", "status": "unknown"}) in events
+
+        records = [json.loads(line) for line in ledger.read_text().splitlines()]
+        assert [(r["serial_number"], r["status"]) for r in records] == [
+            ("E661A", "ok"), ("E661B", "failed"), ("E661B", "ok"), ("E661C", "ok")]
+        assert records[1]["error"] == "No device found on port"
+
+        stats = fleet.stats()
+        assert stats["provisioned"] == 3 and stats["attempts"] == 4 and stats["failed"] == 0
+        assert stats["boards_per_hour"] > 0
+        print(f"✅ 3 boards provisioned, {stats['boards_per_hour']} boards/hour")
+
+        # A restart picks the ledger back up and skips finished boards
+        restarted = FleetProvisioner(manifest, provision, ledger)
+        assert restarted.remaining() == 0 and restarted.wait(0)
+        assert not restarted.enqueue(manifest["E661A"], "/dev/ttyACM0")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    print("✅ Ledger resumes after restart")
+
+
+def main():
+    print("""
+╔══════════════════════════════════════════════╗
+║      🧪 MANIFEST FLEET PROVISIONING 🧪       ║
+╚══════════════════════════════════════════════╝
+""")
+    test_load_manifest()
+    test_boards_are_queued_on_plug_in()
+    print("\n✅ ALL TESTS PASSED!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the shared downloader: retries with backoff, resumed
+downloads and the per-host concurrency limit
+A local HTTP server fails, drops connections mid-body and stalls on purpose
+"""
+import os
+import sys
+import gzip
+import time
+import hashlib
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add current directory to path to import bombercat modules
+sys.path.insert(0, '.')
+
+from bombercat_http import Downloader
+
+BODY = bytes(range(256)) * 800
+BIG = os.urandom(32 * 1024 * 1024)
+
+
+class FlakyServer:
+    """Misbehaves per path and records what it was asked"""
+
+    def __init__(self):
+        self.hits = {}
+        self.ranges = []
+        self.encodings = []
+        self.active = 0
+        self.max_active = 0
+        self.version = b"v1"
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_HEAD(self):
+                self.do_GET()
+
+            def do_GET(self):
+                path = self.path.lstrip("/")
+                with lock:
+                    server.hits[path] = server.hits.get(path, 0) + 1
+                    hits = server.hits[path]
+                handler = getattr(server, "serve_" + path.split("-")[0], None)
+                if handler is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                handler(self, hits)
+
+            def log_message(self, format, *args):
+                pass
+
+        lock = threading.Lock()
+        self.lock = lock
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+
+    @staticmethod
+    def send_body(handler, body, status=200, headers=None):
+        handler.send_response(status)
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        if handler.command != "HEAD":
+            handler.wfile.write(body)
+
+    def serve_flaky(self, handler, hits):
+        # Two overloaded answers before the real one
+        if hits <= 2:
+            self.send_body(handler, b"busy", 503, {"Retry-After": "0"})
+        else:
+            self.send_body(handler, BODY)
+
+    def serve_drop(self, handler, hits):
+        # The first transfer dies halfway, later ones honour Range
+        requested = handler.headers.get("Range")
+        self.ranges.append(requested)
+        if requested:
+            start = int(requested.split("=")[1].rstrip("-"))
+            self.send_body(handler, BODY[start:], 206, {
+                "Content-Range": f"bytes {start}-{len(BODY) - 1}/{len(BODY)}", "ETag": '"v1"'})
+            return
+        handler.send_response(200)
+        handler.send_header("Content-Length", str(len(BODY)))
+        handler.send_header("ETag", '"v1"')
+        handler.end_headers()
+        handler.wfile.write(BODY[:len(BODY) // 2])
+        handler.wfile.flush()
+        handler.close_connection = True
+
+    def serve_dropbusy(self, handler, hits):
+        # Dies halfway, then stays overloaded
+        if hits == 1:
+            handler.send_response(200)
+            handler.send_header("Content-Length", str(len(BODY)))
+            handler.end_headers()
+            handler.wfile.write(BODY[:len(BODY) // 2])
+            handler.wfile.flush()
+            handler.close_connection = True
+            return
+        self.send_body(handler, b"busy", 503, {"Retry-After": "0"})
+
+    def serve_changed(self, handler, hits):
+        # Dies halfway, then the file changes; If-Range must get the new file whole
+        body = self.version * 10000
+        if hits == 1:
+            handler.send_response(200)
+            handler.send_header("Content-Length", str(len(body)))
+            handler.send_header("ETag", '"v1"')
+            handler.end_headers()
+            handler.wfile.write(body[:len(body) // 2])
+            handler.wfile.flush()
+            handler.close_connection = True
+            self.version = b"v2"
+            return
+        self.ranges.append((handler.headers.get("Range"), handler.headers.get("If-Range")))
+        self.send_body(handler, body, 200, {"ETag": '"v2"'})
+
+    def serve_gzip(self, handler, hits):
+        # Compresses unless told not to; the first transfer dies halfway
+        self.encodings.append(handler.headers.get("Accept-Encoding"))
+        if handler.headers.get("Accept-Encoding") == "identity":
+            body, headers = BODY, {"ETag": '"v1"'}
+        else:
+            body, headers = gzip.compress(BODY), {"ETag": '"v1"', "Content-Encoding": "gzip"}
+        requested = handler.headers.get("Range")
+        if requested:
+            start = int(requested.split("=")[1].rstrip("-"))
+            headers["Content-Range"] = f"bytes {start}-{len(body) - 1}/{len(body)}"
+            self.send_body(handler, body[start:], 206, headers)
+            return
+        handler.send_response(200)
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body[:len(body) // 2])
+        handler.wfile.flush()
+        handler.close_connection = True
+
+    def serve_slow(self, handler, hits):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.2)
+        with self.lock:
+            self.active -= 1
+        self.send_body(handler, b"slow")
+
+    def serve_big(self, handler, hits):
+        self.send_body(handler, BIG)
+
+    def serve_hang(self, handler, hits):
+        time.sleep(1.0)
+        try:
+            self.send_body(handler, b"late")
+        except ConnectionError:
+            pass  # the client gave up already
+
+
+def make_downloader(**options):
+    delays = []
+    messages = []
+    downloader = Downloader(sleep=delays.append, on_retry=messages.append, **options)
+    return downloader, delays, messages
+
+
+def test_retries_with_backoff():
+    """Transient statuses are retried with growing jittered delays, 404s are not"""
+    print("🧪 Testing retries with backoff...")
+    server = FlakyServer()
+    root = Path(tempfile.mkdtemp(prefix="bombercat-http-"))
+    try:
+        downloader, delays, messages = make_downloader(retries=3, backoff=1.0, max_backoff=30)
+        target = downloader.download(server.url + "flaky", root / "flaky.bin")
+        assert target.read_bytes() == BODY
+        assert server.hits["flaky"] == 3
+        assert len(delays) == 2 and delays[0] <= 2.0 and delays[1] <= 4.0
+        assert "attempt 2/4" in messages[0] and "503" in messages[0]
+
+        import requests
+        try:
+            downloader.get_json(server.url + "missing.json")
+            assert False, "404 must raise"
+        except requests.exceptions.HTTPError:
+            pass
+        assert server.hits["missing.json"] == 1
+
+        for attempt in range(1, 8):
+            assert 0 <= downloader.backoff_delay(attempt) <= 30
+        assert downloader.backoff_delay(1, retry_after=10) >= 10
+        print(f"✅ Retried after {', '.join(f'{d:.2f}s' for d in delays)}")
+    finally:
+        server.server.shutdown()
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def test_resume_after_drop():
+    """A dropped transfer continues from where it stopped"""
+    print("\n🧪 Testing resumed downloads...")
+    server = FlakyServer()
+    root = Path(tempfile.mkdtemp(prefix="bombercat-http-"))
+    try:
+        downloader, delays, messages = make_downloader(buffer_size=1024)
+        progress = []
+        target = downloader.download(server.url + "drop", root / "drop.zip",
+                                     progress=lambda done, total: progress.append((done, total)))
+        assert target.read_bytes() == BODY
+        # Resumes from the last chunk written before the drop
+        assert server.ranges[0] is None and len(server.ranges) == 2
+        resumed_at = int(server.ranges[1].split("=")[1].rstrip("-"))
+        assert 0 < resumed_at <= len(BODY) // 2
+        assert downloader.stats["resumed"] == 1
+        assert progress[-1] == (len(BODY), len(BODY))
+        assert not (root / "drop.zip.part").exists()
+
+        # Compression would make the offsets count other bytes than the file's
+        progress = []
+        target = downloader.download(server.url + "gzip", root / "gzip.zip",
+                                     progress=lambda done, total: progress.append((done, total)))
+        assert server.encodings == ["identity", "identity"]
+        assert target.read_bytes() == BODY
+        assert progress[-1] == (len(BODY), len(BODY))
+
+        # A file that changed between attempts is fetched again from the start
+        target = downloader.download(server.url + "changed", root / "changed.zip")
+        assert target.read_bytes() == b"v2" * 10000
+        requested, validator = server.ranges[-1]
+        assert requested.startswith("bytes=") and validator == '"v1"'
+
+        # Retries used up on a transient status: the partial file goes too
+        from bombercat_http import RetryableStatus
+        downloader, delays, messages = make_downloader(buffer_size=1024, retries=2)
+        try:
+            downloader.download(server.url + "dropbusy", root / "dropbusy.zip")
+            assert False, "a server that stays busy must fail the download"
+        except RetryableStatus:
+            pass
+        assert server.hits["dropbusy"] == 3
+        assert not (root / "dropbusy.zip.part").exists() and not (root / "dropbusy.zip").exists()
+        print(f"✅ Resumed at byte {resumed_at} of {len(BODY)}")
+    finally:
+        server.server.shutdown()
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def test_firmware_download_failure():
+    """A failed firmware download fails the flash unless an earlier archive is there"""
+    print("\n🧪 Testing firmware download failures...")
+
+    from bombercat_relay import ArduinoCLI, Config, FirmwareManager
+
+    server = FlakyServer()
+    root = Path(tempfile.mkdtemp(prefix="bombercat-http-"))
+    try:
+        cfg = Config(sketch_dir=str(root / "sketch"), run_history_path=str(root / "runs.sqlite3"))
+        arduino = ArduinoCLI(None, cfg)
+        arduino.emit_log = lambda message, level="info": None
+        arduino.emit_progress = lambda progress: None
+        downloader, delays, messages = make_downloader()
+        manager = FirmwareManager(arduino, None, cfg)
+        manager.fetch_firmware_archive = lambda: downloader.download(server.url + "missing.zip",
+                                                                     root / "sketch" / "bombercat.zip")
+
+        try:
+            manager.download_firmware("host")
+            assert False, "a 404 without an earlier archive must fail"
+        except Exception as e:
+            assert str(e).startswith("Could not download the BomberCat firmware: 404")
+        assert manager.sketch_path is None
+
+        firmware = root / "sketch" / "BomberCat-main" / "firmware" / "host_Relay_NFC"
+        firmware.mkdir(parents=True)
+        (firmware / "host_Relay_NFC.ino").write_text("void setup() {}\nvoid loop() {}\n")
+        manager.download_firmware("host")
+        assert manager.sketch_path == firmware
+    finally:
+        server.server.shutdown()
+        shutil.rmtree(root, ignore_errors=True)
+    print("✅ Download errors raised, earlier archive reused")
+
+
+def test_per_host_limit_and_timeouts():
+    """Concurrent downloads to one host are capped, stalled reads time out"""
+    print("\n🧪 Testing per-host limit and timeouts...")
+    server = FlakyServer()
+    root = Path(tempfile.mkdtemp(prefix="bombercat-http-"))
+    try:
+        downloader, delays, messages = make_downloader(per_host=2)
+        threads = [threading.Thread(target=downloader.download, args=(server.url + f"slow-{i}", root / f"slow{i}"))
+                   for i in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert server.max_active == 2, server.max_active
+        assert all((root / f"slow{i}").read_bytes() == b"slow" for i in range(6))
+
+        import requests
+        downloader, delays, messages = make_downloader(read_timeout=0.2, retries=1)
+        try:
+            downloader.download(server.url + "hang", root / "hang.bin")
+            assert False, "a stalled server must time out"
+        except requests.Timeout:
+            pass
+        assert server.hits["hang"] == 2 and len(delays) == 1
+        assert not (root / "hang.bin").exists() and not (root / "hang.bin.part").exists()
+        print(f"✅ At most {server.max_active} requests per host, stalls give up after one retry")
+    finally:
+        server.server.shutdown()
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def legacy_download(url, target, progress, checksum):
+    """The previous loop: 8 KB chunks, a progress call per chunk, a second pass to verify"""
+    import requests
+    from bombercat_mirror import verify_checksum
+    with requests.get(url, stream=True) as response:
+        total = int(response.headers.get("content-length", 0))
+        downloaded = 0
+        with open(target, "wb") as f:
+            for chunk in response.iter_content(chunk_size=8192):
+                f.write(chunk)
+                downloaded += len(chunk)
+                progress(downloaded, total)
+    assert verify_checksum(target, checksum)
+
+
+def test_download_throughput():
+    """Large buffers, hashing while streaming and throttled progress events"""
+    print("\n🧪 Benchmarking the download loop...")
+    server = FlakyServer()
+    root = Path(tempfile.mkdtemp(prefix="bombercat-http-"))
+    checksum = "SHA-256:" + hashlib.sha256(BIG).hexdigest()
+    size_mb = len(BIG) / 1024 ** 2
+    try:
+        legacy_events = []
+        start = time.perf_counter()
+        legacy_download(server.url + "big", root / "legacy.bin",
+                        lambda done, total: legacy_events.append(done), checksum)
+        legacy_rate = size_mb / (time.perf_counter() - start)
+
+        downloader, delays, messages = make_downloader()
+        events = []
+        start = time.perf_counter()
+        downloader.download(server.url + "big", root / "big.bin",
+                            progress=lambda done, total: events.append(done * 100 // total), checksum=checksum)
+        rate = size_mb / (time.perf_counter() - start)
+
+        assert (root / "big.bin").read_bytes() == BIG
+        assert events == sorted(set(events)) and events[-1] == 100
+        assert len(events) <= 101 < len(legacy_events)
+        assert downloader.stats["progress_events"] == len(events)
+
+        # A corrupted file never reaches its target name
+        from bombercat_http import ChecksumMismatch
+        try:
+            downloader.download(server.url + "big", root / "bad.bin", checksum="SHA-256:" + "0" * 64)
+            assert False, "checksum mismatch must raise"
+        except ChecksumMismatch:
+            pass
+        assert not (root / "bad.bin").exists() and not (root / "bad.bin.part").exists()
+
+        print(f"   before: {legacy_rate:.0f} MB/s with a separate verify pass, {len(legacy_events)} progress events")
+        print(f"   after:  {rate:.0f} MB/s hashed while streaming, {len(events)} progress events")
+        print("✅ Download loop benchmarked")
+    finally:
+        server.server.shutdown()
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main():
+    print("""
+╔══════════════════════════════════════════════╗
+║        🧪 SHARED HTTP DOWNLOADER 🧪          ║
+╚══════════════════════════════════════════════╝
+""")
+    test_retries_with_backoff()
+    test_resume_after_drop()
+    test_firmware_download_failure()
+    test_per_host_limit_and_timeouts()
+    test_download_throughput()
+    print("\n✅ ALL TESTS PASSED!")
+
+
+if __name__ == "__main__":
+    main()
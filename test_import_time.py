@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Test script to verify that importing bombercat_relay stays cheap and side-effect free
+Runs a cold interpreter with -X importtime and fails if the import regresses
+"""
+import os
+import sys
+import json
+import subprocess
+import tempfile
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent
+
+# Cumulative import budget for bombercat_relay in microseconds
+IMPORT_BUDGET_US = 150000
+
+# Modules that must only be loaded when the web server or a download is needed
+HEAVY_MODULES = ["flask", "flask_socketio", "socketio", "engineio", "requests", "serial", "zipfile", "werkzeug"]
+
+PROBE = """
+import sys, json
+before = set(sys.modules)
+import bombercat_relay
+from bombercat_relay import FirmwareManager, ArduinoCLI, Config
+print(json.dumps(sorted(set(sys.modules) - before)))
+"""
+
+
+def run_probe(workdir):
+    env = dict(os.environ, PYTHONPATH=str(REPO_DIR))
+    return subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE], cwd=workdir,
+                          capture_output=True, text=True, env=env, timeout=60)
+
+
+def cumulative_import_time(stderr, module):
+    for line in stderr.splitlines():
+        if line.startswith("import time:") and line.rsplit("|", 1)[-1].strip() == module:
+            return int(line.split("|")[1])
+    return None
+
+
+def test_import_is_lazy_and_side_effect_free():
+    """No heavy dependencies, no config loading and no directories on import"""
+    print("🧪 Testing bombercat_relay cold import...")
+
+    with tempfile.TemporaryDirectory(prefix="bombercat-import-") as workdir:
+        run_probe(workdir)  # warm the bytecode cache so only import work is measured
+        result = run_probe(workdir)
+        assert result.returncode == 0, result.stderr[-2000:]
+
+        loaded = json.loads(result.stdout.strip().splitlines()[-1])
+        heavy = [m for m in loaded if m.split(".")[0] in HEAVY_MODULES]
+        assert heavy == [], f"heavy modules imported eagerly: {heavy}"
+
+        assert os.listdir(workdir) == [], f"import created files: {os.listdir(workdir)}"
+        assert "Loaded" not in result.stdout
+
+        elapsed = cumulative_import_time(result.stderr, "bombercat_relay")
+        assert elapsed is not None
+        assert elapsed < IMPORT_BUDGET_US, f"import took {elapsed} us (budget {IMPORT_BUDGET_US} us)"
+    print(f"✅ bombercat_relay imported in {elapsed / 1000:.1f} ms without heavy modules")
+
+
+def test_app_factory_builds_independent_apps():
+    """create_app builds a fresh app and services each time"""
+    sys.path.insert(0, str(REPO_DIR))
+    from bombercat_relay import Config, create_app
+
+    with tempfile.TemporaryDirectory(prefix="bombercat-app-") as workdir:
+        cfg = Config(build_dir=os.path.join(workdir, "build"), sketch_dir=os.path.join(workdir, "sketch"))
+        first = create_app(cfg)
+        second = create_app(cfg)
+        assert first is not second
+        assert first.extensions["bombercat"]["arduino_cli"] is not second.extensions["bombercat"]["arduino_cli"]
+        assert first.extensions["bombercat"]["config"] is cfg
+
+        client = first.test_client()
+        assert client.get("/api/status").get_json()["initialized"] is False
+
+
+def main():
+    print("""
+╔══════════════════════════════════════════════╗
+║        🧪 IMPORT TIME BUDGET CHECK 🧪        ║
+╚══════════════════════════════════════════════╝
+""")
+    test_import_is_lazy_and_side_effect_free()
+    test_app_factory_builds_independent_apps()
+    print("\n✅ ALL TESTS PASSED!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Test script to verify freshness-aware index updates in ArduinoCLI.initialize
+A local HTTP server with ETags stands in for the board manager index hosts
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+
+# Add current directory to path to import bombercat modules
+sys.path.insert(0, '.')
+
+
+class IndexHandler(BaseHTTPRequestHandler):
+    etag = '"v1"'
+    requests_seen = []
+
+    def do_HEAD(self):
+        IndexHandler.requests_seen.append(self.path)
+        if self.headers.get("If-None-Match") == IndexHandler.etag:
+            self.send_response(304)
+        else:
+            self.send_response(200)
+            self.send_header("ETag", IndexHandler.etag)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeArduinoCLI:
+    """Records commands and writes the files the real CLI would"""
+
+    def __init__(self, arduino_dir, board_urls):
+        self.arduino_dir = arduino_dir
+        self.board_urls = board_urls
+        self.commands = []
+
+    def __call__(self, *args, **kwargs):
+        self.commands.append(args)
+        if args[:2] == ("config", "init"):
+            (self.arduino_dir / "arduino-cli.yaml").write_text(
+                "board_manager:\n  additional_urls:\n" + "".join(f"    - {u}\n" for u in args[3].split(",")))
+        elif args == ("core", "update-index"):
+            (self.arduino_dir / "package_index.json").write_text("{}")
+            for url in self.board_urls:
+                (self.arduino_dir / url.rsplit("/", 1)[1]).write_text("{}")
+
+
+def run_initialize(cli, fake):
+    cli.initialized = False
+    cli.run_command = fake
+    fake.commands.clear()
+    start = time.perf_counter()
+    cli.initialize()
+    return time.perf_counter() - start
+
+
+def test_initialize_skips_fresh_indexes():
+    """Restarts reuse fresh indexes and write all board URLs at once"""
+    print("🧪 Testing freshness-aware initialize...")
+    from bombercat_relay import ArduinoCLI, config, socketio
+
+    home = Path(tempfile.mkdtemp(prefix="bombercat-home-"))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), IndexHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    original_home = os.environ.get("HOME")
+    original_urls, original_ttl = config.board_urls, config.index_ttl
+    os.environ["HOME"] = str(home)
+    try:
+        config.board_urls = [f"{base}/package_rp2040_index.json", f"{base}/package_electroniccats_index.json"]
+        config.index_ttl = 3600
+        arduino_dir = home / ".arduino15"
+        arduino_dir.mkdir()
+
+        cli = ArduinoCLI(socketio)
+        cli.cli_path = sys.executable
+        fake = FakeArduinoCLI(arduino_dir, config.board_urls)
+
+        # First run: one config write with every URL, then a full index update
+        run_initialize(cli, fake)
+        assert fake.commands == [("config", "init", "--additional-urls", ",".join(config.board_urls)),
+                                 ("core", "update-index")]
+        state = json.loads((arduino_dir / "bombercat_index_state.json").read_text())
+        assert all(state[url]["etag"] == '"v1"' for url in config.board_urls)
+
+        # restart_server.sh deletes the config: only the config write is repeated
+        (arduino_dir / "arduino-cli.yaml").unlink()
+        IndexHandler.requests_seen.clear()
+        elapsed = run_initialize(cli, fake)
+        assert fake.commands == [("config", "init", "--additional-urls", ",".join(config.board_urls))]
+        assert IndexHandler.requests_seen == []
+        assert elapsed < 0.5
+        print(f"✅ Restart reached ready in {elapsed * 1000:.1f} ms")
+
+        # Config already lists every URL: nothing to run at all
+        run_initialize(cli, fake)
+        assert fake.commands == []
+
+        # TTL expired but the server answers 304: no update, timestamps refreshed
+        config.index_ttl = 0
+        time.sleep(0.01)
+        run_initialize(cli, fake)
+        assert fake.commands == []
+        assert len(IndexHandler.requests_seen) == 2
+
+        # Upstream changed: the update runs and the new ETag is recorded
+        IndexHandler.etag = '"v2"'
+        time.sleep(0.01)
+        run_initialize(cli, fake)
+        assert fake.commands == [("core", "update-index")]
+        state = json.loads((arduino_dir / "bombercat_index_state.json").read_text())
+        assert all(state[url]["etag"] == '"v2"' for url in config.board_urls)
+    finally:
+        config.board_urls, config.index_ttl = original_urls, original_ttl
+        if original_home is None:
+            os.environ.pop("HOME", None)
+        else:
+            os.environ["HOME"] = original_home
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(home, ignore_errors=True)
+    print("✅ Index updates only run when something changed")
+
+
+def main():
+    print("""
+╔══════════════════════════════════════════════╗
+║      🧪 FRESHNESS-AWARE INDEX UPDATES 🧪     ║
+╚══════════════════════════════════════════════╝
+""")
+    test_initialize_skips_fresh_indexes()
+    print("\n✅ ALL TESTS PASSED!")
+
+
+if __name__ == "__main__":
+    main()
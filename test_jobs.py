@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Test script to verify cancellable jobs
+A fake arduino-cli never finishes and spawns a grandchild that ignores
+SIGTERM and holds the output pipe, like an uploader stuck on a port
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+
+# Add current directory to path to import bombercat modules
+sys.path.insert(0, '.')
+
+from bombercat_jobs import Job
+
+REPO_DIR = Path(__file__).resolve().parent
+
+FQBN = "electroniccats:rp2040:bombercat"
+
+FAKE_CLI = """#!{python}
+import os
+import sys
+import time
+import signal
+import subprocess
+from pathlib import Path
+args = sys.argv[1:]
+if args[0] == "version":
+    print('{{"VersionString": "1.0.4"}}')
+    sys.exit(0)
+signal.signal(signal.SIGTERM, signal.SIG_IGN)
+child = subprocess.Popen([sys.executable, "-c",
+                          "import signal, time; signal.signal(signal.SIGTERM, signal.SIG_IGN); time.sleep(120)"])
+Path({pids!r}).write_text(f"{{os.getpid()}} {{child.pid}}")
+print("Waiting for the board...", flush=True)
+time.sleep(120)
+"""
+
+
+def make_cli(root):
+    pids = root / "pids"
+    cli = root / "arduino-cli"
+    cli.write_text(FAKE_CLI.format(python=sys.executable, pids=str(pids)))
+    cli.chmod(0o755)
+    return cli, pids
+
+
+def wait_for_pids(pids, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if pids.exists() and len(pids.read_text().split()) == 2:
+            return [int(pid) for pid in pids.read_text().split()]
+        time.sleep(0.02)
+    raise AssertionError("fake arduino-cli did not start")
+
+
+def alive(pid):
+    """True unless the process is gone or a zombie"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+    except OSError:
+        try:
+            os.kill(pid, 0)
+            return True
+        except OSError:
+            return False
+
+
+def all_dead(*pids, timeout=2):
+    """SIGKILL is delivered asynchronously, give the processes a moment to go"""
+    deadline = time.time() + timeout
+    while any(alive(pid) for pid in pids):
+        if time.time() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+def test_cancel_kills_process_group():
+    """Cancelling a job kills the CLI and its grandchildren, also when they ignore SIGTERM"""
+    print("🧪 Testing job cancellation of run_command...")
+
+    from bombercat_relay import ArduinoCLI, Config
+
+    root = Path(tempfile.mkdtemp(prefix="bombercat-jobs-"))
+    try:
+        cli, pids = make_cli(root)
+        arduino = ArduinoCLI(None, Config(job_kill_grace=0.5, run_history_path=str(root / "runs.sqlite3")))
+        arduino.cli_path = str(cli)
+        arduino.emit_log = lambda message, level="info": None
+
+        job = Job("flash", kill_grace=0.5)
+        thread = threading.Thread(target=job.run, args=(arduino.run_command, "upload", "--port", "/dev/ttyACM0"))
+        thread.start()
+        leader, grandchild = wait_for_pids(pids)
+        assert job.state == "running" and len(job.processes) == 1
+
+        start = time.perf_counter()
+        assert job.cancel()
+        thread.join(5)
+        elapsed = time.perf_counter() - start
+        assert not thread.is_alive() and job.state == "cancelled", job.to_dict()
+        assert elapsed < 3, elapsed
+        assert all_dead(leader, grandchild)
+        assert not job.processes and not job.cancel()
+
+        # Without a job, a timeout tears the tree down too instead of waiting on the open pipe
+        pids.unlink()
+        start = time.perf_counter()
+        try:
+            arduino.run_command("upload", timeout=0.5)
+            assert False, "timeout expected"
+        except subprocess.TimeoutExpired:
+            pass
+        leader, grandchild = wait_for_pids(pids)
+        assert time.perf_counter() - start < 4
+        assert all_dead(leader, grandchild)
+        print(f"✅ Process group killed {elapsed * 1000:.0f} ms after cancel")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def test_cancel_endpoint():
+    """POST /api/jobs/<id>/cancel stops a stuck flash or install and releases what it held"""
+    print("\n🧪 Testing the job cancel endpoint...")
+
+    from bombercat_relay import Config, create_app
+
+    root = Path(tempfile.mkdtemp(prefix="bombercat-jobs-"))
+    old_home = os.environ.get("HOME")
+    os.environ["HOME"] = str(root)
+    os.chdir(root)
+    try:
+        cli, pids = make_cli(root)
+        sketch = root / "sketch" / "BomberCat-main" / "firmware" / "host_Relay_NFC"
+        sketch.mkdir(parents=True)
+        (sketch / "host_Relay_NFC.ino").write_text("void setup() {}\nvoid loop() {}\n")
+
+        cfg = Config(build_dir=str(root / "build"), sketch_dir=str(root / "sketch"), use_build_cache=False,
+                     use_ccache=False, async_mode="threading", warmup=False, job_kill_grace=0.5,
+                     board_registry_path=str(root / "boards.sqlite3"), run_history_path=str(root / "runs.sqlite3"))
+        app = create_app(cfg)
+        services = app.extensions["bombercat"]
+        arduino = services["arduino_cli"]
+        arduino.cli_path = str(cli)
+        arduino.emit_log = lambda message, level="info": None
+        arduino.emit_progress = lambda progress: None
+        # The extracted firmware archive counts as freshly fetched
+        services["firmware_manager"].firmware_fetched_at = time.time()
+        services["port_inventory"].list_ports = lambda: []
+        services["port_inventory"].bootsel_scanner = lambda: {"in_bootsel": False, "bootsel_path": None}
+        client = app.test_client()
+
+        # A flash stuck in compile
+        response = client.post("/api/flash", json={"port": "/dev/ttyACM0", "wifi_ssid": "lab", "fqbn": FQBN})
+        job_id = response.get_json()["job_id"]
+        leader, grandchild = wait_for_pids(pids)
+        workspaces = list((root / "sketch" / "workspaces" / "jobs").iterdir())
+        assert len(workspaces) == 1
+
+        start = time.perf_counter()
+        response = client.post(f"/api/jobs/{job_id}/cancel")
+        elapsed = time.perf_counter() - start
+        assert response.status_code == 200, response.get_json()
+        assert response.get_json()["job"]["state"] == "cancelled" and elapsed < 3
+        assert all_dead(leader, grandchild)
+        assert not workspaces[0].exists()
+
+        run = client.get("/api/runs?limit=1").get_json()["runs"][0]
+        assert run["outcome"] == "cancelled" and run["failed_stage"] == "compile"
+        assert run["error_class"] == "JobCancelled"
+        jobs = client.get("/api/jobs").get_json()["jobs"]
+        assert jobs[0]["id"] == job_id and jobs[0]["kind"] == "flash" and jobs[0]["port"] == "/dev/ttyACM0"
+        assert client.post(f"/api/jobs/{job_id}/cancel").status_code == 409
+        assert client.post("/api/jobs/nope/cancel").status_code == 404
+
+        # An install stuck in `config init` frees the installation slot
+        pids.unlink()
+        response = client.post("/api/install_dependencies")
+        job_id = response.get_json()["job_id"]
+        wait_for_pids(pids)
+        assert client.post("/api/install_dependencies").get_json()["status"] == "Installation already in progress"
+        assert client.post(f"/api/jobs/{job_id}/cancel").status_code == 200
+        state = services["installation_state"]
+        assert not state["in_progress"] and not state["completed"]
+        assert state["message"] == "Installation cancelled"
+        print(f"✅ Flash cancelled in {elapsed * 1000:.0f} ms, workspace and install slot released")
+    finally:
+        os.chdir(REPO_DIR)
+        if old_home is None:
+            os.environ.pop("HOME", None)
+        else:
+            os.environ["HOME"] = old_home
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main():
+    print("""
+╔══════════════════════════════════════════════╗
+║           🧪 CANCELLABLE JOBS 🧪             ║
+╚══════════════════════════════════════════════╝
+""")
+    test_cancel_kills_process_group()
+    test_cancel_endpoint()
+    print("\n✅ ALL TESTS PASSED!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Test script to verify concurrent library downloads with ordered installation
+A local HTTP server with a per-request delay stands in for the Arduino library store
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add current directory to path to import bombercat modules
+sys.path.insert(0, '.')
+
+from bombercat_libfetch import install_order, resolve_releases
+
+DELAY = 0.3
+
+# name -> dependencies; "Broken" is published with a wrong checksum
+LIBRARIES = {
+    "PubSubClient": [],
+    "Adafruit PN532": ["Adafruit BusIO"],
+    "Adafruit BusIO": ["Wire"],
+    "FastLED": [],
+    "Arduino-SerialCommand": [],
+    "Broken": [],
+}
+
+FAKE_CLI = """#!{python}
+import sys, json, shutil
+from pathlib import Path
+args = sys.argv[1:]
+with open({log!r}, "a") as log:
+    log.write(" ".join(args) + "\\n")
+if args[:2] == ["lib", "list"]:
+    print(json.dumps({{"installed_libraries": [
+        {{"library": {{"name": "SPI", "version": "1.0.0", "location": "platform"}}}},
+        {{"library": {{"name": "Wire", "version": "1.0.0", "location": "platform"}}}}]}}))
+elif args[:2] == ["lib", "update-index"]:
+    shutil.copy({index!r}, Path.home() / ".arduino15" / "library_index.json")
+elif args[:2] == ["lib", "install"] and "--zip-path" not in args:
+    print("Library not found: " + args[2], file=sys.stderr)
+    sys.exit(1)
+"""
+
+
+class Store:
+    """Serves library zips after a delay and counts downloads"""
+
+    def __init__(self):
+        self.files = {}
+        self.hits = []
+        store = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                time.sleep(DELAY)
+                body = store.files.get(self.path.lstrip("/"))
+                store.hits.append(self.path.lstrip("/"))
+                self.send_response(200 if body is not None else 404)
+                self.send_header("Content-Length", str(len(body or b"")))
+                self.end_headers()
+                self.wfile.write(body or b"")
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+
+    def index(self):
+        releases = []
+        for name, deps in LIBRARIES.items():
+            archive = name.replace(" ", "_") + "-1.0.0.zip"
+            body = f"zip of {name}".encode()
+            self.files[archive] = body
+            checksum = hashlib.sha256(body if name != "Broken" else b"tampered").hexdigest()
+            releases.append({
+                "name": name,
+                "version": "1.0.0",
+                "url": self.url + archive,
+                "archiveFileName": archive,
+                "checksum": f"SHA-256:{checksum}",
+                "dependencies": [{"name": dep} for dep in deps]
+            })
+            # An older release that must not be picked
+            releases.append(dict(releases[-1], version="0.9.0", archiveFileName="old-" + archive))
+        return {"libraries": releases}
+
+
+def test_resolution_and_order():
+    """Alternatives and dependencies are resolved, dependencies install first"""
+    print("🧪 Testing library resolution and install order...")
+    latest = {name: {"name": name, "version": "1.0.0", "dependencies": [{"name": d} for d in deps]}
+              for name, deps in LIBRARIES.items()}
+    resolved, releases, unknown = resolve_releases(
+        latest, ["Adafruit PN532", "SerialCommand", "Nope"],
+        {"SerialCommand": ["SerialCommand-ng", "Arduino-SerialCommand"]},
+        installed=lambda name: name == "Wire")
+    assert resolved == {"Adafruit PN532": "Adafruit PN532", "SerialCommand": "Arduino-SerialCommand"}
+    assert set(releases) == {"Adafruit PN532", "Adafruit BusIO", "Arduino-SerialCommand"}
+    assert unknown == ["Nope"]
+    order = install_order(releases)
+    assert order.index("Adafruit BusIO") < order.index("Adafruit PN532")
+    print("✅ Resolution OK")
+
+
+def test_concurrent_install():
+    """Archives download in parallel, verified, then install in dependency order"""
+    print("\n🧪 Testing concurrent library downloads...")
+
+    from bombercat_relay import ArduinoCLI, Config
+
+    root = Path(tempfile.mkdtemp(prefix="bombercat-libs-"))
+    old_home = os.environ.get("HOME")
+    os.environ["HOME"] = str(root)
+    store = Store()
+    try:
+        (root / ".arduino15").mkdir()
+        index = root / "library_index.json"
+        index.write_text(json.dumps(store.index()))
+        log = root / "cli.log"
+        cli = root / "arduino-cli"
+        cli.write_text(FAKE_CLI.format(python=sys.executable, log=str(log), index=str(index)))
+        cli.chmod(0o755)
+
+        cfg = Config(required_libraries=["PubSubClient", "Adafruit PN532", "FastLED", "SPI", "SerialCommand",
+                                         "Broken"],
+                     library_alternatives={"SerialCommand": ["Arduino-SerialCommand"]},
+                     library_download_workers=4, library_staging_dir=str(root / "staging"))
+        arduino = ArduinoCLI(None, cfg)
+        arduino.cli_path = str(cli)
+        logs = []
+        arduino.emit_log = lambda message, level="info": logs.append((level, message))
+        arduino.emit_progress = lambda progress: None
+
+        arduino.install_libraries()
+
+        report = arduino.library_fetch_report
+        assert report["downloaded"] == 5 and report["failed"] == 1
+        assert len(store.hits) == 6
+        # Six DELAY downloads over four workers take two rounds, not six
+        assert report["wall"] < 6 * DELAY * 0.7, report
+
+        commands = log.read_text().splitlines()
+        installs = [line.split("--zip-path ")[1] for line in commands if "--zip-path" in line]
+        names = [Path(path).name for path in installs]
+        assert names.index("Adafruit_BusIO-1.0.0.zip") < names.index("Adafruit_PN532-1.0.0.zip")
+        assert "Broken-1.0.0.zip" not in names and not any("Wire" in name for name in names)
+        assert "config set library.enable_unsafe_install true" in commands
+        # The tampered archive falls back to installing by name
+        assert "lib install Broken" in commands
+        assert ("warning", "Failed libraries: Broken") in logs
+        assert commands.count("lib list --format json") == 1
+
+        # Verified archives stay staged; only the broken one is fetched again
+        arduino.install_libraries()
+        assert arduino.library_fetch_report["cached"] == 5
+        assert len(store.hits) == 7
+        print(f"✅ {report['downloaded']} archives in {report['wall']}s instead of ~{6 * DELAY:.1f}s")
+    finally:
+        store.server.shutdown()
+        if old_home is None:
+            os.environ.pop("HOME", None)
+        else:
+            os.environ["HOME"] = old_home
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main():
+    print("""
+╔══════════════════════════════════════════════╗
+║     🧪 CONCURRENT LIBRARY DOWNLOADS 🧪       ║
+╚══════════════════════════════════════════════╝
+""")
+    test_resolution_and_order()
+    test_concurrent_install()
+    print("\n✅ ALL TESTS PASSED!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Test script to verify firmware size and memory-map analysis
+A small RP2040-like ELF and linker map are generated on the fly
+"""
+import sys
+import time
+import shutil
+import struct
+import tempfile
+from pathlib import Path
+
+# Add current directory to path to import bombercat modules
+sys.path.insert(0, '.')
+
+from bombercat_memmap import SizeHistory, analyze_build, iter_map_sections, library_of, library_usage
+
+FQBN = "rp2040:rp2040:rpipico"
+
+# name, type (1 progbits, 8 nobits), flags (2 alloc, 4 exec), address, size
+SECTIONS = [
+    (".boot2", 1, 6, 0x10000000, 0x100),
+    (".text", 1, 6, 0x10000100, 0x30000),
+    (".rodata", 1, 2, 0x10030100, 0x4000),
+    (".data", 1, 3, 0x20000000, 0x800),
+    (".bss", 8, 3, 0x20000800, 0x8000),
+    (".debug_info", 1, 0, 0, 0x10000),
+]
+
+# name, kind (1 object, 2 function), section index, address, size
+SYMBOLS = [
+    ("loop", 2, 2, 0x10000201, 0x40),
+    ("_ZN7PN71504initEv", 2, 2, 0x10000301, 0x1200),
+    ("rx_buffer", 1, 5, 0x20000800, 0x4000),
+    ("wifi_config", 1, 4, 0x20000000, 0x100),
+    ("empty", 1, 5, 0x20004800, 0),
+]
+
+MAP_HEADER = """Archive member included to satisfy reference by file (symbol)
+
+Discarded input sections
+
+ .text          0x00000000       0x40 /build/sketch/unused.cpp.o
+
+Memory Configuration
+
+Linker script and memory map
+
+LOAD /build/sketch/BomberCat.ino.cpp.o
+.text           0x10000100    0x30000
+ *(.text*)
+"""
+
+MAP_ENTRIES = """ .text.loop     0x10000200       0x40 /build/sketch/BomberCat.ino.cpp.o
+                0x10000200                loop
+ .text._ZN7PN71504initEv
+                0x10000300     0x1200 /build/libraries/ElectronicCats-PN7150/Electroniccats_PN7150.cpp.o
+ .text          0x10001500      0x800 /build/core/core.a(wiring.cpp.o)
+ *fill*         0x10001d00        0x4
+ .text.memcpy   0x10001d04      0x100 /opt/arm-none-eabi/lib/thumb/libc_nano.a(lib_a-memcpy.o)
+ .data.wifi_config
+                0x20000000      0x100 /build/sketch/BomberCat.ino.cpp.o
+ .bss.rx_buffer
+                0x20000800     0x4000 /build/libraries/WiFiNINA/utility/spi_drv.cpp.o
+ COMMON         0x20004800       0x20 /build/core/core.a(main.cpp.o)
+"""
+
+
+def build_elf(path):
+    """Write an ELF32 with the sections and symbols above"""
+    shstrtab = b"\0"
+    names = []
+    for name, *_ in SECTIONS + [(".symtab",), (".strtab",), (".shstrtab",)]:
+        names.append(len(shstrtab))
+        shstrtab += name.encode() + b"\0"
+
+    strtab = b"\0"
+    symtab = b"\0" * 16
+    for name, kind, shndx, address, size in SYMBOLS:
+        symtab += struct.pack("<IIIBBH", len(strtab), address, size, 0x10 | kind, 0, shndx)
+        strtab += name.encode() + b"\0"
+
+    blobs = [symtab, strtab, shstrtab]
+    offset = 52
+    offsets = []
+    for blob in blobs:
+        offsets.append(offset)
+        offset += len(blob)
+
+    headers = [struct.pack("<IIIIIIIIII", 0, 0, 0, 0, 0, 0, 0, 0, 0, 0)]
+    for i, (_, kind, flags, address, size) in enumerate(SECTIONS):
+        headers.append(struct.pack("<IIIIIIIIII", names[i], kind, flags, address, 0, size, 0, 0, 4, 0))
+    count = len(SECTIONS)
+    headers.append(struct.pack("<IIIIIIIIII", names[count], 2, 0, 0, offsets[0], len(symtab), count + 2, 1, 4, 16))
+    headers.append(struct.pack("<IIIIIIIIII", names[count + 1], 3, 0, 0, offsets[1], len(strtab), 0, 0, 1, 0))
+    headers.append(struct.pack("<IIIIIIIIII", names[count + 2], 3, 0, 0, offsets[2], len(shstrtab), 0, 0, 1, 0))
+
+    ident = b"\x7fELF" + bytes([1, 1, 1]) + b"\0" * 9
+    header = ident + struct.pack("<HHIIIIIHHHHHH", 2, 40, 1, 0x10000001, 0, offset, 0x5000000, 52, 0, 0, 40,
+                                 len(headers), len(headers) - 1)
+    path.write_bytes(header + b"".join(blobs) + b"".join(headers))
+
+
+def make_build(root, map_repeat=1, sketch_name="BomberCat"):
+    build = root / "build"
+    build.mkdir(parents=True, exist_ok=True)
+    build_elf(build / f"{sketch_name}.ino.elf")
+    with open(build / f"{sketch_name}.ino.map", "w") as f:
+        f.write(MAP_HEADER)
+        for _ in range(map_repeat):
+            f.write(MAP_ENTRIES)
+    return build
+
+
+def test_library_names():
+    """Objects are attributed to libraries, the core, the toolchain or the sketch"""
+    assert library_of("/build/libraries/WiFiNINA/utility/spi_drv.cpp.o") == "WiFiNINA"
+    assert library_of("/build/core/core.a(wiring.cpp.o)") == "core"
+    assert library_of("/opt/lib/thumb/libc_nano.a(lib_a-memcpy.o)") == "libc_nano"
+    assert library_of("/build/sketch/BomberCat.ino.cpp.o") == "sketch"
+    assert library_of("C:\\build\\libraries\\SD\\SD.cpp.o") == "SD"
+
+
+def test_analyze_build():
+    """Sections, flash/RAM totals, top symbols and per-library use"""
+    print("🧪 Testing ELF and map analysis...")
+
+    root = Path(tempfile.mkdtemp(prefix="bombercat-memmap-"))
+    try:
+        report = analyze_build(make_build(root), "BomberCat", flash_size=0x100000, ram_size=0x40000, top_n=3)
+
+        # boot2 + text + rodata + the flash copy of data; data + bss in RAM
+        assert report["flash"]["used"] == 0x100 + 0x30000 + 0x4000 + 0x800
+        assert report["ram"]["used"] == 0x800 + 0x8000
+        assert report["flash"]["percent"] == 20.5
+        assert [s["name"] for s in report["sections"]] == [".boot2", ".text", ".rodata", ".data", ".bss"]
+
+        assert [s["name"] for s in report["top_symbols"]] == ["rx_buffer", "_ZN7PN71504initEv", "wifi_config"]
+        assert report["top_symbols"][0]["region"] == "ram"
+        assert report["top_symbols"][1]["address"] == 0x10000300
+
+        libraries = {lib["name"]: lib for lib in report["libraries"]}
+        assert report["libraries"][0]["name"] == "ElectronicCats-PN7150"
+        assert libraries["sketch"] == {"name": "sketch", "flash": 0x140, "ram": 0x100}
+        assert libraries["WiFiNINA"] == {"name": "WiFiNINA", "flash": 0, "ram": 0x4000}
+        assert libraries["core"] == {"name": "core", "flash": 0x800, "ram": 0x20}
+        assert libraries["libc_nano"]["flash"] == 0x100
+        assert "unused" not in libraries
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    print("✅ Sections, symbols and libraries reported")
+
+
+def test_large_map_streams():
+    """A multi-MB map file is parsed line by line"""
+    print("\n🧪 Testing streaming map parsing...")
+
+    root = Path(tempfile.mkdtemp(prefix="bombercat-memmap-"))
+    try:
+        build = make_build(root, map_repeat=20_000)
+        map_file = build / "BomberCat.ino.map"
+        size_mb = map_file.stat().st_size / (1024 * 1024)
+        assert size_mb > 10
+
+        start = time.time()
+        libraries = library_usage(map_file)
+        elapsed = time.time() - start
+        assert libraries["ElectronicCats-PN7150"]["flash"] == 0x1200 * 20_000
+
+        # The parser consumes an iterator, it never needs the whole file
+        with open(map_file) as f:
+            first = next(iter_map_sections(f))
+        assert first == (".text.loop", 0x10000200, 0x40, "/build/sketch/BomberCat.ino.cpp.o")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    print(f"✅ {size_mb:.1f} MB map parsed in {elapsed:.2f}s")
+
+
+def test_compile_records_history():
+    """compile_firmware logs the size and keeps a history per firmware and FQBN"""
+    print("\n🧪 Testing size history after compile...")
+
+    from bombercat_relay import ArduinoCLI, Config, FirmwareManager
+
+    root = Path(tempfile.mkdtemp(prefix="bombercat-memmap-"))
+    try:
+        cfg = Config(build_dir=str(root / "build"), sketch_dir=str(root / "sketch"), use_ccache=False,
+                     use_build_cache=False, size_history_path=str(root / "sizes.jsonl"))
+        arduino = ArduinoCLI(None, cfg)
+        logs = []
+        arduino.emit_log = lambda message, level="info": logs.append((level, message))
+        arduino.emit_progress = lambda progress: None
+
+        class Result:
+            stdout = ("Sketch uses 200000 bytes (9%) of program storage space. Maximum is 2093056 bytes.\n"
+                      "Global variables use 34816 bytes (13%) of dynamic memory, leaving 227328 bytes for "
+                      "local variables. Maximum is 262144 bytes.\n")
+
+        def run_command(*args, **kwargs):
+            make_build(root, sketch_name="host_Relay_NFC")
+            return Result()
+
+        arduino.run_command = run_command
+        manager = FirmwareManager(arduino, None, cfg)
+        manager.sketch_path = root / "host_Relay_NFC"
+
+        manager.compile_firmware(FQBN)
+        report = manager.size_report
+        assert report["firmware"] == "host_Relay_NFC"
+        assert report["flash"]["size"] == 2093056 and report["ram"]["size"] == 262144
+        assert ("info", "Flash: 210.2 KB of 2044.0 KB (10.3%), RAM: 34.0 KB of 256.0 KB (13.3%)") in logs
+        assert any(message.startswith("Largest libraries: ElectronicCats-PN7150 4.5 KB") for _, message in logs)
+
+        manager.compile_firmware(FQBN)
+        assert ("info", "Size change since previous build: +0.0 KB flash, +0.0 KB RAM") in logs
+
+        history = SizeHistory(root / "sizes.jsonl")
+        records = history.records("host_Relay_NFC", FQBN)
+        assert len(records) == 2 and records[-1]["flash"] == report["flash"]["used"]
+        assert history.records("client_Relay_NFC") == []
+        # Jobs append through the manager's one history, and its lock
+        assert manager.for_job().get_size_history() is manager.get_size_history()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    print("✅ Size logged and recorded")
+
+
+def main():
+    print("""
+╔══════════════════════════════════════════════╗
+║      🧪 FIRMWARE SIZE & MEMORY MAP 🧪        ║
+╚══════════════════════════════════════════════╝
+""")
+    test_library_names()
+    test_analyze_build()
+    test_large_map_streams()
+    test_compile_records_history()
+    print("\n✅ ALL TESTS PASSED!")
+
+
+if __name__ == "__main__":
+    main()
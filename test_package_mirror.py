@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the local package mirror (sync once, then serve offline)
+A local HTTP server plays the part of the upstream package hosts
+"""
+import sys
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+import urllib.request
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from pathlib import Path
+
+# Add current directory to path to import bombercat modules
+sys.path.insert(0, '.')
+
+from bombercat_mirror import PackageMirror, host_matches
+
+
+class CountingHandler(SimpleHTTPRequestHandler):
+    requests_seen = []
+
+    def do_GET(self):
+        CountingHandler.requests_seen.append(self.path)
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def sha256(data):
+    return "SHA-256:" + hashlib.sha256(data).hexdigest()
+
+
+def make_upstream(root):
+    """Create a fake board index, library index and archives, served over HTTP"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(CountingHandler, directory=str(root)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    files = {
+        "rp2040-3.9.0.zip": b"core 3.9.0",
+        "rp2040-3.8.0.zip": b"core 3.8.0",
+        "pqt-gcc-linux.tar.gz": b"gcc linux",
+        "pqt-gcc-windows.zip": b"gcc windows",
+        "PubSubClient-2.8.zip": b"pubsub",
+        "ArduinoJson-7.0.zip": b"json",
+    }
+    for name, data in files.items():
+        (root / name).write_bytes(data)
+
+    def archive(name):
+        return {"archiveFileName": name, "url": f"{base}/{name}", "checksum": sha256(files[name]),
+                "size": str(len(files[name]))}
+
+    index = {"packages": [{
+        "name": "rp2040",
+        "maintainer": "Earle F. Philhower, III",
+        "platforms": [
+            dict(archive("rp2040-3.8.0.zip"), name="Raspberry Pi Pico/RP2040", architecture="rp2040",
+                 version="3.8.0", toolsDependencies=[]),
+            dict(archive("rp2040-3.9.0.zip"), name="Raspberry Pi Pico/RP2040", architecture="rp2040",
+                 version="3.9.0", toolsDependencies=[{"packager": "rp2040", "name": "pqt-gcc", "version": "2.0"}]),
+        ],
+        "tools": [{"name": "pqt-gcc", "version": "2.0", "systems": [
+            dict(archive("pqt-gcc-linux.tar.gz"), host="x86_64-linux-gnu"),
+            dict(archive("pqt-gcc-windows.zip"), host="x86_64-mingw32"),
+        ]}]
+    }]}
+    (root / "package_rp2040_index.json").write_text(json.dumps(index))
+
+    libraries = {"libraries": [
+        dict(archive("PubSubClient-2.8.zip"), name="PubSubClient", version="2.8",
+             dependencies=[{"name": "ArduinoJson"}]),
+        dict(archive("ArduinoJson-7.0.zip"), name="ArduinoJson", version="7.0"),
+    ]}
+    (root / "library_index.json").write_text(json.dumps(libraries))
+
+    return server, base
+
+
+def test_sync_and_serve_offline():
+    """The mirror downloads once, verifies checksums and serves rewritten indexes offline"""
+    print("🧪 Testing package mirror sync...")
+
+    upstream_dir = Path(tempfile.mkdtemp(prefix="bombercat-upstream-"))
+    mirror_dir = Path(tempfile.mkdtemp(prefix="bombercat-mirror-"))
+    upstream, base = make_upstream(upstream_dir)
+    mirror = PackageMirror(mirror_dir, emit_log=lambda message, level="info": None)
+    try:
+        manifest = mirror.sync([f"{base}/package_rp2040_index.json"], ["rp2040:rp2040"],
+                               ["PubSubClient"], library_index_url=f"{base}/library_index.json",
+                               all_hosts=True)
+        assert manifest["platforms"] == {"rp2040:rp2040": "3.9.0"}
+        assert set(manifest["libraries"]) == {"PubSubClient", "ArduinoJson"}
+        assert not (mirror_dir / "archives" / "rp2040-3.8.0.zip").exists()
+
+        # A second sync re-uses every verified archive
+        CountingHandler.requests_seen.clear()
+        mirror.sync([f"{base}/package_rp2040_index.json"], ["rp2040:rp2040"],
+                    ["PubSubClient"], library_index_url=f"{base}/library_index.json", all_hosts=True)
+        assert sorted(CountingHandler.requests_seen) == ["/library_index.json", "/package_rp2040_index.json"]
+    finally:
+        upstream.shutdown()
+        upstream.server_close()
+
+    # Upstream is gone, everything must now come from the mirror
+    try:
+        url = mirror.serve("127.0.0.1", 0)
+        index_urls = mirror.index_urls()
+        assert index_urls == [f"{url}package_rp2040_index.json"]
+
+        with urllib.request.urlopen(index_urls[0]) as response:
+            served = json.load(response)
+        package = served["packages"][0]
+        assert [p["version"] for p in package["platforms"]] == ["3.9.0"]
+
+        core = package["platforms"][0]
+        assert core["url"] == f"{url}archives/rp2040-3.9.0.zip"
+        with urllib.request.urlopen(core["url"]) as response:
+            assert sha256(response.read()) == core["checksum"]
+
+        assert {s["host"] for s in package["tools"][0]["systems"]} == {"x86_64-linux-gnu", "x86_64-mingw32"}
+
+        archives = [p.name for p in mirror.library_archives("PubSubClient")]
+        assert archives == ["ArduinoJson-7.0.zip", "PubSubClient-2.8.zip"]
+    finally:
+        mirror.shutdown()
+        shutil.rmtree(upstream_dir, ignore_errors=True)
+        shutil.rmtree(mirror_dir, ignore_errors=True)
+    print("✅ Mirror served the index and archives offline")
+
+
+def test_host_matching():
+    """Tool archives are picked for the machine that runs the mirror"""
+    assert host_matches("x86_64-linux-gnu", "Linux", "x86_64")
+    assert host_matches("x86_64-pc-linux-gnu", "Linux", "x86_64")
+    assert not host_matches("aarch64-linux-gnu", "Linux", "x86_64")
+    assert host_matches("arm-linux-gnueabihf", "Linux", "armv7l")
+    assert host_matches("x86_64-mingw32", "Windows", "AMD64")
+    assert host_matches("arm64-apple-darwin", "Darwin", "arm64")
+    assert not host_matches("x86_64-apple-darwin", "Darwin", "arm64")
+
+
+def main():
+    print("""
+╔══════════════════════════════════════════════╗
+║         🧪 LOCAL PACKAGE MIRROR 🧪           ║
+╚══════════════════════════════════════════════╝
+""")
+    test_sync_and_serve_offline()
+    test_host_matching()
+    print("\n✅ ALL TESTS PASSED!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the cached, hot-plug aware port inventory
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add current directory to path to import bombercat modules
+sys.path.insert(0, '.')
+
+from bombercat_ports import PortInventory, parse_uevent
+import bombercat_ports
+
+
+def fake_port(device, vid=0x2E8A, pid=0x000A, serial_number="E6614C311B4F1234", description="Pico",
+              manufacturer="Raspberry Pi"):
+    """Create an object shaped like a pyserial ListPortInfo"""
+    return SimpleNamespace(
+        device=device,
+        description=description,
+        hwid=f"USB VID:PID={vid:04X}:{pid:04X} SER={serial_number}",
+        vid=vid,
+        pid=pid,
+        serial_number=serial_number,
+        manufacturer=manufacturer,
+        product="Pico"
+    )
+
+
+def test_ports_are_classified_once():
+    """Each device is classified once and reused across refreshes"""
+    print("🧪 Testing per-device classification cache...")
+
+    ports = [fake_port("/dev/ttyACM0"), fake_port("/dev/ttyUSB0", vid=0x0403, pid=0x6001,
+                                                  serial_number="FT1", description="FT232R",
+                                                  manufacturer="FTDI")]
+    calls = []
+    original = bombercat_ports.classify_port
+
+    def counting_classify(port):
+        calls.append(port.device)
+        return original(port)
+
+    bombercat_ports.classify_port = counting_classify
+    try:
+        inventory = PortInventory(list_ports=lambda: list(ports))
+        inventory.refresh()
+        inventory.refresh()
+        assert sorted(calls) == ["/dev/ttyACM0", "/dev/ttyUSB0"]
+
+        ports.append(fake_port("/dev/ttyACM1", serial_number="E6614C311B4F9999"))
+        snapshot = inventory.refresh()
+        assert calls.count("/dev/ttyACM1") == 1
+        assert len(snapshot["ports"]) == 3
+    finally:
+        bombercat_ports.classify_port = original
+
+    likely = {p["port"]: p["likely_bombercat"] for p in snapshot["ports"]}
+    assert likely == {"/dev/ttyACM0": True, "/dev/ttyUSB0": False, "/dev/ttyACM1": True}
+    print("✅ Ports classified once per device")
+
+
+def test_snapshot_is_served_without_rescanning():
+    """snapshot() must not touch the port scanner or the BOOTSEL scan"""
+    print("\n🧪 Testing snapshot latency...")
+
+    scans = {"ports": 0, "bootsel": 0}
+
+    def list_ports():
+        scans["ports"] += 1
+        return [fake_port("/dev/ttyACM0")]
+
+    def bootsel():
+        scans["bootsel"] += 1
+        return {"in_bootsel": True, "bootsel_path": "/media/user/RPI-RP2"}
+
+    inventory = PortInventory(list_ports=list_ports, bootsel_scanner=bootsel)
+    inventory.refresh()
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        snapshot = inventory.snapshot()
+    per_call = (time.perf_counter() - start) / 1000
+
+    assert scans == {"ports": 1, "bootsel": 1}
+    assert snapshot["in_bootsel"] and snapshot["bootsel_path"] == "/media/user/RPI-RP2"
+    assert per_call < 0.001
+    print(f"✅ snapshot() served in {per_call * 1e6:.2f} µs")
+
+
+def test_listeners_see_added_and_removed():
+    """Subscribers are told which boards appeared or disappeared"""
+    print("\n🧪 Testing change notifications...")
+
+    ports = [fake_port("/dev/ttyACM0")]
+    events = []
+    inventory = PortInventory(list_ports=lambda: list(ports))
+    inventory.subscribe(lambda snap, added, removed: events.append(
+        ([p["port"] for p in added], [p["port"] for p in removed])))
+
+    inventory.refresh()
+    ports[:] = [fake_port("/dev/ttyACM1", serial_number="OTHER")]
+    inventory.refresh()
+    inventory.refresh()
+
+    assert events == [(["/dev/ttyACM0"], []), (["/dev/ttyACM1"], ["/dev/ttyACM0"])]
+    print("✅ Added/removed boards reported once")
+
+
+def test_parse_uevent():
+    """Kernel uevent messages are decoded into key/value pairs"""
+    raw = b"add@/devices/usb1/1-1/1-1:1.0/tty/ttyACM0\0ACTION=add\0SUBSYSTEM=tty\0DEVNAME=ttyACM0\0"
+    event = parse_uevent(raw)
+    assert event["ACTION"] == "add"
+    assert event["SUBSYSTEM"] == "tty"
+    assert event["DEVNAME"] == "ttyACM0"
+
+
+def test_watcher_polls_as_fallback():
+    """The background watcher keeps the snapshot fresh"""
+    print("\n🧪 Testing background watcher...")
+
+    ports = []
+    inventory = PortInventory(list_ports=lambda: list(ports), poll_interval=0.05)
+    inventory.start()
+    try:
+        ports.append(fake_port("/dev/ttyACM0"))
+        deadline = time.time() + 3
+        while time.time() < deadline and not inventory.snapshot()["ports"]:
+            time.sleep(0.02)
+        assert [p["port"] for p in inventory.snapshot()["ports"]] == ["/dev/ttyACM0"]
+    finally:
+        inventory.stop()
+    print("✅ Watcher picked up the new port")
+
+
+def test_watcher_survives_errors():
+    """A failing rescan is logged and retried, the watcher keeps running"""
+    print("\n🧪 Testing watcher error recovery...")
+
+    ports = []
+    failures = [OSError("netlink hiccup"), OSError("comports failed")]
+    messages = []
+
+    def list_ports():
+        if failures:
+            raise failures.pop(0)
+        return list(ports)
+
+    inventory = PortInventory(list_ports=list_ports, poll_interval=0.05,
+                              log=lambda message, level="info": messages.append((level, message)))
+    inventory.start()
+    try:
+        ports.append(fake_port("/dev/ttyACM0"))
+        deadline = time.time() + 3
+        while time.time() < deadline and not (inventory._snapshot or {}).get("ports"):
+            time.sleep(0.02)
+        assert inventory._thread.is_alive()
+        assert [p["port"] for p in inventory.snapshot()["ports"]] == ["/dev/ttyACM0"]
+        assert [level for level, _ in messages] == ["warning", "warning"]
+        assert "comports failed" in messages[1][1]
+    finally:
+        inventory.stop()
+    print("✅ Watcher logged 2 errors and kept refreshing")
+
+
+def test_detect_boards_skips_busy_pool():
+    """/api/detect_boards is served from the inventory while the blocking pool is full"""
+    print("\n🧪 Testing detect_boards with a busy blocking pool...")
+
+    from bombercat_relay import Config, create_app
+
+    repo_dir = Path(__file__).resolve().parent
+    root = Path(tempfile.mkdtemp(prefix="bombercat-ports-"))
+    os.chdir(root)
+    release = threading.Event()
+    try:
+        cfg = Config(build_dir=str(root / "build"), sketch_dir=str(root / "sketch"), async_mode="threading",
+                     warmup=False, blocking_workers=1, use_board_registry=False)
+        app = create_app(cfg)
+        services = app.extensions["bombercat"]
+        inventory = services["port_inventory"]
+        inventory.list_ports = lambda: [fake_port("/dev/ttyACM0")]
+        inventory.refresh()
+
+        busy = threading.Thread(target=services["blocking"].run, args=(release.wait,), daemon=True)
+        busy.start()
+        while not services["blocking"].stats()["active"]:
+            time.sleep(0.01)
+
+        start = time.perf_counter()
+        body = app.test_client().get("/api/detect_boards").get_json()
+        elapsed = time.perf_counter() - start
+        assert [p["port"] for p in body["ports"]] == ["/dev/ttyACM0"]
+        assert elapsed < 0.5, elapsed
+    finally:
+        release.set()
+        os.chdir(repo_dir)
+        shutil.rmtree(root, ignore_errors=True)
+    print(f"✅ Served in {elapsed * 1000:.1f} ms with the pool busy")
+
+
+def main():
+    print("""
+╔══════════════════════════════════════════════╗
+║      🧪 PORT INVENTORY FUNCTIONALITY 🧪      ║
+╚══════════════════════════════════════════════╝
+""")
+    test_ports_are_classified_once()
+    test_snapshot_is_served_without_rescanning()
+    test_listeners_see_added_and_removed()
+    test_parse_uevent()
+    test_watcher_polls_as_fallback()
+    test_watcher_survives_errors()
+    test_detect_boards_skips_busy_pool()
+    print("\n✅ ALL TESTS PASSED!")
+
+
+if __name__ == "__main__":
+    main()
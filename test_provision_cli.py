@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the headless provision command
+A fake arduino-cli script records compiles and uploads, no hardware or Flask needed
+"""
+import os
+import sys
+import json
+import shutil
+import tempfile
+import subprocess
+from pathlib import Path
+
+# Add current directory to path to import bombercat modules
+sys.path.insert(0, '.')
+
+REPO_DIR = Path(__file__).resolve().parent
+
+FAKE_CLI = """#!{python}
+import sys
+from pathlib import Path
+args = sys.argv[1:]
+with open({log!r}, "a") as log:
+    log.write(" ".join(args) + "\\n")
+if args[0] == "compile":
+    build = Path(args[args.index("--build-path") + 1])
+    build.mkdir(exist_ok=True)
+    (build / (Path(args[-1]).name + ".ino.bin")).write_bytes(b"\\0" * 256)
+    with open({log!r} + ".config", "a") as log:
+        log.write(args[-1] + "\\n" + (Path(args[-1]) / "bombercat_config.h").read_text())
+elif args[0] == "upload" and args[args.index("--port") + 1].endswith("BAD"):
+    print("No device found on port", file=sys.stderr)
+    sys.exit(1)
+"""
+
+RUNNER = """
+import sys
+sys.path.insert(0, {repo!r})
+import bombercat_cli
+code = bombercat_cli.main(sys.argv[1:])
+if "flask" in sys.modules:
+    print("FLASK_LOADED", file=sys.stderr)
+sys.exit(code)
+"""
+
+
+def make_workspace():
+    """Create a working directory with a fake arduino-cli and a local sketch"""
+    root = Path(tempfile.mkdtemp(prefix="bombercat-provision-"))
+    log = root / "cli.log"
+    cli = root / "arduino-cli"
+    cli.write_text(FAKE_CLI.format(python=sys.executable, log=str(log)))
+    cli.chmod(0o755)
+
+    sketch = root / "host_Relay_NFC"
+    sketch.mkdir()
+    (sketch / "host_Relay_NFC.ino").write_text("void setup() {}\nvoid loop() {}\n")
+    return root, cli, sketch, log
+
+
+def run_provision(root, *args):
+    result = subprocess.run(
+        [sys.executable, "-c", RUNNER.format(repo=str(REPO_DIR)), "provision", *args],
+        cwd=root, capture_output=True, text=True, timeout=60,
+        env=dict(os.environ, HOME=str(root))
+    )
+    events = [json.loads(line) for line in result.stdout.splitlines()]
+    return result, events
+
+
+def test_provision_multiple_boards():
+    """Each distinct config compiles once, every port is flashed and reported as JSON"""
+    print("🧪 Testing headless provisioning...")
+
+    root, cli, sketch, log = make_workspace()
+    try:
+        result, events = run_provision(
+            root, "--port", "/dev/ttyACM0", "/dev/ttyACM1", "--wifi-ssid", "lab", "--wifi-password", "secret",
+            "--host-number", "7", "--sketch", str(sketch), "--cli", str(cli), "--skip-install")
+
+        assert result.returncode == 0, result.stderr
+        assert "FLASK_LOADED" not in result.stderr
+
+        # The run history asks for the CLI version once per run
+        commands = [line.split()[0] for line in log.read_text().splitlines() if not line.startswith("version")]
+        assert commands == ["compile", "upload", "upload"]
+
+        boards = [e for e in events if e["event"] == "board"]
+        assert [(b["port"], b["status"], b["host_number"]) for b in boards] == [
+            ("/dev/ttyACM0", "ok", 7), ("/dev/ttyACM1", "ok", 7)]
+        assert events[-1]["event"] == "summary"
+        assert events[-1]["ok"] == 2 and events[-1]["failed"] == 0
+        assert any(e["event"] == "flash_log" for e in events)
+
+        # Configuration went into a per-job workspace, the local sketch is untouched
+        compiled = Path(str(log) + ".config").read_text()
+        assert '#define WIFI_SSID "lab"' in compiled and "#define HOST_NUMBER 7" in compiled
+        assert not compiled.startswith(str(sketch))
+        assert not (sketch / "bombercat_config.h").exists()
+        assert "bombercat_config.h" not in (sketch / "host_Relay_NFC.ino").read_text()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    print("✅ Two boards provisioned with a single compile")
+
+
+def test_provision_reports_failed_boards():
+    """A failing upload is reported per board and reflected in the exit code"""
+    print("\n🧪 Testing partial failure...")
+
+    root, cli, sketch, log = make_workspace()
+    try:
+        result, events = run_provision(
+            root, "--port", "/dev/ttyACM0", "/dev/ttyBAD", "--wifi-ssid", "lab", "--increment-host-number",
+            "--sketch", str(sketch), "--cli", str(cli), "--skip-install")
+
+        assert result.returncode == 1, result.stderr
+        # The run history asks for the CLI version once per run
+        commands = [line.split()[0] for line in log.read_text().splitlines() if not line.startswith("version")]
+        assert commands == ["compile", "upload", "compile", "upload"]
+
+        boards = {e["port"]: e for e in events if e["event"] == "board"}
+        assert boards["/dev/ttyACM0"]["status"] == "ok"
+        assert boards["/dev/ttyBAD"]["status"] == "failed"
+        assert events[-1]["failed_ports"] == ["/dev/ttyBAD"]
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    print("✅ Failed board reported with exit code 1")
+
+
+def test_provision_setup_and_usage_errors():
+    """Missing sketches and bad arguments exit with their own codes"""
+    print("\n🧪 Testing setup and usage errors...")
+
+    root, cli, sketch, log = make_workspace()
+    try:
+        empty = root / "empty"
+        empty.mkdir()
+        result, events = run_provision(
+            root, "--port", "/dev/ttyACM0", "--wifi-ssid", "lab",
+            "--sketch", str(empty), "--cli", str(cli), "--skip-install")
+        assert result.returncode == 3
+        assert events[-1]["event"] == "summary" and "No .ino file" in events[-1]["error"]
+        assert not log.exists()
+
+        # Dispatch through bombercat_relay.py, missing --wifi-ssid is a usage error
+        result = subprocess.run(
+            [sys.executable, str(REPO_DIR / "bombercat_relay.py"), "provision", "--port", "/dev/ttyACM0"],
+            cwd=root, capture_output=True, text=True, timeout=60)
+        assert result.returncode == 2
+        assert "--wifi-ssid" in result.stderr
+        assert result.stdout == ""
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    print("✅ Exit codes 2 and 3 reported")
+
+
+def main():
+    print("""
+╔══════════════════════════════════════════════╗
+║       🧪 HEADLESS PROVISIONING CLI 🧪        ║
+╚══════════════════════════════════════════════╝
+""")
+    test_provision_multiple_boards()
+    test_provision_reports_failed_boards()
+    test_provision_setup_and_usage_errors()
+    print("\n✅ ALL TESTS PASSED!")
+
+
+if __name__ == "__main__":
+    main()
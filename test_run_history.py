@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the provisioning run history and its percentile queries
+Synthetic runs check the statistics; a headless provision with a fake
+arduino-cli checks that real runs are recorded
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+from pathlib import Path
+
+# Add current directory to path to import bombercat modules
+sys.path.insert(0, '.')
+
+from bombercat_history import RunHistory, percentile
+
+REPO_DIR = Path(__file__).resolve().parent
+
+FQBN = "electroniccats:rp2040:bombercat"
+
+FAKE_CLI = """#!{python}
+import sys
+from pathlib import Path
+args = sys.argv[1:]
+if args[0] == "version":
+    print('{{"Application": "arduino-cli", "VersionString": "1.0.4"}}')
+elif args[0] == "compile":
+    build = Path(args[args.index("--build-path") + 1])
+    build.mkdir(parents=True, exist_ok=True)
+    (build / (Path(args[-1]).name + ".ino.bin")).write_bytes(b"\\0" * 256)
+elif args[0] == "upload" and args[args.index("--port") + 1].endswith("BAD"):
+    print("No device found on port", file=sys.stderr)
+    sys.exit(1)
+"""
+
+RUNNER = """
+import sys
+sys.path.insert(0, {repo!r})
+import bombercat_cli
+sys.exit(bombercat_cli.main(sys.argv[1:]))
+"""
+
+
+def add_run(history, started_at, cli_version, compile_time, outcome="ok"):
+    run = history.start("provision", fqbn=FQBN, cli_version=cli_version)
+    run.fields["started_at"] = started_at
+    run.add_stage("configure", started_at, 0.01)
+    run.add_stage("compile", started_at, compile_time, "ok" if outcome == "ok" else "failed")
+    run.finish(None if outcome == "ok" else RuntimeError("boom"))
+    return run
+
+
+def test_percentiles_per_stage():
+    """p50/p95/p99 per stage over a window, split by arduino-cli version"""
+    print("🧪 Testing run history percentiles...")
+    assert percentile([1, 2, 3, 4], 50) == 2.5
+    assert percentile([5], 99) == 5 and percentile([], 50) is None
+
+    root = Path(tempfile.mkdtemp(prefix="bombercat-runs-"))
+    try:
+        history = RunHistory(root / "runs.sqlite3")
+        now = time.time()
+        for i in range(1, 101):
+            add_run(history, now - 3600 + i, "0.35.3", float(i))
+            add_run(history, now - 1800 + i, "1.0.4", float(2 * i))
+        # Outside the window, and a failure whose stage time must not count
+        add_run(history, now - 30 * 24 * 3600, "0.35.3", 999.0)
+        add_run(history, now - 60, "1.0.4", 500.0, outcome="failed")
+
+        stats = history.stage_stats(since=now - 24 * 3600, group_by="cli_version")
+        old, new = stats["0.35.3"]["compile"], stats["1.0.4"]["compile"]
+        assert old["count"] == 100 and new["count"] == 100
+        assert old["p50"] == 50.5 and round(old["p95"], 2) == 95.05 and round(old["p99"], 2) == 99.01
+        assert new["p50"] == 101.0 and new["max"] == 200.0
+        assert stats["1.0.4"]["configure"]["p99"] == 0.01
+
+        overall = history.stage_stats(since=now - 24 * 3600)
+        assert overall["compile"]["count"] == 200
+        assert history.stage_stats(since=now - 24 * 3600, include_failed=True)["compile"]["max"] == 500.0
+        assert history.stage_stats(since=now - 24 * 3600, cli_version="1.0.4")["compile"]["count"] == 100
+        for bad in ({"group_by": "error"}, {"port": "/dev/ttyACM0"}):
+            try:
+                history.stage_stats(**bad)
+                assert False, f"{bad} must be rejected"
+            except ValueError:
+                pass
+
+        failed = [run for run in history.recent(5) if run["outcome"] == "failed"][0]
+        assert failed["failed_stage"] is None and failed["error_class"] == "RuntimeError"
+        assert [s["stage"] for s in failed["stages"]] == ["configure", "compile"]
+        history.close()
+        print(f"✅ compile p95 {old['p95']:.1f}s on 0.35.3 vs {new['p95']:.1f}s on 1.0.4")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def test_provision_runs_recorded():
+    """A headless provision stores its stages, outcome and CLI version, served by the API"""
+    print("\n🧪 Testing recorded provisioning runs...")
+
+    root = Path(tempfile.mkdtemp(prefix="bombercat-runs-"))
+    try:
+        cli = root / "arduino-cli"
+        cli.write_text(FAKE_CLI.format(python=sys.executable))
+        cli.chmod(0o755)
+        sketch = root / "host_Relay_NFC"
+        sketch.mkdir()
+        (sketch / "host_Relay_NFC.ino").write_text("void setup() {}\nvoid loop() {}\n")
+
+        for ports in (["/dev/ttyACM0", "/dev/ttyACM1"], ["/dev/ttyBAD"]):
+            subprocess.run(
+                [sys.executable, "-c", RUNNER.format(repo=str(REPO_DIR)), "provision", "--port", *ports,
+                 "--wifi-ssid", "lab", "--sketch", str(sketch), "--cli", str(cli), "--skip-install",
+                 "--fqbn", FQBN],
+                cwd=root, capture_output=True, text=True, timeout=60, env=dict(os.environ, HOME=str(root)))
+
+        history_path = root / ".cache" / "bombercat" / "runs.sqlite3"
+        history = RunHistory(history_path)
+        failed, ok = history.recent()
+        history.close()
+        assert ok["outcome"] == "ok" and ok["source"] == "provision"
+        assert ok["fqbn"] == FQBN and ok["firmware"] == "host_Relay_NFC" and ok["cli_version"] == "1.0.4"
+        assert [s["stage"] for s in ok["stages"]] == ["configure", "compile", "flash", "flash"]
+        assert failed["outcome"] == "failed" and "No device found" in failed["error"]
+        assert failed["stages"][-1] == dict(failed["stages"][-1], stage="flash", outcome="failed")
+
+        from bombercat_relay import Config, create_app
+        os.chdir(root)
+        cfg = Config(run_history_path=str(history_path), async_mode="threading", warmup=False)
+        client = create_app(cfg).test_client()
+        runs = client.get("/api/runs?limit=1").get_json()["runs"]
+        assert len(runs) == 1 and runs[0]["outcome"] == "failed"
+        stats = client.get("/api/runs/stats?window=3600&group_by=cli_version").get_json()["stages"]
+        assert stats["1.0.4"]["flash"]["count"] == 2 and stats["1.0.4"]["total"]["count"] == 1
+        assert set(stats["1.0.4"]["compile"]) == {"count", "mean", "max", "p50", "p95", "p99"}
+        assert client.get("/api/runs/stats?group_by=port").status_code == 400
+        print(f"✅ Runs recorded, compile p50 {stats['1.0.4']['compile']['p50'] * 1000:.0f} ms")
+    finally:
+        os.chdir(REPO_DIR)
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main():
+    print("""
+╔══════════════════════════════════════════════╗
+║        🧪 PROVISIONING RUN HISTORY 🧪        ║
+╚══════════════════════════════════════════════╝
+""")
+    test_percentiles_per_stage()
+    test_provision_runs_recorded()
+    print("\n✅ ALL TESTS PASSED!")
+
+
+if __name__ == "__main__":
+    main()
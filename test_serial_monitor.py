@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the multiplexed serial monitor
+Boards are simulated with pty pairs: the monitor opens the slave side like a
+serial port and the test writes the board's output into the master side
+"""
+import os
+import pty
+import sys
+import time
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+
+# Add current directory to path to import bombercat modules
+sys.path.insert(0, '.')
+
+from bombercat_monitor import RingBuffer, SerialMonitor
+
+REPO_DIR = Path(__file__).resolve().parent
+
+
+def open_board():
+    """A fake board: (master fd to write its output to, serial port path)"""
+    master, slave = pty.openpty()
+    return master, slave, os.ttyname(slave)
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_ring_buffer():
+    """Absolute offsets survive wraparound and overwritten data is reported"""
+    print("🧪 Testing the ring buffer...")
+    ring = RingBuffer(8)
+    ring.write(b"abcdef")
+    assert ring.read(0, 100) == (b"abcdef", 6, 0)
+    ring.write(b"ghij")
+    assert ring.start == 2 and ring.end == 10
+    assert ring.read(0, 100) == (b"cdefghij", 10, 2)
+    assert ring.read(7, 2) == (b"hi", 9, 0)
+    ring.write(b"0123456789abcdef")
+    assert ring.read(10, 100) == (b"89abcdef", 26, 8)
+    print("✅ Ring buffer OK")
+
+
+def test_multiplexing_and_backpressure():
+    """Many ports in one reader, data only to subscribers, slow clients skip ahead"""
+    print("\n🧪 Testing multiplexed ports and backpressure...")
+    boards = [open_board() for _ in range(3)]
+    ports = [board[2] for board in boards]
+    received = {}
+    lock = threading.Lock()
+    monitor = None
+
+    def emit(event, data, room):
+        if event != "monitor_data":
+            return
+        with lock:
+            received.setdefault((room, data["port"]), []).append(data)
+        if room != "slow":
+            # A fast client acknowledges every message as soon as it arrives
+            monitor.ack(room, data["port"], data["offset"])
+
+    monitor = SerialMonitor(emit, buffer_size=16 * 1024, window=4 * 1024, flush_interval=0.01)
+    try:
+        monitor.subscribe("a", ports[0])
+        monitor.subscribe("a", ports[1])
+        monitor.subscribe("b", ports[2])
+        monitor.subscribe("slow", ports[0])
+        assert [p["subscribers"] for p in monitor.status()] == [2, 1, 1]
+        threads = {thread.name for thread in threading.enumerate()}
+        assert sum(1 for name in threads if name == "serial-monitor") == 1
+
+        # 64 KiB on port 0 (four times the ring), a line on each of the others
+        payload = b"".join(b"line %05d ..........................................\r\n" % i for i in range(1200))
+        payload = payload[:64 * 1024]
+        for i in range(0, len(payload), 1024):
+            os.write(boards[0][0], payload[i:i + 1024])
+            time.sleep(0.005)
+        os.write(boards[1][0], b"port one\r\n")
+        os.write(boards[2][0], b"port two\r\n")
+
+        def text(room, port):
+            with lock:
+                return "".join(message["text"] for message in received.get((room, port), []))
+
+        assert wait_until(lambda: len(text("a", ports[0])) == len(payload)), len(text("a", ports[0]))
+        assert text("a", ports[0]) == payload.decode()
+        assert wait_until(lambda: text("a", ports[1]) == "port one\r\n" and text("b", ports[2]) == "port two\r\n")
+        assert ("b", ports[0]) not in received and ("a", ports[2]) not in received
+
+        # The slow client got one window and nothing more until it acknowledged
+        slow = list(received[("slow", ports[0])])
+        assert sum(len(m["text"]) for m in slow) == 4 * 1024
+        monitor.ack("slow", ports[0], slow[-1]["offset"])
+        assert wait_until(lambda: len(received[("slow", ports[0])]) > len(slow))
+        resumed = received[("slow", ports[0])][len(slow)]
+        assert resumed["skipped"] == len(payload) - 16 * 1024 - 4 * 1024
+        assert resumed["text"] == payload[-16 * 1024:][:len(resumed["text"])].decode()
+        assert [p for p in monitor.status() if p["port"] == ports[0]][0]["lagging"] == 1
+
+        monitor.unsubscribe("a")
+        assert sorted(p["port"] for p in monitor.status()) == [ports[0], ports[2]]
+        print(f"✅ 3 ports on one reader, fast client got all {len(payload)} bytes, "
+              f"slow client skipped {resumed['skipped']}")
+    finally:
+        monitor.stop()
+        for master, slave, _ in boards:
+            os.close(master)
+            os.close(slave)
+
+
+def test_pause_and_reconnect():
+    """A paused port is released for an upload and reopened; a vanished port is retried"""
+    print("\n🧪 Testing pause and reconnect...")
+    master, slave, port = open_board()
+    statuses = []
+    messages = []
+
+    def emit(event, data, room):
+        (statuses if event == "monitor_status" else messages).append(data)
+        if event == "monitor_data":
+            monitor.ack(room, data["port"], data["offset"])
+
+    monitor = SerialMonitor(emit, flush_interval=0.01, reopen_interval=0.05)
+    try:
+        monitor.subscribe("a", port)
+        with monitor.paused(port):
+            assert monitor.status()[0]["state"] == "paused"
+            assert monitor.ports[port].handle is None
+        assert wait_until(lambda: monitor.status()[0]["state"] == "open")
+        os.write(master, b"after reset\r\n")
+        assert wait_until(lambda: "".join(m["text"] for m in messages) == "after reset\r\n")
+        assert monitor.write(port, "status\n") == 7
+        assert os.read(master, 100) == b"status\n"
+
+        # The board goes away: the monitor keeps the buffer and keeps retrying
+        os.close(master)
+        master = None
+        assert wait_until(lambda: monitor.status()[0]["state"] == "reopening")
+        assert monitor.status()[0]["buffered"] == len(b"after reset\r\n")
+        assert [s["state"] for s in statuses][:4] == ["open", "paused", "reopening", "open"]
+        print("✅ Port paused, reopened and kept after the board vanished")
+    finally:
+        monitor.stop()
+        if master is not None:
+            os.close(master)
+        os.close(slave)
+
+
+def test_slow_status_emit_does_not_block():
+    """A status event stuck in a slow emit holds no lock the reader or other handlers need"""
+    print("\n🧪 Testing slow status emits...")
+    boards = [open_board() for _ in range(2)]
+    released = threading.Event()
+    stuck = threading.Event()
+    messages = []
+
+    def emit(event, data, room):
+        if event == "monitor_status" and data["port"] == boards[0][2]:
+            stuck.set()
+            released.wait(5)
+        elif event == "monitor_data":
+            messages.append(data)
+            monitor.ack(room, data["port"], data["offset"])
+
+    monitor = SerialMonitor(emit, flush_interval=0.01)
+    try:
+        monitor.subscribe("fast", boards[1][2])
+        slow = threading.Thread(target=monitor.subscribe, args=("slow", boards[0][2]), daemon=True)
+        slow.start()
+        assert stuck.wait(5)
+
+        # The first subscriber's emit is still blocked, everything else carries on
+        start = time.perf_counter()
+        assert len(monitor.status()) == 2
+        os.write(boards[1][0], b"still flowing\r\n")
+        assert wait_until(lambda: "".join(m["text"] for m in messages) == "still flowing\r\n", timeout=2)
+        elapsed = time.perf_counter() - start
+        assert elapsed < 1.0, elapsed
+    finally:
+        released.set()
+        monitor.stop()
+        for master, slave, _ in boards:
+            os.close(master)
+            os.close(slave)
+    print(f"✅ Other port served in {elapsed * 1000:.0f} ms during a stuck emit")
+
+
+def test_socketio_rooms():
+    """Socket.IO clients subscribe to ports and only receive their own ports' output"""
+    print("\n🧪 Testing the Socket.IO monitor events...")
+
+    from bombercat_relay import Config, create_app
+
+    root = Path(tempfile.mkdtemp(prefix="bombercat-monitor-"))
+    os.chdir(root)
+    boards = [open_board() for _ in range(2)]
+    try:
+        cfg = Config(build_dir=str(root / "build"), sketch_dir=str(root / "sketch"), async_mode="threading",
+                     warmup=False, monitor_flush_interval=0.01)
+        app = create_app(cfg)
+        socketio = app.extensions["bombercat"]["socketio"]
+        first = socketio.test_client(app)
+        second = socketio.test_client(app)
+        first.get_received()
+        second.get_received()
+
+        status = first.emit("monitor_subscribe", {"port": boards[0][2]}, callback=True)
+        assert status["state"] == "open" and status["subscribers"] == 1
+        second.emit("monitor_subscribe", {"port": boards[1][2]}, callback=True)
+        os.write(boards[0][0], b"host ready\r\n")
+        os.write(boards[1][0], b"client ready\r\n")
+
+        def data(client):
+            return [event["args"][0] for event in client.get_received() if event["name"] == "monitor_data"]
+
+        first_data, second_data = [], []
+        assert wait_until(lambda: first_data.extend(data(first)) or second_data.extend(data(second))
+                          or (first_data and second_data))
+        assert "".join(m["text"] for m in first_data) == "host ready\r\n"
+        assert "".join(m["text"] for m in second_data) == "client ready\r\n"
+        first.emit("monitor_ack", {"port": boards[0][2], "offset": first_data[-1]["offset"]})
+        assert first.emit("monitor_write", {"port": boards[0][2], "data": "reset\n"}, callback=True) == {"written": 6}
+        assert os.read(boards[0][0], 100) == b"reset\n"
+
+        ports = app.test_client().get("/api/monitor").get_json()["ports"]
+        assert sorted(p["port"] for p in ports) == sorted([boards[0][2], boards[1][2]])
+        second.disconnect()
+        ports = app.test_client().get("/api/monitor").get_json()["ports"]
+        assert [p["port"] for p in ports] == [boards[0][2]]
+        first.disconnect()
+        print("✅ Each client only got its own board's output")
+    finally:
+        os.chdir(REPO_DIR)
+        for master, slave, _ in boards:
+            os.close(master)
+            os.close(slave)
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main():
+    print("""
+╔══════════════════════════════════════════════╗
+║        🧪 MULTIPLEXED SERIAL MONITOR 🧪      ║
+╚══════════════════════════════════════════════╝
+""")
+    test_ring_buffer()
+    test_multiplexing_and_backpressure()
+    test_pause_and_reconnect()
+    test_slow_status_emit_does_not_block()
+    test_socketio_rooms()
+    print("\n✅ ALL TESTS PASSED!")
+
+
+if __name__ == "__main__":
+    main()
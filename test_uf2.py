@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the BIN/ELF -> UF2 packer and the UF2 inspector
+"""
+import os
+import sys
+import shutil
+import struct
+import tempfile
+import time
+from pathlib import Path
+
+# Add current directory to path to import bombercat modules
+sys.path.insert(0, '.')
+
+from bombercat_uf2 import (
+    RP2040_FAMILY_ID, RP2040_FLASH_BASE, UF2_MAGIC_END, UF2_MAGIC_START0, UF2_MAGIC_START1,
+    UF2Error, inspect_uf2, pack_bin, pack_elf
+)
+
+
+def reference_pack(data, base=RP2040_FLASH_BASE):
+    """Straightforward block-by-block packer used to cross-check the batched one"""
+    data = data + b"\0" * (-len(data) % 256)
+    count = len(data) // 256
+    blocks = []
+    for i in range(count):
+        header = struct.pack("<8I", UF2_MAGIC_START0, UF2_MAGIC_START1, 0x2000, base + i * 256,
+                             256, i, count, RP2040_FAMILY_ID)
+        payload = data[i * 256:(i + 1) * 256].ljust(476, b"\0")
+        blocks.append(header + payload + struct.pack("<I", UF2_MAGIC_END))
+    return b"".join(blocks)
+
+
+def make_elf(segments):
+    """Build a minimal 32-bit little-endian ELF with the given (paddr, data) PT_LOAD segments"""
+    phoff = 52
+    offset = phoff + 32 * len(segments)
+    header = bytearray(52)
+    header[:7] = b"\x7fELF\x01\x01\x01"
+    struct.pack_into("<HHI", header, 16, 2, 40, 1)
+    struct.pack_into("<I", header, 28, phoff)
+    struct.pack_into("<HHH", header, 40, 52, 32, len(segments))
+
+    phdrs = b""
+    body = b""
+    for paddr, data in segments:
+        phdrs += struct.pack("<8I", 1, offset + len(body), paddr, paddr, len(data), len(data), 5, 4)
+        body += data
+    return bytes(header) + phdrs + body
+
+
+def test_pack_matches_reference():
+    """The batched packer produces byte-identical output to a naive implementation"""
+    print("🧪 Testing UF2 packing...")
+    data = os.urandom(10 * 256 + 77)
+    assert pack_bin(data) == reference_pack(data)
+    print("✅ Packed output matches reference")
+
+
+def test_inspect_reports_ranges_and_gaps():
+    """Inspector validates headers and reports address ranges and gaps"""
+    print("\n🧪 Testing UF2 inspection...")
+    info = inspect_uf2(pack_bin(b"\xAA" * 4096))
+    assert info.valid, info.errors
+    assert info.num_blocks == 16
+    assert info.family_id == RP2040_FAMILY_ID
+    assert info.ranges == [(RP2040_FLASH_BASE, RP2040_FLASH_BASE + 4096)]
+    assert info.gaps == []
+
+    elf = make_elf([(RP2040_FLASH_BASE, b"\x01" * 600), (RP2040_FLASH_BASE + 0x2000, b"\x02" * 100),
+                    (0x20000000, b"\x03" * 64)])
+    info = inspect_uf2(pack_elf(elf))
+    assert info.valid, info.errors
+    assert info.num_blocks == 4
+    assert info.ranges == [(RP2040_FLASH_BASE, RP2040_FLASH_BASE + 768),
+                           (RP2040_FLASH_BASE + 0x2000, RP2040_FLASH_BASE + 0x2100)]
+    assert info.gaps == [(RP2040_FLASH_BASE + 768, RP2040_FLASH_BASE + 0x2000)]
+    print("✅ Ranges and gaps reported")
+
+
+def test_inspect_rejects_corrupt_files():
+    """Truncated files, bad magic and wrong family IDs are flagged"""
+    print("\n🧪 Testing corrupt UF2 detection...")
+    good = bytearray(pack_bin(b"\x55" * 1024))
+
+    assert not inspect_uf2(bytes(good[:-1])).valid
+
+    bad_magic = bytearray(good)
+    bad_magic[512] ^= 0xFF
+    assert "bad magic" in inspect_uf2(bytes(bad_magic)).errors[0]
+
+    other_family = pack_bin(b"\x55" * 1024, family_id=0x68ED2B88)
+    assert not inspect_uf2(other_family).valid
+    assert inspect_uf2(other_family, family_id=None).valid
+
+    missing = bytes(good[:512]) + bytes(good[1024:])
+    assert not inspect_uf2(missing).valid
+
+    try:
+        pack_elf(b"not an elf")
+    except UF2Error:
+        pass
+    else:
+        raise AssertionError("pack_elf should reject non-ELF input")
+    print("✅ Corrupt files rejected")
+
+
+def test_multi_megabyte_images_are_fast():
+    """A 4 MB image packs and validates in well under a second"""
+    print("\n🧪 Testing packing speed...")
+    data = os.urandom(4 * 1024 * 1024)
+
+    start = time.perf_counter()
+    uf2 = pack_bin(data)
+    pack_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    info = inspect_uf2(uf2)
+    inspect_time = time.perf_counter() - start
+
+    assert info.valid and info.num_blocks == 16384
+    assert pack_time < 0.5 and inspect_time < 0.5
+    print(f"✅ Packed in {pack_time * 1000:.1f} ms, inspected in {inspect_time * 1000:.1f} ms")
+
+
+def test_firmware_manager_converts_bin():
+    """A build directory with only a .bin gets a UF2 generated for the BOOTSEL path"""
+    print("\n🧪 Testing FirmwareManager .bin conversion...")
+    from bombercat_relay import FirmwareManager, arduino_cli, socketio, config
+
+    build_dir = Path(tempfile.mkdtemp(prefix="bombercat-build-"))
+    original_build_dir = config.build_dir
+    try:
+        config.build_dir = str(build_dir)
+        (build_dir / "client_Relay_NFC.ino.bin").write_bytes(b"\x42" * 1000)
+
+        manager = FirmwareManager(arduino_cli, socketio)
+        manager.sketch_path = Path("client_Relay_NFC")
+        uf2_file = manager.find_uf2()
+
+        assert uf2_file == build_dir / "client_Relay_NFC.ino.uf2"
+        assert inspect_uf2(uf2_file.read_bytes()).num_blocks == 4
+
+        # Outputs of another sketch are never picked up
+        manager.sketch_path = Path("host_Relay_NFC")
+        (build_dir / "stale.uf2").write_bytes(uf2_file.read_bytes())
+        (build_dir / "DetectTags.ino.elf").write_bytes(b"\x7fELF")
+        assert manager.find_uf2() is None
+    finally:
+        config.build_dir = original_build_dir
+        shutil.rmtree(build_dir, ignore_errors=True)
+    print("✅ UF2 generated from .bin")
+
+
+def main():
+    print("""
+╔══════════════════════════════════════════════╗
+║        🧪 UF2 PACKER AND INSPECTOR 🧪        ║
+╚══════════════════════════════════════════════╝
+""")
+    test_pack_matches_reference()
+    test_inspect_reports_ranges_and_gaps()
+    test_inspect_rejects_corrupt_files()
+    test_multi_megabyte_images_are_fast()
+    test_firmware_manager_converts_bin()
+    print("\n✅ ALL TESTS PASSED!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the direct UF2 copy flash path
+A tmpfs directory stands in for the RPI-RP2 mass-storage volume
+"""
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Add current directory to path to import bombercat modules
+sys.path.insert(0, '.')
+
+from bombercat_bootloader_detector import copy_uf2_to_drive
+from bombercat_uf2 import pack_bin
+
+
+def make_volume():
+    """Create a fake RPI-RP2 volume, preferably on tmpfs"""
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else None
+    root = Path(tempfile.mkdtemp(prefix="bombercat-uf2-", dir=base))
+    volume = root / "RPI-RP2"
+    volume.mkdir()
+    (volume / "INFO_UF2.TXT").write_text("UF2 Bootloader v3.0\nModel: Raspberry Pi RP2\nBoard-ID: RPI-RP2\n")
+    return root, volume
+
+
+def simulate_bootrom(volume, name, size):
+    """Detach the volume once the whole image has landed, like the RP2040 does"""
+    def run():
+        target = volume / name
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            if target.exists() and target.stat().st_size >= size:
+                shutil.rmtree(volume)
+                return
+            time.sleep(0.01)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_copy_reports_progress_and_waits_for_reboot():
+    """The image is copied in large chunks and success waits for the volume to go away"""
+    print("🧪 Testing direct UF2 copy...")
+
+    root, volume = make_volume()
+    try:
+        image = root / "firmware.ino.uf2"
+        image.write_bytes(os.urandom(3 * 1024 * 1024 + 512))
+        size = image.stat().st_size
+
+        progress = []
+        bootrom = simulate_bootrom(volume, image.name, size)
+        written = copy_uf2_to_drive(image, str(volume), progress=lambda w, t: progress.append((w, t)),
+                                    chunk_size=1024 * 1024, timeout=5)
+        bootrom.join()
+
+        assert written == size
+        assert not volume.exists()
+        assert [w for w, _ in progress] == [1048576, 2097152, 3145728, size]
+        assert all(t == size for _, t in progress)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    print("✅ UF2 copied and volume disconnect confirmed")
+
+
+def test_copy_times_out_if_board_never_reboots():
+    """A volume that stays attached is reported as a failure"""
+    print("\n🧪 Testing reboot timeout...")
+
+    root, volume = make_volume()
+    try:
+        image = root / "firmware.ino.uf2"
+        image.write_bytes(b"\0" * 1024)
+        try:
+            copy_uf2_to_drive(image, str(volume), timeout=0.3)
+        except TimeoutError:
+            pass
+        else:
+            raise AssertionError("copy_uf2_to_drive should time out")
+        assert (volume / image.name).read_bytes() == image.read_bytes()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    print("✅ Timeout reported")
+
+
+def test_flash_firmware_prefers_bootsel_copy():
+    """FirmwareManager copies the compiled UF2 instead of running arduino-cli upload"""
+    print("\n🧪 Testing FirmwareManager BOOTSEL path...")
+
+    from bombercat_relay import FirmwareManager, arduino_cli, socketio, config
+
+    root, volume = make_volume()
+    original_build_dir = config.build_dir
+    try:
+        build_dir = root / "build"
+        build_dir.mkdir()
+        config.build_dir = str(build_dir)
+
+        image = build_dir / "host_Relay_NFC.ino.uf2"
+        image.write_bytes(pack_bin(os.urandom(64 * 1024)))
+
+        manager = FirmwareManager(arduino_cli, socketio)
+        manager.sketch_path = root / "host_Relay_NFC"
+
+        commands = []
+        original_run = arduino_cli.run_command
+        arduino_cli.run_command = lambda *args, **kwargs: commands.append(args)
+        try:
+            bootrom = simulate_bootrom(volume, image.name, image.stat().st_size)
+            assert manager.flash_firmware("rp2040:rp2040:rpipico", "/dev/ttyACM0", bootsel_path=str(volume))
+            bootrom.join()
+        finally:
+            arduino_cli.run_command = original_run
+
+        assert commands == []
+        assert not volume.exists()
+    finally:
+        config.build_dir = original_build_dir
+        shutil.rmtree(root, ignore_errors=True)
+    print("✅ arduino-cli upload skipped in BOOTSEL mode")
+
+
+def main():
+    print("""
+╔══════════════════════════════════════════════╗
+║       🧪 DIRECT UF2 COPY FLASH PATH 🧪       ║
+╚══════════════════════════════════════════════╝
+""")
+    test_copy_reports_progress_and_waits_for_reboot()
+    test_copy_times_out_if_board_never_reboots()
+    test_flash_firmware_prefers_bootsel_copy()
+    print("\n✅ ALL TESTS PASSED!")
+
+
+if __name__ == "__main__":
+    main()
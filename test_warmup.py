@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the background warm-up at server start
+A fake arduino-cli and a stubbed firmware download keep it offline
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+
+# Add current directory to path to import bombercat modules
+sys.path.insert(0, '.')
+
+from bombercat_warmup import SkipStep, Warmup
+
+REPO_DIR = Path(__file__).resolve().parent
+
+BOARD_URL = "https://example.invalid/package_electroniccats_index.json"
+
+# Compiles take a second, like a cold core build
+FAKE_CLI = """#!{python}
+import sys, time
+from pathlib import Path
+args = sys.argv[1:]
+if args[0] == "compile":
+    time.sleep(1.0)
+    build = Path(args[args.index("--build-path") + 1])
+    (build / "BomberCatWarmup.ino.bin").write_bytes(b"\\0" * 256)
+    core = Path(args[args.index("--build-cache-path") + 1])
+    core.mkdir(parents=True, exist_ok=True)
+    (core / "core.a").write_bytes(b"\\0" * 1024)
+"""
+
+
+def test_steps_report_status():
+    """Failures and skips are reported per step without stopping the others"""
+    print("🧪 Testing warm-up step reporting...")
+
+    def skipped():
+        raise SkipStep("nothing to do")
+
+    def failing():
+        raise RuntimeError("offline")
+
+    warmup = Warmup([("a", lambda: "ok"), ("b", skipped), ("c", failing), ("d", lambda: None)])
+    assert warmup.status()["state"] == "idle"
+    assert warmup.start()
+    assert not warmup.start()
+    assert warmup.wait(5)
+
+    status = warmup.status()
+    assert status["state"] == "finished" and not status["ready"]
+    assert [s["status"] for s in status["steps"]] == ["done", "skipped", "failed", "done"]
+    assert status["steps"][0]["detail"] == "ok"
+    assert status["steps"][2]["error"] == "offline"
+    print("✅ Step results reported")
+
+
+def test_warmup_at_server_start():
+    """Status is served while warm-up runs, and the first flash reuses its work"""
+    print("\n🧪 Testing server warm-up...")
+
+    from bombercat_relay import Config, create_app
+
+    root = Path(tempfile.mkdtemp(prefix="bombercat-warmup-"))
+    old_home = os.environ.get("HOME")
+    os.environ["HOME"] = str(root)
+    os.chdir(root)
+    try:
+        # Fresh indexes and an installed core, so initialize stays offline
+        arduino_dir = root / ".arduino15"
+        (arduino_dir / "packages" / "electroniccats" / "hardware" / "rp2040" / "1.0.0").mkdir(parents=True)
+        (arduino_dir / "arduino-cli.yaml").write_text(f"board_manager:\n  additional_urls:\n    - {BOARD_URL}\n")
+        (arduino_dir / "package_index.json").write_text("{}")
+        (arduino_dir / "package_electroniccats_index.json").write_text("{}")
+        (arduino_dir / "bombercat_index_state.json").write_text(
+            json.dumps({BOARD_URL: {"fetched_at": time.time()}}))
+
+        cli = root / "arduino-cli"
+        cli.write_text(FAKE_CLI.format(python=sys.executable))
+        cli.chmod(0o755)
+
+        cfg = Config(board_urls=[BOARD_URL], build_dir=str(root / "build"), sketch_dir=str(root / "sketch"),
+                     build_cache_dir=str(root / "cache"), use_ccache=False, async_mode="threading")
+        app = create_app(cfg)
+        services = app.extensions["bombercat"]
+        services["arduino_cli"].cli_path = str(cli)
+        firmware_manager = services["firmware_manager"]
+
+        fetches = []
+
+        def fetch_firmware_archive():
+            # Stands in for the GitHub download and extraction
+            time.sleep(0.3)
+            firmware = root / "sketch" / "BomberCat-main" / "firmware" / "host_Relay_NFC"
+            firmware.mkdir(parents=True, exist_ok=True)
+            (firmware / "host_Relay_NFC.ino").write_text("void setup() {}\nvoid loop() {}\n")
+            firmware_manager.firmware_fetched_at = time.time()
+            firmware_manager.catalog = None
+            fetches.append(time.time())
+
+        firmware_manager.fetch_firmware_archive = fetch_firmware_archive
+
+        client = app.test_client()
+        start = time.time()
+        assert services["warmup"].start()
+
+        latencies = []
+        states = set()
+        while time.time() - start < 20:
+            t0 = time.perf_counter()
+            status = client.get("/api/status").get_json()["warmup"]
+            latencies.append(time.perf_counter() - t0)
+            states.add(status["state"])
+            if status["state"] == "finished":
+                break
+            time.sleep(0.02)
+
+        assert "running" in states
+        assert status["ready"], status
+        assert [s["status"] for s in status["steps"]] == ["done", "done", "done", "done"]
+        assert status["steps"][2]["detail"] == "1 firmwares"
+        assert status["elapsed"] >= 1.0
+        # Requests were never stuck behind the warm-up
+        assert max(latencies) < 0.5
+        assert list((root / "cache").rglob("core.a"))
+
+        # The first flash reuses the prefetched archive
+        firmware_manager.download_firmware()
+        assert len(fetches) == 1
+        assert firmware_manager.sketch_path.name == "host_Relay_NFC"
+        print(f"✅ Warm-up ready after {status['elapsed']}s, status p100 {max(latencies) * 1000:.0f} ms")
+    finally:
+        os.chdir(REPO_DIR)
+        if old_home is None:
+            os.environ.pop("HOME", None)
+        else:
+            os.environ["HOME"] = old_home
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def test_concurrent_initialize():
+    """Warm-up and an install initializing together set up the mirror and index once"""
+    print("\n🧪 Testing concurrent Arduino CLI initialization...")
+
+    from bombercat_relay import ArduinoCLI, Config
+
+    root = Path(tempfile.mkdtemp(prefix="bombercat-warmup-"))
+    old_home = os.environ.get("HOME")
+    os.environ["HOME"] = str(root)
+    try:
+        cli = root / "arduino-cli"
+        cli.write_text(FAKE_CLI.format(python=sys.executable))
+        cli.chmod(0o755)
+
+        arduino = ArduinoCLI(None, Config(board_urls=[BOARD_URL], mirror_dir=str(root / "mirror"),
+                                          run_history_path=str(root / "runs.sqlite3")))
+        arduino.cli_path = str(cli)
+        arduino.emit_log = lambda message, level="info": None
+        arduino.emit_progress = lambda progress: None
+        calls = []
+
+        def setup_mirror():
+            calls.append("mirror")
+            time.sleep(0.2)
+            return [BOARD_URL]
+
+        arduino.setup_mirror = setup_mirror
+        arduino.update_index_if_stale = lambda urls, arduino_dir: calls.append("update-index")
+
+        threads = [threading.Thread(target=arduino.initialize) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert arduino.initialized
+        assert calls == ["mirror", "update-index"], calls
+    finally:
+        if old_home is None:
+            os.environ.pop("HOME", None)
+        else:
+            os.environ["HOME"] = old_home
+        shutil.rmtree(root, ignore_errors=True)
+    print("✅ Mirror and index set up once")
+
+
+def main():
+    print("""
+╔══════════════════════════════════════════════╗
+║        🧪 BACKGROUND WARM-UP 🧪              ║
+╚══════════════════════════════════════════════╝
+""")
+    test_steps_report_status()
+    test_warmup_at_server_start()
+    test_concurrent_initialize()
+    print("\n✅ ALL TESTS PASSED!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Test script to verify copy-on-write per-job sketch workspaces
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+from pathlib import Path
+
+# Add current directory to path to import bombercat modules
+sys.path.insert(0, '.')
+
+from bombercat_workspace import WorkspaceStore, replace_file
+
+REPO_DIR = Path(__file__).resolve().parent
+
+FQBN = "electroniccats:rp2040:bombercat"
+
+# Compiles slowly enough for two jobs to overlap; the image is the sketch name
+# and its configuration header, and every upload logs the image it was given
+FAKE_CLI = """#!{python}
+import sys
+import time
+from pathlib import Path
+args = sys.argv[1:]
+log = Path({log!r})
+if args[0] == "compile":
+    sketch = next(Path(arg) for arg in args if (Path(arg) / "bombercat_config.h").exists())
+    build = Path(args[args.index("--build-path") + 1])
+    with open(log, "a") as f:
+        f.write(f"start {{sketch.name}} {{time.time()}}\\n")
+    time.sleep(0.5)
+    build.mkdir(parents=True, exist_ok=True)
+    image = sketch.name + "|" + (sketch / "bombercat_config.h").read_text()
+    (build / (sketch.name + ".ino.bin")).write_text(image)
+    with open(log, "a") as f:
+        f.write(f"end {{sketch.name}} {{time.time()}}\\n")
+elif args[0] == "upload":
+    port = args[args.index("--port") + 1]
+    build = Path(args[args.index("--input-dir") + 1])
+    image = (build / (Path(args[-1]).name + ".ino.bin")).read_text()
+    with open(log, "a") as f:
+        f.write(f"upload {{port}} {{image.split('|')[0]}} host={{image.split('HOST_NUMBER ')[1].split()[0]}}\\n")
+"""
+
+
+def make_sketch(root, files=40):
+    """Create a sketch directory with a few hundred KB of sources"""
+    sketch = root / "source" / "host_Relay_NFC"
+    (sketch / "src").mkdir(parents=True)
+    (sketch / "host_Relay_NFC.ino").write_text('#include "relay.h"\nvoid setup() {}\nvoid loop() {}\n')
+    for i in range(files):
+        (sketch / "src" / f"unit{i}.cpp").write_text(f"int unit{i}() {{ return {i}; }}\n" * 200)
+    return sketch
+
+
+def test_workspaces_are_isolated():
+    """Edits in one workspace never reach the snapshot or other workspaces"""
+    print("🧪 Testing workspace isolation...")
+
+    root = Path(tempfile.mkdtemp(prefix="bombercat-ws-"))
+    try:
+        sketch = make_sketch(root)
+        store = WorkspaceStore(root / "workspaces")
+        snapshot = store.snapshot(sketch)
+        assert store.snapshot(sketch) == snapshot
+        assert snapshot.name == "host_Relay_NFC"
+
+        first = store.create(snapshot, "job-a")
+        second = store.create(snapshot, "job-b")
+        ino = "host_Relay_NFC.ino"
+        if first.method == "hardlink":
+            assert os.stat(first.sketch_path / ino).st_ino == os.stat(snapshot / ino).st_ino
+
+        replace_file(first.sketch_path / ino, "// job a\n")
+        replace_file(first.sketch_path / "bombercat_config.h", "#define HOST_NUMBER 1\n")
+        replace_file(second.sketch_path / ino, "// job b\n")
+
+        assert (first.sketch_path / ino).read_text() == "// job a\n"
+        assert (second.sketch_path / ino).read_text() == "// job b\n"
+        assert (snapshot / ino).read_text().startswith('#include "relay.h"')
+        assert not (snapshot / "bombercat_config.h").exists()
+        assert not (second.sketch_path / "bombercat_config.h").exists()
+        assert not any(p.name.endswith(".tmp") for p in first.sketch_path.iterdir())
+
+        first.release()
+        assert not first.root.exists()
+        assert (second.sketch_path / "src" / "unit0.cpp").exists()
+        assert (snapshot / "src" / "unit0.cpp").exists()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    print("✅ Workspaces isolated from each other and the snapshot")
+
+
+def test_workspace_creation_is_fast():
+    """Creating a workspace only links files and takes milliseconds"""
+    print("\n🧪 Testing workspace creation time...")
+
+    root = Path(tempfile.mkdtemp(prefix="bombercat-ws-"))
+    try:
+        store = WorkspaceStore(root / "workspaces")
+        snapshot = store.snapshot(make_sketch(root, files=200))
+
+        timings = []
+        for i in range(5):
+            start = time.perf_counter()
+            workspace = store.create(snapshot, f"job-{i}")
+            timings.append(time.perf_counter() - start)
+            assert len(list(workspace.sketch_path.rglob("*.cpp"))) == 200
+
+        best = min(timings) * 1000
+        assert best < 100, f"workspace creation took {best:.1f} ms"
+        print(f"✅ 201 files linked in {best:.1f} ms ({workspace.method})")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def test_firmware_manager_configures_workspace():
+    """configure_firmware edits the job workspace, not the extracted sources"""
+    print("\n🧪 Testing FirmwareManager workspaces...")
+
+    from bombercat_relay import Config, FirmwareManager, arduino_cli, socketio
+
+    root = Path(tempfile.mkdtemp(prefix="bombercat-ws-"))
+    try:
+        sketch = make_sketch(root, files=1)
+        original = (sketch / "host_Relay_NFC.ino").read_text()
+        cfg = Config(sketch_dir=str(root / "sketch"), build_dir=str(root / "build"))
+
+        manager = FirmwareManager(arduino_cli, socketio, cfg)
+        manager.sketch_path = sketch
+        workspace_path = manager.create_workspace("job-1")
+        assert workspace_path != sketch and workspace_path.name == sketch.name
+
+        manager.configure_firmware("lab", "secret", "broker", 1883, 4)
+        assert "#define HOST_NUMBER 4" in (workspace_path / "bombercat_config.h").read_text()
+        assert (workspace_path / "host_Relay_NFC.ino").read_text().startswith('#include "bombercat_config.h"')
+        assert (sketch / "host_Relay_NFC.ino").read_text() == original
+        assert not (sketch / "bombercat_config.h").exists()
+
+        manager.release_workspace()
+        assert manager.sketch_path == sketch
+        assert not workspace_path.exists()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    print("✅ Extracted firmware left pristine")
+
+
+def test_compatibility_fixes_stay_in_workspace():
+    """Downloaded firmware is patched in the job workspace, the extracted archive is not touched"""
+    print("\n🧪 Testing compatibility fixes in the workspace...")
+
+    from bombercat_relay import Config, FirmwareManager, arduino_cli, socketio
+
+    root = Path(tempfile.mkdtemp(prefix="bombercat-ws-"))
+    try:
+        firmware = root / "sketch" / "BomberCat-main" / "firmware" / "host_Relay_NFC"
+        firmware.mkdir(parents=True)
+        original = '#include "Electroniccats_PN7150.h"\n#include <FlashIAPBlockDevice.h>\nvoid setup() {}\n'
+        (firmware / "host_Relay_NFC.ino").write_text(original)
+        cfg = Config(sketch_dir=str(root / "sketch"), build_dir=str(root / "build"))
+        manager = FirmwareManager(arduino_cli, socketio, cfg)
+        manager.firmware_fetched_at = time.time()
+
+        manager.download_firmware("host")
+        assert manager.sketch_path == firmware
+        assert (firmware / "host_Relay_NFC.ino").read_text() == original
+
+        workspace_path = manager.create_workspace("job-1")
+        patched = (workspace_path / "host_Relay_NFC.ino").read_text()
+        assert "// #include <FlashIAPBlockDevice.h>" in patched
+        assert (firmware / "host_Relay_NFC.ino").read_text() == original
+        assert (manager.workspace.snapshot / "host_Relay_NFC.ino").read_text() == original
+        manager.release_workspace()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    print("✅ Fixes applied to the workspace copy only")
+
+
+def test_new_sources_prune_old_snapshots():
+    """A changed sketch replaces its unused snapshots, pinned and other sketches' snapshots stay"""
+    print("\n🧪 Testing snapshot pruning...")
+
+    root = Path(tempfile.mkdtemp(prefix="bombercat-ws-"))
+    try:
+        sketch = make_sketch(root, files=1)
+        other = root / "source" / "client_Relay_NFC"
+        other.mkdir()
+        (other / "client_Relay_NFC.ino").write_text("void setup() {}\nvoid loop() {}\n")
+        store = WorkspaceStore(root / "workspaces")
+
+        running = store.checkout(sketch, "running")
+        store.checkout(other, "client").release()
+        replace_file(sketch / "host_Relay_NFC.ino", "// v2\n")
+        second = store.checkout(sketch, "second")
+        # The first snapshot is still used by a running job
+        assert running.snapshot.exists() and (running.sketch_path / "src" / "unit0.cpp").exists()
+        assert len(list(store.snapshots_dir.iterdir())) == 3
+
+        running.release()
+        second.release()
+        replace_file(sketch / "host_Relay_NFC.ino", "// v3\n")
+        third = store.checkout(sketch, "third")
+        snapshots = sorted(entry.name for entry in store.snapshots_dir.iterdir())
+        assert len(snapshots) == 2 and third.snapshot.parent.name in snapshots
+        assert any((store.snapshots_dir / name / "client_Relay_NFC").exists() for name in snapshots)
+        third.release()
+        assert store.pins == {}
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    print("✅ Stale snapshots pruned once no job uses them")
+
+
+def test_overlapping_flash_jobs():
+    """Two /api/flash jobs running at once each flash their own firmware and configuration"""
+    print("\n🧪 Testing overlapping flash jobs...")
+
+    from bombercat_relay import Config, create_app
+
+    root = Path(tempfile.mkdtemp(prefix="bombercat-ws-"))
+    old_home = os.environ.get("HOME")
+    os.environ["HOME"] = str(root)
+    os.chdir(root)
+    try:
+        log = root / "cli.log"
+        cli = root / "arduino-cli"
+        cli.write_text(FAKE_CLI.format(python=sys.executable, log=str(log)))
+        cli.chmod(0o755)
+        firmware = root / "sketch" / "BomberCat-main" / "firmware"
+        for name in ("host_Relay_NFC", "client_Relay_NFC"):
+            (firmware / name).mkdir(parents=True)
+            (firmware / name / f"{name}.ino").write_text("void setup() {}\nvoid loop() {}\n")
+
+        cfg = Config(build_dir=str(root / "build"), sketch_dir=str(root / "sketch"), use_ccache=False,
+                     build_cache_dir=str(root / "cache"), async_mode="threading", warmup=False,
+                     use_board_registry=False, run_history_path=str(root / "runs.sqlite3"))
+        app = create_app(cfg)
+        services = app.extensions["bombercat"]
+        services["arduino_cli"].cli_path = str(cli)
+        services["arduino_cli"].emit_log = lambda message, level="info": None
+        services["arduino_cli"].emit_progress = lambda progress: None
+        services["firmware_manager"].firmware_fetched_at = time.time()
+        services["port_inventory"].list_ports = lambda: []
+
+        client = app.test_client()
+        job_ids = [
+            client.post("/api/flash", json={"port": "/dev/ttyACM0", "wifi_ssid": "lab", "fqbn": FQBN,
+                                            "firmware_type": "host", "host_number": 1}).get_json()["job_id"],
+            client.post("/api/flash", json={"port": "/dev/ttyACM1", "wifi_ssid": "lab", "fqbn": FQBN,
+                                            "firmware_type": "client", "host_number": 2}).get_json()["job_id"]
+        ]
+        deadline = time.time() + 20
+        while time.time() < deadline:
+            jobs = {job["id"]: job for job in client.get("/api/jobs").get_json()["jobs"]}
+            if all(jobs[job_id]["state"] not in ("pending", "running") for job_id in job_ids):
+                break
+            time.sleep(0.05)
+        assert [jobs[job_id]["state"] for job_id in job_ids] == ["finished", "finished"], jobs
+
+        lines = log.read_text().splitlines()
+        times = {tuple(line.split()[:2]): float(line.split()[2])
+                 for line in lines if line.split()[0] in ("start", "end")}
+        # The compiles really ran at the same time
+        assert len(times) == 4, lines
+        assert times[("start", "client_Relay_NFC")] < times[("end", "host_Relay_NFC")]
+        assert times[("start", "host_Relay_NFC")] < times[("end", "client_Relay_NFC")]
+        uploads = sorted(line for line in lines if line.startswith("upload"))
+        assert uploads == ["upload /dev/ttyACM0 host_Relay_NFC host=1",
+                           "upload /dev/ttyACM1 client_Relay_NFC host=2"], uploads
+        assert not list((root / "sketch" / "workspaces" / "jobs").iterdir())
+        assert not (firmware / "host_Relay_NFC" / "bombercat_config.h").exists()
+    finally:
+        os.chdir(REPO_DIR)
+        if old_home is None:
+            os.environ.pop("HOME", None)
+        else:
+            os.environ["HOME"] = old_home
+        shutil.rmtree(root, ignore_errors=True)
+    print("✅ Each board got its own firmware and host number")
+
+
+def main():
+    print("""
+╔══════════════════════════════════════════════╗
+║      🧪 COPY-ON-WRITE SKETCH WORKSPACES 🧪   ║
+╚══════════════════════════════════════════════╝
+""")
+    test_workspaces_are_isolated()
+    test_workspace_creation_is_fast()
+    test_firmware_manager_configures_workspace()
+    test_compatibility_fixes_stay_in_workspace()
+    test_new_sources_prune_old_snapshots()
+    test_overlapping_flash_jobs()
+    print("\n✅ ALL TESTS PASSED!")
+
+
+if __name__ == "__main__":
+    main()